@@ -15,10 +15,12 @@
 
 import collections
 import functools
+import hashlib
 import itertools
 import re
 
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 from oslo_utils import strutils
 from oslo_utils import uuidutils
 import six
@@ -26,6 +28,7 @@ import six.moves.urllib.parse as urlparse
 import webob
 from webob import exc
 
+from nova.api.openstack import wsgi
 from nova.compute import task_states
 from nova.compute import utils as compute_utils
 from nova.compute import vm_states
@@ -249,6 +252,37 @@ def get_limit_and_marker(request, max_limit=CONF.osapi_max_limit):
     return limit, marker
 
 
+def get_change_time(obj):
+    """Return the last time an object was saved, None if unknown."""
+    for field in ('updated_at', 'created_at'):
+        if obj.obj_attr_is_set(field) and getattr(obj, field):
+            return getattr(obj, field)
+    return None
+
+
+def check_etag(request, markers):
+    """Set the ETag of the response to a listing and check it against the
+    If-None-Match header of the request.
+
+    The ETag is a digest of the change markers of the listed items, like
+    their ids and update times, and of what the response depends on besides
+    them, so that it is computed without building the views of the items.
+
+    Listings only have ETags when osapi_list_cache_expiration is set.
+
+    :returns: a 304 Not Modified response if the client already holds the
+        response, None otherwise.
+    """
+    if not CONF.osapi_list_cache_expiration:
+        return None
+    etag = hashlib.sha1(utils.utf8(jsonutils.dumps(
+        [request.get_response_key(), markers], sort_keys=True))).hexdigest()
+    request.set_response_etag(etag)
+    if etag in request.if_none_match:
+        return wsgi.not_modified(etag)
+    return None
+
+
 def get_id_from_href(href):
     """Return the id or uuid portion of a url.
 
@@ -40,9 +40,16 @@ class FlavorsController(wsgi.Controller):
         return self._view_builder.index(req, limited_flavors)
 
     @extensions.expected_errors(400)
+    @wsgi.cacheable
     def detail(self, req):
         """Return all flavors in detail."""
         limited_flavors = self._get_flavors(req)
+        not_modified = common.check_etag(
+            req, [[flavor['flavorid'], flavor.get('updated_at', None) or
+                   flavor.get('created_at', None)]
+                  for flavor in limited_flavors])
+        if not_modified:
+            return not_modified
         req.cache_db_flavors(limited_flavors)
         return self._view_builder.detail(req, limited_flavors)
 
@@ -41,8 +41,9 @@ class HypervisorsController(wsgi.Controller):
         super(HypervisorsController, self).__init__()
 
     def _view_hypervisor(self, hypervisor, service, detail, req, servers=None,
-                         **kwargs):
-        alive = self.servicegroup_api.service_is_up(service)
+                         alive=None, **kwargs):
+        if alive is None:
+            alive = self.servicegroup_api.service_is_up(service)
         hyp_dict = {
             'id': hypervisor.id,
             'hypervisor_hostname': hypervisor.hypervisor_hostname,
@@ -80,28 +81,51 @@ class HypervisorsController(wsgi.Controller):
 
         return hyp_dict
 
+    def _get_services(self, context, compute_nodes):
+        services = [self.host_api.service_get_by_compute_host(context,
+                                                               hyp.host)
+                    for hyp in compute_nodes]
+        # Check the state of all of the services at once
+        alive = self.servicegroup_api.services_are_up(services)
+        return services, alive
+
+    def _view_hypervisors(self, context, compute_nodes, detail, req,
+                          services=None, alive=None):
+        if services is None:
+            services, alive = self._get_services(context, compute_nodes)
+        return [self._view_hypervisor(hyp, service, detail, req,
+                                      alive=is_up)
+                for hyp, service, is_up in zip(compute_nodes, services,
+                                               alive)]
+
     @extensions.expected_errors(())
     def index(self, req):
         context = req.environ['nova.context']
         authorize(context)
         compute_nodes = self.host_api.compute_node_get_all(context)
         req.cache_db_compute_nodes(compute_nodes)
-        return dict(hypervisors=[self._view_hypervisor(
-                                 hyp,
-                                 self.host_api.service_get_by_compute_host(
-                                     context, hyp.host),
-                                 False, req)
-                                 for hyp in compute_nodes])
+        return dict(hypervisors=self._view_hypervisors(context, compute_nodes,
+                                                       False, req))
 
     @extensions.expected_errors(())
+    @wsgi.cacheable
     def detail(self, req):
         context = req.environ['nova.context']
         authorize(context)
         compute_nodes = self.host_api.compute_node_get_all(context)
+        services, alive = self._get_services(context, compute_nodes)
+        # The compute nodes are only saved when their resources change
+        not_modified = common.check_etag(
+            req, [[hyp.id, common.get_change_time(hyp), service.id,
+                   service.disabled, service.disabled_reason, is_up]
+                  for hyp, service, is_up in zip(compute_nodes, services,
+                                                 alive)])
+        if not_modified:
+            return not_modified
         req.cache_db_compute_nodes(compute_nodes)
-        return dict(hypervisors=[self._view_hypervisor(
-            hyp, self.host_api.service_get_by_compute_host(context, hyp.host),
-            True, req) for hyp in compute_nodes])
+        return dict(hypervisors=self._view_hypervisors(
+            context, compute_nodes, True, req, services=services,
+            alive=alive))
 
     @extensions.expected_errors(404)
     def show(self, req, id):
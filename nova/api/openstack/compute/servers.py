@@ -281,6 +281,7 @@ class ServersController(wsgi.Controller):
         return servers
 
     @extensions.expected_errors((400, 403))
+    @wsgi.cacheable
     def detail(self, req):
         """Returns a list of server details for a given user."""
         context = req.environ['nova.context']
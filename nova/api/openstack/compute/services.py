@@ -63,8 +63,7 @@ class ServiceController(wsgi.Controller):
 
         return _services
 
-    def _get_service_detail(self, svc, additional_fields):
-        alive = self.servicegroup_api.service_is_up(svc)
+    def _get_service_detail(self, svc, alive, additional_fields):
         state = (alive and "up") or "down"
         active = 'enabled'
         if svc['disabled']:
@@ -85,8 +84,9 @@ class ServiceController(wsgi.Controller):
 
     def _get_services_list(self, req, additional_fields=()):
         _services = self._get_services(req)
-        return [self._get_service_detail(svc, additional_fields)
-                for svc in _services]
+        alive = self.servicegroup_api.services_are_up(_services)
+        return [self._get_service_detail(svc, is_up, additional_fields)
+                for svc, is_up in zip(_services, alive)]
 
     def _enable(self, body, context):
         """Enable scheduling for a service."""
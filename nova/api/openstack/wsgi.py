@@ -14,7 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import functools
+import hashlib
 import inspect
 import math
 import time
@@ -28,15 +28,19 @@ import webob
 
 from nova.api.openstack import api_version_request as api_version
 from nova.api.openstack import versioned_method
+from nova import cache_utils
+import nova.conf
 from nova import exception
 from nova import i18n
 from nova.i18n import _
 from nova.i18n import _LE
 from nova.i18n import _LI
+from nova.i18n import _LW
 from nova import utils
 from nova import wsgi
 
 
+CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
 _SUPPORTED_CONTENT_TYPES = (
@@ -172,6 +176,24 @@ class Request(wsgi.Request):
     def get_db_compute_node(self, id):
         return self.get_db_item('compute_nodes', id)
 
+    def get_response_key(self):
+        """Return a digest of what the response to this request depends on,
+        besides the data it returns: its URL, API version and credentials.
+        """
+        key = [self.url, str(self.api_version_request)]
+        context = self.environ.get('nova.context')
+        if context is not None:
+            key += [context.project_id, context.user_id,
+                    sorted(context.roles)]
+        return hashlib.sha1(utils.utf8(jsonutils.dumps(key))).hexdigest()
+
+    def set_response_etag(self, etag):
+        """Set the ETag of the response to this request."""
+        self.environ['nova.response_etag'] = etag
+
+    def get_response_etag(self):
+        return self.environ.get('nova.response_etag')
+
     def best_match_content_type(self):
         """Determine the requested response content-type."""
         if 'nova.best_content_type' not in self.environ:
@@ -314,6 +336,27 @@ def response(code):
     return decorator
 
 
+def cacheable(func):
+    """Marks a listing method whose responses may be cached.
+
+    When osapi_list_cache_expiration is set, the serialized responses get an
+    ETag and are cached for that many seconds, by URL, API version and
+    credentials of the request. The ETag is a digest of the body, unless the
+    method sets one from the change markers of the listed items. Note that
+    the function attributes are directly manipulated; the method is not
+    wrapped.
+    """
+    func.wsgi_cacheable = True
+    return func
+
+
+def not_modified(etag):
+    """Return a 304 Not Modified response with the given ETag."""
+    response = webob.Response(status=304)
+    response.etag = etag
+    return response
+
+
 class ResponseObject(object):
     """Bundles a response object
 
@@ -485,6 +528,7 @@ class Resource(wsgi.Application):
         self.wsgi_extensions = {}
         self.wsgi_action_extensions = {}
         self.inherits = inherits
+        self._response_cache = None
 
     def register_actions(self, controller):
         """Registers controller actions with this resource."""
@@ -634,6 +678,40 @@ class Resource(wsgi.Application):
 
         return None
 
+    @staticmethod
+    def _is_cacheable(request, meth):
+        return (request.method == 'GET' and
+                getattr(meth, 'wsgi_cacheable', False) and
+                CONF.osapi_list_cache_expiration > 0)
+
+    def _get_response_cache(self):
+        """Return the cache of the responses to the cacheable requests, or
+        None if there is no cache backend.
+        """
+        if self._response_cache is None:
+            if not CONF.cache.enabled:
+                # NOTE: The dictionary backend that cache_utils falls back
+                # to never drops the expired entries, so the responses would
+                # be kept for the life of the process.
+                LOG.warning(_LW("The responses to the listings are not "
+                                "cached because the [cache] section is not "
+                                "enabled."))
+                self._response_cache = False
+            else:
+                self._response_cache = cache_utils.get_client(
+                    expiration_time=CONF.osapi_list_cache_expiration)
+        return self._response_cache or None
+
+    @staticmethod
+    def _cached_response(request, content_type, etag, body):
+        if etag and etag in request.if_none_match:
+            return not_modified(etag)
+        response = webob.Response(body=body)
+        response.headers['Content-Type'] = utils.utf8(content_type)
+        if etag:
+            response.etag = etag
+        return response
+
     def _should_have_body(self, request):
         return request.method in _METHODS_WITH_BODY
 
@@ -731,6 +809,18 @@ class Resource(wsgi.Application):
         response, post = self.pre_process_extensions(extensions,
                                                      request, action_args)
 
+        cacheable = not response and self._is_cacheable(request, meth)
+        cache = None
+        if cacheable:
+            cache = self._get_response_cache()
+        if cache is not None:
+            cache_key = 'response-%s' % request.get_response_key()
+            cached = cache.get(cache_key)
+            if cached:
+                LOG.debug("Using the cached response to %s", request.path)
+                response = self._cached_response(request, accept, *cached)
+                cache = None
+
         if not response:
             try:
                 with ResourceExceptionHandler():
@@ -760,6 +850,18 @@ class Resource(wsgi.Application):
 
             if resp_obj and not response:
                 response = resp_obj.serialize(request, accept)
+                etag = request.get_response_etag()
+                if cacheable and response.status_int == 200:
+                    if not etag:
+                        # The post-processing extensions may add to the
+                        # response what the controller does not know of
+                        etag = hashlib.sha1(response.body).hexdigest()
+                    if cache is not None:
+                        cache.set(cache_key, (etag, response.body))
+                    if etag in request.if_none_match:
+                        response = not_modified(etag)
+                if etag:
+                    response.etag = etag
 
         if hasattr(response, 'headers'):
             for hdr, val in list(response.headers.items()):
@@ -874,6 +976,91 @@ def extends(*args, **kwargs):
     return decorator
 
 
+class VersionedMethodTable(object):
+    """Descriptor dispatching the calls to a versioned method to the
+    implementation matching the API version of the request.
+
+    The implementation of each microversion is resolved when the controller
+    class is created.
+    """
+
+    def __init__(self, name, func_list):
+        self.name = name
+        self.func_list = func_list
+        # The decorator attributes, like wsgi.cacheable, which all the
+        # implementations share, so that they are known before the version
+        # of the request is
+        funcs = [func.func for func in func_list]
+        self.attrs = dict(
+            (key, value) for key, value in funcs[0].__dict__.items()
+            if key.startswith('wsgi_') and
+            all(key in func.__dict__ and func.__dict__[key] == value
+                for func in funcs[1:]))
+        # Implementation of each version, None if no implementation matches
+        self._funcs = {}
+        min_ver = api_version.min_api_version()
+        max_ver = api_version.max_api_version()
+        for minor in range(min_ver.ver_minor, max_ver.ver_minor + 1):
+            ver = api_version.APIVersionRequest(
+                '%d.%d' % (max_ver.ver_major, minor))
+            self._funcs[(ver.ver_major, ver.ver_minor)] = self._match(ver)
+
+    def _match(self, ver):
+        # The list is sorted by minimum version (reversed), the first match
+        # is the latest implementation supporting the version
+        for func in self.func_list:
+            if ver.matches(func.start_version, func.end_version):
+                return func.func
+        return None
+
+    def get_func(self, ver):
+        """Return the implementation of the method for a version.
+
+        :raises: VersionNotFoundForAPIMethod if no implementation matches
+        """
+        key = (ver.ver_major, ver.ver_minor)
+        try:
+            func = self._funcs[key]
+        except KeyError:
+            func = self._funcs[key] = self._match(ver)
+        if func is None:
+            raise exception.VersionNotFoundForAPIMethod(version=ver)
+        return func
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return BoundVersionedMethod(self, obj)
+
+
+class BoundVersionedMethod(object):
+    """A versioned method bound to a controller."""
+
+    def __init__(self, table, obj):
+        self.__name__ = table.name
+        self.__dict__.update(table.attrs)
+        self._table = table
+        self._obj = obj
+
+    def __repr__(self):
+        return '<bound method %s.%s of %r>' % (
+            type(self._obj).__name__, self.__name__, self._obj)
+
+    def __call__(self, *args, **kwargs):
+        # The first arg to all versioned methods is always the request
+        # object. The version for the request is attached to the
+        # request object
+        if len(args) == 0:
+            ver = kwargs['req'].api_version_request
+        else:
+            ver = args[0].api_version_request
+        func = self._table.get_func(ver)
+        # Copy the attributes of the implementation so other decorator
+        # attributes like wsgi.response are still respected.
+        self.__dict__.update(func.__dict__)
+        return func(self._obj, *args, **kwargs)
+
+
 class ControllerMetaclass(type):
     """Controller metaclass.
 
@@ -916,6 +1103,10 @@ class ControllerMetaclass(type):
         cls_dict['wsgi_extensions'] = extensions
         if versioned_methods:
             cls_dict[VER_METHOD_ATTR] = versioned_methods
+            # Only the versioned methods go through a dispatch table, the
+            # other attributes of the controllers are looked up as usual
+            for key, func_list in versioned_methods.items():
+                cls_dict[key] = VersionedMethodTable(key, func_list)
 
         return super(ControllerMetaclass, mcs).__new__(mcs, name, bases,
                                                        cls_dict)
@@ -936,49 +1127,6 @@ class Controller(object):
         else:
             self._view_builder = None
 
-    def __getattribute__(self, key):
-
-        def version_select(*args, **kwargs):
-            """Look for the method which matches the name supplied and version
-            constraints and calls it with the supplied arguments.
-
-            @return: Returns the result of the method called
-            @raises: VersionNotFoundForAPIMethod if there is no method which
-                 matches the name and version constraints
-            """
-
-            # The first arg to all versioned methods is always the request
-            # object. The version for the request is attached to the
-            # request object
-            if len(args) == 0:
-                ver = kwargs['req'].api_version_request
-            else:
-                ver = args[0].api_version_request
-
-            func_list = self.versioned_methods[key]
-            for func in func_list:
-                if ver.matches(func.start_version, func.end_version):
-                    # Update the version_select wrapper function so
-                    # other decorator attributes like wsgi.response
-                    # are still respected.
-                    functools.update_wrapper(version_select, func.func)
-                    return func.func(self, *args, **kwargs)
-
-            # No version match
-            raise exception.VersionNotFoundForAPIMethod(version=ver)
-
-        try:
-            version_meth_dict = object.__getattribute__(self, VER_METHOD_ATTR)
-        except AttributeError:
-            # No versioning on this class
-            return object.__getattribute__(self, key)
-
-        if version_meth_dict and \
-          key in object.__getattribute__(self, VER_METHOD_ATTR):
-            return version_select
-
-        return object.__getattribute__(self, key)
-
     # NOTE(cyeoh): This decorator MUST appear first (the outermost
     # decorator) on an API method for it to work correctly
     @classmethod
@@ -74,6 +74,7 @@ from nova.objects import quotas as quotas_obj
 from nova.objects import security_group as security_group_obj
 from nova.pci import request as pci_request
 import nova.policy
+from nova import quota
 from nova import rpc
 from nova.scheduler import client as scheduler_client
 from nova.scheduler import utils as scheduler_utils
@@ -378,6 +379,33 @@ class API(base.Base):
 
         return max_count, quotas
 
+    def _recheck_num_instances_quota(self, context, instance_type,
+                                     num_instances):
+        """Check that the instances just created did not put the project
+        over quota, with a quota driver which does not reserve them.
+        """
+        try:
+            quota.QUOTAS.recheck(context, ['instances', 'cores', 'ram'])
+        except exception.OverQuota as exc:
+            quotas = exc.kwargs['quotas']
+            usages = exc.kwargs['usages']
+            vram_mb = int(instance_type.get('extra_specs',
+                                            {}).get(VIDEO_RAM, 0))
+            requested = dict(
+                instances=num_instances,
+                cores=num_instances * instance_type['vcpus'],
+                ram=num_instances * (instance_type['memory_mb'] + vram_mb))
+            overs = exc.kwargs['overs']
+            LOG.debug("%(overs)s quota exceeded for %(pid)s once the "
+                      "instances were created", {'overs': overs,
+                                                 'pid': context.project_id})
+            raise exception.TooManyInstances(
+                overs=', '.join(overs),
+                req=', '.join(str(requested[res]) for res in overs),
+                used=', '.join(str(usages[res]['in_use'] - requested[res])
+                               for res in overs),
+                allowed=', '.join(str(quotas[res]) for res in overs))
+
     def _get_over_quota_detail(self, headroom, overs, quotas, requested):
         reqs = []
         useds = []
@@ -1000,6 +1028,12 @@ class API(base.Base):
                 notifications.send_update_with_states(context, instance, None,
                         vm_states.BUILDING, None, None, service="api")
 
+            # Concurrent requests can go over quota together when the quota
+            # driver counts the usage instead of reserving it, so the quota
+            # is checked again now that the instances are counted.
+            self._recheck_num_instances_quota(context, instance_type,
+                                              num_instances)
+
         # In the case of any exceptions, attempt DB cleanup and rollback the
         # quota reservations.
         except Exception:
@@ -74,6 +74,7 @@ from nova.i18n import _LE
 from nova.i18n import _LI
 from nova.i18n import _LW
 from nova import image
+from nova.image.download import peer as image_peer
 from nova.image import glance
 from nova import manager
 from nova import network
@@ -101,6 +102,10 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 
+# Seconds after which the usage of a volume is saved again even if its
+# counters didn't change, so that the volume is still part of the usage audit
+VOLUME_USAGE_REFRESH_INTERVAL = 3600
+
 get_notifier = functools.partial(rpc.get_notifier, service='compute')
 wrap_exception = functools.partial(exception.wrap_exception,
                                    get_notifier=get_notifier)
@@ -529,6 +534,10 @@ class ComputeManager(manager.Manager):
         self.instance_events = InstanceEvents()
         self._sync_power_pool = eventlet.GreenPool()
         self._syncs_in_progress = {}
+        self._image_peer_server = None
+        # (counters, time saved) of the volume usages last saved by
+        # _update_volume_usage_cache, keyed by volume id
+        self._volume_usage_counters = {}
         self.send_instance_updates = CONF.scheduler_tracks_instance_changes
         if CONF.max_concurrent_builds != 0:
             self._build_semaphore = eventlet.semaphore.Semaphore(
@@ -578,6 +587,18 @@ class ComputeManager(manager.Manager):
             rt = self._get_resource_tracker(instance.node)
             rt.update_usage(context, instance)
 
+    def _force_full_recount(self, nodename):
+        """Make the resource tracker of a node recount the usage of all of
+        its instances, after an instance arrived or left without a claim.
+
+        Returns the resource tracker, or None if the node has none yet, in
+        which case its first update is a full recount anyway.
+        """
+        rt = self._resource_tracker_dict.get(nodename)
+        if rt is not None:
+            rt.force_full_recount()
+        return rt
+
     def _instance_update(self, context, instance, **kwargs):
         """Update an instance in the database using kwargs as value."""
 
@@ -1143,6 +1164,9 @@ class ComputeManager(manager.Manager):
 
         self.init_virt_events()
 
+        if CONF.image_peer.serve:
+            self._image_peer_server = image_peer.start_server()
+
         try:
             # checking that instance was not already evacuated to other host
             self._destroy_evacuated_instances(context)
@@ -1156,6 +1180,9 @@ class ComputeManager(manager.Manager):
     def cleanup_host(self):
         self.driver.register_event_listener(None)
         self.instance_events.cancel_all_events()
+        if self._image_peer_server is not None:
+            self._image_peer_server.stop()
+            self._image_peer_server = None
         self.driver.cleanup_host(host=self.host)
 
     def pre_start_hook(self):
@@ -4144,6 +4171,7 @@ class ComputeManager(manager.Manager):
         self.driver.destroy(context, instance, network_info,
                 block_device_info)
 
+        offloaded_node = instance.node
         instance.power_state = current_power_state
         instance.host = None
         instance.node = None
@@ -4153,6 +4181,9 @@ class ComputeManager(manager.Manager):
                                            task_states.SHELVING_OFFLOADING])
         # NOTE(ndipanov): This frees the resources with the resource_tracker
         self._update_resource_tracker(context, instance)
+        # The instance no longer belongs to this host, so its usage is only
+        # released by a full recount.
+        self._force_full_recount(offloaded_node)
 
         self._delete_scheduler_instance_info(context, instance.uuid)
         self._notify_about_instance_usage(context, instance,
@@ -4653,6 +4684,7 @@ class ComputeManager(manager.Manager):
                 vol_usage.curr_writes = wr_req
                 vol_usage.curr_write_bytes = wr_bytes
                 vol_usage.save(update_totals=True)
+                self._volume_usage_counters.pop(volume_id, None)
                 self.notifier.info(context, 'volume.usage',
                                    compute_utils.usage_volume_info(vol_usage))
 
@@ -5337,7 +5369,11 @@ class ComputeManager(manager.Manager):
         self.instance_events.clear_events_for_instance(instance)
 
         # NOTE(timello): make sure we update available resources on source
-        # host even before next periodic task.
+        # host even before next periodic task. The instance left without
+        # going through the resource trackers, so its usage is only released
+        # by a full recount.
+        for rt in self._resource_tracker_dict.values():
+            rt.force_full_recount()
         self.update_available_resource(ctxt)
 
         self._update_scheduler_instance_info(ctxt, instance)
@@ -5439,6 +5475,13 @@ class ComputeManager(manager.Manager):
                                                 prev_host, teardown=True)
         # NOTE(vish): this is necessary to update dhcp
         self.network_api.setup_networks_on_host(context, instance, self.host)
+        # The instance arrived without a claim, so its usage is only
+        # accounted for by a full recount. Do it now, as the source host
+        # does, so the scheduler sees the usage before the next periodic
+        # task.
+        if (node_name is not None and
+                self._force_full_recount(node_name) is not None):
+            self.update_available_resource_for_node(context, node_name)
         self._notify_about_instance_usage(
                      context, instance, "live_migration.post.dest.end",
                      network_info=network_info)
@@ -5559,13 +5602,17 @@ class ComputeManager(manager.Manager):
         list, pull the DB record, and try the call to the network API.
         If anything errors don't fail, as it's possible the instance
         has been deleted, etc.
+
+        With heal_instance_info_cache_batch_size, as many instances are
+        popped off the list and updated together.
         """
         heal_interval = CONF.heal_instance_info_cache_interval
         if not heal_interval:
             return
 
+        batch_size = CONF.heal_instance_info_cache_batch_size
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
-        instance = None
+        instances = []
 
         LOG.debug('Starting heal instance info cache')
 
@@ -5588,17 +5635,17 @@ class ComputeManager(manager.Manager):
                               'because it is being deleted.', instance=inst)
                     continue
 
-                if not instance:
-                    # Save the first one we find so we don't
-                    # have to get it again
-                    instance = inst
+                if len(instances) < batch_size:
+                    # Save the first ones we find so we don't
+                    # have to get them again
+                    instances.append(inst)
                 else:
                     instance_uuids.append(inst['uuid'])
 
             self._instance_uuids_to_heal = instance_uuids
         else:
-            # Find the next valid instance on the list
-            while instance_uuids:
+            # Find the next valid instances on the list
+            while instance_uuids and len(instances) < batch_size:
                 try:
                     inst = objects.Instance.get_by_uuid(
                             context, instance_uuids.pop(0),
@@ -5619,10 +5666,23 @@ class ComputeManager(manager.Manager):
                     LOG.debug('Skipping network cache update for instance '
                               'because it is being deleted.', instance=inst)
                 else:
-                    instance = inst
-                    break
+                    instances.append(inst)
 
-        if instance:
+        if len(instances) > 1:
+            # We have a batch of instances to refresh
+            try:
+                nw_infos = self.network_api.get_instances_nw_info(context,
+                                                                  instances)
+                LOG.debug('Refreshed the network info_cache of '
+                          '%(refreshed)d instances out of %(instances)d',
+                          {'refreshed': len(nw_infos),
+                           'instances': len(instances)})
+            except Exception:
+                LOG.error(_LE('An error occurred while refreshing the network '
+                              'cache of %d instances.'), len(instances),
+                          exc_info=True)
+        elif instances:
+            instance = instances[0]
             # We have an instance now to refresh
             try:
                 # Call to network API to get instance info.. this will
@@ -5956,10 +6016,24 @@ class ComputeManager(manager.Manager):
         return compute_host_bdms
 
     def _update_volume_usage_cache(self, context, vol_usages):
-        """Updates the volume usage cache table with a list of stats."""
+        """Updates the volume usage cache table with a list of stats.
+
+        The stats which didn't change since they were last saved are only
+        saved again every VOLUME_USAGE_REFRESH_INTERVAL seconds, the others
+        are saved all at once.
+        """
+        now = time.time()
+        last_counters = self._volume_usage_counters
+        self._volume_usage_counters = {}
+        usage_list = objects.VolumeUsageList(context, objects=[])
         for usage in vol_usages:
-            # Allow switching of greenthreads between queries.
-            greenthread.sleep(0)
+            counters = (usage['instance'].uuid, usage['rd_req'],
+                        usage['rd_bytes'], usage['wr_req'], usage['wr_bytes'])
+            last = last_counters.get(usage['volume'])
+            if (last is not None and last[0] == counters and
+                    now - last[1] < VOLUME_USAGE_REFRESH_INTERVAL):
+                self._volume_usage_counters[usage['volume']] = last
+                continue
             vol_usage = objects.VolumeUsage(context)
             vol_usage.volume_id = usage['volume']
             vol_usage.instance_uuid = usage['instance'].uuid
@@ -5970,7 +6044,18 @@ class ComputeManager(manager.Manager):
             vol_usage.curr_read_bytes = usage['rd_bytes']
             vol_usage.curr_writes = usage['wr_req']
             vol_usage.curr_write_bytes = usage['wr_bytes']
-            vol_usage.save()
+            usage_list.objects.append(vol_usage)
+            self._volume_usage_counters[usage['volume']] = (counters, now)
+
+        if not usage_list.objects:
+            return
+        try:
+            usage_list.save()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                # Save all of them again at the next poll
+                self._volume_usage_counters = {}
+        for vol_usage in usage_list:
             self.notifier.info(context, 'volume.usage',
                                compute_utils.usage_volume_info(vol_usage))
 
@@ -6003,12 +6088,22 @@ class ComputeManager(manager.Manager):
         number of virtual machines known by the database, we proceed in a lazy
         loop, one database record at a time, checking if the hypervisor has the
         same power state as is in the database.
+
+        If the virt driver can list the power states of all of its instances
+        at once, only the records which don't match that list are checked.
         """
         db_instances = objects.InstanceList.get_by_host(context, self.host,
                                                         expected_attrs=[],
                                                         use_slave=True)
 
-        num_vm_instances = self.driver.get_num_instances()
+        try:
+            # Power states of all of the guests in a single call, to only
+            # query the instances which are out of sync one by one
+            vm_power_states = self.driver.get_power_states()
+            num_vm_instances = len(vm_power_states)
+        except NotImplementedError:
+            vm_power_states = None
+            num_vm_instances = self.driver.get_num_instances()
         num_db_instances = len(db_instances)
 
         if num_vm_instances != num_db_instances:
@@ -6037,6 +6132,12 @@ class ComputeManager(manager.Manager):
             self._syncs_in_progress.pop(db_instance.uuid)
 
         for db_instance in db_instances:
+            if (vm_power_states is not None and
+                    self._power_state_in_sync(
+                        db_instance,
+                        vm_power_states.get(db_instance.uuid,
+                                            power_state.NOSTATE))):
+                continue
             # process syncs asynchronously - don't want instance locking to
             # block entire periodic task thread
             uuid = db_instance.uuid
@@ -6047,6 +6148,27 @@ class ComputeManager(manager.Manager):
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance)
 
+    @staticmethod
+    def _power_state_in_sync(db_instance, vm_power_state):
+        """Return True if _sync_instance_power_state() would have nothing to
+        do for an instance, given its power state on the hypervisor.
+        """
+        if db_instance.task_state is not None:
+            # Skipped by the sync anyway
+            return True
+        if db_instance.power_state != vm_power_state:
+            return False
+        if db_instance.vm_state in (vm_states.BUILDING,
+                                    vm_states.RESCUED,
+                                    vm_states.RESIZED,
+                                    vm_states.SUSPENDED,
+                                    vm_states.ERROR):
+            return True
+        return (db_instance.vm_state, vm_power_state) in (
+            (vm_states.ACTIVE, power_state.RUNNING),
+            (vm_states.STOPPED, power_state.SHUTDOWN),
+            (vm_states.PAUSED, power_state.PAUSED))
+
     def _query_driver_power_state_and_sync(self, context, db_instance):
         if db_instance.task_state is not None:
             LOG.info(_LI("During sync_power_state the instance has a "
@@ -6578,6 +6700,18 @@ class ComputeManager(manager.Manager):
 
         self.driver.manage_image_cache(context, filtered_instances)
 
+    @periodic_task.periodic_task(spacing=CONF.image_prefetch_interval,
+                                 external_process_ok=True)
+    def _prefetch_images(self, context):
+        """Start the download of the images to prefetch which are missing
+        from the image cache.
+        """
+        if (not CONF.prefetch_images or
+                not self.driver.capabilities["has_imagecache"]):
+            return
+
+        self.driver.prefetch_images(context, CONF.prefetch_images)
+
     @periodic_task.periodic_task(spacing=CONF.instance_delete_interval)
     def _run_pending_deletes(self, context):
         """Retry any pending instance file deletes."""
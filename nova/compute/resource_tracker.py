@@ -23,6 +23,7 @@ import copy
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import importutils
+from oslo_utils import timeutils
 
 from nova.compute import claims
 from nova.compute import monitors
@@ -46,6 +47,17 @@ CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
 
+# Usage fields of the compute node which the resource tracker accounts for
+# itself, and which are compared with the ones of a full recount to detect
+# any drift of the incremental accounting.
+LEDGER_FIELDS = ('memory_mb_used', 'local_gb_used', 'vcpus_used',
+                 'running_vms')
+
+# Keys of the resources reported by the virt driver which hold usage rather
+# than capacity, kept from the ledger between two full recounts.
+_USAGE_RESOURCES = ('memory_mb_used', 'local_gb_used', 'vcpus_used',
+                    'numa_topology', 'stats', 'pci_passthrough_devices')
+
 
 def _instance_in_resize_state(instance):
     """Returns True if the instance is in one of the resizing states.
@@ -88,6 +100,7 @@ class ResourceTracker(object):
         self.ram_allocation_ratio = CONF.ram_allocation_ratio
         self.cpu_allocation_ratio = CONF.cpu_allocation_ratio
         self.disk_allocation_ratio = CONF.disk_allocation_ratio
+        self._last_full_recount = None
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def instance_claim(self, context, instance_ref, limits=None):
@@ -528,9 +541,61 @@ class ResourceTracker(object):
                               'another host\'s instance!'),
                           {'uuid': migration.instance_uuid})
 
+    def force_full_recount(self):
+        """Recount the usage of all of the instances and migrations at the
+        next update_available_resource(), e.g. after resources were released
+        without going through the resource tracker.
+        """
+        self._last_full_recount = None
+
+    def _full_recount_needed(self):
+        interval = CONF.resource_tracker_full_recount_interval
+        if (not interval or self.disabled or
+                self._last_full_recount is None):
+            return True
+        return timeutils.is_older_than(self._last_full_recount, interval)
+
+    def _update_hypervisor_resources(self, resources):
+        """Only copy the capacity reported by the virt driver, the usage
+        being kept up to date by the claims and the instance updates.
+        """
+        self.compute_node.update_from_virt_driver(
+            {key: value for key, value in resources.items()
+             if key not in _USAGE_RESOURCES})
+        self.compute_node.free_ram_mb = (self.compute_node.memory_mb -
+                                         self.compute_node.memory_mb_used)
+        self.compute_node.free_disk_gb = (self.compute_node.local_gb -
+                                          self.compute_node.local_gb_used)
+
+    def _report_drift(self, ledger):
+        """Log the usage which the incremental accounting got wrong, as
+        found by a full recount.
+        """
+        drift = ['%s %s -> %s' % (field, ledger[field],
+                                  getattr(self.compute_node, field))
+                 for field in LEDGER_FIELDS
+                 if getattr(self.compute_node, field) != ledger[field]]
+        if drift:
+            LOG.warning(_LW("Resource usage of %(host)s:%(node)s corrected "
+                            "by a full recount: %(drift)s"),
+                        {'host': self.host, 'node': self.nodename,
+                         'drift': ', '.join(drift)})
+
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def _update_available_resource(self, context, resources):
 
+        if not self._full_recount_needed():
+            # The usage is already accounted for, only refresh what the
+            # hypervisor reports.
+            self._update_hypervisor_resources(resources)
+            self._finish_update(context)
+            return
+
+        ledger = None
+        if self._last_full_recount is not None and not self.disabled:
+            ledger = {field: getattr(self.compute_node, field)
+                      for field in LEDGER_FIELDS}
+
         # initialise the compute node object, creating it
         # if it does not already exist.
         self._init_compute_node(context, resources)
@@ -570,6 +635,13 @@ class ResourceTracker(object):
         dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
         self.compute_node.pci_device_pools = dev_pools_obj
 
+        if ledger is not None:
+            self._report_drift(ledger)
+        self._last_full_recount = timeutils.utcnow()
+
+        self._finish_update(context)
+
+    def _finish_update(self, context):
         self._report_final_resource_view()
 
         metrics = self._get_host_metrics(context, self.nodename)
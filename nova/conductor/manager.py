@@ -40,6 +40,7 @@ from nova import rpc
 from nova.scheduler import client as scheduler_client
 from nova.scheduler import utils as scheduler_utils
 from nova import servicegroup
+from nova.servicegroup.drivers import batched
 from nova import utils
 
 LOG = logging.getLogger(__name__)
@@ -59,7 +60,7 @@ class ConductorManager(manager.Manager):
     namespace.  See the ComputeTaskManager class for details.
     """
 
-    target = messaging.Target(version='3.0')
+    target = messaging.Target(version='3.1')
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
@@ -134,6 +135,12 @@ class ConductorManager(manager.Manager):
     def reset(self):
         objects.Service.clear_min_version_cache()
 
+    def report_heartbeat(self, context, service_id):
+        """Record the heartbeat of a service, which is written to the
+        database with the other heartbeats received by this conductor.
+        """
+        batched.HEARTBEATS.add(service_id)
+
 
 class ComputeTaskManager(base.Base):
     """Namespace for compute methods.
@@ -193,6 +193,8 @@ class ConductorAPI(object):
     that they can handle the version_cap being set to 3.0.
 
     * Remove provider_fw_rule_get_all()
+
+    * 3.1 - Added report_heartbeat()
     """
 
     VERSION_ALIASES = {
@@ -245,6 +247,13 @@ class ConductorAPI(object):
         return cctxt.call(context, 'object_backport_versions', objinst=objinst,
                           object_versions=object_versions)
 
+    def can_report_heartbeat(self):
+        return self.client.can_send_version('3.1')
+
+    def report_heartbeat(self, context, service_id):
+        cctxt = self.client.prepare(version='3.1')
+        cctxt.cast(context, 'report_heartbeat', service_id=service_id)
+
 
 class ComputeTaskAPI(object):
     """Client side of the conductor 'compute' namespaced RPC API
@@ -51,6 +51,7 @@ from nova.conf import hyperv
 # from nova.conf import image
 # from nova.conf import imagecache
 from nova.conf import image_file_url
+from nova.conf import image_peer
 from nova.conf import ipv6
 from nova.conf import ironic
 from nova.conf import key_manager
@@ -128,6 +129,7 @@ mks.register_opts(CONF)
 # image.register_opts(CONF)
 # imagecache.register_opts(CONF)
 image_file_url.register_opts(CONF)
+image_peer.register_opts(CONF)
 ipv6.register_opts(CONF)
 ironic.register_opts(CONF)
 key_manager.register_opts(CONF)
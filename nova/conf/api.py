@@ -237,6 +237,38 @@ resources. If it is empty (the default), the URLs are returned unchanged.
 * Related options:
 
     None
+"""),
+    cfg.IntOpt("osapi_list_cache_expiration",
+            default=0,
+            min=0,
+            help="""
+This option is the time (in seconds) to cache the responses to the detailed
+listings of the servers, flavors and hypervisors. The responses are cached by
+URL, API version and credentials of the request, so that the clients polling
+these listings get the same response without querying the database again until
+it expires. When set to 0 (the default), the responses are not cached.
+
+The responses are kept in the cache backend configured in the [cache] section,
+and are not cached if it is not enabled.
+
+These responses also get an ETag, and are not sent again to the clients which
+already hold them, as told by the ETag they send in the If-None-Match header.
+The ETag of the flavors and hypervisors is computed from what changes with
+them, without building the listing. The ETag of the servers is computed from
+the response itself, as the extensions add data which comes from other
+services.
+
+* Possible values:
+
+    Zero or any positive integer. The default is 0.
+
+* Services that use this:
+
+    ``nova-api``
+
+* Related options:
+
+    [cache] enabled
 """),
 ]
 
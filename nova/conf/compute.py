@@ -91,6 +91,17 @@ resource_tracker_opts = [
                help='DEPRECATED: Class that will manage stats for the '
                     'local compute host',
                deprecated_for_removal=True),
+    cfg.IntOpt('resource_tracker_full_recount_interval',
+               default=0,
+               min=0,
+               help='Interval in seconds between two full recounts of the '
+                    'resource usage of the instances and migrations of a '
+                    'node. In between, update_available_resource only '
+                    'refreshes the capacity reported by the hypervisor and '
+                    'relies on the claims and instance updates to keep the '
+                    'usage up to date, logging any drift found by the next '
+                    'full recount. 0 recounts everything at each '
+                    'update_available_resource run.'),
 ]
 
 allocation_ratio_opts = [
@@ -194,6 +205,14 @@ interval_opts = [
                default=60,
                help="Number of seconds between instance network information "
                     "cache updates"),
+    cfg.IntOpt("heal_instance_info_cache_batch_size",
+               default=1,
+               min=1,
+               help="Number of instances whose network information cache is "
+                    "updated together on each update. The network "
+                    "information of the instances of a batch is gathered "
+                    "with bulk queries, and only the caches which changed "
+                    "are saved."),
     cfg.IntOpt('reclaim_instance_interval',
                min=0,
                default=0,
@@ -32,6 +32,34 @@ db_driver_opt = cfg.StrOpt(
         deprecated_for_removal=True)
 
 
+instance_list_join_batch_size_opt = cfg.IntOpt(
+        'instance_list_join_batch_size',
+        default=0,
+        min=0,
+        help="""
+Number of instances for which the info cache, security groups and extra
+columns of the instances returned by a filtered instance listing, such as
+``GET /servers/detail``, are loaded with a single ``IN`` query.
+
+By default, these tables are loaded with joins on the instances query, which
+multiplies the rows returned for each instance. When set to a positive value,
+the instances are loaded first and each of these tables is then loaded with
+one query per batch of that many instances, the same way the metadata and
+system metadata of the instances already are. Values around 1000 keep the
+``IN`` clauses within the limits of the database backends.
+
+* Services that use this:
+
+    ``nova-api``
+    ``nova-conductor``
+    ``nova-compute``
+
+* Related options:
+
+    None
+""")
+
+
 # NOTE(markus_z): We cannot simply do:
 # conf.register_opts(oslo_db_options.database_opts, 'api_database')
 # If we reuse a db config option for two different groups ("api_database"
@@ -93,6 +121,7 @@ def register_opts(conf):
     oslo_db_options.set_defaults(conf, connection=_DEFAULT_SQL_CONNECTION,
                          sqlite_db='nova.sqlite')
     conf.register_opt(db_driver_opt)
+    conf.register_opt(instance_list_join_batch_size_opt)
     conf.register_opts(api_db_opts, group='api_database')
 
 
@@ -105,6 +134,6 @@ def list_opts():
     #                 is useful to have the "oslo.db" namespace information
     #                 in the "sample.conf" file, I omit the listing of the
     #                 "oslo_db_options" here.
-    return {'DEFAULT': [db_driver_opt],
+    return {'DEFAULT': [db_driver_opt, instance_list_join_batch_size_opt],
             'api_database': api_db_opts,
             }
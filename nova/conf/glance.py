@@ -72,6 +72,51 @@ V1 API code.
                 default=False,
                 help='Require Nova to perform signature verification on '
                      'each image downloaded from Glance.'),
+    cfg.IntOpt('parallel_download_workers',
+               default=1,
+               min=1,
+               help="""
+Number of byte ranges of an image downloaded concurrently from the glance v2
+API to a file.
+
+With a value greater than 1, the images larger than
+parallel_download_chunk_size are split into chunks which are fetched in
+parallel into a sparse file. The download of an image interrupted by a
+restart of the service resumes with the chunks which are missing. If the
+glance server doesn't serve byte ranges, the image is downloaded as a single
+stream.
+
+* Possible values:
+
+    1 (the default) to download the images as a single stream, or a greater
+    number of concurrent ranges
+
+* Services that use this:
+
+    ``nova-compute``
+
+* Related options:
+
+    parallel_download_chunk_size
+"""),
+    cfg.IntOpt('parallel_download_chunk_size',
+               default=64,
+               min=1,
+               help="""
+Size in MiB of the byte ranges of the images downloaded in parallel.
+
+* Possible values:
+
+    A positive number of MiB
+
+* Services that use this:
+
+    ``nova-compute``
+
+* Related options:
+
+    parallel_download_workers
+"""),
     ]
 
 
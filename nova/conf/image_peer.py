@@ -0,0 +1,115 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+image_peer_group = cfg.OptGroup(
+    'image_peer',
+    title='Image peer-to-peer transfer options',
+    help="""
+Options for the distribution of the cached base images between the compute
+hosts. The compute hosts serving their image cache to their peers set
+``serve``, the compute hosts downloading the images from their peers add
+``peer`` to ``[glance]/allowed_direct_url_schemes`` and list the peers in
+``peers``. All of them must share the same ``secret``.
+
+The images are served over plain HTTP, the requests are only signed. The
+port on which they are served must only be reachable on the management
+network of the compute hosts.
+""")
+
+image_peer_opts = [
+    cfg.BoolOpt('serve',
+                default=False,
+                help="""
+Serve the images of the image cache of this host to the other compute hosts.
+
+Only the cached images which are identical to the images stored in glance
+can be used by the peers, which is not the case of the images converted to
+raw when ``force_raw_images`` is set.
+
+* Services that use this:
+
+    ``nova-compute``
+
+* Related options:
+
+    host, port, secret
+"""),
+    cfg.StrOpt('host',
+               default='0.0.0.0',
+               help='IP address on which the images are served to the '
+                    'peers. It should be an address of the management '
+                    'network, the images are served over plain HTTP.'),
+    cfg.IntOpt('port',
+               default=9393,
+               min=1,
+               max=65535,
+               help='Port on which the images are served to the peers.'),
+    cfg.ListOpt('peers',
+                default=[],
+                help="""
+The compute hosts from which the images are downloaded before falling back
+to glance.
+
+* Possible values:
+
+    A list of ``host:port`` addresses of the peers serving their images
+
+* Services that use this:
+
+    ``nova-compute``
+
+* Related options:
+
+    The ``[glance]/allowed_direct_url_schemes`` option must include
+    ``peer``.
+"""),
+    cfg.StrOpt('secret',
+               secret=True,
+               help='Secret shared by the peers to sign the requests for '
+                    'images. The images are not served when it is not '
+                    'set.'),
+    cfg.IntOpt('signature_max_age',
+               default=60,
+               min=1,
+               help='Number of seconds a signed request for an image is '
+                    'accepted, measured from the time it was signed. The '
+                    'clocks of the peers must not differ by more than '
+                    'this.'),
+    cfg.IntOpt('chunk_size',
+               default=64,
+               min=1,
+               help='Size in MiB of the byte ranges of the images '
+                    'downloaded from the peers.'),
+    cfg.IntOpt('workers',
+               default=4,
+               min=1,
+               help='Number of byte ranges of an image downloaded '
+                    'concurrently from the peers.'),
+    cfg.IntOpt('timeout',
+               default=30,
+               min=1,
+               help='Timeout in seconds of the requests to the peers.'),
+    ]
+
+
+def register_opts(conf):
+    conf.register_group(image_peer_group)
+    conf.register_opts(image_peer_opts, group=image_peer_group)
+
+
+def list_opts():
+    return {image_peer_group: image_peer_opts}
@@ -200,6 +200,15 @@ libvirt_general_opts = [
                help='A number of seconds to memory usage statistics period. '
                     'Zero or negative value mean to disable memory usage '
                     'statistics.'),
+    cfg.IntOpt('domain_stats_interval',
+               default=0,
+               min=0,
+               help='Number of seconds between the samples of the '
+                    'statistics of all the running guests, collected with '
+                    'a single libvirt call. The volume and bandwidth usage '
+                    'and the diagnostics are read from the latest sample. '
+                    'Zero disables the periodic sampling, the statistics '
+                    'are then collected when they are needed.'),
     cfg.ListOpt('uid_maps',
                 default=[],
                 help='List of uid targets and ranges.'
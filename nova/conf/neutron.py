@@ -37,6 +37,33 @@ neutron_opts = [
                 default=600,
                 help='Number of seconds before querying neutron for'
                      ' extensions'),
+    cfg.IntOpt('resource_cache_ttl',
+               default=60,
+               min=0,
+               help="""
+Number of seconds the networks, subnets and DHCP ports fetched from neutron
+to refresh the network info of several instances at once are reused for the
+next instances.
+
+Setting this to 0 only shares them between the instances refreshed together.
+
+* Services which consume this:
+
+    ``nova-compute``
+"""),
+    cfg.IntOpt('port_concurrency',
+               default=4,
+               min=1,
+               help="""
+Maximum number of ports created or updated at the same time when allocating
+the network of an instance.
+
+Setting this to 1 creates and updates the ports one at a time.
+
+* Services which consume this:
+
+    ``nova-compute``
+"""),
 ]
 
 metadata_proxy_opts = [
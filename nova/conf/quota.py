@@ -81,7 +81,18 @@ quota_opts = [
                     'passed since the last reservation'),
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
-               help='Default driver to use for quota checks'),
+               help='Default driver to use for quota checks. Set it to '
+                    'nova.quota.CountedQuotaDriver to count the usage from '
+                    'the instances, security groups, server groups and IPs '
+                    'of the projects instead of tracking it in the '
+                    'quota_usages and reservations tables'),
+    cfg.IntOpt('quota_usage_cache_ttl',
+               default=5,
+               min=0,
+               help='Number of seconds the usage counted by the '
+                    'CountedQuotaDriver for a project or a user is reused '
+                    'when reporting the quota usage. Quota checks always '
+                    'count the usage. 0 disables the cache.'),
     ]
 
 
@@ -155,6 +155,57 @@ a different scheduler, this option has no effect.
     exception will be raised.
 """)
 
+host_mgr_adaptive_filt_order_opt = cfg.BoolOpt(
+        "scheduler_adaptive_filter_ordering",
+        default=False,
+        help="""
+When set to True, the scheduler keeps running statistics of the time each
+filter takes per host and of the fraction of hosts it rejects, and runs the
+filters which are cheap and reject many hosts first, instead of running the
+filters in the order of the 'scheduler_default_filters' option. This leaves
+fewer hosts to check to the expensive filters such as NUMATopologyFilter and
+PciPassthroughFilter.
+
+Since a host has to pass all of the filters, the order of the filters doesn't
+change the hosts which are selected. The filters which only run once per
+request, such as AvailabilityZoneFilter, keep their position in the list.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_default_filters
+""")
+
+host_mgr_vectorized_filt_opt = cfg.BoolOpt("scheduler_use_vectorized_filters",
+        default=False,
+        help="""
+When set to True, the filters able to do so evaluate all of the hosts at once
+using NumPy arrays instead of checking the hosts one at a time. This is the
+case of the RamFilter, CoreFilter, DiskFilter, NumInstancesFilter and
+IoOpsFilter filters and of their per-aggregate variants. The filtering results
+are the same either way, but filtering large numbers of hosts is much faster.
+
+This option requires the NumPy library to be installed on the scheduler hosts.
+If it is not, hosts are filtered one at a time as if this option was False.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_default_filters
+""")
+
 host_mgr_sched_wgt_cls_opt = cfg.ListOpt("scheduler_weight_classes",
         default=["nova.scheduler.weights.all_weighers"],
         help="""
@@ -182,6 +233,33 @@ a different scheduler, this option has no effect.
     None
 """)
 
+host_mgr_vectorized_wgt_opt = cfg.BoolOpt(
+        "scheduler_use_vectorized_weighers",
+        default=False,
+        help="""
+When set to True, the weighers able to do so weigh all of the hosts at once
+using NumPy arrays instead of weighing the hosts one at a time. This is the
+case of the RAMWeigher, DiskWeigher, IoOpsWeigher and MetricsWeigher weighers.
+The weights of all the weighers are then normalized and summed up as arrays,
+and only the 'scheduler_host_subset_size' best hosts are sorted instead of all
+the weighed hosts.
+
+This option requires the NumPy library to be installed on the scheduler hosts.
+If it is not, hosts are weighed one at a time as if this option was False.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_weight_classes
+    scheduler_host_subset_size
+""")
+
 host_mgr_tracks_inst_chg_opt = cfg.BoolOpt("scheduler_tracks_instance_changes",
         default=True,
         help="""
@@ -207,6 +285,276 @@ a different scheduler, this option has no effect.
     None
 """)
 
+host_mgr_incremental_opt = cfg.BoolOpt("scheduler_incremental_host_states",
+        default=False,
+        help="""
+By default, the scheduler reloads every compute node and every compute service
+from the database and refreshes the state of every host each time it handles a
+request. When this option is set to True, the scheduler instead keeps its host
+states between requests and, after an initial full load, only reloads the
+compute nodes which were created, updated or deleted since the newest change
+it has already seen. Instance information keeps flowing in through the updates
+sent by the compute nodes, as controlled by the
+'scheduler_tracks_instance_changes' option.
+
+Enabling this option greatly reduces the cost of scheduling on large
+deployments. Changes which are not reflected in the compute node records are
+only picked up by the next full reload, see
+'scheduler_host_state_full_sync_interval'.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_host_state_full_sync_interval
+    scheduler_tracks_instance_changes
+""")
+
+host_mgr_full_sync_interval_opt = cfg.IntOpt(
+        "scheduler_host_state_full_sync_interval",
+        default=600,
+        min=1,
+        help="""
+When 'scheduler_incremental_host_states' is enabled, this is the maximum number
+of seconds the scheduler relies on incremental updates of its host states
+before reloading all of the compute nodes from the database again. This bounds
+how long the scheduler view of the hosts may differ from the database when a
+change is missed by the incremental updates.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_incremental_host_states
+""")
+
+bulk_placement_opt = cfg.BoolOpt("scheduler_bulk_placement",
+        default=False,
+        help="""
+When a request asks for several instances, the scheduler selects a host for
+each of them in turn. By default all of the hosts still acceptable for the
+request are filtered again before selecting the host of each instance. When
+this option is set to True, the hosts are only filtered once for the whole
+request, and for each of the following instances only the host selected for
+the previous instance, which is the only one whose resources changed, is
+filtered again. The hosts are still weighed again for each instance.
+
+This gives the same placements as long as the result of the enabled filters
+for a host only depends on the request and on the resources used on that
+host, which is the case of all the filters included with Nova. Requests using
+a server group always filter all of the hosts for each instance, since the
+hosts selected for the previous instances change the result of the
+(anti-)affinity filters for the other hosts.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_default_filters
+""")
+
+partition_opts = [
+    cfg.BoolOpt("scheduler_partitioning",
+        default=False,
+        help="""
+When set to True, the compute nodes are split between the nova-scheduler
+services which are up, using a consistent hash ring, and each scheduler only
+loads and considers the compute nodes it owns. The scheduler client sends each
+request to all of the schedulers and keeps the best weighed destinations they
+return. This lowers the memory used by each scheduler and avoids several
+schedulers choosing the same hosts at the same time, which otherwise results
+in failed claims and reschedules.
+
+Since the weights are normalized within each partition, the destinations are
+only approximately the best ones of the whole deployment. The instances of a
+request can be placed by several schedulers, and the schedulers whose
+destinations are not kept release the resources they consumed for the request.
+All of the instances of a request with a server group are placed by the same
+scheduler, so that the server group policies are respected.
+
+The nova-scheduler services must support the version 4.4 of the scheduler RPC
+API for the instances of a request to be placed by several schedulers.
+
+This option must have the same value on the nova-scheduler and nova-conductor
+services. It is only used by the FilterScheduler and its subclasses.
+
+* Services that use this:
+
+    ``nova-scheduler``
+    ``nova-conductor``
+
+* Related options:
+
+    scheduler_partition_key
+    scheduler_partition_refresh_interval
+"""),
+    cfg.StrOpt("scheduler_partition_key",
+        default="node",
+        choices=("node", "aggregate"),
+        help="""
+How the compute nodes are mapped to the scheduler partitions.
+
+Possible values:
+
+* node: Each compute node is mapped by its host and node names.
+* aggregate: The compute nodes which belong to a host aggregate are mapped by
+  the aggregate with the lowest id they belong to, so that all of them are
+  considered by the same scheduler. Compute nodes which don't belong to any
+  aggregate are mapped by their host and node names.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_partitioning
+"""),
+    cfg.IntOpt("scheduler_partition_refresh_interval",
+        default=60,
+        min=1,
+        help="""
+Number of seconds between two lookups of the nova-scheduler services which are
+up, used to split the compute nodes between the schedulers. When a scheduler
+starts or stops being up, only the compute nodes it owned or is going to own
+move to a different scheduler.
+
+* Services that use this:
+
+    ``nova-scheduler``
+    ``nova-conductor``
+
+* Related options:
+
+    scheduler_partitioning
+    service_down_time
+"""),
+]
+
+instrumentation_opts = [
+    cfg.FloatOpt("scheduler_instrumentation_sample_rate",
+        default=0.0,
+        min=0.0,
+        max=1.0,
+        help="""
+Fraction of the filtering and weighing passes for which the time spent in each
+filter and weigher, the number of hosts they received and kept and, for the
+filters, the slowest host evaluation, are measured and handed to the sink set
+by the 'scheduler_instrumentation_sink' option.
+
+Valid values are between 0.0 and 1.0. When set to 0.0, which is the default,
+the instrumentation is disabled and adds no overhead at all. Since measuring
+the slowest host evaluation means running the filters one host at a time,
+low values such as 0.01 are advised on large deployments.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_instrumentation_sink
+"""),
+    cfg.StrOpt("scheduler_instrumentation_sink",
+        default="log",
+        choices=("log", "histogram", "statsd"),
+        help="""
+Where the scheduler filter and weigher measures are sent.
+
+Possible values:
+
+* log: A summary of the number of passes, the mean and maximum time and the
+  number of hosts eliminated by each filter and weigher is logged every
+  'scheduler_instrumentation_interval' seconds.
+* histogram: A histogram of the time spent in each filter and weigher is
+  logged every 'scheduler_instrumentation_interval' seconds.
+* statsd: The measures are sent over UDP to a statsd server at
+  'scheduler_instrumentation_statsd_host' and
+  'scheduler_instrumentation_statsd_port'.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_instrumentation_sample_rate
+    scheduler_instrumentation_interval
+    scheduler_instrumentation_statsd_host
+    scheduler_instrumentation_statsd_port
+    scheduler_instrumentation_statsd_prefix
+"""),
+    cfg.IntOpt("scheduler_instrumentation_interval",
+        default=60,
+        min=1,
+        help="""
+Number of seconds between two reports of the 'log' and 'histogram'
+instrumentation sinks.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_instrumentation_sink
+"""),
+    cfg.StrOpt("scheduler_instrumentation_statsd_host",
+        default="localhost",
+        help="""
+Host name or IP address of the statsd server the 'statsd' instrumentation
+sink sends the measures to.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_instrumentation_sink
+"""),
+    cfg.PortOpt("scheduler_instrumentation_statsd_port",
+        default=8125,
+        help="""
+UDP port of the statsd server the 'statsd' instrumentation sink sends the
+measures to.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_instrumentation_sink
+"""),
+    cfg.StrOpt("scheduler_instrumentation_statsd_prefix",
+        default="nova.scheduler",
+        help="""
+Prefix of the names of the metrics sent by the 'statsd' instrumentation sink.
+The metrics are named <prefix>.<filter|weigher>.<class name>.<measure>.
+
+* Services that use this:
+
+    ``nova-scheduler``
+
+* Related options:
+
+    scheduler_instrumentation_sink
+"""),
+]
+
 rpc_sched_topic_opt = cfg.StrOpt("scheduler_topic",
         default="scheduler",
         help="""
@@ -892,8 +1240,14 @@ default_opts = [host_subset_size_opt,
                use_bm_filters_opt,
                host_mgr_avail_filt_opt,
                host_mgr_default_filt_opt,
+               host_mgr_vectorized_filt_opt,
+               host_mgr_adaptive_filt_order_opt,
                host_mgr_sched_wgt_cls_opt,
+               host_mgr_vectorized_wgt_opt,
                host_mgr_tracks_inst_chg_opt,
+               host_mgr_incremental_opt,
+               host_mgr_full_sync_interval_opt,
+               bulk_placement_opt,
                rpc_sched_topic_opt,
                sched_driver_host_mgr_opt,
                driver_opt,
@@ -916,7 +1270,8 @@ default_opts = [host_subset_size_opt,
 
 
 def register_opts(conf):
-    conf.register_opts(default_opts)
+    conf.register_opts(default_opts + instrumentation_opts +
+                       partition_opts)
     trust_group = cfg.OptGroup(name=TRUSTED_GROUP_NAME,
                                title="Trust parameters")
     conf.register_group(trust_group)
@@ -925,7 +1280,8 @@ def register_opts(conf):
 
 
 def list_opts():
-    return {DEFAULT_GROUP_NAME: default_opts,
+    return {DEFAULT_GROUP_NAME: (default_opts + instrumentation_opts +
+                                 partition_opts),
             TRUSTED_GROUP_NAME: trusted_opts,
             METRICS_GROUP_NAME: metrics_weight_opts,
             }
@@ -18,10 +18,24 @@ from oslo_config import cfg
 servicegroup_driver = cfg.StrOpt('servicegroup_driver',
                                   default='db',
                                   help='The driver for servicegroup '
-                                       'service.',
-                                  choices=['db', 'mc'])
+                                       'service. The batched driver writes '
+                                       'the heartbeats of the services to '
+                                       'the database by batches, through '
+                                       'the conductor for the services '
+                                       'without database access.',
+                                  choices=['db', 'mc', 'batched'])
 
-SERVICEGROUP_OPTS = [servicegroup_driver]
+servicegroup_heartbeat_flush_interval = cfg.IntOpt(
+    'servicegroup_heartbeat_flush_interval',
+    default=5,
+    min=1,
+    help='Number of seconds between two writes of the service heartbeats '
+         'received by a process to the database, with the batched '
+         'servicegroup driver. It should be well below service_down_time '
+         'minus report_interval.')
+
+SERVICEGROUP_OPTS = [servicegroup_driver,
+                     servicegroup_heartbeat_flush_interval]
 
 
 def register_opts(conf):
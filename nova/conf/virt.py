@@ -266,6 +266,33 @@ Interdependencies to other options:
 * ``compute_driver``: Only the libvirt driver uses this option.
 """)
 
+stream_raw_conversion = cfg.BoolOpt(
+    'stream_raw_conversion',
+    default=False,
+    help="""Convert the qcow2 backing images to raw while they are downloaded.
+
+The qcow2 images are written to the raw backing image as they are received
+instead of being downloaded to a temporary file and converted once the
+download is complete, which halves the disk space and the disk I/O needed
+by the conversion. The parts of the images which can't be written directly,
+like the compressed clusters, are still kept in a temporary file until the
+end of the download. The images are then downloaded as a single stream from
+glance.
+
+Possible values:
+
+* True: The qcow2 images are converted while they are downloaded
+* False: The qcow2 images are converted after they are downloaded
+
+Services which consume this:
+
+* nova-compute
+
+Interdependencies to other options:
+
+* ``force_raw_images``: The images are only converted if it is set.
+""")
+
 injected_network_template = cfg.StrOpt(
     'injected_network_template',
     default=paths.basedir_def('nova/virt/interfaces.template'),
@@ -325,6 +352,57 @@ remove_unused_original_minimum_age_seconds = cfg.IntOpt(
     help='Unused unresized base images younger than this will not '
     'be removed')
 
+prefetch_images = cfg.ListOpt(
+    'prefetch_images',
+    default=[],
+    help="""
+Images to download into the image cache of this host ahead of demand.
+
+The images are fetched in the background by a periodic task, so that the
+first instances booted from them on this host don't wait for their
+download. They are never removed from the cache by the image cache manager
+while they are in this list.
+
+Possible values:
+
+* A list of image ids
+
+Services which consume this:
+
+* nova-compute
+
+Related options:
+
+* image_prefetch_interval
+* image_prefetch_max_concurrency
+* image_prefetch_max_bandwidth
+""")
+
+image_prefetch_interval = cfg.IntOpt(
+    'image_prefetch_interval',
+    default=600,
+    help='Number of seconds to wait between checks of the images to '
+    'prefetch which are missing from the image cache. Set to -1 to '
+    'disable. Setting this to 0 will run at the default rate.')
+
+image_prefetch_max_concurrency = cfg.IntOpt(
+    'image_prefetch_max_concurrency',
+    default=1,
+    min=1,
+    help='Maximum number of images prefetched at the same time.')
+
+image_prefetch_max_bandwidth = cfg.IntOpt(
+    'image_prefetch_max_bandwidth',
+    default=0,
+    min=0,
+    help='Maximum bandwidth in MiB/s used by the image prefetch, shared '
+    'evenly between the concurrent downloads. 0 means unlimited. The limit '
+    'applies to the data received from Glance, including the parallel '
+    'downloads by byte ranges. The copies through the transfer modules of '
+    'the [glance] allowed_direct_url_schemes option, such as the downloads '
+    'from the other compute hosts, are not limited. The downloads of the '
+    'images needed by the instances are not limited.')
+
 pointer_model = cfg.StrOpt(
     'pointer_model',
     default=None, choices=[None, 'usbtablet'],
@@ -384,6 +462,7 @@ ALL_OPTS = [vcpu_pin_set,
             firewall_driver,
             allow_same_net_traffic,
             force_raw_images,
+            stream_raw_conversion,
             injected_network_template,
             virt_mkfs,
             resize_fs_using_block_device,
@@ -392,6 +471,10 @@ ALL_OPTS = [vcpu_pin_set,
             image_cache_subdirectory_name,
             remove_unused_base_images,
             remove_unused_original_minimum_age_seconds,
+            prefetch_images,
+            image_prefetch_interval,
+            image_prefetch_max_concurrency,
+            image_prefetch_max_bandwidth,
             pointer_model,
             reserved_huge_pages]
 
@@ -173,6 +173,16 @@ def service_update(context, service_id, values):
     return IMPL.service_update(context, service_id, values)
 
 
+def service_heartbeats_update(context, heartbeats):
+    """Record the heartbeats of several services at once.
+
+    :param heartbeats: dict of (last heartbeat time, number of heartbeats)
+                       tuples, keyed by service id
+    :returns: the number of services updated
+    """
+    return IMPL.service_heartbeats_update(context, heartbeats)
+
+
 ###################
 
 
@@ -244,6 +254,21 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+def compute_node_get_all_updated_since(context, since):
+    """Get compute nodes created, updated or deleted since a given time.
+
+    Soft-deleted compute nodes are only returned if the context allows
+    reading deleted rows.
+
+    :param context: The security context
+    :param since: Naive UTC datetime; nodes whose created_at, updated_at or
+                  deleted_at is equal or later than this value are returned
+
+    :returns: List of dictionaries each containing compute node properties
+    """
+    return IMPL.compute_node_get_all_updated_since(context, since)
+
+
 def compute_node_get_all_by_host(context, host):
     """Get compute nodes by host name
 
@@ -1149,6 +1174,13 @@ def quota_usage_update(context, project_id, user_id, resource, **kwargs):
                                    **kwargs)
 
 
+def quota_usage_count(context, sync, project_id, user_id=None):
+    """Count the current usage of the resources synced by a sync function,
+    for a whole project if user_id is None.
+    """
+    return IMPL.quota_usage_count(context, sync, project_id, user_id=user_id)
+
+
 def quota_usage_refresh(context, resources, keys, until_refresh, max_age,
                         project_id=None, user_id=None):
     """Refresh the quota usages.
@@ -1756,6 +1788,17 @@ def vol_usage_update(context, id, rd_req, rd_bytes, wr_req, wr_bytes,
                                  update_totals=update_totals)
 
 
+def vol_usage_update_all(context, usages):
+    """Update the cached current usage of several volumes at once
+
+       Creates new records if needed. usages is a list of dicts with the
+       volume_id, the curr_* counters, instance_uuid, project_id, user_id and
+       availability_zone of each volume. Returns the records in the same
+       order.
+    """
+    return IMPL.vol_usage_update_all(context, usages)
+
+
 ###################
 
 
@@ -22,6 +22,7 @@ import copy
 import datetime
 import functools
 import inspect
+import itertools
 import sys
 import uuid
 
@@ -559,6 +560,27 @@ def service_update(context, service_id, values):
     return service_ref
 
 
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@pick_context_manager_writer
+def service_heartbeats_update(context, heartbeats):
+    if not heartbeats:
+        return 0
+    last_seen_up = {service_id: heartbeat[0]
+                    for service_id, heartbeat in heartbeats.items()}
+    report_counts = {service_id: heartbeat[1]
+                     for service_id, heartbeat in heartbeats.items()}
+    # A single UPDATE statement for all of the services, the values of each
+    # service being picked by a CASE on its id.
+    return model_query(context, models.Service, read_deleted="no").\
+        filter(models.Service.id.in_(list(heartbeats))).\
+        update({'last_seen_up': sa.case(last_seen_up,
+                                        value=models.Service.id),
+                'report_count': models.Service.report_count +
+                                sa.case(report_counts,
+                                        value=models.Service.id)},
+               synchronize_session=False)
+
+
 ###################
 
 
@@ -580,6 +602,11 @@ def _compute_node_select(context, filters=None):
     if "hypervisor_hostname" in filters:
         hyp_hostname = filters["hypervisor_hostname"]
         select = select.where(cn_tbl.c.hypervisor_hostname == hyp_hostname)
+    if "updated_since" in filters:
+        since = filters["updated_since"]
+        select = select.where(sql.or_(cn_tbl.c.updated_at >= since,
+                                      cn_tbl.c.created_at >= since,
+                                      cn_tbl.c.deleted_at >= since))
     return select
 
 
@@ -646,6 +673,13 @@ def compute_node_get_all(context):
     return _compute_node_fetchall(context)
 
 
+@pick_context_manager_reader
+def compute_node_get_all_updated_since(context, since):
+    filters = convert_objects_related_datetimes({"updated_since": since},
+                                                "updated_since")
+    return _compute_node_fetchall(context, filters)
+
+
 @pick_context_manager_reader
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
@@ -1863,7 +1897,8 @@ def _build_instance_get(context, columns_to_join=None):
     return query
 
 
-def _instances_fill_metadata(context, instances, manual_joins=None):
+def _instances_fill_metadata(context, instances, manual_joins=None,
+                             batch_size=None):
     """Selectively fill instances with manually-joined metadata. Note that
     instance will be converted to a dict.
 
@@ -1871,28 +1906,57 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
     :param instances: list of instances to fill
     :param manual_joins: list of tables to manually join (can be any
                          combination of 'metadata' and 'system_metadata' or
-                         None to take the default of both)
+                         None to take the default of both). 'pci_devices',
+                         'info_cache', 'security_groups', 'extra' and
+                         'extra.<column>' can also be given.
+    :param batch_size: if set, the tables are loaded with one query per
+                       batch of that many instances
     """
     uuids = [inst['uuid'] for inst in instances]
 
     if manual_joins is None:
         manual_joins = ['metadata', 'system_metadata']
 
+    def _get_multi(get_multi, *args):
+        if not batch_size:
+            return get_multi(context, uuids, *args)
+        return itertools.chain.from_iterable(
+            get_multi(context, uuids[start:start + batch_size], *args)
+            for start in range(0, len(uuids), batch_size))
+
     meta = collections.defaultdict(list)
     if 'metadata' in manual_joins:
-        for row in _instance_metadata_get_multi(context, uuids):
+        for row in _get_multi(_instance_metadata_get_multi):
             meta[row['instance_uuid']].append(row)
 
     sys_meta = collections.defaultdict(list)
     if 'system_metadata' in manual_joins:
-        for row in _instance_system_metadata_get_multi(context, uuids):
+        for row in _get_multi(_instance_system_metadata_get_multi):
             sys_meta[row['instance_uuid']].append(row)
 
     pcidevs = collections.defaultdict(list)
     if 'pci_devices' in manual_joins:
-        for row in _instance_pcidevs_get_multi(context, uuids):
+        for row in _get_multi(_instance_pcidevs_get_multi):
             pcidevs[row['instance_uuid']].append(row)
 
+    info_caches = {}
+    if 'info_cache' in manual_joins:
+        for row in _get_multi(_instance_info_cache_get_multi):
+            info_caches[row['instance_uuid']] = row
+
+    secgroups = collections.defaultdict(list)
+    if 'security_groups' in manual_joins:
+        for instance_uuid, row in _get_multi(
+                _instance_security_groups_get_multi):
+            secgroups[instance_uuid].append(row)
+
+    extras = {}
+    if 'extra' in manual_joins:
+        extra_columns = [column[len('extra.'):] for column in manual_joins
+                         if column.startswith('extra.')]
+        for row in _get_multi(_instance_extra_get_multi, extra_columns):
+            extras[row['instance_uuid']] = row
+
     filled_instances = []
     for inst in instances:
         inst = dict(inst)
@@ -1900,6 +1964,15 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
         inst['metadata'] = meta[inst['uuid']]
         if 'pci_devices' in manual_joins:
             inst['pci_devices'] = pcidevs[inst['uuid']]
+        if 'info_cache' in manual_joins:
+            inst['info_cache'] = info_caches.get(inst['uuid'])
+        if 'security_groups' in manual_joins:
+            # NOTE: Like the security_groups relationship, deleted instances
+            # have no security groups.
+            inst['security_groups'] = (secgroups[inst['uuid']]
+                                       if not inst['deleted'] else [])
+        if 'extra' in manual_joins:
+            inst['extra'] = extras.get(inst['uuid'])
         filled_instances.append(inst)
 
     return filled_instances
@@ -1928,6 +2001,32 @@ def _manual_join_columns(columns_to_join):
     return manual_joins, columns_to_join_new
 
 
+def _batch_join_columns(columns_to_join):
+    """Separate the columns which can be loaded by batches of instances
+    from columns_to_join.
+
+    The 'info_cache', 'security_groups', 'extra' and 'extra.<column>'
+    columns are removed from columns_to_join and added to a list of manual
+    joins to be used with the _instances_fill_metadata method.
+
+    :param:columns_to_join: List of columns to join in a model query.
+    :return: tuple of (manual_joins, columns_to_join)
+    """
+    manual_joins = []
+    columns_to_join_new = []
+    for column in columns_to_join:
+        if (column in ('info_cache', 'security_groups', 'extra') or
+                column.startswith('extra.')):
+            manual_joins.append(column)
+        else:
+            columns_to_join_new.append(column)
+    # The extra columns can only be loaded with their table
+    if (any(column.startswith('extra.') for column in manual_joins) and
+            'extra' not in manual_joins):
+        manual_joins.append('extra')
+    return manual_joins, columns_to_join_new
+
+
 @require_context
 @pick_context_manager_reader
 def instance_get_all(context, columns_to_join=None):
@@ -2047,6 +2146,15 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
         manual_joins, columns_to_join_new = (
             _manual_join_columns(columns_to_join))
 
+    # NOTE: Joined loads multiply the rows returned for each instance, so
+    # the related tables can instead be loaded with one query per batch of
+    # instances once the instances are known.
+    batch_size = CONF.instance_list_join_batch_size
+    if batch_size:
+        batch_joins, columns_to_join_new = (
+            _batch_join_columns(columns_to_join_new))
+        manual_joins = manual_joins + batch_joins
+
     query_prefix = context.session.query(models.Instance)
     for column in columns_to_join_new:
         if 'extra.' in column:
@@ -2177,7 +2285,8 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     except db_exc.InvalidSortKey:
         raise exception.InvalidSortKey()
 
-    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+    return _instances_fill_metadata(context, query_prefix.all(), manual_joins,
+                                    batch_size=batch_size)
 
 
 def _tag_instance_filter(context, query, filters):
@@ -2767,6 +2876,14 @@ def instance_info_cache_get(context, instance_uuid):
                          first()
 
 
+def _instance_info_cache_get_multi(context, instance_uuids):
+    if not instance_uuids:
+        return []
+    return model_query(context, models.InstanceInfoCache,
+                       read_deleted='yes').filter(
+        models.InstanceInfoCache.instance_uuid.in_(instance_uuids))
+
+
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 @pick_context_manager_writer
@@ -2857,6 +2974,17 @@ def instance_extra_get_by_instance_uuid(context, instance_uuid,
     return instance_extra
 
 
+def _instance_extra_get_multi(context, instance_uuids, columns):
+    if not instance_uuids:
+        return []
+    query = model_query(context, models.InstanceExtra,
+                        read_deleted='yes').filter(
+        models.InstanceExtra.instance_uuid.in_(instance_uuids))
+    for column in columns:
+        query = query.options(undefer(column))
+    return query
+
+
 ###################
 
 
@@ -3703,6 +3831,15 @@ def _calculate_overquota(project_quotas, user_quotas, deltas,
     return overs
 
 
+@require_context
+@pick_context_manager_reader
+def quota_usage_count(context, sync, project_id, user_id=None):
+    """Count the current usage of the resources synced by a sync function,
+    for a whole project if user_id is None.
+    """
+    return QUOTA_SYNC_FUNCTIONS[sync](context, project_id, user_id)
+
+
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 @main_context_manager.writer
@@ -4294,6 +4431,19 @@ def security_group_get_by_instance(context, instance_uuid):
                    all()
 
 
+def _instance_security_groups_get_multi(context, instance_uuids):
+    """Returns (instance_uuid, security_group) tuples for the instances."""
+    if not instance_uuids:
+        return []
+    assoc = models.SecurityGroupInstanceAssociation
+    return model_query(context, models.SecurityGroup,
+                       args=(assoc.instance_uuid, models.SecurityGroup),
+                       read_deleted='no').\
+        join(assoc, assoc.security_group_id == models.SecurityGroup.id).\
+        filter(assoc.deleted == 0).\
+        filter(assoc.instance_uuid.in_(instance_uuids))
+
+
 @require_context
 @main_context_manager.reader
 def security_group_in_use(context, group_id):
@@ -4419,10 +4569,11 @@ def security_group_destroy(context, security_group_id):
 
 def _security_group_count_by_project_and_user(context, project_id, user_id):
     nova.context.authorize_project_context(context, project_id)
-    return model_query(context, models.SecurityGroup, read_deleted="no").\
-                   filter_by(project_id=project_id).\
-                   filter_by(user_id=user_id).\
-                   count()
+    query = model_query(context, models.SecurityGroup, read_deleted="no").\
+                   filter_by(project_id=project_id)
+    if user_id:
+        query = query.filter_by(user_id=user_id)
+    return query.count()
 
 
 ###################
@@ -5558,6 +5709,57 @@ def vol_usage_update(context, id, rd_req, rd_bytes, wr_req, wr_bytes,
     return vol_usage
 
 
+@require_context
+@pick_context_manager_writer
+def vol_usage_update_all(context, usages):
+    refreshed = timeutils.utcnow()
+    volume_ids = set(usage['volume_id'] for usage in usages)
+    current_usages = {}
+    if volume_ids:
+        query = model_query(context, models.VolumeUsage,
+                            read_deleted="yes").\
+                    filter(models.VolumeUsage.volume_id.in_(volume_ids))
+        for current_usage in query:
+            current_usages[current_usage.volume_id] = current_usage
+
+    vol_usages = []
+    for usage in usages:
+        values = {'curr_last_refreshed': refreshed,
+                  'curr_reads': usage['curr_reads'],
+                  'curr_read_bytes': usage['curr_read_bytes'],
+                  'curr_writes': usage['curr_writes'],
+                  'curr_write_bytes': usage['curr_write_bytes'],
+                  'instance_uuid': usage['instance_uuid'],
+                  'project_id': usage['project_id'],
+                  'user_id': usage['user_id'],
+                  'availability_zone': usage['availability_zone']}
+        current_usage = current_usages.get(usage['volume_id'])
+        if current_usage is None:
+            current_usage = models.VolumeUsage(volume_id=usage['volume_id'],
+                                               tot_reads=0,
+                                               tot_read_bytes=0,
+                                               tot_writes=0,
+                                               tot_write_bytes=0)
+            context.session.add(current_usage)
+            current_usages[usage['volume_id']] = current_usage
+        elif (usage['curr_reads'] < current_usage['curr_reads'] or
+              usage['curr_read_bytes'] < current_usage['curr_read_bytes'] or
+              usage['curr_writes'] < current_usage['curr_writes'] or
+              usage['curr_write_bytes'] < current_usage['curr_write_bytes']):
+            LOG.info(_LI("Volume(%s) has lower stats then what is in "
+                         "the database. Instance must have been rebooted "
+                         "or crashed. Updating totals."), usage['volume_id'])
+            for key in ('reads', 'read_bytes', 'writes', 'write_bytes'):
+                values['tot_' + key] = ((current_usage['tot_' + key] or 0) +
+                                        current_usage['curr_' + key])
+        current_usage.update(values)
+        vol_usages.append(current_usage)
+
+    # All the rows are written in the same flush
+    context.session.flush()
+    return vol_usages
+
+
 ####################
 
 
@@ -6520,10 +6722,11 @@ def instance_group_get_all_by_project_id(context, project_id):
 
 
 def _instance_group_count_by_project_and_user(context, project_id, user_id):
-    return model_query(context, models.InstanceGroup, read_deleted="no").\
-                   filter_by(project_id=project_id).\
-                   filter_by(user_id=user_id).\
-                   count()
+    query = model_query(context, models.InstanceGroup, read_deleted="no").\
+                   filter_by(project_id=project_id)
+    if user_id:
+        query = query.filter_by(user_id=user_id)
+    return query.count()
 
 
 def _instance_group_model_get_query(context, model_class, group_id,
@@ -17,6 +17,8 @@
 Filter support
 """
 
+import time
+
 from oslo_log import log as logging
 
 from nova.i18n import _LI
@@ -48,6 +50,19 @@ class BaseFilter(object):
     # for each request rather than for each instance
     run_filter_once_per_request = False
 
+    # Set to true in a subclass implementing filter_all_vectorized()
+    vectorized = False
+
+    def filter_all_vectorized(self, columns, spec_obj):
+        """Return a boolean NumPy array telling which objects pass the filter.
+
+        Only called instead of filter_all() when the filter handler provides
+        a columnar view of the objects, see BaseFilterHandler.columns_cls.
+        The Nth value of the returned array is for the Nth object of
+        columns.objs.
+        """
+        raise NotImplementedError()
+
     def run_filter_for_index(self, index):
         """Return True if the filter needs to be run for the "index-th"
         instance in a request.  Only need to override this if a filter
@@ -65,8 +80,46 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
+    # Class building a columnar view of the objects being filtered, which is
+    # handed to the filter_all_vectorized() method of vectorized filters. It
+    # is instantiated with the list of objects and must provide an 'objs'
+    # attribute and a select(mask) method returning the view of the objects
+    # passing a filter. Vectorized filtering is disabled when this is None.
+    columns_cls = None
+
+    # Object measuring the filters, see nova.scheduler.instrumentation. The
+    # filters aren't measured when this is None.
+    instrumentation = None
+
+    # Object whose record(name, seconds, hosts_in, hosts_out) method is
+    # called after every filter pass, such as
+    # nova.scheduler.filter_ordering.AdaptiveFilterOrdering.
+    statistics = None
+
+    @staticmethod
+    def _filter_all_timed(filter_, list_objs, spec_obj):
+        """Filter the objects one at a time like BaseFilter.filter_all(),
+        also returning the object which took the longest to evaluate and how
+        many seconds it took.
+        """
+        passing = []
+        slowest_obj = slowest_seconds = None
+        for obj in list_objs:
+            start = time.time()
+            passes = filter_._filter_one(obj, spec_obj)
+            seconds = time.time() - start
+            if slowest_seconds is None or seconds > slowest_seconds:
+                slowest_obj = obj
+                slowest_seconds = seconds
+            if passes:
+                passing.append(obj)
+        return passing, slowest_obj, slowest_seconds
+
     def get_filtered_objects(self, filters, objs, spec_obj, index=0):
         list_objs = list(objs)
+        columns = None
+        measured = (self.instrumentation is not None and
+                    self.instrumentation.sample())
         LOG.debug("Starting with %d host(s)", len(list_objs))
         # Track the hosts as they are removed. The 'full_filter_results' list
         # contains the host/nodename info for every host that passes each
@@ -82,12 +135,43 @@ class BaseFilterHandler(loadables.BaseLoader):
             if filter_.run_filter_for_index(index):
                 cls_name = filter_.__class__.__name__
                 start_count = len(list_objs)
-                objs = filter_.filter_all(list_objs, spec_obj)
-                if objs is None:
-                    LOG.debug("Filter %s says to stop filtering", cls_name)
-                    return
-                list_objs = list(objs)
+                start_time = time.time()
+                slowest_obj = slowest_seconds = None
+                if self.columns_cls is not None and filter_.vectorized:
+                    if columns is None:
+                        columns = self.columns_cls(list_objs)
+                    columns = columns.select(
+                        filter_.filter_all_vectorized(columns, spec_obj))
+                    list_objs = columns.objs
+                else:
+                    # Each object can only be timed when the filter doesn't
+                    # override filter_all().
+                    if (measured and getattr(type(filter_), 'filter_all',
+                            None) == BaseFilter.filter_all):
+                        objs, slowest_obj, slowest_seconds = (
+                            self._filter_all_timed(filter_, list_objs,
+                                                   spec_obj))
+                    else:
+                        objs = filter_.filter_all(list_objs, spec_obj)
+                    if objs is None:
+                        LOG.debug("Filter %s says to stop filtering",
+                                  cls_name)
+                        return
+                    list_objs = list(objs)
+                    # The columns no longer match the remaining objects
+                    columns = None
                 end_count = len(list_objs)
+                elapsed = time.time() - start_time
+                if self.statistics is not None:
+                    self.statistics.record(cls_name, elapsed, start_count,
+                                           end_count)
+                if measured:
+                    if slowest_obj is not None:
+                        slowest_obj = getattr(slowest_obj, "host",
+                                              slowest_obj)
+                    self.instrumentation.record(
+                        'filter', cls_name, elapsed, start_count, end_count,
+                        slowest_obj, slowest_seconds)
                 part_filter_results.append(log_msg % {"cls_name": cls_name,
                         "start": start_count, "end": end_count})
                 if list_objs:
@@ -0,0 +1,241 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Transfer of the base images between the compute hosts.
+
+The compute hosts with [image_peer]/serve set serve the images of their
+image cache over HTTP, at /images/<image id>, with the MD5 checksum of each
+image as its ETag. The other compute hosts download the images from the
+peers whose copy has the checksum and the size of the image in glance, by
+byte ranges spread over these peers, and fall back to glance otherwise.
+The requests are signed with the secret shared by the peers, and the
+signatures are only valid for [image_peer]/signature_max_age seconds. The
+images are served over plain HTTP, so the port must only be reachable on
+the management network of the compute hosts.
+"""
+
+import hashlib
+import hmac
+import itertools
+import os
+import time
+
+from eventlet import tpool
+from oslo_log import log as logging
+from oslo_utils import units
+import requests
+import six
+import webob.dec
+import webob.exc
+import webob.static
+
+import nova.conf
+from nova import exception
+from nova.i18n import _, _LI, _LW
+import nova.image.download.base as xfer_base
+from nova.image import parallel_download
+from nova import utils
+from nova import wsgi
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-Image-Peer-Signature'
+TIMESTAMP_HEADER = 'X-Image-Peer-Timestamp'
+
+# Size of the reads of the images
+READ_SIZE = units.Mi
+
+
+def _sign(image_id, timestamp):
+    return hmac.new(six.b(CONF.image_peer.secret),
+                    six.b('%s:%s' % (image_id, timestamp)),
+                    hashlib.sha256).hexdigest()
+
+
+def _signed_headers(image_id):
+    """Return the headers signing a request for an image."""
+    timestamp = str(int(time.time()))
+    return {TIMESTAMP_HEADER: timestamp,
+            SIGNATURE_HEADER: _sign(image_id, timestamp)}
+
+
+def _check_signature(req, image_id):
+    """Check that a request for an image was signed recently with the
+    shared secret.
+    """
+    timestamp = req.headers.get(TIMESTAMP_HEADER, '')
+    signature = req.headers.get(SIGNATURE_HEADER, '')
+    try:
+        age = abs(time.time() - int(timestamp))
+    except ValueError:
+        return False
+    # NOTE: The requests can be seen on the network, a signature must not
+    # grant access to the image forever.
+    if age > CONF.image_peer.signature_max_age:
+        return False
+    return hmac.compare_digest(six.b(_sign(image_id, timestamp)),
+                               six.b(signature))
+
+
+def _get_base_file(image_id):
+    base_dir = os.path.join(CONF.instances_path,
+                            CONF.image_cache_subdirectory_name)
+    return os.path.join(base_dir, hashlib.sha1(six.b(image_id)).hexdigest())
+
+
+def _md5(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(READ_SIZE), b''):
+            md5.update(data)
+    return md5.hexdigest()
+
+
+class PeerTransfer(xfer_base.TransferBase):
+
+    def _find_peers(self, session, image_id, checksum, size):
+        """Return the URLs of the image on the peers holding it."""
+        urls = []
+        for peer in CONF.image_peer.peers:
+            url = 'http://%s/images/%s' % (peer, image_id)
+            try:
+                resp = session.head(url, headers=_signed_headers(image_id),
+                                    timeout=CONF.image_peer.timeout)
+            except requests.RequestException as e:
+                LOG.debug('Could not reach the image peer %(peer)s: '
+                          '%(error)s', {'peer': peer, 'error': e})
+                continue
+            if (resp.status_code == 200 and
+                    resp.headers.get('ETag', '').strip('"') == checksum and
+                    resp.headers.get('Content-Length') == str(size)):
+                urls.append(url)
+        return urls
+
+    def download(self, context, url_parts, dst_path, metadata, **kwargs):
+        image_id = url_parts.path.strip('/')
+        checksum = metadata.get('checksum')
+        size = metadata.get('size')
+        if not checksum or not size:
+            msg = _('The checksum and the size of the image are required')
+            raise exception.ImageDownloadModuleMetaDataError(
+                module=str(self), reason=msg)
+
+        session = requests.Session()
+        urls = self._find_peers(session, image_id, checksum, size)
+        if not urls:
+            msg = _('No peer holds image %s.') % image_id
+            raise exception.ImageDownloadModuleError(module=str(self),
+                                                     reason=msg)
+        # Spread the ranges over the peers, a retried range goes to the
+        # next peer
+        peer_urls = itertools.cycle(urls)
+
+        def fetch_range(start, end):
+            headers = _signed_headers(image_id)
+            headers['Range'] = 'bytes=%d-%d' % (start, end)
+            resp = session.get(next(peer_urls), headers=headers, stream=True,
+                               timeout=CONF.image_peer.timeout)
+            if resp.status_code != 206:
+                resp.close()
+                raise IOError(_('Unexpected status %d from the image peer') %
+                              resp.status_code)
+            return resp.iter_content(READ_SIZE)
+
+        parallel_download.download(
+            image_id, size, fetch_range, dst_path,
+            CONF.image_peer.chunk_size * units.Mi, CONF.image_peer.workers,
+            checksum=checksum, retries=len(urls))
+        LOG.info(_LI('Copied image %(image_id)s from %(peers)d peers'),
+                 {'image_id': image_id, 'peers': len(urls)})
+
+
+class PeerApplication(object):
+    """WSGI application serving the images of the image cache."""
+
+    def __init__(self):
+        # (mtime, size, MD5 checksum) of the cached images, keyed by path
+        self._checksums = {}
+        self._computing = set()
+
+    def _compute_checksum(self, path, key):
+        try:
+            checksum = tpool.execute(_md5, path)
+            self._checksums[path] = key + (checksum,)
+        except (IOError, OSError) as e:
+            LOG.warning(_LW('Could not compute the checksum of %(path)s: '
+                            '%(error)s'), {'path': path, 'error': e})
+        finally:
+            self._computing.discard(path)
+
+    def _get_checksum(self, path):
+        """Return the checksum of a cached image, or None if it is being
+        computed.
+        """
+        st = os.stat(path)
+        key = (st.st_mtime, st.st_size)
+        cached = self._checksums.get(path)
+        if cached is not None and cached[:2] == key:
+            return cached[2]
+        # NOTE: Reading a whole image takes a while, the peers use other
+        # sources until it is done.
+        if path not in self._computing:
+            self._computing.add(path)
+            utils.spawn_n(self._compute_checksum, path, key)
+        return None
+
+    @webob.dec.wsgify
+    def __call__(self, req):
+        if req.method not in ('GET', 'HEAD'):
+            return webob.exc.HTTPMethodNotAllowed()
+        parts = req.path_info.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'images':
+            return webob.exc.HTTPNotFound()
+        image_id = parts[1]
+        if not _check_signature(req, image_id):
+            return webob.exc.HTTPForbidden()
+
+        path = _get_base_file(image_id)
+        if not os.path.isfile(path):
+            return webob.exc.HTTPNotFound()
+        checksum = self._get_checksum(path)
+        if checksum is None:
+            return webob.exc.HTTPServiceUnavailable()
+
+        resp = req.get_response(webob.static.FileApp(path))
+        resp.etag = checksum
+        return resp
+
+
+def start_server():
+    """Start serving the image cache to the peers, return the server."""
+    if not CONF.image_peer.secret:
+        LOG.warning(_LW('Not serving the image cache to the peers, '
+                        '[image_peer]/secret is not set'))
+        return None
+    server = wsgi.Server('image_peer', PeerApplication(),
+                         host=CONF.image_peer.host,
+                         port=CONF.image_peer.port)
+    server.start()
+    return server
+
+
+def get_download_handler(**kwargs):
+    return PeerTransfer()
+
+
+def get_schemes():
+    return ['peer']
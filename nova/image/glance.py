@@ -33,6 +33,7 @@ from oslo_serialization import jsonutils
 from oslo_service import sslutils
 from oslo_utils import excutils
 from oslo_utils import timeutils
+from oslo_utils import units
 import six
 from six.moves import range
 import six.moves.urllib.parse as urlparse
@@ -41,6 +42,7 @@ import nova.conf
 from nova import exception
 from nova.i18n import _LE, _LI, _LW
 import nova.image.download as image_xfers
+from nova.image import parallel_download
 from nova import objects
 from nova import signature_utils
 
@@ -151,6 +153,12 @@ class GlanceClientWrapper(object):
         self.api_server = next(self.api_servers)
         return _glanceclient_from_endpoint(context, self.api_server, version)
 
+    def get_client(self, context, version):
+        """Return a client for a request which the images API of the client
+        doesn't provide. The request isn't retried.
+        """
+        return self.client or self._create_onetime_client(context, version)
+
     def call(self, context, version, method, *args, **kwargs):
         """Call a glance client method.  If we get a connection error,
         retry the request according to CONF.glance.num_retries.
@@ -282,8 +290,13 @@ class GlanceImageService(object):
                           "for %(scheme)s"), {'scheme': scheme})
         return
 
-    def download(self, context, image_id, data=None, dst_path=None):
-        """Calls out to Glance for data and writes data."""
+    def download(self, context, image_id, data=None, dst_path=None,
+                 max_bandwidth=0):
+        """Calls out to Glance for data and writes data.
+
+        :param max_bandwidth: if not 0, the maximum rate in bytes per second
+                              of the data received from Glance
+        """
         if CONF.glance.allowed_direct_url_schemes and dst_path is not None:
             image = self.show(context, image_id, include_locations=True)
             for entry in image.get('locations', []):
@@ -300,10 +313,16 @@ class GlanceImageService(object):
                     except Exception:
                         LOG.exception(_LE("Download image error"))
 
+        if data is None and dst_path is not None:
+            if _download_from_peers(self, context, image_id, dst_path):
+                return
+
         try:
             image_chunks = self._client.call(context, 1, 'data', image_id)
         except Exception:
             _reraise_translated_image_exception(image_id)
+        if max_bandwidth:
+            image_chunks = _Throttle(max_bandwidth).iterate(image_chunks)
 
         # Retrieve properties for verification of Glance image signature
         verifier = None
@@ -513,8 +532,13 @@ class GlanceImageServiceV2(object):
 
         return _images
 
-    def download(self, context, image_id, data=None, dst_path=None):
-        """Calls out to Glance for data and writes data."""
+    def download(self, context, image_id, data=None, dst_path=None,
+                 max_bandwidth=0):
+        """Calls out to Glance for data and writes data.
+
+        :param max_bandwidth: if not 0, the maximum rate in bytes per second
+                              of the data received from Glance
+        """
         if CONF.glance.allowed_direct_url_schemes and dst_path is not None:
             image = self.show(context, image_id, include_locations=True)
             for entry in image.get('locations', []):
@@ -531,37 +555,29 @@ class GlanceImageServiceV2(object):
                     except Exception:
                         LOG.exception(_LE("Download image error"))
 
+        if data is None and dst_path is not None:
+            if _download_from_peers(self, context, image_id, dst_path):
+                return
+
+        if (data is None and dst_path is not None and
+                CONF.glance.parallel_download_workers > 1):
+            if self._download_ranges(context, image_id, dst_path,
+                                     max_bandwidth=max_bandwidth):
+                return
+
         try:
             image_chunks = self._client.call(context, 2, 'data', image_id)
         except Exception:
             _reraise_translated_image_exception(image_id)
+        if max_bandwidth:
+            image_chunks = _Throttle(max_bandwidth).iterate(image_chunks)
 
         # Retrieve properties for verification of Glance image signature
         verifier = None
         if CONF.glance.verify_glance_signatures:
             image_meta_dict = self.show(context, image_id,
                                         include_locations=False)
-            image_meta = objects.ImageMeta.from_dict(image_meta_dict)
-            img_signature = image_meta.properties.get('img_signature')
-            img_sig_hash_method = image_meta.properties.get(
-                'img_signature_hash_method'
-            )
-            img_sig_cert_uuid = image_meta.properties.get(
-                'img_signature_certificate_uuid'
-            )
-            img_sig_key_type = image_meta.properties.get(
-                'img_signature_key_type'
-            )
-            try:
-                verifier = signature_utils.get_verifier(context,
-                                                        img_sig_cert_uuid,
-                                                        img_sig_hash_method,
-                                                        img_signature,
-                                                        img_sig_key_type)
-            except exception.SignatureVerificationError:
-                with excutils.save_and_reraise_exception():
-                    LOG.error(_LE('Image signature verification failed '
-                                  'for image: %s'), image_id)
+            verifier = self._get_verifier(context, image_id, image_meta_dict)
 
         close_file = False
         if data is None and dst_path:
@@ -608,6 +624,95 @@ class GlanceImageServiceV2(object):
                 if close_file:
                     data.close()
 
+    @staticmethod
+    def _get_verifier(context, image_id, image_meta_dict):
+        """Return the verifier of the signature of the image."""
+        image_meta = objects.ImageMeta.from_dict(image_meta_dict)
+        img_signature = image_meta.properties.get('img_signature')
+        img_sig_hash_method = image_meta.properties.get(
+            'img_signature_hash_method'
+        )
+        img_sig_cert_uuid = image_meta.properties.get(
+            'img_signature_certificate_uuid'
+        )
+        img_sig_key_type = image_meta.properties.get(
+            'img_signature_key_type'
+        )
+        try:
+            return signature_utils.get_verifier(context,
+                                                img_sig_cert_uuid,
+                                                img_sig_hash_method,
+                                                img_signature,
+                                                img_sig_key_type)
+        except exception.SignatureVerificationError:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_LE('Image signature verification failed '
+                              'for image: %s'), image_id)
+
+    def _get_data_range(self, context, image_id, start, end):
+        """Return an iterator over the bytes start to end (inclusive) of
+        the image data.
+        """
+        client = self._client.get_client(context, 2)
+        resp, body = client.http_client.get(
+            '/v2/images/%s/file' % image_id,
+            headers={'Range': 'bytes=%d-%d' % (start, end)})
+        if resp.status_code != 206:
+            # The server sends the whole image instead
+            resp.close()
+            raise parallel_download.RangesNotSupported()
+        return body
+
+    def _download_ranges(self, context, image_id, dst_path, max_bandwidth=0):
+        """Download the image data to dst_path by parallel byte ranges.
+
+        max_bandwidth, if not 0, limits the total rate of the ranges.
+
+        Returns False if the image is too small to be split or if glance
+        doesn't serve byte ranges, the image must then be downloaded as a
+        single stream.
+        """
+        image_meta_dict = self.show(context, image_id,
+                                    include_locations=False)
+        size = image_meta_dict.get('size')
+        chunk_size = CONF.glance.parallel_download_chunk_size * units.Mi
+        if not size or size <= chunk_size:
+            return False
+
+        verifier = None
+        if CONF.glance.verify_glance_signatures:
+            verifier = self._get_verifier(context, image_id, image_meta_dict)
+
+        throttle = _Throttle(max_bandwidth) if max_bandwidth else None
+
+        def fetch_range(start, end):
+            body = self._get_data_range(context, image_id, start, end)
+            if throttle is not None:
+                body = throttle.iterate(body)
+            return body
+
+        try:
+            downloaded = parallel_download.download(
+                image_id, size, fetch_range, dst_path, chunk_size,
+                CONF.glance.parallel_download_workers,
+                checksum=image_meta_dict.get('checksum'), verifier=verifier,
+                retries=max(CONF.glance.num_retries, 0))
+        except parallel_download.RangesNotSupported:
+            LOG.info(_LI('Glance does not serve byte ranges of image %s, '
+                         'downloading it as a single stream'), image_id)
+            return False
+        except cryptography.exceptions.InvalidSignature:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_LE('Image signature verification failed '
+                              'for image: %s'), image_id)
+        except Exception:
+            _reraise_translated_image_exception(image_id)
+
+        if verifier and downloaded:
+            LOG.info(_LI('Image signature verification succeeded '
+                         'for image %s'), image_id)
+        return True
+
     def create(self, context, image_meta, data=None):
         """Store the image data and return the new image object."""
         # Here we workaround the situation when user wants to activate an
@@ -727,6 +832,24 @@ class GlanceImageServiceV2(object):
         return True
 
 
+class _Throttle(object):
+    """Limits the rate of the data read from one or more iterators."""
+
+    def __init__(self, bytes_per_second):
+        self._bytes_per_second = float(bytes_per_second)
+        self._start = time.time()
+        self._count = 0
+
+    def iterate(self, chunks):
+        for chunk in chunks:
+            yield chunk
+            self._count += len(chunk)
+            delay = (self._count / self._bytes_per_second -
+                     (time.time() - self._start))
+            if delay > 0:
+                time.sleep(delay)
+
+
 def _extract_query_params(params):
     _params = {}
     accepted_params = ('filters', 'marker', 'limit',
@@ -1035,6 +1158,39 @@ def _translate_plain_exception(exc_value):
     return exc_value
 
 
+def _download_from_peers(image_service, context, image_id, dst_path):
+    """Download the image data to dst_path from the other compute hosts.
+
+    Returns False if the peer transfer module isn't enabled or if no peer
+    holds the image, the image must then be downloaded from glance.
+    """
+    if 'peer' not in CONF.glance.allowed_direct_url_schemes:
+        return False
+    if CONF.glance.verify_glance_signatures:
+        # The peers don't serve the signature properties of the images
+        return False
+    xfer_mod = image_service._get_transfer_module('peer')
+    if not xfer_mod:
+        return False
+
+    image_meta_dict = image_service.show(context, image_id,
+                                         include_locations=False)
+    metadata = {'checksum': image_meta_dict.get('checksum'),
+                'size': image_meta_dict.get('size')}
+    url_parts = urlparse.urlparse('peer:///%s' % image_id)
+    try:
+        xfer_mod.download(context, url_parts, dst_path, metadata)
+    except exception.ImageDownloadModuleError as e:
+        LOG.info(_LI('Not downloading image %(image_id)s from the peers: '
+                     '%(reason)s'), {'image_id': image_id, 'reason': e})
+        return False
+    except Exception:
+        LOG.exception(_LE('Error downloading image %s from the peers'),
+                      image_id)
+        return False
+    return True
+
+
 def get_remote_image_service(context, image_href):
     """Create an image_service and parse the id from the given image_href.
 
@@ -0,0 +1,243 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Parallel download of the image data by byte ranges.
+
+The image is split into chunks which are fetched concurrently and written at
+their offset in a file preallocated to the size of the image. The chunks
+which are complete are recorded in a state file next to the destination, so
+that a download interrupted by a restart of the service only fetches the
+missing chunks the next time. The checksum and the signature of the image
+are computed from the chunks in order, as soon as they are written.
+"""
+
+import errno
+import hashlib
+import os
+
+import eventlet
+from eventlet import event
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+from oslo_utils import fileutils
+from six.moves import range
+
+from nova import exception
+from nova.i18n import _, _LI, _LW
+
+LOG = logging.getLogger(__name__)
+
+# Suffix of the file recording the progress of a download
+STATE_SUFFIX = '.ranges'
+
+# Size of the reads of the written chunks to compute the checksum
+READ_SIZE = 1024 * 1024
+
+# Downloads in progress in this process, keyed by (image id, destination)
+_IN_PROGRESS = {}
+
+
+class RangesNotSupported(Exception):
+    """The image server doesn't serve byte ranges of the image data."""
+
+
+class ParallelDownload(object):
+    """Download of one image to a file by parallel byte ranges.
+
+    fetch_range(start, end) must return an iterator over the bytes start to
+    end (inclusive) of the image data, or raise RangesNotSupported. The
+    verifier, if any, is updated with the data in order and verified at the
+    end.
+    """
+
+    def __init__(self, image_id, size, fetch_range, dst_path, chunk_size,
+                 workers, checksum=None, verifier=None, retries=0):
+        self.image_id = image_id
+        self.size = size
+        self.fetch_range = fetch_range
+        self.dst_path = dst_path
+        self.state_path = dst_path + STATE_SUFFIX
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checksum = checksum
+        self.verifier = verifier
+        self.retries = retries
+        self.chunks = (size + chunk_size - 1) // chunk_size
+        self._done = set()
+        self._file = None
+
+    def _state(self):
+        return {'image_id': self.image_id, 'size': self.size,
+                'checksum': self.checksum, 'chunk_size': self.chunk_size}
+
+    def _load_state(self):
+        """Return the chunks which a previous download of the same image
+        already wrote to the destination.
+        """
+        try:
+            with open(self.state_path) as f:
+                state = jsonutils.load(f)
+            if os.path.getsize(self.dst_path) != self.size:
+                return set()
+        except (IOError, OSError, ValueError):
+            return set()
+        if state.get('image') != self._state():
+            return set()
+        return set(state.get('done', []))
+
+    def _save_state(self):
+        # Write and rename so that a restart never sees a partial state
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            jsonutils.dump({'image': self._state(),
+                            'done': sorted(self._done)}, f)
+        os.rename(tmp_path, self.state_path)
+
+    def _remove_state(self):
+        fileutils.delete_if_exists(self.state_path)
+
+    def _fetch_chunk(self, index):
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.size) - 1
+        for attempt in range(self.retries + 1):
+            try:
+                offset = start
+                for data in self.fetch_range(start, end):
+                    # NOTE: Writing to a file doesn't yield to the other
+                    # greenthreads, so that they can't move the position of
+                    # the file between the seek and the write.
+                    self._file.seek(offset)
+                    self._file.write(data)
+                    offset += len(data)
+                if offset != end + 1:
+                    raise IOError(errno.EIO,
+                                  _('Got %(got)d bytes of the range '
+                                    '%(start)d-%(end)d') %
+                                  {'got': offset - start, 'start': start,
+                                   'end': end})
+                return index
+            except RangesNotSupported:
+                raise
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                LOG.warning(_LW('Error downloading the range %(start)d-'
+                                '%(end)d of image %(image_id)s, retrying: '
+                                '%(error)s'),
+                            {'start': start, 'end': end,
+                             'image_id': self.image_id, 'error': e})
+
+    def _digest(self, index, reader, md5):
+        """Feed a written chunk to the checksum and the signature verifier.
+        """
+        reader.seek(index * self.chunk_size)
+        remaining = min(self.chunk_size, self.size - index * self.chunk_size)
+        while remaining:
+            data = reader.read(min(READ_SIZE, remaining))
+            if not data:
+                raise IOError(errno.EIO, _('Unexpected end of %s') %
+                              self.dst_path)
+            remaining -= len(data)
+            md5.update(data)
+            if self.verifier is not None:
+                self.verifier.update(data)
+
+    def run(self):
+        self._done = self._load_state()
+        if self._done:
+            LOG.info(_LI('Resuming the download of image %(image_id)s, '
+                         '%(done)d of %(chunks)d chunks were already '
+                         'downloaded'),
+                     {'image_id': self.image_id, 'done': len(self._done),
+                      'chunks': self.chunks})
+        else:
+            # Truncating an empty file preallocates a sparse file
+            with open(self.dst_path, 'wb') as f:
+                f.truncate(self.size)
+            self._save_state()
+
+        md5 = hashlib.md5()
+        pending = [index for index in range(self.chunks)
+                   if index not in self._done]
+        pool = eventlet.GreenPool(self.workers)
+        try:
+            with open(self.dst_path, 'r+b') as self._file, \
+                    open(self.dst_path, 'rb') as reader:
+                next_digest = 0
+                # imap returns the chunks in order, whatever the order in
+                # which they complete
+                for index in pool.imap(self._fetch_chunk, pending):
+                    self._file.flush()
+                    self._done.add(index)
+                    self._save_state()
+                    while next_digest in self._done:
+                        self._digest(next_digest, reader, md5)
+                        next_digest += 1
+                while next_digest < self.chunks:
+                    self._digest(next_digest, reader, md5)
+                    next_digest += 1
+        except Exception:
+            for thread in list(pool.coroutines_running):
+                thread.kill()
+            # The caller removes the destination when the download fails, so
+            # the state would refer to a missing file
+            self._remove_state()
+            raise
+        finally:
+            self._file = None
+
+        self._remove_state()
+        if self.checksum and md5.hexdigest() != self.checksum:
+            raise exception.ImageUnacceptable(
+                image_id=self.image_id,
+                reason=_('Checksum %(actual)s of the downloaded data '
+                         'doesn\'t match %(expected)s') %
+                {'actual': md5.hexdigest(), 'expected': self.checksum})
+        if self.verifier is not None:
+            self.verifier.verify()
+
+
+def download(image_id, size, fetch_range, dst_path, chunk_size, workers,
+             checksum=None, verifier=None, retries=0):
+    """Download the image data to dst_path by parallel byte ranges.
+
+    Concurrent downloads of the same image to the same destination in this
+    process are coalesced: the later ones wait for the first one and share
+    its result. Returns False for them, True for the one which downloaded
+    the image.
+    """
+    key = (image_id, dst_path)
+    in_progress = _IN_PROGRESS.get(key)
+    if in_progress is not None:
+        LOG.info(_LI('Waiting for the download of image %(image_id)s to '
+                     '%(path)s in progress'),
+                 {'image_id': image_id, 'path': dst_path})
+        in_progress.wait()
+        return False
+
+    done = _IN_PROGRESS[key] = event.Event()
+    try:
+        ParallelDownload(image_id, size, fetch_range, dst_path, chunk_size,
+                         workers, checksum=checksum, verifier=verifier,
+                         retries=retries).run()
+    except Exception as e:
+        done.send_exception(e)
+        raise
+    else:
+        done.send()
+        return True
+    finally:
+        del _IN_PROGRESS[key]
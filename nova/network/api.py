@@ -375,6 +375,13 @@ class API(base_api.NetworkAPI):
         return super(API, self).get_instance_nw_info(context, instance,
                                                      **kwargs)
 
+    def get_instances_nw_info(self, context, instances):
+        """Returns the network info of several instances."""
+        # Same policy as refreshing the instances one by one
+        if not self.skip_policy_check:
+            check_policy(context, 'get_instance_nw_info')
+        return super(API, self).get_instances_nw_info(context, instances)
+
     def _get_instance_nw_info(self, context, instance, **kwargs):
         """Returns all network info related to an instance."""
         flavor = instance.get_flavor()
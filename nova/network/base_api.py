@@ -18,9 +18,11 @@ import inspect
 
 from oslo_concurrency import lockutils
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 from oslo_utils import excutils
 
 from nova.db import base
+from nova import exception
 from nova import hooks
 from nova.i18n import _, _LE
 from nova.network import model as network_model
@@ -53,6 +55,20 @@ def update_instance_cache_with_nw_info(impl, context, instance,
             LOG.exception(_LE('Failed storing info cache'), instance=instance)
 
 
+def _nw_info_changed(instance, nw_info):
+    """Return whether the network info differs from the info cache of the
+    instance.
+    """
+    if instance.info_cache is None:
+        return True
+    cached = instance.info_cache.network_info
+    if cached is None:
+        return True
+    # NOTE: The models only compare some of their keys, compare everything
+    return (jsonutils.loads(cached.json()) !=
+            jsonutils.loads(nw_info.json()))
+
+
 def refresh_cache(f):
     """Decorator to update the instance_info_cache
 
@@ -261,6 +277,39 @@ class NetworkAPI(base.Base):
                                                update_cells=update_cells)
         return result
 
+    def get_instances_nw_info(self, context, instances):
+        """Refresh the network info of several instances.
+
+        Only the info caches which changed are saved. Returns the network
+        info of the instances which could be refreshed, keyed by instance
+        uuid.
+        """
+        return self._refresh_instances_nw_info(context, instances)
+
+    def _refresh_instances_nw_info(self, context, instances, **kwargs):
+        nw_infos = {}
+        for instance in instances:
+            try:
+                with lockutils.lock('refresh_cache-%s' % instance.uuid):
+                    nw_info = self._get_instance_nw_info(context, instance,
+                                                         **kwargs)
+                    if _nw_info_changed(instance, nw_info):
+                        update_instance_cache_with_nw_info(
+                            self, context, instance, nw_info=nw_info,
+                            update_cells=False)
+                    else:
+                        LOG.debug('The network info_cache is up to date',
+                                  instance=instance)
+                nw_infos[instance.uuid] = nw_info
+            except (exception.InstanceNotFound,
+                    exception.InstanceInfoCacheNotFound):
+                LOG.debug('Instance no longer exists. Unable to refresh',
+                          instance=instance)
+            except Exception:
+                LOG.exception(_LE('An error occurred while refreshing the '
+                                  'network cache.'), instance=instance)
+        return nw_infos
+
     def _get_instance_nw_info(self, context, instance, **kwargs):
         """Template method, so a subclass can implement for neutron/network."""
         raise NotImplementedError()
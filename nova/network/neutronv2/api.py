@@ -15,9 +15,11 @@
 #    under the License.
 #
 
+import sys
 import time
 import uuid
 
+import eventlet
 from keystoneauth1 import loading as ks_loading
 from neutronclient.common import exceptions as neutron_client_exc
 from neutronclient.v2_0 import client as clientv20
@@ -53,6 +55,10 @@ _ADMIN_AUTH = None
 
 DEFAULT_SECGROUP = 'default'
 
+# Maximum number of ids filtering a single neutron query, which keeps the
+# request URI short enough
+BULK_QUERY_SIZE = 100
+
 
 def reset_state():
     global _ADMIN_AUTH
@@ -123,6 +129,152 @@ def _is_not_duplicate(item, items, items_list_name, instance):
     return not present
 
 
+def _bulk_list(list_func, key, ids, **search_opts):
+    """List the neutron resources matching a list of ids in batches."""
+    ids = list(ids)
+    resources = []
+    for i in range(0, len(ids), BULK_QUERY_SIZE):
+        search_opts[key] = ids[i:i + BULK_QUERY_SIZE]
+        resources += list_func(**search_opts)
+    return resources
+
+
+class _NeutronResourceCache(object):
+    """Cache of the networks, subnets and DHCP ports used to build the
+    network info of the instances.
+
+    The resources are kept for [neutron]/resource_cache_ttl seconds and
+    the missing ones are fetched in batches.
+    """
+
+    def __init__(self):
+        # (time fetched, resource) tuples keyed by id, and lists of DHCP
+        # ports keyed by network id
+        self._networks = {}
+        self._subnets = {}
+        self._dhcp_ports = {}
+
+    def _get(self, cache, keys, fetch):
+        now = time.time()
+        ttl = CONF.neutron.resource_cache_ttl
+        # Drop the expired entries, including the ones of the resources
+        # that were not found, so that the cache does not grow forever
+        for key in [key for key, (fetched_at, resource) in cache.items()
+                    if now - fetched_at >= ttl]:
+            del cache[key]
+        missing = set(key for key in keys if key not in cache)
+        if missing:
+            fetched = fetch(missing)
+            for key in missing:
+                cache[key] = (now, fetched.get(key))
+        return dict((key, cache[key][1]) for key in keys
+                    if cache[key][1] is not None)
+
+    def get_networks(self, client, network_ids):
+        def fetch(ids):
+            return dict((net['id'], net) for net in _bulk_list(
+                lambda **kw: client.list_networks(**kw).get('networks', []),
+                'id', ids))
+        return self._get(self._networks, network_ids, fetch)
+
+    def get_subnets(self, client, subnet_ids):
+        def fetch(ids):
+            return dict((subnet['id'], subnet) for subnet in _bulk_list(
+                lambda **kw: client.list_subnets(**kw).get('subnets', []),
+                'id', ids))
+        return self._get(self._subnets, subnet_ids, fetch)
+
+    def get_dhcp_ports(self, client, network_ids):
+        def fetch(ids):
+            ports = dict((network_id, []) for network_id in ids)
+            for port in _bulk_list(
+                    lambda **kw: client.list_ports(**kw).get('ports', []),
+                    'network_id', ids, device_owner='network:dhcp'):
+                ports.setdefault(port['network_id'], []).append(port)
+            return ports
+        return self._get(self._dhcp_ports, network_ids, fetch)
+
+
+class _BulkNetworkInfo(object):
+    """The neutron resources needed to build the network info of several
+    instances, fetched with a few neutron calls.
+
+    The ports of all the instances are listed at once, as well as their
+    floating IPs. Their networks, subnets and DHCP ports come from the
+    cache shared by the batches.
+    """
+
+    def __init__(self, client, cache, instances, safe_get_floating_ips):
+        self.client = client
+        self._cache = cache
+        # Lists of ports keyed by instance uuid
+        self.ports = dict((instance.uuid, []) for instance in instances)
+        for port in _bulk_list(
+                lambda **kw: client.list_ports(**kw).get('ports', []),
+                'device_id', self.ports):
+            if port['device_id'] in self.ports:
+                self.ports[port['device_id']].append(port)
+        ports = [port for instance_ports in self.ports.values()
+                 for port in instance_ports]
+        self._port_ids = set(port['id'] for port in ports)
+
+        # Lists of floating IPs keyed by (port id, fixed IP address)
+        self._floating_ips = {}
+        for fip in _bulk_list(
+                lambda **kw: safe_get_floating_ips(client, **kw),
+                'port_id', [port['id'] for port in ports]):
+            key = (fip['port_id'], fip['fixed_ip_address'])
+            self._floating_ips.setdefault(key, []).append(fip)
+
+        # Fetch the missing networks, subnets and DHCP ports at once, they
+        # are used for the whole batch even if they expire meanwhile
+        self._networks = cache.get_networks(
+            client, set(port['network_id'] for port in ports))
+        self._subnets = cache.get_subnets(client, set(
+            fixed_ip['subnet_id'] for port in ports
+            for fixed_ip in port['fixed_ips']))
+        self._dhcp_ports = cache.get_dhcp_ports(client, set(
+            subnet['network_id'] for subnet in self._subnets.values()))
+
+    def _get(self, resources, get, keys):
+        missing = [key for key in keys if key not in resources]
+        if missing:
+            resources.update(get(self.client, missing))
+        return resources
+
+    def _get_ordered(self, resources, get, keys):
+        resources = self._get(resources, get, keys)
+        ordered = []
+        seen = set()
+        for key in keys:
+            if key in resources and key not in seen:
+                seen.add(key)
+                ordered.append(resources[key])
+        return ordered
+
+    def get_networks(self, network_ids):
+        """Return the networks with the given ids, in the same order."""
+        return self._get_ordered(self._networks, self._cache.get_networks,
+                                 network_ids)
+
+    def get_subnets(self, subnet_ids):
+        """Return the subnets with the given ids, in the same order."""
+        return self._get_ordered(self._subnets, self._cache.get_subnets,
+                                 subnet_ids)
+
+    def get_dhcp_ports(self, network_id):
+        return self._get(self._dhcp_ports, self._cache.get_dhcp_ports,
+                         [network_id]).get(network_id, [])
+
+    def get_floating_ips(self, port_id, fixed_ip):
+        """Return the floating IPs of a fixed IP of a port, or None if the
+        port wasn't listed with the batch.
+        """
+        if port_id not in self._port_ids:
+            return None
+        return self._floating_ips.get((port_id, fixed_ip), [])
+
+
 class API(base_api.NetworkAPI):
     """API for interacting with the neutron 2.x API."""
 
@@ -130,6 +282,7 @@ class API(base_api.NetworkAPI):
         super(API, self).__init__(skip_policy_check=skip_policy_check)
         self.last_neutron_extension_sync = None
         self.extensions = {}
+        self._resource_cache = _NeutronResourceCache()
 
     def setup_networks_on_host(self, context, instance, host=None,
                                teardown=False):
@@ -574,9 +727,7 @@ class API(base_api.NetworkAPI):
         security_group_ids = self._process_security_groups(
                                     instance, neutron, security_groups)
 
-        preexisting_port_ids = []
-        created_port_ids = []
-        ports_in_requested_order = []
+        port_requests = []
         nets_in_requested_order = []
         for request in ordered_networks:
             # Network lookup for available network_id
@@ -608,34 +759,29 @@ class API(base_api.NetworkAPI):
             zone = 'compute:%s' % instance.availability_zone
             port_req_body = {'port': {'device_id': instance.uuid,
                                       'device_owner': zone}}
-            try:
+            port_requests.append((request, network, port_req_body))
+
+        preexisting_port_ids = []
+        created_port_ids = []
+        ports_in_requested_order = []
+        try:
+            for request, network, port_req_body in port_requests:
                 self._populate_neutron_extension_values(
                     context, instance, request.pci_request_id, port_req_body,
                     network=network, neutron=neutron,
                     bind_host_id=bind_host_id)
                 self._populate_mac_address(instance, request.pci_request_id,
                                            port_req_body)
-                if request.port_id:
-                    port = ports[request.port_id]
-                    port_client.update_port(port['id'], port_req_body)
-                    preexisting_port_ids.append(port['id'])
-                    ports_in_requested_order.append(port['id'])
-                else:
-                    created_port = self._create_port(
-                            port_client, instance, request.network_id,
-                            port_req_body, request.address,
-                            security_group_ids, available_macs, dhcp_opts)
-                    created_port_ids.append(created_port)
-                    ports_in_requested_order.append(created_port)
-                self._update_port_dns_name(context, instance, network,
-                                           ports_in_requested_order[-1],
-                                           neutron)
-            except Exception:
-                with excutils.save_and_reraise_exception():
-                    self._unbind_ports(context,
-                                       preexisting_port_ids,
-                                       neutron, port_client)
-                    self._delete_ports(neutron, instance, created_port_ids)
+            ports_in_requested_order = self._create_or_update_ports(
+                context, instance, neutron, port_client, port_requests,
+                ports, security_group_ids, available_macs, dhcp_opts,
+                preexisting_port_ids, created_port_ids)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self._unbind_ports(context,
+                                   preexisting_port_ids,
+                                   neutron, port_client)
+                self._delete_ports(neutron, instance, created_port_ids)
         nw_info = self.get_instance_nw_info(
             context, instance, networks=nets_in_requested_order,
             port_ids=ports_in_requested_order,
@@ -651,6 +797,55 @@ class API(base_api.NetworkAPI):
                                           if vif['id'] in created_port_ids +
                                           preexisting_port_ids])
 
+    def _create_or_update_ports(self, context, instance, neutron,
+                                port_client, port_requests, ports,
+                                security_group_ids, available_macs,
+                                dhcp_opts, preexisting_port_ids,
+                                created_port_ids):
+        """Create or update the ports of the requested networks.
+
+        Up to [neutron]/port_concurrency ports are created or updated at the
+        same time. The ports which were updated and created are appended to
+        preexisting_port_ids and created_port_ids as they are, so that the
+        caller can roll them back, and the first error is raised once all
+        the requests in progress are done. The requests which did not start
+        before an error are skipped.
+
+        :returns: the IDs of the ports in the order of port_requests.
+        """
+        port_ids = [None] * len(port_requests)
+        errors = []
+
+        def create_or_update(index):
+            if errors:
+                return
+            request, network, port_req_body = port_requests[index]
+            try:
+                if request.port_id:
+                    port = ports[request.port_id]
+                    port_client.update_port(port['id'], port_req_body)
+                    port_id = port['id']
+                    preexisting_port_ids.append(port_id)
+                else:
+                    port_id = self._create_port(
+                            port_client, instance, request.network_id,
+                            port_req_body, request.address,
+                            security_group_ids, available_macs, dhcp_opts)
+                    created_port_ids.append(port_id)
+                port_ids[index] = port_id
+                self._update_port_dns_name(context, instance, network,
+                                           port_id, neutron)
+            except Exception:
+                errors.append(sys.exc_info())
+
+        pool = eventlet.GreenPool(CONF.neutron.port_concurrency)
+        for index in range(len(port_requests)):
+            pool.spawn_n(create_or_update, index)
+        pool.waitall()
+        if errors:
+            six.reraise(*errors[0])
+        return port_ids
+
     def _refresh_neutron_extensions_cache(self, context, neutron=None):
         """Refresh the neutron extensions cache when necessary."""
         if (not self.last_neutron_extension_sync or
@@ -905,7 +1100,8 @@ class API(base_api.NetworkAPI):
 
     def _get_instance_nw_info(self, context, instance, networks=None,
                               port_ids=None, admin_client=None,
-                              preexisting_port_ids=None, **kwargs):
+                              preexisting_port_ids=None, bulk=None,
+                              **kwargs):
         # NOTE(danms): This is an inner method intended to be called
         # by other code that updates instance nwinfo. It *must* be
         # called with the refresh_cache-%(instance_uuid) lock held!
@@ -916,11 +1112,28 @@ class API(base_api.NetworkAPI):
         compute_utils.refresh_info_cache_for_instance(context, instance)
         nw_info = self._build_network_info_model(context, instance, networks,
                                                  port_ids, admin_client,
-                                                 preexisting_port_ids)
+                                                 preexisting_port_ids,
+                                                 bulk=bulk)
         return network_model.NetworkInfo.hydrate(nw_info)
 
+    def get_instances_nw_info(self, context, instances):
+        """Refresh the network info of several instances at once.
+
+        The ports of all the instances, their floating IPs, networks,
+        subnets and DHCP ports are fetched with a few neutron calls, the
+        networks, subnets and DHCP ports being cached for
+        [neutron]/resource_cache_ttl seconds.
+        """
+        if not instances:
+            return {}
+        client = get_client(context, admin=True)
+        bulk = _BulkNetworkInfo(client, self._resource_cache, instances,
+                                self._safe_get_floating_ips)
+        return self._refresh_instances_nw_info(
+            context, instances, admin_client=client, bulk=bulk)
+
     def _gather_port_ids_and_networks(self, context, instance, networks=None,
-                                      port_ids=None):
+                                      port_ids=None, bulk=None):
         """Return an instance's complete list of port_ids and networks."""
 
         if ((networks is None and port_ids is not None) or
@@ -937,9 +1150,12 @@ class API(base_api.NetworkAPI):
             net_ids = [iface['network']['id'] for iface in ifaces]
 
         if networks is None:
-            networks = self._get_available_networks(context,
-                                                    instance.project_id,
-                                                    net_ids)
+            if bulk is not None:
+                networks = bulk.get_networks(net_ids)
+            else:
+                networks = self._get_available_networks(context,
+                                                        instance.project_id,
+                                                        net_ids)
         # an interface was added/removed from instance.
         else:
 
@@ -1572,12 +1788,17 @@ class API(base_api.NetworkAPI):
         """Force add a network to the project."""
         raise NotImplementedError()
 
-    def _nw_info_get_ips(self, client, port):
+    def _nw_info_get_ips(self, client, port, bulk=None):
         network_IPs = []
         for fixed_ip in port['fixed_ips']:
             fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
-            floats = self._get_floating_ips_by_fixed_and_port(
-                client, fixed_ip['ip_address'], port['id'])
+            floats = None
+            if bulk is not None:
+                floats = bulk.get_floating_ips(port['id'],
+                                               fixed_ip['ip_address'])
+            if floats is None:
+                floats = self._get_floating_ips_by_fixed_and_port(
+                    client, fixed_ip['ip_address'], port['id'])
             for ip in floats:
                 fip = network_model.IP(address=ip['floating_ip_address'],
                                        type='floating')
@@ -1585,8 +1806,8 @@ class API(base_api.NetworkAPI):
             network_IPs.append(fixed)
         return network_IPs
 
-    def _nw_info_get_subnets(self, context, port, network_IPs):
-        subnets = self._get_subnets_from_port(context, port)
+    def _nw_info_get_subnets(self, context, port, network_IPs, bulk=None):
+        subnets = self._get_subnets_from_port(context, port, bulk=bulk)
         for subnet in subnets:
             subnet['ips'] = [fixed_ip for fixed_ip in network_IPs
                              if fixed_ip.is_in_subnet(subnet)]
@@ -1671,7 +1892,7 @@ class API(base_api.NetworkAPI):
 
     def _build_network_info_model(self, context, instance, networks=None,
                                   port_ids=None, admin_client=None,
-                                  preexisting_port_ids=None):
+                                  preexisting_port_ids=None, bulk=None):
         """Return list of ordered VIFs attached to instance.
 
         :param context: Request context.
@@ -1689,6 +1910,8 @@ class API(base_api.NetworkAPI):
                         an instance is de-allocated. Supplied list will
                         be added to the cached list of preexisting port
                         IDs for this instance.
+        :param bulk: The _BulkNetworkInfo of a batch of instances including
+                     this instance, to build its network info from.
         """
 
         search_opts = {'tenant_id': instance.project_id,
@@ -1698,12 +1921,26 @@ class API(base_api.NetworkAPI):
         else:
             client = admin_client
 
-        data = client.list_ports(**search_opts)
-
-        current_neutron_ports = data.get('ports', [])
+        if bulk is not None:
+            current_neutron_ports = [
+                port for port in bulk.ports.get(instance.uuid, [])
+                if port['tenant_id'] == instance.project_id]
+        else:
+            data = client.list_ports(**search_opts)
+            current_neutron_ports = data.get('ports', [])
         nw_info_refresh = networks is None and port_ids is None
         networks, port_ids = self._gather_port_ids_and_networks(
-                context, instance, networks, port_ids)
+                context, instance, networks, port_ids, bulk=bulk)
+        current_port_ids = set(port['id'] for port in current_neutron_ports)
+        if bulk is not None and not current_port_ids.issuperset(port_ids):
+            # NOTE: The ports were listed before the info cache was
+            # refreshed, a port attached in between would be dropped from
+            # the info cache.
+            LOG.debug('The ports of the instance changed while the network '
+                      'info was built, listing them again.',
+                      instance=instance)
+            data = client.list_ports(**search_opts)
+            current_neutron_ports = data.get('ports', [])
         nw_info = network_model.NetworkInfo()
 
         if preexisting_port_ids is None:
@@ -1725,10 +1962,11 @@ class API(base_api.NetworkAPI):
                     vif_active = True
 
                 network_IPs = self._nw_info_get_ips(client,
-                                                    current_neutron_port)
+                                                    current_neutron_port,
+                                                    bulk=bulk)
                 subnets = self._nw_info_get_subnets(context,
                                                     current_neutron_port,
-                                                    network_IPs)
+                                                    network_IPs, bulk=bulk)
 
                 devname = "tap" + current_neutron_port['id']
                 devname = devname[:network_model.NIC_NAME_LEN]
@@ -1761,7 +1999,7 @@ class API(base_api.NetworkAPI):
 
         return nw_info
 
-    def _get_subnets_from_port(self, context, port):
+    def _get_subnets_from_port(self, context, port, bulk=None):
         """Return the subnets for a given port."""
 
         fixed_ips = port['fixed_ips']
@@ -1772,9 +2010,13 @@ class API(base_api.NetworkAPI):
         # related to the port. To avoid this, the method returns here.
         if not fixed_ips:
             return []
-        search_opts = {'id': [ip['subnet_id'] for ip in fixed_ips]}
-        data = get_client(context).list_subnets(**search_opts)
-        ipam_subnets = data.get('subnets', [])
+        subnet_ids = [ip['subnet_id'] for ip in fixed_ips]
+        if bulk is not None:
+            ipam_subnets = bulk.get_subnets(subnet_ids)
+        else:
+            search_opts = {'id': subnet_ids}
+            data = get_client(context).list_subnets(**search_opts)
+            ipam_subnets = data.get('subnets', [])
         subnets = []
 
         for subnet in ipam_subnets:
@@ -1785,10 +2027,13 @@ class API(base_api.NetworkAPI):
             }
 
             # attempt to populate DHCP server field
-            search_opts = {'network_id': subnet['network_id'],
-                           'device_owner': 'network:dhcp'}
-            data = get_client(context).list_ports(**search_opts)
-            dhcp_ports = data.get('ports', [])
+            if bulk is not None:
+                dhcp_ports = bulk.get_dhcp_ports(subnet['network_id'])
+            else:
+                search_opts = {'network_id': subnet['network_id'],
+                               'device_owner': 'network:dhcp'}
+                data = get_client(context).list_ports(**search_opts)
+                dhcp_ports = data.get('ports', [])
             for p in dhcp_ports:
                 for ip_pair in p['fixed_ips']:
                     if ip_pair['subnet_id'] == subnet['id']:
@@ -26,6 +26,7 @@ from nova import objects
 from nova.objects import base
 from nova.objects import fields
 from nova.objects import pci_device_pool
+from nova import utils
 
 CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
@@ -436,7 +437,8 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
     # Version 1.12 ComputeNode version 1.12
     # Version 1.13 ComputeNode version 1.13
     # Version 1.14 ComputeNode version 1.14
-    VERSION = '1.14'
+    # Version 1.15 Add get_all_updated_since()
+    VERSION = '1.15'
     fields = {
         'objects': fields.ListOfObjectsField('ComputeNode'),
         }
@@ -447,6 +449,21 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @base.serialize_args
+    @base.remotable_classmethod
+    def get_all_updated_since(cls, context, since):
+        """Returns the compute nodes which changed since a given time.
+
+        Compute nodes which were deleted since then are returned too, with
+        their deleted field set, so that callers keeping a copy of the
+        compute nodes can drop them.
+        """
+        with utils.temporary_mutation(context, read_deleted='yes'):
+            db_computes = db.compute_node_get_all_updated_since(context,
+                                                                since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
     @base.remotable_classmethod
     def get_by_hypervisor(cls, context, hypervisor_match):
         db_computes = db.compute_node_search_by_hypervisor(context,
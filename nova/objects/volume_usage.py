@@ -57,3 +57,31 @@ class VolumeUsage(base.NovaPersistentObject, base.NovaObject):
             self.instance_uuid, self.project_id, self.user_id,
             self.availability_zone, update_totals=update_totals)
         self._from_db_object(self._context, self, db_vol_usage)
+
+
+@base.NovaObjectRegistry.register
+class VolumeUsageList(base.ObjectListBase, base.NovaObject):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'objects': fields.ListOfObjectsField('VolumeUsage'),
+    }
+
+    @base.remotable
+    def save(self):
+        """Save the current usage of all the volumes in one transaction."""
+        usages = [{'volume_id': vol_usage.volume_id,
+                   'curr_reads': vol_usage.curr_reads,
+                   'curr_read_bytes': vol_usage.curr_read_bytes,
+                   'curr_writes': vol_usage.curr_writes,
+                   'curr_write_bytes': vol_usage.curr_write_bytes,
+                   'instance_uuid': vol_usage.instance_uuid,
+                   'project_id': vol_usage.project_id,
+                   'user_id': vol_usage.user_id,
+                   'availability_zone': vol_usage.availability_zone}
+                  for vol_usage in self.objects]
+        db_vol_usages = db.vol_usage_update_all(self._context, usages)
+        for vol_usage, db_vol_usage in zip(self.objects, db_vol_usages):
+            VolumeUsage._from_db_object(self._context, vol_usage,
+                                        db_vol_usage)
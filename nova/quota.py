@@ -510,11 +510,35 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
+        return self._quota_reserve(context, resources, quotas, user_quotas,
+                                   deltas, expire, project_id, user_id)
+
+    def _quota_reserve(self, context, resources, quotas, user_quotas, deltas,
+                       expire, project_id, user_id):
         return db.quota_reserve(context, resources, quotas, user_quotas,
                                 deltas, expire,
                                 CONF.until_refresh, CONF.max_age,
                                 project_id=project_id, user_id=user_id)
 
+    def recheck(self, context, resources, keys, project_id=None,
+                user_id=None):
+        """Check that the usage of the given reservable resources is not
+        over quota once they are created.
+
+        The reservations already made sure of it, so this does nothing.
+
+        :param context: The request context, for access checks.
+        :param resources: A dictionary of the registered resources.
+        :param keys: The names of the resources to check.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        :param user_id: Specify the user_id if current context
+                        is admin and admin wants to impact on
+                        common user.
+        """
+        pass
+
     def commit(self, context, reservations, project_id=None, user_id=None):
         """Commit reservations.
 
@@ -623,6 +647,174 @@ class DbQuotaDriver(object):
         db.reservation_expire(context)
 
 
+class CountedQuotaDriver(DbQuotaDriver):
+    """Driver which counts the usage of the reservable resources from the
+    resources themselves, e.g. the instances of a project, instead of
+    tracking it in the quota_usages and reservations tables.
+
+    Reserving only checks the requested deltas against the counted usage,
+    without locking or writing any row, and returns no reservations, so
+    commit, rollback and expire have nothing to do. Requests made at the
+    same time can all pass that check, so the creators of resources call
+    recheck() once the resources exist and delete them if it fails. The
+    usage reported by get_project_quotas() and get_user_quotas() is cached
+    for quota_usage_cache_ttl seconds.
+    """
+
+    def __init__(self):
+        # Dict of (time, usages) tuples, keyed by (sync, project_id, user_id)
+        self._usage_cache = {}
+
+    def _count(self, context, sync, project_id, user_id, cached=True):
+        key = (sync, project_id, user_id)
+        if cached and key in self._usage_cache:
+            counted_at, usages = self._usage_cache[key]
+            if not timeutils.is_older_than(counted_at,
+                                           CONF.quota_usage_cache_ttl):
+                return usages
+        usages = db.quota_usage_count(context.elevated(), sync, project_id,
+                                      user_id=user_id)
+        if CONF.quota_usage_cache_ttl:
+            # Drop the expired usages so that the cache doesn't grow with
+            # every project ever checked
+            for old_key, (counted_at, _usages) in list(
+                    self._usage_cache.items()):
+                if timeutils.is_older_than(counted_at,
+                                           CONF.quota_usage_cache_ttl):
+                    del self._usage_cache[old_key]
+            self._usage_cache[key] = (timeutils.utcnow(), usages)
+        return usages
+
+    def _get_usages(self, context, resources, keys, project_id,
+                    user_id=None, cached=True):
+        """Return the counted usage of the given reservable resources, for a
+        whole project if user_id is None.
+        """
+        keys = [key for key in keys if hasattr(resources.get(key), 'sync')]
+        in_use = {}
+        for sync in set(resources[key].sync for key in keys):
+            in_use.update(self._count(context, sync, project_id, user_id,
+                                      cached=cached))
+        return dict((key, dict(in_use=in_use.get(key, 0), reserved=0))
+                    for key in keys)
+
+    def get_user_quotas(self, context, resources, project_id, user_id,
+                        quota_class=None, defaults=True,
+                        usages=True, project_quotas=None,
+                        user_quotas=None):
+        """Given a list of resources, retrieve the quotas for the given
+        user and project, with the counted usage if usages is True.
+        """
+        quotas = super(CountedQuotaDriver, self).get_user_quotas(
+            context, resources, project_id, user_id,
+            quota_class=quota_class, defaults=defaults, usages=False,
+            project_quotas=project_quotas, user_quotas=user_quotas)
+        if usages:
+            for key, usage in self._get_usages(
+                    context, resources, quotas, project_id,
+                    user_id).items():
+                quotas[key].update(usage)
+        return quotas
+
+    def get_project_quotas(self, context, resources, project_id,
+                           quota_class=None, defaults=True,
+                           usages=True, remains=False, project_quotas=None):
+        """Given a list of resources, retrieve the quotas for the given
+        project, with the counted usage if usages is True.
+        """
+        quotas = super(CountedQuotaDriver, self).get_project_quotas(
+            context, resources, project_id, quota_class=quota_class,
+            defaults=defaults, usages=False, remains=remains,
+            project_quotas=project_quotas)
+        if usages:
+            for key, usage in self._get_usages(
+                    context, resources, quotas, project_id).items():
+                quotas[key].update(usage)
+        return quotas
+
+    def _check_usages(self, context, resources, quotas, user_quotas, deltas,
+                      project_id, user_id):
+        """Raise OverQuota if the counted usage plus the deltas is over the
+        project or user quotas.
+        """
+        project_usages = self._get_usages(context, resources, deltas.keys(),
+                                          project_id, cached=False)
+        user_usages = self._get_usages(context, resources, deltas.keys(),
+                                       project_id, user_id, cached=False)
+        # NOTE: Like with the DbQuotaDriver, only positive increments can go
+        # over quota.
+        overs = [res for res, delta in deltas.items()
+                 if delta >= 0 and
+                 (0 <= quotas[res] < delta + project_usages[res]['in_use'] or
+                  0 <= user_quotas[res] < delta + user_usages[res]['in_use'])]
+        if overs:
+            LOG.debug('Raise OverQuota exception because: quotas: '
+                      '%(quotas)s, user_quotas: %(user_quotas)s, '
+                      'deltas: %(deltas)s, overs: %(overs)s, '
+                      'project_usages: %(project_usages)s, '
+                      'user_usages: %(user_usages)s',
+                      {'quotas': quotas, 'user_quotas': user_quotas,
+                       'deltas': deltas, 'overs': overs,
+                       'project_usages': project_usages,
+                       'user_usages': user_usages})
+            raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
+                                      usages=user_usages)
+
+    def _quota_reserve(self, context, resources, quotas, user_quotas, deltas,
+                       expire, project_id, user_id):
+        self._check_usages(context, resources, quotas, user_quotas, deltas,
+                           project_id, user_id)
+        return []
+
+    def recheck(self, context, resources, keys, project_id=None,
+                user_id=None):
+        """Check that the counted usage of the given reservable resources,
+        which includes the resources just created, is not over quota.
+
+        :param context: The request context, for access checks.
+        :param resources: A dictionary of the registered resources.
+        :param keys: The names of the resources to check.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        :param user_id: Specify the user_id if current context
+                        is admin and admin wants to impact on
+                        common user.
+        """
+        if project_id is None:
+            project_id = context.project_id
+        if user_id is None:
+            user_id = context.user_id
+
+        project_quotas = db.quota_get_all_by_project(context, project_id)
+        quotas = self._get_quotas(context, resources, keys,
+                                  has_sync=True, project_id=project_id,
+                                  project_quotas=project_quotas)
+        user_quotas = self._get_quotas(context, resources, keys,
+                                       has_sync=True, project_id=project_id,
+                                       user_id=user_id,
+                                       project_quotas=project_quotas)
+        self._check_usages(context, resources, quotas, user_quotas,
+                           dict((key, 0) for key in keys), project_id,
+                           user_id)
+
+    def commit(self, context, reservations, project_id=None, user_id=None):
+        """There are no reservations to commit."""
+        pass
+
+    def rollback(self, context, reservations, project_id=None, user_id=None):
+        """There are no reservations to roll back."""
+        pass
+
+    def usage_reset(self, context, resources):
+        """The usage is counted, there is no usage record to reset."""
+        pass
+
+    def expire(self, context):
+        """There are no reservations to expire."""
+        pass
+
+
 class NoopQuotaDriver(object):
     """Driver that turns quotas calls into no-ops and pretends that quotas
     for all resources are unlimited.  This can be used if you do not
@@ -821,6 +1013,25 @@ class NoopQuotaDriver(object):
         """
         return []
 
+    def recheck(self, context, resources, keys, project_id=None,
+                user_id=None):
+        """Check that the usage of the given reservable resources is not
+        over quota once they are created.
+
+        There are no quotas, so this does nothing.
+
+        :param context: The request context, for access checks.
+        :param resources: A dictionary of the registered resources.
+        :param keys: The names of the resources to check.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        :param user_id: Specify the user_id if current context
+                        is admin and admin wants to impact on
+                        common user.
+        """
+        pass
+
     def commit(self, context, reservations, project_id=None, user_id=None):
         """Commit reservations.
 
@@ -1279,6 +1490,29 @@ class QuotaEngine(object):
 
         return reservations
 
+    def recheck(self, context, keys, project_id=None, user_id=None):
+        """Check that the usage of the given reservable resources is not
+        over quota once they are created.
+
+        Quota drivers which do not reserve the resources when checking the
+        quotas, like the CountedQuotaDriver, let concurrent requests go over
+        quota together. This method will raise an OverQuota exception in
+        that case, and the caller should then delete the resources it
+        created.
+
+        :param context: The request context, for access checks.
+        :param keys: The names of the resources to check.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        :param user_id: Specify the user_id if current context
+                        is admin and admin wants to impact on
+                        common user.
+        """
+
+        self._driver.recheck(context, self._resources, keys,
+                             project_id=project_id, user_id=user_id)
+
     def commit(self, context, reservations, project_id=None, user_id=None):
         """Commit reservations.
 
@@ -13,7 +13,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo_log import log as logging
+import oslo_messaging as messaging
+
+import nova.conf
+from nova import exception
+from nova.i18n import _, _LW
+from nova.scheduler import partitioning
 from nova.scheduler import rpcapi as scheduler_rpcapi
+from nova import utils
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
 
 
 class SchedulerQueryClient(object):
@@ -21,6 +32,9 @@ class SchedulerQueryClient(object):
 
     def __init__(self):
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.partitioner = None
+        if CONF.scheduler_partitioning:
+            self.partitioner = partitioning.SchedulerPartitioner()
 
     def select_destinations(self, context, spec_obj):
         """Returns destinations(s) best suited for this request_spec and
@@ -29,8 +43,94 @@ class SchedulerQueryClient(object):
         The result should be a list of dicts with 'host', 'nodename' and
         'limits' as keys.
         """
+        if self.partitioner is not None:
+            self.partitioner.refresh(context)
+            servers = self.partitioner.members
+            if len(servers) > 1:
+                return self._select_partitioned_destinations(
+                    context, spec_obj, servers)
         return self.scheduler_rpcapi.select_destinations(context, spec_obj)
 
+    def _select_partitioned_destinations(self, context, spec_obj, servers):
+        """Asks every scheduler for destinations within the compute nodes it
+        owns and returns the best weighed ones.
+
+        Each scheduler returns as many destinations as it finds, up to the
+        number of instances. The schedulers are then asked to release the
+        resources they consumed on the destinations which are not kept.
+        """
+        def _select(server):
+            try:
+                return self.scheduler_rpcapi.select_destinations(
+                    context, spec_obj, server=server, partial=True), None
+            except exception.NoValidHost:
+                LOG.debug("Scheduler %s found no valid host", server)
+                return None, None
+            except messaging.MessagingTimeout as e:
+                LOG.warning(_LW("Timed out waiting for the destinations of "
+                                "the scheduler on %s"), server)
+                return None, e
+
+        threads = [(server, utils.spawn(_select, server))
+                   for server in servers]
+        answers = []
+        timeout = None
+        for server, thread in threads:
+            answer, error = thread.wait()
+            if answer:
+                answers.append((server, answer))
+            elif error is not None:
+                timeout = error
+        if not answers and timeout is not None:
+            raise timeout
+
+        def _weight(dest):
+            return dest.get('weight', 0.0)
+
+        num_instances = spec_obj.num_instances
+        if spec_obj.instance_group is not None:
+            # The server group policies are only enforced within a partition,
+            # so all of the instances have to come from the same one.
+            candidates = [answer for server, answer in answers
+                          if len(answer) >= num_instances]
+            candidates = sorted(candidates, key=lambda answer: sum(
+                _weight(dest) for dest in answer), reverse=True)[:1]
+        else:
+            candidates = [answer for server, answer in answers]
+        dests = sorted((dest for answer in candidates for dest in answer),
+                       key=_weight, reverse=True)[:num_instances]
+        if len(dests) < num_instances:
+            dests = []
+        self._release_unused_destinations(context, answers, dests)
+        if not dests:
+            reason = _('There are not enough hosts available.')
+            raise exception.NoValidHost(reason=reason)
+        for dest in dests:
+            dest.pop('weight', None)
+        return dests
+
+    def _release_unused_destinations(self, context, answers, dests):
+        """Asks the schedulers to release the destinations of their answer
+        which are not in dests.
+        """
+        kept = set(id(dest) for dest in dests)
+        for server, answer in answers:
+            # Releasing a host state drops every resource consumed on it, so
+            # the hosts which are kept are not released, even if the
+            # scheduler returned them for more instances than are kept.
+            skipped = set((dest['host'], dest['nodename'])
+                          for dest in answer if id(dest) in kept)
+            released = []
+            for dest in answer:
+                node = (dest['host'], dest['nodename'])
+                if node not in skipped:
+                    skipped.add(node)
+                    released.append({'host': dest['host'],
+                                     'nodename': dest['nodename']})
+            if released:
+                self.scheduler_rpcapi.release_destinations(
+                    context, released, server=server)
+
     def update_aggregates(self, context, aggregates):
         """Updates HostManager internal aggregates information.
 
@@ -0,0 +1,120 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar view of host states, used by the vectorized filters and weighers.
+"""
+
+from oslo_log import log as logging
+from oslo_utils import importutils
+
+from nova.i18n import _LW
+from nova.scheduler.filters import utils
+
+numpy = importutils.try_import('numpy')
+
+LOG = logging.getLogger(__name__)
+
+
+def is_available():
+    """Return True if NumPy can be used for vectorized scheduling."""
+    return numpy is not None
+
+
+class HostStateColumns(object):
+    """Gives the attributes of a list of HostState objects as NumPy arrays.
+
+    Each array is built the first time it is asked for and then kept for the
+    following filters, so that one attribute is read only once per host no
+    matter how many filters use it.
+    """
+
+    def __init__(self, objs):
+        self.objs = list(objs)
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.objs)
+
+    def get(self, name, default=None):
+        """Return an array of floats holding the given attribute of every
+        host. Unset values are replaced by default, or by NaN if no default
+        is given.
+        """
+        key = (name, default)
+        column = self._columns.get(key)
+        if column is None:
+            values = (getattr(obj, name) for obj in self.objs)
+            if default is not None:
+                values = (default if value is None else value
+                          for value in values)
+            column = numpy.array(list(values), dtype=float)
+            self._columns[key] = column
+        return column
+
+    def get_metric(self, name):
+        """Return an array holding the value of the given metric for every
+        host. Hosts not reporting the metric get NaN.
+        """
+        key = ('metrics', name)
+        column = self._columns.get(key)
+        if column is None:
+            column = numpy.empty(len(self.objs), dtype=float)
+            for i, obj in enumerate(self.objs):
+                column[i] = numpy.nan
+                for metric in obj.metrics or []:
+                    if metric.name == name:
+                        column[i] = metric.value
+                        break
+            self._columns[key] = column
+        return column
+
+    def get_aggregate_values(self, key_name, default, cast_to=int):
+        """Return an array holding the per-aggregate value of a metadata key
+        for every host, as utils.validate_num_values() would compute it.
+
+        Hosts which don't belong to an aggregate defining the key, or whose
+        aggregate value can't be decoded, get their value from ``default``,
+        which can be a scalar or an array aligned with the hosts.
+        """
+        values = numpy.empty(len(self.objs), dtype=float)
+        values[:] = default
+        for i, obj in enumerate(self.objs):
+            if not obj.aggregates:
+                continue
+            aggregate_vals = utils.aggregate_values_from_key(obj, key_name)
+            if not aggregate_vals:
+                continue
+            try:
+                values[i] = utils.validate_num_values(aggregate_vals,
+                                                      cast_to=cast_to)
+            except ValueError as e:
+                LOG.warning(_LW("Could not decode %(key_name)s: '%(error)s'"),
+                            {'key_name': key_name, 'error': e})
+        return values
+
+    def set_limits(self, name, values, mask):
+        """Save an oversubscription limit for the hosts selected by mask."""
+        for i in numpy.flatnonzero(mask):
+            self.objs[i].limits[name] = float(values[i])
+
+    def select(self, mask):
+        """Return the columns of the hosts selected by a boolean array."""
+        mask = numpy.asarray(mask, dtype=bool)
+        selected = self.__class__(
+            obj for obj, passes in zip(self.objs, mask) if passes)
+        selected._columns = {key: column[mask]
+                             for key, column in self._columns.items()}
+        return selected
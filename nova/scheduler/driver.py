@@ -53,9 +53,9 @@ class Scheduler(object):
         """Return the list of hosts that have a running service for topic."""
 
         services = objects.ServiceList.get_by_topic(context, topic)
+        alive = self.servicegroup_api.services_are_up(services)
         return [service.host
-                for service in services
-                if self.servicegroup_api.service_is_up(service)]
+                for service, is_up in zip(services, alive) if is_up]
 
     @abc.abstractmethod
     def select_destinations(self, context, spec_obj):
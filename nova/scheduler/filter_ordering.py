@@ -0,0 +1,95 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Adaptive ordering of the scheduler filters.
+
+A host is only acceptable if it passes all of the filters, so the order in
+which the filters run doesn't change the hosts they return, but it changes
+how many hosts each filter has to check. Running the filters which are cheap
+and reject many hosts first leaves fewer hosts to the expensive ones.
+"""
+
+# Weight of the latest pass in the moving averages of the cost and the
+# rejection rate of a filter.
+DEFAULT_DECAY = 0.1
+
+# Rejection rate used for the filters which don't reject any host, so that
+# they are ordered by cost after all of the filters rejecting hosts.
+MIN_REJECTION_RATE = 0.001
+
+
+class _FilterStats(object):
+    def __init__(self, cost_per_host, rejection_rate):
+        self.cost_per_host = cost_per_host
+        self.rejection_rate = rejection_rate
+
+    @property
+    def rank(self):
+        """Expected cost of the filter for each host it rejects."""
+        return self.cost_per_host / max(self.rejection_rate,
+                                        MIN_REJECTION_RATE)
+
+
+class AdaptiveFilterOrdering(object):
+    """Keeps statistics about the filters and orders them accordingly.
+
+    The filter handler reports every filter pass through record(), and
+    order() sorts the filters by the expected cost for each rejected host,
+    lowest first. The filters only run for the first instance of a request
+    (run_filter_once_per_request) keep their configured position. Filters
+    with equal ranks, such as the ones which never ran, keep their configured
+    relative order.
+    """
+
+    def __init__(self, decay=DEFAULT_DECAY):
+        self.decay = decay
+        self._stats = {}
+
+    def record(self, name, seconds, hosts_in, hosts_out):
+        """Update the statistics of a filter after it checked hosts_in hosts
+        in the given number of seconds, hosts_out of them passing.
+        """
+        if not hosts_in:
+            return
+        cost_per_host = float(seconds) / hosts_in
+        rejection_rate = float(hosts_in - hosts_out) / hosts_in
+        stats = self._stats.get(name)
+        if stats is None:
+            self._stats[name] = _FilterStats(cost_per_host, rejection_rate)
+        else:
+            stats.cost_per_host += self.decay * (
+                cost_per_host - stats.cost_per_host)
+            stats.rejection_rate += self.decay * (
+                rejection_rate - stats.rejection_rate)
+
+    def _rank(self, filter_):
+        stats = self._stats.get(filter_.__class__.__name__)
+        # Filters without statistics run first to get some
+        return stats.rank if stats is not None else 0.0
+
+    def order(self, filters):
+        """Return the filters in the order they should run."""
+        movable = [(self._rank(filter_), index)
+                   for index, filter_ in enumerate(filters)
+                   if not filter_.run_filter_once_per_request]
+        slots = iter(sorted(movable))
+        ordered = []
+        for filter_ in filters:
+            if filter_.run_filter_once_per_request:
+                ordered.append(filter_)
+            else:
+                ordered.append(filters[next(slots)[1]])
+        return ordered
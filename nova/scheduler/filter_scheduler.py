@@ -43,8 +43,12 @@ class FilterScheduler(driver.Scheduler):
         self.options = scheduler_options.SchedulerOptions()
         self.notifier = rpc.get_notifier('scheduler')
 
-    def select_destinations(self, context, spec_obj):
-        """Selects a filtered set of hosts and nodes."""
+    def select_destinations(self, context, spec_obj, partial=False):
+        """Selects a filtered set of hosts and nodes.
+
+        With partial, the hosts found are returned even if there are not
+        enough of them for all of the instances.
+        """
         self.notifier.info(
             context, 'scheduler.select_destinations.start',
             dict(request_spec=spec_obj.to_legacy_request_spec_dict()))
@@ -53,7 +57,8 @@ class FilterScheduler(driver.Scheduler):
         selected_hosts = self._schedule(context, spec_obj)
 
         # Couldn't fulfill the request_spec
-        if len(selected_hosts) < num_instances:
+        if len(selected_hosts) < num_instances and not (partial and
+                                                        selected_hosts):
             # NOTE(Rui Chen): If multiple creates failed, set the updated time
             # of selected HostState to None so that these HostStates are
             # refreshed according to database in next schedule, and release
@@ -61,6 +66,11 @@ class FilterScheduler(driver.Scheduler):
             # host.
             for host in selected_hosts:
                 host.obj.updated = None
+            # Their compute node may not have changed since it was last
+            # loaded, which is all the incremental host states reload.
+            self.host_manager.release_host_states(
+                [(host.obj.host, host.obj.nodename)
+                 for host in selected_hosts])
 
             # Log the details but don't put those into the reason since
             # we don't want to give away too much information about our
@@ -75,6 +85,11 @@ class FilterScheduler(driver.Scheduler):
 
         dests = [dict(host=host.obj.host, nodename=host.obj.nodename,
                       limits=host.obj.limits) for host in selected_hosts]
+        if CONF.scheduler_partitioning:
+            # The scheduler client merges the destinations of every partition
+            # by their weight.
+            for dest, host in zip(dests, selected_hosts):
+                dest['weight'] = host.weight
 
         self.notifier.info(
             context, 'scheduler.select_destinations.end',
@@ -107,23 +122,38 @@ class FilterScheduler(driver.Scheduler):
         num_instances = spec_obj.num_instances
         # NOTE(sbauza): Adding one field for any out-of-tree need
         spec_obj.config_options = config_options
+        # The hosts selected for a server group change the filter results of
+        # every other host, so they all need to be filtered again.
+        bulk_placement = (CONF.scheduler_bulk_placement and
+                          spec_obj.instance_group is None)
+        chosen_host = None
         for num in range(num_instances):
-            # Filter local hosts based on requirements ...
-            hosts = self.host_manager.get_filtered_hosts(hosts,
-                    spec_obj, index=num)
+            if bulk_placement and chosen_host is not None:
+                # Only the host chosen for the previous instance consumed
+                # resources, so the other hosts still pass the filters.
+                if not self.host_manager.host_passes_filters(
+                        chosen_host.obj, spec_obj, index=num):
+                    hosts = [host for host in hosts
+                             if host is not chosen_host.obj]
+            else:
+                # Filter local hosts based on requirements ...
+                hosts = self.host_manager.get_filtered_hosts(hosts,
+                        spec_obj, index=num)
             if not hosts:
                 # Can't get any more locally.
                 break
 
             LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
 
+            # Only the best weighed hosts can be selected, so there is no
+            # need to sort the other ones.
+            scheduler_host_subset_size = max(1,
+                                             CONF.scheduler_host_subset_size)
             weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                    spec_obj)
+                    spec_obj, limit=scheduler_host_subset_size)
 
             LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
 
-            scheduler_host_subset_size = max(1,
-                                             CONF.scheduler_host_subset_size)
             if scheduler_host_subset_size < len(weighed_hosts):
                 weighed_hosts = weighed_hosts[0:scheduler_host_subset_size]
             chosen_host = random.choice(weighed_hosts)
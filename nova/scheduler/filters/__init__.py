@@ -16,7 +16,15 @@
 """
 Scheduler host filters
 """
+from oslo_log import log as logging
+
+import nova.conf
 from nova import filters
+from nova.i18n import _LW
+from nova.scheduler import instrumentation
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
 
 
 class BaseHostFilter(filters.BaseFilter):
@@ -35,6 +43,17 @@ class BaseHostFilter(filters.BaseFilter):
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
+        self.instrumentation = instrumentation.from_config()
+        if CONF.scheduler_use_vectorized_filters:
+            # Imported here since nova.scheduler.columns itself relies on
+            # the filters utils module.
+            from nova.scheduler import columns
+            if columns.is_available():
+                self.columns_cls = columns.HostStateColumns
+            else:
+                LOG.warning(_LW("The scheduler_use_vectorized_filters option "
+                                "requires NumPy, which is not installed. "
+                                "Hosts are filtered one at a time instead."))
 
 
 def all_filters():
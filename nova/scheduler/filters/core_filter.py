@@ -26,9 +26,14 @@ LOG = logging.getLogger(__name__)
 
 class BaseCoreFilter(filters.BaseHostFilter):
 
+    vectorized = True
+
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         raise NotImplementedError
 
+    def _get_cpu_allocation_ratios(self, columns, spec_obj):
+        raise NotImplementedError
+
     def host_passes(self, host_state, spec_obj):
         """Return True if host has sufficient CPU cores."""
         if not host_state.vcpus_total:
@@ -68,6 +73,31 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
         return True
 
+    def filter_all_vectorized(self, columns, spec_obj):
+        """Return the hosts which have sufficient CPU cores."""
+        host_vcpus_total = columns.get('vcpus_total', default=0)
+        # Fail safe
+        vcpus_unknown = host_vcpus_total == 0
+        if vcpus_unknown.any():
+            LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
+
+        instance_vcpus = spec_obj.vcpus
+        cpu_allocation_ratio = self._get_cpu_allocation_ratios(columns,
+                                                               spec_obj)
+        vcpus_total = host_vcpus_total * cpu_allocation_ratio
+
+        # Only provide a VCPU limit to compute if the virt driver is reporting
+        # an accurate count of installed VCPUs. (XenServer driver does not)
+        has_limit = ~vcpus_unknown & (vcpus_total > 0)
+        columns.set_limits('vcpu', vcpus_total, has_limit)
+
+        # Do not allow an instance to overcommit against itself, only
+        # against other instances.
+        overcommits = has_limit & (instance_vcpus > host_vcpus_total)
+
+        free_vcpus = vcpus_total - columns.get('vcpus_used')
+        return vcpus_unknown | (~overcommits & (free_vcpus >= instance_vcpus))
+
 
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
@@ -75,6 +105,9 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         return host_state.cpu_allocation_ratio
 
+    def _get_cpu_allocation_ratios(self, columns, spec_obj):
+        return columns.get('cpu_allocation_ratio')
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -94,3 +127,9 @@ class AggregateCoreFilter(BaseCoreFilter):
             ratio = host_state.cpu_allocation_ratio
 
         return ratio
+
+    def _get_cpu_allocation_ratios(self, columns, spec_obj):
+        return columns.get_aggregate_values(
+            'cpu_allocation_ratio',
+            columns.get('cpu_allocation_ratio'),
+            cast_to=float)
@@ -28,9 +28,14 @@ CONF = nova.conf.CONF
 class IoOpsFilter(filters.BaseHostFilter):
     """Filter out hosts with too many concurrent I/O operations."""
 
+    vectorized = True
+
     def _get_max_io_ops_per_host(self, host_state, spec_obj):
         return CONF.max_io_ops_per_host
 
+    def _get_max_io_ops_per_hosts(self, columns, spec_obj):
+        return CONF.max_io_ops_per_host
+
     def host_passes(self, host_state, spec_obj):
         """Use information about current vm and task states collected from
         compute node statistics to decide whether to filter.
@@ -46,6 +51,10 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def filter_all_vectorized(self, columns, spec_obj):
+        max_io_ops = self._get_max_io_ops_per_hosts(columns, spec_obj)
+        return columns.get('num_io_ops') < max_io_ops
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -65,3 +74,8 @@ class AggregateIoOpsFilter(IoOpsFilter):
             value = CONF.max_io_ops_per_host
 
         return value
+
+    def _get_max_io_ops_per_hosts(self, columns, spec_obj):
+        return columns.get_aggregate_values('max_io_ops_per_host',
+                                            CONF.max_io_ops_per_host,
+                                            cast_to=int)
@@ -28,9 +28,14 @@ CONF = nova.conf.CONF
 class NumInstancesFilter(filters.BaseHostFilter):
     """Filter out hosts with too many instances."""
 
+    vectorized = True
+
     def _get_max_instances_per_host(self, host_state, spec_obj):
         return CONF.max_instances_per_host
 
+    def _get_max_instances_per_hosts(self, columns, spec_obj):
+        return CONF.max_instances_per_host
+
     def host_passes(self, host_state, spec_obj):
         num_instances = host_state.num_instances
         max_instances = self._get_max_instances_per_host(
@@ -43,6 +48,10 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def filter_all_vectorized(self, columns, spec_obj):
+        max_instances = self._get_max_instances_per_hosts(columns, spec_obj)
+        return columns.get('num_instances') < max_instances
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -64,3 +73,8 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
             value = CONF.max_instances_per_host
 
         return value
+
+    def _get_max_instances_per_hosts(self, columns, spec_obj):
+        return columns.get_aggregate_values('max_instances_per_host',
+                                            CONF.max_instances_per_host,
+                                            cast_to=int)
@@ -25,9 +25,14 @@ LOG = logging.getLogger(__name__)
 
 class BaseRamFilter(filters.BaseHostFilter):
 
+    vectorized = True
+
     def _get_ram_allocation_ratio(self, host_state, spec_obj):
         raise NotImplementedError
 
+    def _get_ram_allocation_ratios(self, columns, spec_obj):
+        raise NotImplementedError
+
     def host_passes(self, host_state, spec_obj):
         """Only return hosts with sufficient available RAM."""
         requested_ram = spec_obj.memory_mb
@@ -63,6 +68,27 @@ class BaseRamFilter(filters.BaseHostFilter):
         host_state.limits['memory_mb'] = memory_mb_limit
         return True
 
+    def filter_all_vectorized(self, columns, spec_obj):
+        """Only return hosts with sufficient available RAM."""
+        requested_ram = spec_obj.memory_mb
+        free_ram_mb = columns.get('free_ram_mb')
+        total_usable_ram_mb = columns.get('total_usable_ram_mb')
+
+        ram_allocation_ratio = self._get_ram_allocation_ratios(columns,
+                                                               spec_obj)
+
+        memory_mb_limit = total_usable_ram_mb * ram_allocation_ratio
+        used_ram_mb = total_usable_ram_mb - free_ram_mb
+        usable_ram = memory_mb_limit - used_ram_mb
+        # Do not allow an instance to overcommit against itself, only against
+        # other instances.
+        passes = ((total_usable_ram_mb >= requested_ram) &
+                  (usable_ram >= requested_ram))
+
+        # save oversubscription limit for compute node to test against:
+        columns.set_limits('memory_mb', memory_mb_limit, passes)
+        return passes
+
 
 class RamFilter(BaseRamFilter):
     """Ram Filter with over subscription flag."""
@@ -70,6 +96,9 @@ class RamFilter(BaseRamFilter):
     def _get_ram_allocation_ratio(self, host_state, spec_obj):
         return host_state.ram_allocation_ratio
 
+    def _get_ram_allocation_ratios(self, columns, spec_obj):
+        return columns.get('ram_allocation_ratio')
+
 
 class AggregateRamFilter(BaseRamFilter):
     """AggregateRamFilter with per-aggregate ram subscription flag.
@@ -90,3 +119,9 @@ class AggregateRamFilter(BaseRamFilter):
             ratio = host_state.ram_allocation_ratio
 
         return ratio
+
+    def _get_ram_allocation_ratios(self, columns, spec_obj):
+        return columns.get_aggregate_values(
+            'ram_allocation_ratio',
+            columns.get('ram_allocation_ratio'),
+            cast_to=float)
@@ -37,7 +37,9 @@ from nova import exception
 from nova.i18n import _LI, _LW
 from nova import objects
 from nova.pci import stats as pci_stats
+from nova.scheduler import filter_ordering
 from nova.scheduler import filters
+from nova.scheduler import partitioning
 from nova.scheduler import weights
 from nova import utils
 from nova.virt import hardware
@@ -334,6 +336,10 @@ class HostManager(object):
         self.filter_cls_map = {cls.__name__: cls for cls in filter_classes}
         self.filter_obj_map = {}
         self.default_filters = self._choose_host_filters(self._load_filters())
+        self.filter_ordering = None
+        if CONF.scheduler_adaptive_filter_ordering:
+            self.filter_ordering = filter_ordering.AdaptiveFilterOrdering()
+            self.filter_handler.statistics = self.filter_ordering
         self.weight_handler = weights.HostWeightHandler()
         weigher_classes = self.weight_handler.get_matching_classes(
                 CONF.scheduler_weight_classes)
@@ -349,6 +355,19 @@ class HostManager(object):
         self._instance_info = {}
         if self.tracks_instance_changes:
             self._init_instance_info()
+        self.incremental_host_states = CONF.scheduler_incremental_host_states
+        # Newest change seen in the compute nodes table, used to only reload
+        # the compute nodes which changed since then
+        self._compute_nodes_high_water_mark = None
+        self._last_full_sync = None
+        # Keys of the host states released since the previous call, reloaded
+        # from the db even if their compute node did not change
+        self._released_host_states = set()
+        # Only the compute nodes owned by this scheduler are considered when
+        # the compute nodes are partitioned between the schedulers
+        self.partitioner = None
+        if CONF.scheduler_partitioning:
+            self.partitioner = partitioning.SchedulerPartitioner(CONF.host)
 
     def _load_filters(self):
         return CONF.scheduler_default_filters
@@ -368,6 +387,7 @@ class HostManager(object):
                 self._update_aggregate(agg)
         else:
             self._update_aggregate(aggregates)
+        self._aggregates_changed()
 
     def _update_aggregate(self, aggregate):
         self.aggs_by_id[aggregate.id] = aggregate
@@ -388,6 +408,14 @@ class HostManager(object):
         for host in aggregate.hosts:
             if aggregate.id in self.host_aggregates_map[host]:
                 self.host_aggregates_map[host].remove(aggregate.id)
+        self._aggregates_changed()
+
+    def _aggregates_changed(self):
+        # The partition of a compute node can depend on its aggregates, so
+        # they all have to be reloaded to pick up the ones moving in.
+        if (self.partitioner is not None and
+                CONF.scheduler_partition_key == 'aggregate'):
+            self.force_full_resync()
 
     def _init_instance_info(self):
         """Creates the initial view of instances for all hosts.
@@ -553,37 +581,85 @@ class HostManager(object):
                     return []
             hosts = six.itervalues(name_to_cls_map)
 
-        return self.filter_handler.get_filtered_objects(self.default_filters,
+        ordered_filters = self.default_filters
+        if self.filter_ordering is not None:
+            ordered_filters = self.filter_ordering.order(ordered_filters)
+        return self.filter_handler.get_filtered_objects(ordered_filters,
                 hosts, spec_obj, index)
 
-    def get_weighed_hosts(self, hosts, spec_obj):
-        """Weigh the hosts."""
+    def host_passes_filters(self, host_state, spec_obj, index=0):
+        """Check again a single host which already passed the filters for
+        this request, for instance after it consumed resources.
+        """
+        if spec_obj.force_hosts or spec_obj.force_nodes:
+            # Filters are skipped when forcing host or node
+            return True
+        for filter_ in self.default_filters:
+            if not filter_.run_filter_for_index(index):
+                continue
+            if not list(filter_.filter_all([host_state], spec_obj) or []):
+                LOG.debug("%(host_state)s no longer passes filter %(filter)s",
+                          {'host_state': host_state,
+                           'filter': filter_.__class__.__name__})
+                return False
+        return True
+
+    def get_weighed_hosts(self, hosts, spec_obj, limit=None):
+        """Weigh the hosts, only returning the limit best ones if set."""
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, spec_obj)
+                hosts, spec_obj, limit=limit)
 
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
         the HostManager knows about. Also, each of the consumable resources
         in HostState are pre-populated and adjusted based on data in the db.
+
+        When incremental host states are enabled, only the compute nodes which
+        changed since the previous call are reloaded from the db, unless a
+        full resync is due.
         """
 
+        if self.partitioner is not None and self.partitioner.refresh(context):
+            # Compute nodes may have moved in from another partition
+            self.force_full_resync()
         service_refs = {service.host: service
                         for service in objects.ServiceList.get_by_binary(
                             context, 'nova-compute', include_disabled=True)}
-        # Get resource usage across the available compute nodes:
-        compute_nodes = objects.ComputeNodeList.get_all(context)
+        full_sync = self._full_sync_needed()
+        if full_sync:
+            # Get resource usage across the available compute nodes:
+            compute_nodes = objects.ComputeNodeList.get_all(context)
+        else:
+            compute_nodes = list(objects.ComputeNodeList.get_all_updated_since(
+                context, self._compute_nodes_high_water_mark))
+            compute_nodes += self._get_released_compute_nodes(context,
+                                                              compute_nodes)
+        self._released_host_states = set()
         seen_nodes = set()
+        deleted_nodes = set()
+        foreign_nodes = set()
         for compute in compute_nodes:
-            service = service_refs.get(compute.host)
+            if self.incremental_host_states:
+                self._update_high_water_mark(compute)
+            host = compute.host
+            node = compute.hypervisor_hostname
+            state_key = (host, node)
+            if (self.partitioner is not None and
+                    not self.partitioner.owns(
+                        host, node, self.host_aggregates_map.get(host))):
+                foreign_nodes.add(state_key)
+                continue
+            if not full_sync and compute.deleted:
+                deleted_nodes.add(state_key)
+                continue
+
+            service = service_refs.get(host)
 
             if not service:
                 LOG.warning(_LW(
                     "No compute service record found for host %(host)s"),
-                    {'host': compute.host})
+                    {'host': host})
                 continue
-            host = compute.host
-            node = compute.hypervisor_hostname
-            state_key = (host, node)
             host_state = self.host_state_map.get(state_key)
             if not host_state:
                 host_state = self.host_state_cls(host, node, compute=compute)
@@ -598,8 +674,21 @@ class HostManager(object):
 
             seen_nodes.add(state_key)
 
+        # Compute nodes which moved to another partition aren't dead, they are
+        # just dropped
+        for state_key in foreign_nodes & set(self.host_state_map.keys()):
+            del self.host_state_map[state_key]
+
+        if full_sync:
+            dead_nodes = set(self.host_state_map.keys()) - seen_nodes
+            self._last_full_sync = timeutils.utcnow()
+        else:
+            dead_nodes = ((deleted_nodes - seen_nodes) &
+                          set(self.host_state_map.keys()))
+            dead_nodes |= self._update_unchanged_host_states(
+                context, service_refs, seen_nodes | dead_nodes)
+
         # remove compute nodes from host_state_map if they are not active
-        dead_nodes = set(self.host_state_map.keys()) - seen_nodes
         for state_key in dead_nodes:
             host, node = state_key
             LOG.info(_LI("Removing dead compute node %(host)s:%(node)s "
@@ -608,6 +697,93 @@ class HostManager(object):
 
         return six.itervalues(self.host_state_map)
 
+    def _update_unchanged_host_states(self, context, service_refs,
+                                      skipped_nodes):
+        """Refreshes the host states whose compute node did not change.
+
+        Their service, aggregates and instances are still updated as those
+        are not tracked by the compute node records. Returns the keys of the
+        host states which no longer have a compute service.
+        """
+        dead_nodes = set()
+        for state_key, host_state in six.iteritems(self.host_state_map):
+            if state_key in skipped_nodes:
+                continue
+            host = state_key[0]
+            service = service_refs.get(host)
+            if not service:
+                dead_nodes.add(state_key)
+                continue
+            host_state.update(service=dict(service),
+                              aggregates=self._get_aggregates_info(host),
+                              inst_dict=self._get_host_instance_info(context,
+                                                                     host))
+        return dead_nodes
+
+    def _get_released_compute_nodes(self, context, compute_nodes):
+        """Returns the compute nodes of the released host states which are not
+        in compute_nodes.
+        """
+        released = self._released_host_states - set(
+            (compute.host, compute.hypervisor_hostname)
+            for compute in compute_nodes)
+        released_nodes = []
+        for host, node in released:
+            try:
+                released_nodes.append(
+                    objects.ComputeNode.get_by_host_and_nodename(
+                        context, host, node))
+            except exception.ComputeHostNotFound:
+                # Removed as a dead node when the service is gone
+                pass
+        return released_nodes
+
+    def release_host_states(self, state_keys):
+        """Drops the resources consumed on the host states of the given
+        (host, node) keys, which are reloaded from the db by the next call to
+        get_all_host_states().
+        """
+        for state_key in state_keys:
+            host_state = self.host_state_map.get(state_key)
+            if host_state is None:
+                continue
+            host_state.updated = None
+            self._released_host_states.add(state_key)
+
+    def _full_sync_needed(self):
+        if not self.incremental_host_states:
+            return True
+        if (self._last_full_sync is None or
+                self._compute_nodes_high_water_mark is None):
+            return True
+        return timeutils.is_older_than(
+            self._last_full_sync,
+            CONF.scheduler_host_state_full_sync_interval)
+
+    def _update_high_water_mark(self, compute):
+        # Changes committed with an older timestamp than the high-water mark
+        # after it has been read are missed until the next full resync, which
+        # is why the time between two full resyncs is bounded by the
+        # scheduler_host_state_full_sync_interval option.
+        for field in ('created_at', 'updated_at', 'deleted_at'):
+            if not compute.obj_attr_is_set(field):
+                continue
+            changed_at = getattr(compute, field)
+            if changed_at is None:
+                continue
+            # The db query expects naive UTC datetimes
+            changed_at = changed_at.replace(tzinfo=None)
+            if (self._compute_nodes_high_water_mark is None or
+                    changed_at > self._compute_nodes_high_water_mark):
+                self._compute_nodes_high_water_mark = changed_at
+
+    def force_full_resync(self):
+        """Forces the next call to get_all_host_states() to reload all of the
+        compute nodes from the db, even when incremental host states are
+        enabled.
+        """
+        self._last_full_sync = None
+
     def _get_aggregates_info(self, host):
         return [self.aggs_by_id[agg_id] for agg_id in
                 self.host_aggregates_map[host]]
@@ -622,7 +798,9 @@ class HostManager(object):
         In those cases, we need to grab the current InstanceList instead of
         relying on the version in _instance_info.
         """
-        host_name = compute.host
+        return self._get_host_instance_info(context, compute.host)
+
+    def _get_host_instance_info(self, context, host_name):
         host_info = self._instance_info.get(host_name)
         if host_info and host_info.get("updated"):
             inst_dict = host_info["instances"]
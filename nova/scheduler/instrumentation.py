@@ -0,0 +1,211 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Instrumentation of the scheduler filters and weighers.
+
+The filter and weight handlers measure a sample of their passes and hand a
+StageMeasure for each filter or weigher they ran to an Instrumentation object,
+which forwards them to the configured sink.
+"""
+
+import collections
+import math
+import random
+import socket
+
+from oslo_log import log as logging
+from oslo_utils import timeutils
+
+import nova.conf
+from nova.i18n import _LI
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
+# kind is either 'filter' or 'weigher'. slowest_host and slowest_seconds are
+# None when the evaluation of each host couldn't be timed.
+StageMeasure = collections.namedtuple(
+    'StageMeasure', ['kind', 'name', 'seconds', 'hosts_in', 'hosts_out',
+                     'slowest_host', 'slowest_seconds'])
+
+
+class BaseSink(object):
+    """Base class for the destinations of the measures."""
+
+    def emit(self, measure, sample_rate):
+        """Handle the measure of one filter or weigher pass.
+
+        Only a sample_rate fraction of the passes are measured.
+        """
+        raise NotImplementedError()
+
+
+class _PeriodicLogSink(BaseSink):
+    """Aggregates the measures and logs them at a regular interval."""
+
+    def __init__(self):
+        self.interval = CONF.scheduler_instrumentation_interval
+        self._last_report = timeutils.utcnow()
+        self._stages = collections.OrderedDict()
+
+    def emit(self, measure, sample_rate):
+        key = (measure.kind, measure.name)
+        stage = self._stages.get(key)
+        if stage is None:
+            stage = self._stages[key] = self._new_stage()
+        self._add(stage, measure)
+        if timeutils.is_older_than(self._last_report, self.interval):
+            self._report(sample_rate)
+            self._stages.clear()
+            self._last_report = timeutils.utcnow()
+
+    def _new_stage(self):
+        raise NotImplementedError()
+
+    def _add(self, stage, measure):
+        raise NotImplementedError()
+
+    def _report(self, sample_rate):
+        raise NotImplementedError()
+
+
+class LogSink(_PeriodicLogSink):
+    """Logs a summary of the measures of each filter and weigher."""
+
+    def _new_stage(self):
+        return {'passes': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                'hosts_in': 0, 'hosts_out': 0, 'slowest_host': None,
+                'slowest_seconds': 0.0}
+
+    def _add(self, stage, measure):
+        stage['passes'] += 1
+        stage['seconds'] += measure.seconds
+        stage['max_seconds'] = max(stage['max_seconds'], measure.seconds)
+        stage['hosts_in'] += measure.hosts_in
+        stage['hosts_out'] += measure.hosts_out
+        if (measure.slowest_seconds is not None and
+                measure.slowest_seconds > stage['slowest_seconds']):
+            stage['slowest_host'] = measure.slowest_host
+            stage['slowest_seconds'] = measure.slowest_seconds
+
+    def _report(self, sample_rate):
+        for (kind, name), stage in self._stages.items():
+            LOG.info(_LI("Scheduler %(kind)s %(name)s: %(passes)d sampled "
+                         "passes, mean %(mean_ms).3f ms, max %(max_ms).3f "
+                         "ms, %(hosts_in)d hosts in, %(eliminated)d "
+                         "eliminated, slowest host %(slowest_host)s "
+                         "(%(slowest_ms).3f ms)"),
+                     {'kind': kind, 'name': name,
+                      'passes': stage['passes'],
+                      'mean_ms': stage['seconds'] * 1000 / stage['passes'],
+                      'max_ms': stage['max_seconds'] * 1000,
+                      'hosts_in': stage['hosts_in'],
+                      'eliminated': stage['hosts_in'] - stage['hosts_out'],
+                      'slowest_host': stage['slowest_host'],
+                      'slowest_ms': stage['slowest_seconds'] * 1000})
+
+
+class HistogramSink(_PeriodicLogSink):
+    """Logs a histogram of the time spent in each filter and weigher.
+
+    The buckets are powers of two of milliseconds: the first one counts the
+    passes taking less than 1 ms, the second one those taking less than 2 ms,
+    then 4 ms, etc.
+    """
+
+    def _new_stage(self):
+        return collections.Counter()
+
+    def _add(self, stage, measure):
+        milliseconds = measure.seconds * 1000
+        bucket = 0
+        if milliseconds >= 1:
+            bucket = int(math.floor(math.log(milliseconds, 2))) + 1
+        stage[bucket] += 1
+
+    def _report(self, sample_rate):
+        for (kind, name), stage in self._stages.items():
+            buckets = ', '.join('<%d ms: %d' % (2 ** bucket, stage[bucket])
+                                for bucket in sorted(stage))
+            LOG.info(_LI("Scheduler %(kind)s %(name)s time histogram: "
+                         "%(buckets)s"),
+                     {'kind': kind, 'name': name, 'buckets': buckets})
+
+
+class StatsdSink(BaseSink):
+    """Sends the measures to a statsd server."""
+
+    def __init__(self):
+        self.address = (CONF.scheduler_instrumentation_statsd_host,
+                        CONF.scheduler_instrumentation_statsd_port)
+        self.prefix = CONF.scheduler_instrumentation_statsd_prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def emit(self, measure, sample_rate):
+        name = '%s.%s.%s' % (self.prefix, measure.kind, measure.name)
+        rate = ''
+        if sample_rate < 1:
+            rate = '|@%s' % sample_rate
+        lines = ['%s.time:%.3f|ms%s' % (name, measure.seconds * 1000, rate),
+                 '%s.hosts_in:%d|c%s' % (name, measure.hosts_in, rate),
+                 '%s.hosts_eliminated:%d|c%s' % (
+                     name, measure.hosts_in - measure.hosts_out, rate)]
+        if measure.slowest_seconds is not None:
+            lines.append('%s.slowest_host_time:%.3f|ms%s' % (
+                name, measure.slowest_seconds * 1000, rate))
+        try:
+            self._socket.sendto('\n'.join(lines).encode('utf-8'),
+                                self.address)
+        except socket.error as e:
+            # Losing measures must never fail a scheduling request
+            LOG.debug("Could not send scheduler measures to statsd: %s", e)
+
+
+SINKS = {
+    'log': LogSink,
+    'histogram': HistogramSink,
+    'statsd': StatsdSink,
+}
+
+
+class Instrumentation(object):
+    """Decides which passes are measured and sends their measures to a sink.
+    """
+
+    def __init__(self, sink, sample_rate):
+        self.sink = sink
+        self.sample_rate = sample_rate
+
+    def sample(self):
+        """Return True if the next pass should be measured."""
+        return random.random() < self.sample_rate
+
+    def record(self, kind, name, seconds, hosts_in, hosts_out,
+               slowest_host=None, slowest_seconds=None):
+        self.sink.emit(StageMeasure(kind, name, seconds, hosts_in, hosts_out,
+                                    slowest_host, slowest_seconds),
+                       self.sample_rate)
+
+
+def from_config():
+    """Return the Instrumentation object set up by the configuration, or None
+    if the instrumentation is disabled.
+    """
+    sample_rate = CONF.scheduler_instrumentation_sample_rate
+    if not sample_rate:
+        return None
+    sink = SINKS[CONF.scheduler_instrumentation_sink]()
+    return Instrumentation(sink, sample_rate)
@@ -92,6 +92,6 @@ class IronicHostManager(host_manager.HostManager):
         """Ironic hosts should not pass instance info."""
         pass
 
-    def _get_instance_info(self, context, compute):
+    def _get_host_instance_info(self, context, host_name):
         """Ironic hosts should not pass instance info."""
         return {}
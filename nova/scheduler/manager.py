@@ -44,7 +44,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    target = messaging.Target(version='4.3')
+    target = messaging.Target(version='4.4')
 
     _sentinel = object()
 
@@ -88,11 +88,12 @@ class SchedulerManager(manager.Manager):
     @messaging.expected_exceptions(exception.NoValidHost)
     def select_destinations(self, ctxt,
                             request_spec=None, filter_properties=None,
-                            spec_obj=_sentinel):
+                            spec_obj=_sentinel, partial=False):
         """Returns destinations(s) best suited for this RequestSpec.
 
         The result should be a list of dicts with 'host', 'nodename' and
-        'limits' as keys.
+        'limits' as keys. With partial, fewer destinations than instances
+        may be returned.
         """
 
         # TODO(sbauza): Change the method signature to only accept a spec_obj
@@ -101,9 +102,24 @@ class SchedulerManager(manager.Manager):
             spec_obj = objects.RequestSpec.from_primitives(ctxt,
                                                            request_spec,
                                                            filter_properties)
-        dests = self.driver.select_destinations(ctxt, spec_obj)
+        if partial:
+            # Only asked by the scheduler client when the compute nodes are
+            # partitioned, which requires the FilterScheduler
+            dests = self.driver.select_destinations(ctxt, spec_obj,
+                                                    partial=True)
+        else:
+            dests = self.driver.select_destinations(ctxt, spec_obj)
         return jsonutils.to_primitive(dests)
 
+    def release_destinations(self, ctxt, destinations):
+        """Releases the resources consumed by destinations which are not
+        used.
+
+        :param destinations: dicts with 'host' and 'nodename' as keys
+        """
+        self.driver.host_manager.release_host_states(
+            [(dest['host'], dest['nodename']) for dest in destinations])
+
     def update_aggregates(self, ctxt, aggregates):
         """Updates HostManager internal aggregates information.
 
@@ -0,0 +1,131 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Partitioning of the compute nodes between the scheduler services.
+
+Every live nova-scheduler service owns the compute nodes which a consistent
+hash ring maps to its host, so that each scheduler only loads and considers
+its own share of the compute nodes. The scheduler client asks each of them
+for destinations and merges their answers.
+"""
+
+import bisect
+import hashlib
+
+from oslo_log import log as logging
+from oslo_utils import timeutils
+
+import nova.conf
+from nova.i18n import _LI
+from nova import objects
+from nova import servicegroup
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
+# Number of points each scheduler gets on the hash ring. The more points,
+# the more even the split of the compute nodes between the schedulers.
+RING_REPLICAS = 64
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16)
+
+
+class HashRing(object):
+    """Consistent hash ring mapping keys to a set of members.
+
+    Adding or removing a member only moves the keys it owned or is going to
+    own, the other keys stay with the same member.
+    """
+
+    def __init__(self, members, replicas=RING_REPLICAS):
+        self.members = frozenset(members)
+        points = sorted((_hash('%s-%d' % (member, replica)), member)
+                        for member in self.members
+                        for replica in range(replicas))
+        self._hashes = [point[0] for point in points]
+        self._members = [point[1] for point in points]
+
+    def get_member(self, key):
+        """Return the member owning the key, or None if the ring is empty."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._members[index]
+
+
+def get_scheduler_hosts(context, servicegroup_api):
+    """Return the sorted hosts of the nova-scheduler services which are up."""
+    services = objects.ServiceList.get_by_binary(context, 'nova-scheduler')
+    alive = servicegroup_api.services_are_up(services)
+    return sorted(set(service.host
+                      for service, is_up in zip(services, alive) if is_up))
+
+
+class SchedulerPartitioner(object):
+    """Keeps the hash ring of the live schedulers up to date.
+
+    The scheduler services are looked up at most once every
+    scheduler_partition_refresh_interval seconds.
+    """
+
+    def __init__(self, local_host=None):
+        # A scheduler always owns a share of the compute nodes, even before
+        # its service is reported as up.
+        self.local_host = local_host
+        self.servicegroup_api = servicegroup.API()
+        self.ring = HashRing([local_host] if local_host else [])
+        self._last_refresh = None
+
+    def refresh(self, context):
+        """Refresh the ring if it is due. Return True if it changed."""
+        if (self._last_refresh is not None and
+                not timeutils.is_older_than(
+                    self._last_refresh,
+                    CONF.scheduler_partition_refresh_interval)):
+            return False
+        self._last_refresh = timeutils.utcnow()
+        members = set(get_scheduler_hosts(context, self.servicegroup_api))
+        if self.local_host:
+            members.add(self.local_host)
+        if members == self.ring.members:
+            return False
+        LOG.info(_LI("Scheduler partitions are now shared between "
+                     "%(hosts)s"), {'hosts': ', '.join(sorted(members))})
+        self.ring = HashRing(members)
+        return True
+
+    @property
+    def members(self):
+        return sorted(self.ring.members)
+
+    @staticmethod
+    def get_key(host, node, aggregate_ids=None):
+        """Return the ring key of a compute node.
+
+        When partitioning by aggregate, all of the compute nodes of a host
+        aggregate get the key of the aggregate with the lowest id they belong
+        to, so that a single scheduler considers the whole aggregate.
+        """
+        if CONF.scheduler_partition_key == 'aggregate' and aggregate_ids:
+            return 'aggregate-%d' % min(aggregate_ids)
+        return '%s-%s' % (host, node)
+
+    def owns(self, host, node, aggregate_ids=None):
+        """Return True if the local scheduler owns the compute node."""
+        return (self.ring.get_member(
+            self.get_key(host, node, aggregate_ids)) == self.local_host)
@@ -92,6 +92,9 @@ class SchedulerAPI(object):
         existing methods in 4.x after that point should be done such
         that they can handle the version_cap being set to 4.3.
 
+        * 4.4 - Add partial to select_destinations() and add
+                release_destinations()
+
     '''
 
     VERSION_ALIASES = {
@@ -113,18 +116,34 @@ class SchedulerAPI(object):
         self.client = rpc.get_client(target, version_cap=version_cap,
                                      serializer=serializer)
 
-    def select_destinations(self, ctxt, spec_obj):
+    def select_destinations(self, ctxt, spec_obj, server=None,
+                            partial=False):
         version = '4.3'
         msg_args = {'spec_obj': spec_obj}
-        if not self.client.can_send_version(version):
+        if partial and self.client.can_send_version('4.4'):
+            version = '4.4'
+            msg_args['partial'] = True
+        elif not self.client.can_send_version(version):
             del msg_args['spec_obj']
             msg_args['request_spec'] = spec_obj.to_legacy_request_spec_dict()
             msg_args['filter_properties'
                      ] = spec_obj.to_legacy_filter_properties_dict()
             version = '4.0'
-        cctxt = self.client.prepare(version=version)
+        if server:
+            # Only ask the scheduler running on that host
+            cctxt = self.client.prepare(version=version, server=server)
+        else:
+            cctxt = self.client.prepare(version=version)
         return cctxt.call(ctxt, 'select_destinations', **msg_args)
 
+    def release_destinations(self, ctxt, destinations, server):
+        if not self.client.can_send_version('4.4'):
+            # Older schedulers keep the resources consumed until their host
+            # states are refreshed
+            return
+        cctxt = self.client.prepare(version='4.4', server=server)
+        cctxt.cast(ctxt, 'release_destinations', destinations=destinations)
+
     def update_aggregates(self, ctxt, aggregates):
         # NOTE(sbauza): Yes, it's a fanout, we need to update all schedulers
         cctxt = self.client.prepare(fanout=True, version='4.1')
@@ -17,8 +17,17 @@
 Scheduler host weights
 """
 
+from oslo_log import log as logging
+
+import nova.conf
+from nova.i18n import _LW
+from nova.scheduler import columns
+from nova.scheduler import instrumentation
 from nova import weights
 
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
 
 class WeighedHost(weights.WeighedObject):
     def to_dict(self):
@@ -41,6 +50,14 @@ class HostWeightHandler(weights.BaseWeightHandler):
 
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
+        self.instrumentation = instrumentation.from_config()
+        if CONF.scheduler_use_vectorized_weighers:
+            if columns.is_available():
+                self.columns_cls = columns.HostStateColumns
+            else:
+                LOG.warning(_LW("The scheduler_use_vectorized_weighers option "
+                                "requires NumPy, which is not installed. "
+                                "Hosts are weighed one at a time instead."))
 
 
 def all_weighers():
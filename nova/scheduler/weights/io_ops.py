@@ -29,6 +29,7 @@ CONF = nova.conf.CONF
 
 class IoOpsWeigher(weights.BaseHostWeigher):
     minval = 0
+    vectorized = True
 
     def weight_multiplier(self):
         """Override the weight multiplier."""
@@ -39,3 +40,9 @@ class IoOpsWeigher(weights.BaseHostWeigher):
         to be the default.
         """
         return host_state.num_io_ops
+
+    def _weigh_columns(self, columns, weight_properties):
+        """Higher weights win. We want to choose light workload host
+        to be the default.
+        """
+        return columns.get('num_io_ops')
@@ -26,16 +26,21 @@ in the configuration file as the followings:
     The final weight would be name1.value * 1.0 + name2.value * -1.0.
 """
 
+from oslo_utils import importutils
+
 import nova.conf
 from nova import exception
 from nova.scheduler import utils
 from nova.scheduler import weights
 
+numpy = importutils.try_import('numpy')
 
 CONF = nova.conf.CONF
 
 
 class MetricsWeigher(weights.BaseHostWeigher):
+    vectorized = True
+
     def __init__(self):
         self._parse_setting()
 
@@ -73,3 +78,27 @@ class MetricsWeigher(weights.BaseHostWeigher):
                         return CONF.metrics.weight_of_unavailable
 
         return value
+
+    def _weigh_columns(self, columns, weight_properties):
+        values = numpy.zeros(len(columns))
+        unavailable = numpy.zeros(len(columns), dtype=bool)
+
+        for (name, ratio) in self.setting:
+            metric_values = columns.get_metric(name)
+            missing = numpy.isnan(metric_values)
+            if missing.any():
+                if CONF.metrics.required:
+                    host_state = columns.objs[numpy.flatnonzero(missing)[0]]
+                    raise exception.ComputeHostMetricNotFound(
+                            host=host_state.host,
+                            node=host_state.nodename,
+                            name=name)
+                # Same as _weigh_object(): hosts missing a metric get the
+                # weight_of_unavailable value, unless the metric doesn't
+                # count because of a 0 ratio or weight_multiplier.
+                if ratio * self.weight_multiplier() != 0:
+                    unavailable |= missing
+            values += numpy.where(missing, 0.0, metric_values * ratio)
+
+        values[unavailable] = CONF.metrics.weight_of_unavailable
+        return values
@@ -26,7 +26,8 @@ LOG = logging.getLogger(__name__)
 
 _driver_name_class_mapping = {
     'db': 'nova.servicegroup.drivers.db.DbDriver',
-    'mc': 'nova.servicegroup.drivers.mc.MemcachedDriver'
+    'mc': 'nova.servicegroup.drivers.mc.MemcachedDriver',
+    'batched': 'nova.servicegroup.drivers.batched.BatchedDbDriver',
 }
 
 CONF = nova.conf.CONF
@@ -78,3 +79,15 @@ class API(object):
             return False
 
         return self._driver.is_up(member)
+
+    def services_are_up(self, members):
+        """Check whether each of the given members is up.
+
+        This is cheaper than calling service_is_up() for each member with
+        the drivers able to check them all at once.
+
+        :returns: a list of booleans, in the order of the members
+        """
+        return [not member.get('forced_down') and is_up
+                for member, is_up in zip(members,
+                                         self._driver.are_up(members))]
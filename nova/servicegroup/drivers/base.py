@@ -27,3 +27,10 @@ class Driver(object):
     def is_up(self, member):
         """Check whether the given member is up."""
         raise NotImplementedError()
+
+    def are_up(self, members):
+        """Check whether each of the given members is up.
+
+        :returns: a list of booleans, in the order of the members
+        """
+        return [self.is_up(member) for member in members]
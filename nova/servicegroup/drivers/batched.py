@@ -0,0 +1,144 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Service heartbeat driver writing the heartbeats to the database by batches.
+
+The services without database access send their heartbeats to the conductor,
+the other ones keep them in memory themselves. Every
+servicegroup_heartbeat_flush_interval seconds, the heartbeats received
+since the last flush are written with a single UPDATE statement, instead of
+one save() of each service at every report_interval.
+"""
+
+from oslo_log import log as logging
+from oslo_service import loopingcall
+from oslo_utils import timeutils
+
+from nova.conductor import rpcapi as conductor_rpcapi
+import nova.conf
+from nova import context as nova_context
+from nova import db
+from nova.i18n import _LE, _LI, _LW
+from nova.objects import base as objects_base
+from nova.servicegroup.drivers import db as db_driver
+
+
+CONF = nova.conf.CONF
+
+LOG = logging.getLogger(__name__)
+
+
+class HeartbeatBuffer(object):
+    """Keeps the heartbeats of the services until they are flushed to the
+    database.
+    """
+
+    def __init__(self):
+        # Dict of (last heartbeat, number of heartbeats) tuples, keyed by
+        # service id
+        self._heartbeats = {}
+        self._timer = None
+
+    def add(self, service_id):
+        count = self._heartbeats.get(service_id, (None, 0))[1]
+        self._heartbeats[service_id] = (timeutils.utcnow(), count + 1)
+        if self._timer is None:
+            interval = CONF.servicegroup_heartbeat_flush_interval
+            self._timer = loopingcall.FixedIntervalLoopingCall(self.flush)
+            self._timer.start(interval=interval, initial_delay=interval)
+
+    def get(self, service_id):
+        """Return the last heartbeat of a service which is not flushed yet,
+        or None.
+        """
+        heartbeat = self._heartbeats.get(service_id)
+        return heartbeat[0] if heartbeat is not None else None
+
+    def flush(self):
+        if not self._heartbeats:
+            return
+        heartbeats, self._heartbeats = self._heartbeats, {}
+        try:
+            db.service_heartbeats_update(nova_context.get_admin_context(),
+                                         heartbeats)
+        except Exception:
+            # NOTE: The flush is retried with the next heartbeats, this
+            # must not stop the timer.
+            LOG.exception(_LE('Unexpected error while writing %d service '
+                              'heartbeats'), len(heartbeats))
+            for service_id, (last_heartbeat, count) in heartbeats.items():
+                newer = self._heartbeats.get(service_id)
+                if newer is not None:
+                    self._heartbeats[service_id] = (newer[0],
+                                                    newer[1] + count)
+                else:
+                    self._heartbeats[service_id] = (last_heartbeat, count)
+
+
+HEARTBEATS = HeartbeatBuffer()
+
+
+class BatchedDbDriver(db_driver.DbDriver):
+
+    def __init__(self, *args, **kwargs):
+        super(BatchedDbDriver, self).__init__(*args, **kwargs)
+        self._conductor_rpcapi = None
+
+    def are_up(self, service_refs):
+        """Check whether each service is up based on its last heartbeat,
+        including the heartbeats this process didn't flush yet.
+        """
+        now = timeutils.utcnow()
+        return [self._is_up(service_ref, now) for service_ref in service_refs]
+
+    def is_up(self, service_ref):
+        return self.are_up([service_ref])[0]
+
+    def _get_last_heartbeat(self, service_ref):
+        last_heartbeat = super(BatchedDbDriver, self)._get_last_heartbeat(
+            service_ref)
+        pending = HEARTBEATS.get(service_ref.get('id', None))
+        if pending is not None and pending > last_heartbeat:
+            return pending
+        return last_heartbeat
+
+    def _report_state(self, service):
+        """Send the heartbeat of this service to the conductor, or keep it
+        for the next flush if this service has access to the database.
+        """
+        if objects_base.NovaObject.indirection_api is None:
+            HEARTBEATS.add(service.service_ref.id)
+            return
+
+        if self._conductor_rpcapi is None:
+            self._conductor_rpcapi = conductor_rpcapi.ConductorAPI()
+        if not self._conductor_rpcapi.can_report_heartbeat():
+            # The conductor is too old to batch the heartbeats
+            return super(BatchedDbDriver, self)._report_state(service)
+
+        try:
+            self._conductor_rpcapi.report_heartbeat(
+                nova_context.get_admin_context(), service.service_ref.id)
+
+            if getattr(service, 'model_disconnected', False):
+                service.model_disconnected = False
+                LOG.info(
+                    _LI('Recovered from being unable to report status.'))
+        except Exception:
+            if not getattr(service, 'model_disconnected', False):
+                service.model_disconnected = True
+                LOG.warning(_LW('Lost connection to nova-conductor '
+                                'for reporting service status.'))
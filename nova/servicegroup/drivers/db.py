@@ -53,10 +53,7 @@ class DbDriver(base.Driver):
             service.tg.add_timer(report_interval, self._report_state,
                                  api.INITIAL_REPORTING_DELAY, service)
 
-    def is_up(self, service_ref):
-        """Moved from nova.utils
-        Check whether a service is up based on last heartbeat.
-        """
+    def _get_last_heartbeat(self, service_ref):
         # Keep checking 'updated_at' if 'last_seen_up' isn't set.
         # Should be able to use only 'last_seen_up' in the M release
         last_heartbeat = (service_ref.get('last_seen_up') or
@@ -65,13 +62,21 @@ class DbDriver(base.Driver):
             # NOTE(russellb) If this service_ref came in over rpc via
             # conductor, then the timestamp will be a string and needs to be
             # converted back to a datetime.
-            last_heartbeat = timeutils.parse_strtime(last_heartbeat)
-        else:
-            # Objects have proper UTC timezones, but the timeutils comparison
-            # below does not (and will fail)
-            last_heartbeat = last_heartbeat.replace(tzinfo=None)
+            return timeutils.parse_strtime(last_heartbeat)
+        # Objects have proper UTC timezones, but the timeutils comparison
+        # below does not (and will fail)
+        return last_heartbeat.replace(tzinfo=None)
+
+    def is_up(self, service_ref):
+        """Moved from nova.utils
+        Check whether a service is up based on last heartbeat.
+        """
+        return self._is_up(service_ref, timeutils.utcnow())
+
+    def _is_up(self, service_ref, now):
+        last_heartbeat = self._get_last_heartbeat(service_ref)
         # Timestamps in DB are UTC.
-        elapsed = timeutils.delta_seconds(last_heartbeat, timeutils.utcnow())
+        elapsed = timeutils.delta_seconds(last_heartbeat, now)
         is_up = abs(elapsed) <= self.service_down_time
         if not is_up:
             LOG.debug('Seems service %(binary)s on host %(host)s is down. '
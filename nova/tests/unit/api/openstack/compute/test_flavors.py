@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
+import mock
 import six.moves.urllib.parse as urlparse
 import webob
 
@@ -527,6 +530,34 @@ class FlavorsTestV21(test.TestCase):
         self.assertRaises(webob.exc.HTTPBadRequest,
                           self.controller.index, req)
 
+    def test_get_flavor_list_detail_no_etag(self):
+        req = self.fake_request.blank(self._prefix + '/flavors/detail')
+        self.controller.detail(req)
+        self.assertIsNone(req.get_response_etag())
+
+    def test_get_flavor_list_detail_not_modified(self):
+        self.flags(osapi_list_cache_expiration=60)
+        req = self.fake_request.blank(self._prefix + '/flavors/detail')
+        self.controller.detail(req)
+        etag = req.get_response_etag()
+        self.assertIsNotNone(etag)
+
+        headers = {'If-None-Match': '"%s"' % etag}
+        req = self.fake_request.blank(self._prefix + '/flavors/detail',
+                                      headers=headers)
+        response = self.controller.detail(req)
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('"%s"' % etag, response.headers['ETag'])
+
+        # The ETag changes when a flavor is updated
+        with mock.patch.dict(FAKE_FLAVORS['flavor 1'],
+                             updated_at=datetime.datetime(2016, 1, 1)):
+            req = self.fake_request.blank(self._prefix + '/flavors/detail',
+                                          headers=headers)
+            flavors = self.controller.detail(req)
+        self.assertEqual(2, len(flavors['flavors']))
+        self.assertNotEqual(etag, req.get_response_etag())
+
     def test_get_flavor_list_detail_min_ram_and_min_disk(self):
         """Tests that filtering work on flavor details and that minRam and
         minDisk filters can be combined
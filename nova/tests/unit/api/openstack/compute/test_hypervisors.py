@@ -199,6 +199,8 @@ class HypervisorsTestV21(test.NoDBTestCase):
         self.controller = hypervisors_v21.HypervisorsController()
         self.controller.servicegroup_api.service_is_up = mock.MagicMock(
             return_value=True)
+        self.controller.servicegroup_api.services_are_up = mock.MagicMock(
+            side_effect=lambda services: [True] * len(services))
 
     def setUp(self):
         super(HypervisorsTestV21, self).setUp()
@@ -251,6 +253,19 @@ class HypervisorsTestV21(test.NoDBTestCase):
 
         self.assertEqual(result, dict(hypervisors=self.INDEX_HYPER_DICTS))
 
+    def test_index_checks_services_at_once(self):
+        req = self._get_request(True)
+        self.controller.servicegroup_api.services_are_up = mock.MagicMock(
+            return_value=[True, False])
+        result = self.controller.index(req)
+
+        self.assertEqual(['up', 'down'],
+                         [hyp['state'] for hyp in result['hypervisors']])
+        self.assertEqual(1, self.controller.servicegroup_api.
+                         services_are_up.call_count)
+        self.assertFalse(
+            self.controller.servicegroup_api.service_is_up.called)
+
     def test_index_non_admin(self):
         req = self._get_request(False)
         self.assertRaises(exception.PolicyNotAuthorized,
@@ -262,6 +277,27 @@ class HypervisorsTestV21(test.NoDBTestCase):
 
         self.assertEqual(result, dict(hypervisors=self.DETAIL_HYPERS_DICTS))
 
+    def test_detail_not_modified(self):
+        self.flags(osapi_list_cache_expiration=60)
+        req = self._get_request(True)
+        self.controller.detail(req)
+        etag = req.get_response_etag()
+
+        req = self._get_request(True)
+        req.headers['If-None-Match'] = '"%s"' % etag
+        response = self.controller.detail(req)
+        self.assertEqual(304, response.status_int)
+
+        # The ETag changes with the state of the services
+        self.controller.servicegroup_api.services_are_up = mock.MagicMock(
+            return_value=[True, False])
+        req = self._get_request(True)
+        req.headers['If-None-Match'] = '"%s"' % etag
+        result = self.controller.detail(req)
+        self.assertEqual(['up', 'down'],
+                         [hyp['state'] for hyp in result['hypervisors']])
+        self.assertNotEqual(etag, req.get_response_etag())
+
     def test_detail_non_admin(self):
         req = self._get_request(False)
         self.assertRaises(exception.PolicyNotAuthorized,
@@ -1262,6 +1262,19 @@ class ServersControllerTest(ControllerTest):
             self.assertEqual(s['status'], 'BUILD')
             self.assertEqual(s['metadata']['seq'], str(i + 1))
 
+    def test_get_all_server_details_body_etag(self):
+        self.flags(osapi_list_cache_expiration=60)
+        req = self.req('/fake/servers/detail')
+        req.headers['If-None-Match'] = '"fake-etag"'
+
+        res_dict = self.controller.detail(req)
+
+        # The extensions add to the views what the servers do not tell,
+        # like the host status or the security groups, so the ETag is
+        # computed from the serialized response
+        self.assertEqual(5, len(res_dict['servers']))
+        self.assertIsNone(req.get_response_etag())
+
     def test_get_all_server_details_with_host(self):
         """We want to make sure that if two instances are on the same host,
         then they return the same hostId. If two instances are on different
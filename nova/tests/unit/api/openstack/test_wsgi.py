@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
 import inspect
 
 import mock
@@ -21,6 +22,7 @@ from nova.api.openstack import api_version_request as api_version
 from nova.api.openstack import extensions
 from nova.api.openstack import versioned_method
 from nova.api.openstack import wsgi
+from nova import cache_utils
 from nova import exception
 from nova import i18n
 from nova import test
@@ -363,6 +365,123 @@ class ResourceTest(MicroversionedTest):
         self.assertEqual(b'success', response.body)
         self.assertEqual(response.status_int, 200)
 
+    def test_resource_etag(self):
+        class Controller(object):
+            def index(self, req):
+                req.set_response_etag('fake-etag')
+                return {'foo': 'bar'}
+
+        app = fakes.TestRouterV21(Controller())
+        req = webob.Request.blank('/tests')
+        response = req.get_response(app)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('"fake-etag"', response.headers['ETag'])
+
+    def _use_response_cache(self):
+        self.flags(osapi_list_cache_expiration=60)
+        self.flags(enabled=True, group='cache')
+        client = cache_utils.CacheClient(
+            cache_utils._get_custom_cache_region(
+                expiration_time=60, backend='oslo_cache.dict'))
+        patcher = mock.patch.object(cache_utils, 'get_client',
+                                    return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_resource_cacheable(self):
+        self._use_response_cache()
+        calls = []
+
+        class Controller(object):
+            @wsgi.cacheable
+            def index(self, req):
+                calls.append(req)
+                req.set_response_etag('etag-%d' % len(calls))
+                return {'calls': len(calls)}
+
+        app = fakes.TestRouterV21(Controller())
+        for i in range(2):
+            response = webob.Request.blank('/tests').get_response(app)
+            self.assertEqual(200, response.status_int)
+            self.assertEqual(b'{"calls": 1}', response.body)
+            self.assertEqual('"etag-1"', response.headers['ETag'])
+        self.assertEqual(1, len(calls))
+
+        req = webob.Request.blank('/tests',
+                                  headers={'If-None-Match': '"etag-1"'})
+        response = req.get_response(app)
+        self.assertEqual(304, response.status_int)
+        self.assertEqual(b'', response.body)
+
+        # The responses are cached by URL
+        response = webob.Request.blank('/tests?foo=bar').get_response(app)
+        self.assertEqual(b'{"calls": 2}', response.body)
+        self.assertEqual(2, len(calls))
+
+    def test_resource_cacheable_body_etag(self):
+        self.flags(osapi_list_cache_expiration=60)
+
+        class Controller(object):
+            @wsgi.cacheable
+            def index(self, req):
+                return {'foo': 'bar'}
+
+        app = fakes.TestRouterV21(Controller())
+        response = webob.Request.blank('/tests').get_response(app)
+        self.assertEqual(200, response.status_int)
+        etag = hashlib.sha1(response.body).hexdigest()
+        self.assertEqual('"%s"' % etag, response.headers['ETag'])
+
+        req = webob.Request.blank('/tests',
+                                  headers={'If-None-Match': '"%s"' % etag})
+        response = req.get_response(app)
+        self.assertEqual(304, response.status_int)
+
+    def test_resource_cacheable_no_cache_backend(self):
+        self.flags(osapi_list_cache_expiration=60)
+        calls = []
+
+        class Controller(object):
+            @wsgi.cacheable
+            def index(self, req):
+                calls.append(req)
+                return {'calls': len(calls)}
+
+        app = fakes.TestRouterV21(Controller())
+        with mock.patch.object(cache_utils, 'get_client') as mock_client:
+            webob.Request.blank('/tests').get_response(app)
+            response = webob.Request.blank('/tests').get_response(app)
+
+        # The [cache] section is not enabled, the responses are not cached
+        self.assertEqual(b'{"calls": 2}', response.body)
+        self.assertFalse(mock_client.called)
+        self.assertIn('ETag', response.headers)
+
+    def test_resource_cacheable_disabled(self):
+        class Controller(object):
+            @wsgi.cacheable
+            def index(self, req):
+                return {'foo': 'bar'}
+
+        app = fakes.TestRouterV21(Controller())
+        response = webob.Request.blank('/tests').get_response(app)
+        self.assertEqual(200, response.status_int)
+        self.assertNotIn('ETag', response.headers)
+
+    def test_resource_not_cacheable(self):
+        self.flags(osapi_list_cache_expiration=60)
+        calls = []
+
+        class Controller(object):
+            def index(self, req):
+                calls.append(req)
+                return {'calls': len(calls)}
+
+        app = fakes.TestRouterV21(Controller())
+        webob.Request.blank('/tests').get_response(app)
+        response = webob.Request.blank('/tests').get_response(app)
+        self.assertEqual(b'{"calls": 2}', response.body)
+
     def test_resource_call_with_method_post(self):
         class Controller(object):
             @extensions.expected_errors(400)
@@ -1177,3 +1296,89 @@ class TestController(test.NoDBTestCase):
         result = wsgi.Controller.check_for_versions_intersection(func_list=
                                                                  func_list)
         self.assertTrue(result)
+
+    def _versioned_controller(self):
+        class VersionedController(wsgi.Controller):
+            @wsgi.Controller.api_version("2.1", "2.2")
+            def foo(self, req):
+                return 'foo-2.1'
+
+            @wsgi.Controller.api_version("2.3")  # noqa
+            @wsgi.response(202)
+            def foo(self, req):
+                return 'foo-2.3'
+
+            def bar(self, req):
+                return 'bar'
+
+        return VersionedController()
+
+    def _req(self, version):
+        req = mock.Mock()
+        req.api_version_request = api_version.APIVersionRequest(version)
+        return req
+
+    def test_versioned_method_dispatch(self):
+        controller = self._versioned_controller()
+
+        self.assertEqual('foo-2.1', controller.foo(self._req('2.2')))
+        self.assertEqual('foo-2.3', controller.foo(req=self._req('2.3')))
+        self.assertEqual('bar', controller.bar(self._req('2.1')))
+
+    def test_versioned_method_response_code(self):
+        controller = self._versioned_controller()
+        meth = controller.foo
+
+        meth(self._req('2.3'))
+
+        self.assertEqual(202, meth.wsgi_code)
+
+    def test_versioned_method_precompiled(self):
+        controller = self._versioned_controller()
+        table = type(controller).__dict__['foo']
+
+        self.assertIsInstance(table, wsgi.VersionedMethodTable)
+        self.assertIn((2, 1), table._funcs)
+        max_ver = api_version.max_api_version()
+        self.assertIn((max_ver.ver_major, max_ver.ver_minor), table._funcs)
+
+    def test_versioned_method_later_version(self):
+        controller = self._versioned_controller()
+        table = type(controller).__dict__['foo']
+
+        self.assertEqual('foo-2.3', controller.foo(self._req('2.1000')))
+        self.assertIn((2, 1000), table._funcs)
+
+    def test_versioned_method_not_found(self):
+        controller = self._versioned_controller()
+
+        self.assertRaises(exception.VersionNotFoundForAPIMethod,
+                          controller.foo, self._req('1.5'))
+
+    def test_versioned_method_attributes(self):
+        class VersionedController(wsgi.Controller):
+            @wsgi.Controller.api_version("2.1", "2.2")
+            @wsgi.cacheable
+            def detail(self, req):
+                return 'detail-2.1'
+
+            @wsgi.Controller.api_version("2.3")  # noqa
+            @wsgi.cacheable
+            @wsgi.response(202)
+            def detail(self, req):
+                return 'detail-2.3'
+
+        self.flags(osapi_list_cache_expiration=60)
+        controller = VersionedController()
+        meth = controller.detail
+
+        # The attributes of all the implementations are known before the
+        # method is called
+        self.assertEqual('detail', meth.__name__)
+        self.assertTrue(wsgi.Resource._is_cacheable(mock.Mock(method='GET'),
+                                                    meth))
+        self.assertFalse(hasattr(meth, 'wsgi_code'))
+        self.assertIn('bound method VersionedController.detail', repr(meth))
+
+        meth(self._req('2.3'))
+        self.assertEqual(202, meth.wsgi_code)
@@ -1820,6 +1820,28 @@ class _ComputeAPIUnitTestMixIn(object):
             else:
                 self.fail("Exception not raised")
 
+    def test_recheck_instance_quota_exceeds(self):
+        over_quota_args = dict(
+            quotas={'cores': 10, 'instances': 2, 'ram': 4096},
+            usages={'cores': dict(in_use=3, reserved=0),
+                    'instances': dict(in_use=3, reserved=0),
+                    'ram': dict(in_use=1536, reserved=0)},
+            overs=['instances'])
+        fake_flavor = self._create_flavor()
+        with mock.patch.object(quota.QUOTAS, 'recheck',
+                               side_effect=exception.OverQuota(
+                                   **over_quota_args)) as mock_recheck:
+            e = self.assertRaises(
+                exception.TooManyInstances,
+                self.compute_api._recheck_num_instances_quota,
+                self.context, fake_flavor, 2)
+        mock_recheck.assert_called_once_with(
+            self.context, ['instances', 'cores', 'ram'])
+        self.assertEqual('instances', e.kwargs['overs'])
+        self.assertEqual('2', e.kwargs['req'])
+        self.assertEqual('1', e.kwargs['used'])
+        self.assertEqual('2', e.kwargs['allowed'])
+
     @mock.patch.object(flavors, 'get_flavor_by_flavor_id')
     @mock.patch.object(objects.Quotas, 'reserve')
     def test_resize_instance_quota_exceeds_with_multiple_resources(
@@ -3128,6 +3150,39 @@ class _ComputeAPIUnitTestMixIn(object):
 
         do_test()
 
+    @mock.patch('nova.objects.RequestSpec.from_components')
+    @mock.patch('nova.objects.BuildRequest')
+    @mock.patch('nova.objects.Instance')
+    @mock.patch('nova.objects.InstanceMapping.create')
+    def test_provision_instances_recheck_over_quota(self, mock_im,
+                                                    mock_instance, mock_br,
+                                                    mock_rs):
+        @mock.patch.object(self.compute_api, '_check_num_instances_quota')
+        @mock.patch.object(self.compute_api, 'security_group_api')
+        @mock.patch.object(self.compute_api,
+                           'create_db_entry_for_new_instance')
+        @mock.patch.object(self.compute_api, '_create_block_device_mapping')
+        @mock.patch.object(self.compute_api, '_recheck_num_instances_quota',
+                           side_effect=exception.TooManyInstances(
+                               overs='instances', req='1', used='1',
+                               allowed='1'))
+        def do_test(mock_recheck, mock_cbdm, mock_cdb, mock_sg, mock_cniq):
+            quotas = mock.MagicMock()
+            mock_cniq.return_value = 1, quotas
+            self.assertRaises(exception.TooManyInstances,
+                              self.compute_api._provision_instances,
+                              self.context, mock.sentinel.flavor,
+                              1, 1, mock.MagicMock(), {}, None,
+                              None, None, None, {}, None, None)
+            mock_recheck.assert_called_once_with(
+                self.context, mock.sentinel.flavor, 1)
+            # The instance which went over quota is deleted
+            mock_cdb.return_value.destroy.assert_called_once_with()
+            quotas.rollback.assert_called_once_with()
+            self.assertFalse(quotas.commit.called)
+
+        do_test()
+
     @mock.patch('nova.objects.RequestSpec.from_components')
     @mock.patch('nova.objects.BuildRequest')
     @mock.patch('nova.objects.Instance')
@@ -519,6 +519,25 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                 mock.call(self.compute.handle_events), mock.call(None)])
             mock_driver.cleanup_host.assert_called_once_with(host='fake-mini')
 
+    @mock.patch('nova.image.download.peer.start_server')
+    @mock.patch('nova.objects.InstanceList')
+    @mock.patch('nova.objects.MigrationList.get_by_filters')
+    def test_init_and_cleanup_host_image_peer(self, mock_miglist_get,
+                                              mock_instance_list,
+                                              mock_start_server):
+        self.flags(serve=True, group='image_peer')
+        mock_miglist_get.return_value = []
+        mock_instance_list.get_by_host.return_value = []
+        server = mock_start_server.return_value
+
+        with mock.patch.object(self.compute, 'driver'):
+            self.compute.init_host()
+            mock_start_server.assert_called_once_with()
+
+            self.compute.cleanup_host()
+            server.stop.assert_called_once_with()
+            self.assertIsNone(self.compute._image_peer_server)
+
     def test_init_virt_events_disabled(self):
         self.flags(handle_virt_lifecycle_events=False, group='workarounds')
         with mock.patch.object(self.compute.driver,
@@ -526,6 +545,70 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             self.compute.init_virt_events()
         self.assertFalse(mock_register.called)
 
+    @mock.patch.object(objects.Instance, 'get_by_uuid')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_batch(self, mock_get_by_host,
+                                            mock_get_by_uuid):
+        self.flags(heal_instance_info_cache_batch_size=2)
+        instances = [fake_instance.fake_instance_obj(
+                         self.context, uuid=getattr(uuids, 'instance%d' % i),
+                         host=self.compute.host, vm_state=vm_states.ACTIVE,
+                         task_state=None)
+                     for i in range(4)]
+        # Deleting
+        instances[1].task_state = task_states.DELETING
+        mock_get_by_host.return_value = instances
+        mock_get_by_uuid.side_effect = lambda context, uuid, **kwargs: (
+            [instance for instance in instances if instance.uuid == uuid][0])
+
+        with mock.patch.object(self.compute.network_api,
+                               'get_instances_nw_info') as mock_nw_info:
+            self.compute._heal_instance_info_cache(self.context)
+            mock_nw_info.assert_called_once_with(
+                self.context, [instances[0], instances[2]])
+            self.assertEqual([uuids.instance3],
+                             self.compute._instance_uuids_to_heal)
+
+            # A single instance left, refreshed in a batch of one
+            with mock.patch.object(self.compute.network_api,
+                                   'get_instance_nw_info') as mock_one:
+                self.compute._heal_instance_info_cache(self.context)
+            mock_one.assert_called_once_with(self.context, instances[3])
+            self.assertEqual(1, mock_nw_info.call_count)
+
+    @mock.patch('time.time')
+    @mock.patch('nova.compute.utils.usage_volume_info')
+    @mock.patch.object(objects.VolumeUsageList, 'save', autospec=True)
+    def test_update_volume_usage_cache(self, mock_save, mock_info,
+                                       mock_time):
+        instance = fake_instance.fake_instance_obj(self.context)
+        saved = []
+        mock_save.side_effect = lambda usage_list: saved.append(
+            [(vol_usage.volume_id, vol_usage.curr_reads)
+             for vol_usage in usage_list])
+
+        def _update(time, reads):
+            mock_time.return_value = time
+            self.compute._update_volume_usage_cache(self.context, [
+                {'volume': uuids.volume1, 'instance': instance,
+                 'rd_req': reads, 'rd_bytes': 2, 'wr_req': 3, 'wr_bytes': 4},
+                {'volume': uuids.volume2, 'instance': instance,
+                 'rd_req': 1, 'rd_bytes': 2, 'wr_req': 3, 'wr_bytes': 4}])
+
+        with mock.patch.object(self.compute, 'notifier') as mock_notifier:
+            _update(100, 1)
+            # Only the usage which changed is saved
+            _update(200, 5)
+            # Nothing changed
+            _update(300, 5)
+            # The unchanged usages are saved again after a while
+            _update(100 + manager.VOLUME_USAGE_REFRESH_INTERVAL, 5)
+
+        self.assertEqual([[(uuids.volume1, 1), (uuids.volume2, 1)],
+                          [(uuids.volume1, 5)],
+                          [(uuids.volume2, 1)]], saved)
+        self.assertEqual(4, mock_notifier.info.call_count)
+
     @mock.patch('nova.objects.MigrationList.get_by_filters')
     @mock.patch('nova.objects.Migration.save')
     def test_init_host_with_evacuated_instance(self, mock_save, mock_mig_get):
@@ -1413,6 +1496,69 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                         use_slave=True)
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk(self, mock_get):
+        in_sync = objects.Instance(uuid=uuids.in_sync,
+                                   power_state=power_state.RUNNING,
+                                   vm_state=vm_states.ACTIVE,
+                                   task_state=None)
+        stopped = objects.Instance(uuid=uuids.stopped,
+                                   power_state=power_state.RUNNING,
+                                   vm_state=vm_states.ACTIVE,
+                                   task_state=None)
+        missing = objects.Instance(uuid=uuids.missing,
+                                   power_state=power_state.RUNNING,
+                                   vm_state=vm_states.ACTIVE,
+                                   task_state=None)
+        busy = objects.Instance(uuid=uuids.busy,
+                                power_state=power_state.RUNNING,
+                                vm_state=vm_states.ACTIVE,
+                                task_state=task_states.REBOOTING)
+        mock_get.return_value = [in_sync, stopped, missing, busy]
+        with test.nested(
+            mock.patch.object(self.compute.driver, 'get_power_states',
+                              create=True,
+                              return_value={
+                                  uuids.in_sync: power_state.RUNNING,
+                                  uuids.stopped: power_state.SHUTDOWN,
+                                  uuids.busy: power_state.SHUTDOWN}),
+            mock.patch.object(self.compute.driver, 'get_num_instances'),
+            mock.patch.object(self.compute._sync_power_pool, 'spawn_n'),
+        ) as (mock_power_states, mock_num_instances, mock_spawn):
+            self.compute._sync_power_states(mock.sentinel.context)
+
+        mock_power_states.assert_called_once_with()
+        self.assertFalse(mock_num_instances.called)
+        self.assertEqual([mock.call(mock.ANY, stopped),
+                          mock.call(mock.ANY, missing)],
+                         mock_spawn.call_args_list)
+
+    def test_power_state_in_sync(self):
+        def in_sync(vm_state, db_power_state, vm_power_state,
+                    task_state=None):
+            instance = objects.Instance(vm_state=vm_state,
+                                        power_state=db_power_state,
+                                        task_state=task_state)
+            return self.compute._power_state_in_sync(instance, vm_power_state)
+
+        self.assertTrue(in_sync(vm_states.ACTIVE, power_state.RUNNING,
+                                power_state.RUNNING))
+        self.assertTrue(in_sync(vm_states.STOPPED, power_state.SHUTDOWN,
+                                power_state.SHUTDOWN))
+        self.assertTrue(in_sync(vm_states.ERROR, power_state.NOSTATE,
+                                power_state.NOSTATE))
+        self.assertTrue(in_sync(vm_states.ACTIVE, power_state.RUNNING,
+                                power_state.SHUTDOWN,
+                                task_state=task_states.REBOOTING))
+        # The power state needs to be updated
+        self.assertFalse(in_sync(vm_states.ERROR, power_state.RUNNING,
+                                 power_state.NOSTATE))
+        # The instance needs to be stopped
+        self.assertFalse(in_sync(vm_states.ACTIVE, power_state.SHUTDOWN,
+                                 power_state.SHUTDOWN))
+        self.assertFalse(in_sync(vm_states.SOFT_DELETED, power_state.RUNNING,
+                                 power_state.RUNNING))
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None,
                            shutdown_terminate=False):
         instance = objects.Instance()
@@ -1522,6 +1668,24 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                                           power_state.NOSTATE,
                                                           use_slave=True)
 
+    @mock.patch.object(fake_driver.FakeDriver, 'prefetch_images')
+    def test_prefetch_images(self, mock_prefetch):
+        self.flags(prefetch_images=['image1', 'image2'])
+        with mock.patch.dict(self.compute.driver.capabilities,
+                             has_imagecache=True):
+            self.compute._prefetch_images(self.context)
+
+        mock_prefetch.assert_called_once_with(self.context,
+                                              ['image1', 'image2'])
+
+    @mock.patch.object(fake_driver.FakeDriver, 'prefetch_images')
+    def test_prefetch_images_no_images(self, mock_prefetch):
+        with mock.patch.dict(self.compute.driver.capabilities,
+                             has_imagecache=True):
+            self.compute._prefetch_images(self.context)
+
+        self.assertFalse(mock_prefetch.called)
+
     def test_run_pending_deletes(self):
         self.flags(instance_delete_interval=10)
 
@@ -4718,6 +4882,42 @@ class ComputeManagerMigrationTestCase(test.NoDBTestCase):
 
         _do_test()
 
+    @mock.patch.object(manager.ComputeManager,
+                       'update_available_resource_for_node')
+    @mock.patch.object(manager.ComputeManager, '_get_power_state',
+                       return_value=1)
+    @mock.patch.object(manager.ComputeManager, '_get_compute_info')
+    def test_post_live_migration_at_destination_recount(
+            self, mock_get_compute_info, mock_power_state, mock_update):
+        cn = mock.Mock(spec_set=['hypervisor_hostname'])
+        cn.hypervisor_hostname = 'test_host'
+        mock_get_compute_info.return_value = cn
+        rt = mock.Mock()
+        self.compute._resource_tracker_dict = {'test_host': rt}
+
+        with test.nested(
+            mock.patch.object(self.instance, 'save'),
+            mock.patch.object(self.compute, 'network_api'),
+            mock.patch.object(self.compute, '_notify_about_instance_usage'),
+            mock.patch.object(self.compute,
+                              '_get_instance_block_device_info'),
+            mock.patch.object(self.compute.driver,
+                              'post_live_migration_at_destination'),
+        ):
+            self.compute.post_live_migration_at_destination(
+                self.context, self.instance, False)
+
+        rt.force_full_recount.assert_called_once_with()
+        mock_update.assert_called_once_with(self.context, 'test_host')
+
+    def test_force_full_recount(self):
+        rt = mock.Mock()
+        self.compute._resource_tracker_dict = {'node1': rt}
+
+        self.assertIs(rt, self.compute._force_full_recount('node1'))
+        rt.force_full_recount.assert_called_once_with()
+        self.assertIsNone(self.compute._force_full_recount('node2'))
+
     def test_post_live_migration_at_destination_compute_not_found(self):
 
         @mock.patch.object(self.instance, 'save')
@@ -167,11 +167,14 @@ class ShelveComputeManagerTestCase(test_compute.BaseTestCase):
                 'shelve_offload.end')
         self.mox.ReplayAll()
 
-        with mock.patch.object(instance, 'save'):
+        node = instance.node
+        with mock.patch.object(instance, 'save'), mock.patch.object(
+                self.compute, '_force_full_recount') as mock_recount:
             self.compute.shelve_offload_instance(self.context, instance,
                                                  clean_shutdown=clean_shutdown)
         self.assertEqual(vm_states.SHELVED_OFFLOADED, instance.vm_state)
         self.assertIsNone(instance.task_state)
+        mock_recount.assert_called_once_with(node)
 
     def test_shelve_offload(self):
         self._shelve_offload()
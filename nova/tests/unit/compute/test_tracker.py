@@ -13,6 +13,7 @@
 import copy
 
 import mock
+from oslo_utils import fixture as utils_fixture
 from oslo_utils import units
 
 from nova.compute import arch
@@ -1003,6 +1004,92 @@ class TestUpdateAvailableResources(BaseTestCase):
                                                  self.rt.compute_node))
 
 
+@mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+            return_value=objects.InstancePCIRequests(requests=[]))
+@mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+            return_value=objects.PciDeviceList())
+@mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+@mock.patch('nova.objects.MigrationList.get_in_progress_by_host_and_node',
+            return_value=[])
+@mock.patch('nova.objects.InstanceList.get_by_host_and_node',
+            return_value=[])
+class TestIncrementalUpdate(BaseTestCase):
+
+    def setUp(self):
+        super(TestIncrementalUpdate, self).setUp()
+        self.flags(reserved_host_disk_mb=0,
+                   reserved_host_memory_mb=0,
+                   resource_tracker_full_recount_interval=600)
+        self.time_fixture = self.useFixture(utils_fixture.TimeFixture())
+        self._setup_rt()
+
+    def _update_available_resources(self):
+        with mock.patch.object(self.rt, '_update'):
+            self.rt.update_available_resource(mock.sentinel.ctx)
+
+    def test_incremental_update(self, get_mock, migr_mock, get_cn_mock,
+                                pci_mock, instance_pci_mock):
+        get_cn_mock.return_value = copy.deepcopy(_COMPUTE_NODE_FIXTURES[0])
+        self._update_available_resources()
+        self.assertEqual(1, get_mock.call_count)
+
+        # Usage accounted for by a claim, which the hypervisor doesn't
+        # report yet
+        self.rt.compute_node.memory_mb_used = 256
+        self.rt.compute_node.vcpus_used = 1
+        virt_resources = self.driver_mock.get_available_resource.return_value
+        virt_resources['memory_mb'] = 1024
+
+        self._update_available_resources()
+
+        self.assertEqual(1, get_mock.call_count)
+        self.assertEqual(1, migr_mock.call_count)
+        self.assertEqual(1,
+                         self.driver_mock.get_per_instance_usage.call_count)
+        self.assertEqual(1024, self.rt.compute_node.memory_mb)
+        self.assertEqual(256, self.rt.compute_node.memory_mb_used)
+        self.assertEqual(768, self.rt.compute_node.free_ram_mb)
+        self.assertEqual(1, self.rt.compute_node.vcpus_used)
+
+    @mock.patch.object(resource_tracker.LOG, 'warning')
+    def test_full_recount_reports_drift(self, warn_mock, get_mock,
+                                        migr_mock, get_cn_mock, pci_mock,
+                                        instance_pci_mock):
+        get_cn_mock.return_value = copy.deepcopy(_COMPUTE_NODE_FIXTURES[0])
+        self._update_available_resources()
+        self.rt.compute_node.memory_mb_used = 256
+
+        self.time_fixture.advance_time_seconds(601)
+        self._update_available_resources()
+
+        self.assertEqual(2, get_mock.call_count)
+        self.assertEqual(0, self.rt.compute_node.memory_mb_used)
+        self.assertEqual(1, warn_mock.call_count)
+        self.assertEqual('memory_mb_used 256 -> 0',
+                         warn_mock.call_args[0][1]['drift'])
+
+    @mock.patch.object(resource_tracker.LOG, 'warning')
+    def test_force_full_recount(self, warn_mock, get_mock, migr_mock,
+                                get_cn_mock, pci_mock, instance_pci_mock):
+        get_cn_mock.return_value = copy.deepcopy(_COMPUTE_NODE_FIXTURES[0])
+        self._update_available_resources()
+
+        self.rt.force_full_recount()
+        self._update_available_resources()
+
+        self.assertEqual(2, get_mock.call_count)
+        self.assertFalse(warn_mock.called)
+
+    def test_full_recount_every_time(self, get_mock, migr_mock, get_cn_mock,
+                                     pci_mock, instance_pci_mock):
+        self.flags(resource_tracker_full_recount_interval=0)
+        get_cn_mock.return_value = copy.deepcopy(_COMPUTE_NODE_FIXTURES[0])
+        self._update_available_resources()
+        self._update_available_resources()
+
+        self.assertEqual(2, get_mock.call_count)
+
+
 class TestInitComputeNode(BaseTestCase):
 
     @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
@@ -194,6 +194,11 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
         result = self.conductor.provider_fw_rule_get_all(self.context)
         self.assertEqual([], result)
 
+    @mock.patch('nova.servicegroup.drivers.batched.HEARTBEATS')
+    def test_report_heartbeat(self, mock_heartbeats):
+        self.conductor.report_heartbeat(self.context, 42)
+        mock_heartbeats.add.assert_called_once_with(42)
+
 
 class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor RPC API Tests."""
@@ -204,6 +209,20 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor_manager = self.conductor_service.manager
         self.conductor = conductor_rpcapi.ConductorAPI()
 
+    def test_report_heartbeat(self):
+        with mock.patch.object(self.conductor.client,
+                               'prepare') as mock_prepare:
+            self.conductor.report_heartbeat(self.context, 42)
+        mock_prepare.assert_called_once_with(version='3.1')
+        mock_prepare.return_value.cast.assert_called_once_with(
+            self.context, 'report_heartbeat', service_id=42)
+
+    def test_can_report_heartbeat(self):
+        self.assertTrue(self.conductor.can_report_heartbeat())
+        self.flags(conductor='3.0', group='upgrade_levels')
+        self.assertFalse(
+            conductor_rpcapi.ConductorAPI().can_report_heartbeat())
+
 
 class ConductorAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor API Tests."""
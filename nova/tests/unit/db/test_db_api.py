@@ -2331,6 +2331,69 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         mock_joinedload.assert_called_once_with('info_cache')
         mock_undefer.assert_called_once_with('extra.pci_requests')
 
+    def test_instance_get_all_by_filters_batch_joins(self):
+        secgroup = db.security_group_create(
+            self.ctxt, {'project_id': 'project1', 'name': 'secgroup1'})
+        instances = [self.create_instance_with_args(
+            extra={'flavor': 'flavor%d' % i}) for i in range(3)]
+        for instance in instances[:2]:
+            db.instance_add_security_group(self.ctxt, instance['uuid'],
+                                           secgroup['id'])
+        columns_to_join = ['info_cache', 'security_groups', 'metadata',
+                           'extra', 'extra.flavor']
+
+        def _get_all():
+            return db.instance_get_all_by_filters_sort(
+                self.ctxt, {}, columns_to_join=columns_to_join,
+                sort_keys=['id'], sort_dirs=['asc'])
+
+        joined_instances = _get_all()
+        self.flags(instance_list_join_batch_size=2)
+        with mock.patch('nova.db.sqlalchemy.api.joinedload') as mock_join:
+            batched_instances = _get_all()
+        self.assertFalse(mock_join.called)
+
+        self._assertEqualListsOfInstances(joined_instances,
+                                          batched_instances)
+        for joined, batched in zip(joined_instances, batched_instances):
+            self.assertEqual(joined['info_cache']['network_info'],
+                             batched['info_cache']['network_info'])
+            self.assertEqual(
+                [group['id'] for group in joined['security_groups']],
+                [group['id'] for group in batched['security_groups']])
+            self.assertEqual(utils.metadata_to_dict(joined['metadata']),
+                             utils.metadata_to_dict(batched['metadata']))
+            self.assertEqual(joined['extra']['flavor'],
+                             batched['extra']['flavor'])
+        self.assertEqual([secgroup['id']],
+                         [group['id'] for group in
+                          batched_instances[0]['security_groups']])
+        self.assertEqual([], batched_instances[2]['security_groups'])
+        self.assertEqual('flavor1', batched_instances[1]['extra']['flavor'])
+
+    @mock.patch.object(sqlalchemy_api, '_instance_info_cache_get_multi',
+                       return_value=[])
+    @mock.patch.object(sqlalchemy_api, '_instance_metadata_get_multi',
+                       return_value=[])
+    def test_instance_get_all_by_filters_batch_size(self, mock_meta,
+                                                    mock_info_cache):
+        instances = [self.create_instance_with_args() for i in range(3)]
+        uuids = [instance['uuid'] for instance in instances]
+        self.flags(instance_list_join_batch_size=2)
+        db.instance_get_all_by_filters_sort(
+            self.ctxt, {}, columns_to_join=['info_cache', 'metadata'],
+            sort_keys=['id'], sort_dirs=['asc'])
+        for mock_get_multi in (mock_meta, mock_info_cache):
+            self.assertEqual([mock.call(mock.ANY, uuids[:2]),
+                              mock.call(mock.ANY, uuids[2:])],
+                             mock_get_multi.call_args_list)
+
+    def test_batch_join_columns(self):
+        self.assertEqual(
+            (['info_cache', 'extra.flavor', 'extra'], ['fault']),
+            sqlalchemy_api._batch_join_columns(
+                ['info_cache', 'fault', 'extra.flavor']))
+
     @mock.patch('nova.db.sqlalchemy.api.undefer')
     @mock.patch('nova.db.sqlalchemy.api.joinedload')
     def test_instance_get_active_by_window_extra_columns(self,
@@ -3374,6 +3437,31 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self.assertRaises(exception.ServiceNotFound,
                           db.service_update, self.ctxt, 100500, {})
 
+    def test_service_heartbeats_update(self):
+        service1 = self._create_service({'host': 'fake_host1'})
+        service2 = self._create_service({'host': 'fake_host2'})
+        service3 = self._create_service({'host': 'fake_host3'})
+        time1 = datetime.datetime(2016, 1, 1, 12, 0, 0)
+        time2 = datetime.datetime(2016, 1, 1, 12, 0, 5)
+
+        updated = db.service_heartbeats_update(
+            self.ctxt, {service1['id']: (time1, 1),
+                        service2['id']: (time2, 2)})
+
+        self.assertEqual(2, updated)
+        service1 = db.service_get(self.ctxt, service1['id'])
+        self.assertEqual(time1, service1['last_seen_up'])
+        self.assertEqual(4, service1['report_count'])
+        service2 = db.service_get(self.ctxt, service2['id'])
+        self.assertEqual(time2, service2['last_seen_up'])
+        self.assertEqual(5, service2['report_count'])
+        service3 = db.service_get(self.ctxt, service3['id'])
+        self.assertIsNone(service3['last_seen_up'])
+        self.assertEqual(3, service3['report_count'])
+
+    def test_service_heartbeats_update_nothing(self):
+        self.assertEqual(0, db.service_heartbeats_update(self.ctxt, {}))
+
     def test_service_update_with_set_forced_down(self):
         service = self._create_service({})
         db.service_update(self.ctxt, service['id'], {'forced_down': True})
@@ -5984,6 +6072,73 @@ class VolumeUsageDBApiTestCase(test.TestCase):
         for key, value in expected_vol_usage.items():
             self.assertEqual(vol_usage[key], value, key)
 
+    def _usage(self, volume_id, reads, read_bytes, writes, write_bytes):
+        return {'volume_id': volume_id,
+                'curr_reads': reads,
+                'curr_read_bytes': read_bytes,
+                'curr_writes': writes,
+                'curr_write_bytes': write_bytes,
+                'instance_uuid': 'fake-instance-uuid1',
+                'project_id': 'fake-project-uuid1',
+                'user_id': 'fake-user-uuid1',
+                'availability_zone': 'fake-az'}
+
+    def test_vol_usage_update_all(self):
+        ctxt = context.get_admin_context()
+        now = timeutils.utcnow()
+        self.useFixture(utils_fixture.TimeFixture(now))
+        start_time = now - datetime.timedelta(seconds=10)
+
+        db.vol_usage_update(ctxt, u'1',
+                            rd_req=10000, rd_bytes=20000,
+                            wr_req=30000, wr_bytes=40000,
+                            instance_id='fake-instance-uuid1',
+                            project_id='fake-project-uuid1',
+                            availability_zone='fake-az',
+                            user_id='fake-user-uuid1')
+
+        # The block device stats of volume 1 were reset
+        vol_usages = db.vol_usage_update_all(
+            ctxt, [self._usage(u'2', 10, 20, 30, 40),
+                   self._usage(u'1', 100, 200, 300, 400)])
+
+        self.assertEqual([u'2', u'1'],
+                         [vol_usage['volume_id'] for vol_usage in vol_usages])
+        self.assertIsNotNone(vol_usages[0]['id'])
+        vol_usages = {vol_usage['volume_id']: vol_usage
+                      for vol_usage in db.vol_get_usage_by_time(ctxt,
+                                                                start_time)}
+        expected_vol_usages = {
+            u'1': {'curr_reads': 100,
+                   'curr_read_bytes': 200,
+                   'curr_writes': 300,
+                   'curr_write_bytes': 400,
+                   'curr_last_refreshed': now,
+                   'tot_reads': 10000,
+                   'tot_read_bytes': 20000,
+                   'tot_writes': 30000,
+                   'tot_write_bytes': 40000},
+            u'2': {'curr_reads': 10,
+                   'curr_read_bytes': 20,
+                   'curr_writes': 30,
+                   'curr_write_bytes': 40,
+                   'curr_last_refreshed': now,
+                   'tot_reads': 0,
+                   'tot_read_bytes': 0,
+                   'tot_writes': 0,
+                   'tot_write_bytes': 0,
+                   'instance_uuid': 'fake-instance-uuid1',
+                   'availability_zone': 'fake-az'}}
+        self.assertEqual(set(expected_vol_usages), set(vol_usages))
+        for volume_id, expected in expected_vol_usages.items():
+            for key, value in expected.items():
+                self.assertEqual(value, vol_usages[volume_id][key], key)
+
+    def test_vol_usage_update_all_empty(self):
+        ctxt = context.get_admin_context()
+
+        self.assertEqual([], db.vol_usage_update_all(ctxt, []))
+
 
 class TaskLogTestCase(test.TestCase):
 
@@ -7135,6 +7290,19 @@ class QuotaTestCase(test.TestCase, ModelsObjectComparatorMixin):
                     self.ctxt, 'p1', 'u1')
         self.assertTrue(order_mock.called)
 
+    def test_quota_usage_count(self):
+        for project_id, user_id in (('p1', 'u1'), ('p1', 'u2'), ('p2', 'u1')):
+            db.security_group_create(self.ctxt, {'project_id': project_id,
+                                                 'user_id': user_id,
+                                                 'name': 'sg-%s' % user_id})
+        self.assertEqual({'security_groups': 2},
+                         db.quota_usage_count(self.ctxt,
+                                              '_sync_security_groups', 'p1'))
+        self.assertEqual({'security_groups': 1},
+                         db.quota_usage_count(self.ctxt,
+                                              '_sync_security_groups', 'p1',
+                                              user_id='u2'))
+
     def test_quota_usage_update_nonexistent(self):
         self.assertRaises(exception.QuotaUsageNotFound, db.quota_usage_update,
             self.ctxt, 'p1', 'u1', 'resource', in_use=42)
@@ -7539,6 +7707,38 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self._assertEqualListsOfObjects(expected, result,
                                         ignored_keys=ignored)
 
+    def test_compute_node_get_all_updated_since(self):
+        created_at = self.item['created_at']
+        nodes = db.compute_node_get_all_updated_since(self.ctxt, created_at)
+        self.assertEqual([self.item['id']], [node['id'] for node in nodes])
+
+        later = created_at + datetime.timedelta(minutes=5)
+        self.assertEqual([],
+                         db.compute_node_get_all_updated_since(self.ctxt,
+                                                               later))
+
+        self.useFixture(utils_fixture.TimeFixture(
+            later + datetime.timedelta(minutes=1)))
+        db.compute_node_update(self.ctxt, self.item['id'], {'vcpus_used': 1})
+        nodes = db.compute_node_get_all_updated_since(self.ctxt, later)
+        self.assertEqual([self.item['id']], [node['id'] for node in nodes])
+        self.assertEqual(1, nodes[0]['vcpus_used'])
+
+    def test_compute_node_get_all_updated_since_deleted(self):
+        created_at = self.item['created_at']
+        later = created_at + datetime.timedelta(minutes=5)
+        self.useFixture(utils_fixture.TimeFixture(
+            later + datetime.timedelta(minutes=1)))
+        db.compute_node_delete(self.ctxt, self.item['id'])
+
+        self.assertEqual([],
+                         db.compute_node_get_all_updated_since(self.ctxt,
+                                                               later))
+        with utils.temporary_mutation(self.ctxt, read_deleted='yes'):
+            nodes = db.compute_node_get_all_updated_since(self.ctxt, later)
+        self.assertEqual([self.item['id']], [node['id'] for node in nodes])
+        self.assertTrue(nodes[0]['deleted'])
+
     def test_compute_node_get_all_by_host_not_found(self):
         self.assertRaises(exception.ComputeHostNotFound,
                           db.compute_node_get_all_by_host, self.ctxt, 'wrong')
@@ -160,7 +160,8 @@ class _FakeImageService(object):
         """Return list of detailed image information."""
         return copy.deepcopy(self.images.values())
 
-    def download(self, context, image_id, dst_path=None, data=None):
+    def download(self, context, image_id, dst_path=None, data=None,
+                 max_bandwidth=0):
         self.show(context, image_id)
         if data:
             data.write(self._imagedata.get(image_id, ''))
@@ -23,7 +23,7 @@ import glanceclient.exc
 from glanceclient.v1 import images
 import glanceclient.v2.schemas as schemas
 import mock
-
+from oslo_utils import units
 import six
 import testtools
 
@@ -31,6 +31,7 @@ import nova.conf
 from nova import context
 from nova import exception
 from nova.image import glance
+from nova.image import parallel_download
 from nova import test
 from nova.tests import uuidsentinel as uuids
 
@@ -1043,6 +1044,212 @@ class TestDownloadNoDirectUri(test.NoDBTestCase):
         writer.close.assert_called_once_with()
 
 
+class TestDownloadRanges(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestDownloadRanges, self).setUp()
+        self.flags(use_glance_v1=False, parallel_download_workers=4,
+                   parallel_download_chunk_size=1, num_retries=2,
+                   group='glance')
+        self.client = mock.MagicMock()
+        self.client.call.return_value = [1, 2, 3]
+        self.service = glance.GlanceImageServiceV2(self.client)
+        self.ctx = mock.sentinel.ctx
+
+    @mock.patch.object(parallel_download, 'download', return_value=True)
+    @mock.patch('nova.image.glance.GlanceImageServiceV2.show',
+                return_value={'size': 10 * units.Mi, 'checksum': 'sum'})
+    def test_download_ranges(self, show_mock, download_mock):
+        res = self.service.download(self.ctx, mock.sentinel.image_id,
+                                    dst_path=mock.sentinel.dst_path)
+
+        self.assertIsNone(res)
+        show_mock.assert_called_once_with(self.ctx, mock.sentinel.image_id,
+                                          include_locations=False)
+        download_mock.assert_called_once_with(
+            mock.sentinel.image_id, 10 * units.Mi, mock.ANY,
+            mock.sentinel.dst_path, units.Mi, 4, checksum='sum',
+            verifier=None, retries=2)
+        self.assertFalse(self.client.call.called)
+
+    @mock.patch.object(six.moves.builtins, 'open')
+    @mock.patch.object(parallel_download, 'download')
+    @mock.patch('nova.image.glance.GlanceImageServiceV2.show',
+                return_value={'size': units.Mi, 'checksum': 'sum'})
+    def test_download_ranges_small_image(self, show_mock, download_mock,
+                                         open_mock):
+        self.service.download(self.ctx, mock.sentinel.image_id,
+                              dst_path=mock.sentinel.dst_path)
+
+        self.assertFalse(download_mock.called)
+        self.client.call.assert_called_once_with(self.ctx, 2, 'data',
+                                                 mock.sentinel.image_id)
+        open_mock.assert_called_once_with(mock.sentinel.dst_path, 'wb')
+
+    @mock.patch.object(six.moves.builtins, 'open')
+    @mock.patch.object(parallel_download, 'download',
+                       side_effect=parallel_download.RangesNotSupported)
+    @mock.patch('nova.image.glance.GlanceImageServiceV2.show',
+                return_value={'size': 10 * units.Mi, 'checksum': 'sum'})
+    def test_download_ranges_not_supported(self, show_mock, download_mock,
+                                           open_mock):
+        self.service.download(self.ctx, mock.sentinel.image_id,
+                              dst_path=mock.sentinel.dst_path)
+
+        self.assertTrue(download_mock.called)
+        self.client.call.assert_called_once_with(self.ctx, 2, 'data',
+                                                 mock.sentinel.image_id)
+        open_mock.assert_called_once_with(mock.sentinel.dst_path, 'wb')
+
+    def test_get_data_range(self):
+        client = self.client.get_client.return_value
+        resp = mock.Mock(status_code=206)
+        client.http_client.get.return_value = (resp, mock.sentinel.body)
+
+        self.assertEqual(mock.sentinel.body,
+                         self.service._get_data_range(self.ctx, 'image-id',
+                                                      10, 19))
+        self.client.get_client.assert_called_once_with(self.ctx, 2)
+        client.http_client.get.assert_called_once_with(
+            '/v2/images/image-id/file', headers={'Range': 'bytes=10-19'})
+
+    def test_get_data_range_not_supported(self):
+        client = self.client.get_client.return_value
+        resp = mock.Mock(status_code=200)
+        client.http_client.get.return_value = (resp, mock.sentinel.body)
+
+        self.assertRaises(parallel_download.RangesNotSupported,
+                          self.service._get_data_range, self.ctx,
+                          'image-id', 10, 19)
+        resp.close.assert_called_once_with()
+
+    @mock.patch.object(glance, '_Throttle')
+    @mock.patch.object(parallel_download, 'download', return_value=True)
+    @mock.patch('nova.image.glance.GlanceImageServiceV2.show',
+                return_value={'size': 10 * units.Mi, 'checksum': 'sum'})
+    def test_download_ranges_max_bandwidth(self, show_mock, download_mock,
+                                           throttle_mock):
+        self.service.download(self.ctx, mock.sentinel.image_id,
+                              dst_path=mock.sentinel.dst_path,
+                              max_bandwidth=1024)
+
+        throttle_mock.assert_called_once_with(1024)
+        fetch_range = download_mock.call_args[0][2]
+        with mock.patch.object(self.service, '_get_data_range',
+                               return_value=mock.sentinel.body):
+            self.assertEqual(
+                throttle_mock.return_value.iterate.return_value,
+                fetch_range(0, 9))
+        throttle_mock.return_value.iterate.assert_called_once_with(
+            mock.sentinel.body)
+        self.assertFalse(self.client.call.called)
+
+
+class TestThrottle(test.NoDBTestCase):
+
+    @mock.patch.object(glance, 'time')
+    def test_iterate(self, time_mock):
+        time_mock.time.side_effect = [100, 100.5, 101, 103.5]
+        throttle = glance._Throttle(10)
+
+        self.assertEqual([b'a' * 10, b'b' * 20],
+                         list(throttle.iterate([b'a' * 10, b'b' * 20])))
+        # The iterators of the same throttle share its rate
+        self.assertEqual([b'c' * 5], list(throttle.iterate([b'c' * 5])))
+
+        self.assertEqual([mock.call(0.5), mock.call(2.0)],
+                         time_mock.sleep.call_args_list)
+
+    @mock.patch.object(glance, '_Throttle')
+    @mock.patch('nova.image.glance.GlanceImageServiceV2.show')
+    def test_download_max_bandwidth_v2(self, show_mock, throttle_mock):
+        self.flags(use_glance_v1=False, group='glance')
+        client = mock.MagicMock()
+        client.call.return_value = [1, 2, 3]
+        throttle_mock.return_value.iterate.return_value = [4, 5]
+        data = mock.MagicMock()
+        service = glance.GlanceImageServiceV2(client)
+
+        service.download(mock.sentinel.ctx, mock.sentinel.image_id,
+                         data=data, max_bandwidth=1024)
+
+        throttle_mock.assert_called_once_with(1024)
+        throttle_mock.return_value.iterate.assert_called_once_with([1, 2, 3])
+        self.assertEqual([mock.call(4), mock.call(5)],
+                         data.write.call_args_list)
+
+
+class TestDownloadFromPeers(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestDownloadFromPeers, self).setUp()
+        self.flags(use_glance_v1=False, allowed_direct_url_schemes=['peer'],
+                   group='glance')
+        self.client = mock.MagicMock()
+        self.client.call.return_value = [1, 2, 3]
+        self.service = glance.GlanceImageServiceV2(self.client)
+        self.ctx = mock.sentinel.ctx
+        self.xfer_mod = mock.MagicMock()
+        patcher = mock.patch.object(self.service, '_get_transfer_module',
+                                    return_value=self.xfer_mod)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(self.service, 'show',
+                                    return_value={'size': 10,
+                                                  'checksum': 'sum',
+                                                  'locations': []})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_download_from_peers(self):
+        res = self.service.download(self.ctx, 'image-id',
+                                    dst_path=mock.sentinel.dst_path)
+
+        self.assertIsNone(res)
+        self.xfer_mod.download.assert_called_once_with(
+            self.ctx, mock.ANY, mock.sentinel.dst_path,
+            {'size': 10, 'checksum': 'sum'})
+        url_parts = self.xfer_mod.download.call_args[0][1]
+        self.assertEqual('peer', url_parts.scheme)
+        self.assertEqual('/image-id', url_parts.path)
+        self.assertFalse(self.client.call.called)
+
+    @mock.patch.object(six.moves.builtins, 'open')
+    def test_download_from_peers_fallback(self, open_mock):
+        self.xfer_mod.download.side_effect = (
+            exception.ImageDownloadModuleError(module='peer', reason='none'))
+
+        self.service.download(self.ctx, 'image-id',
+                              dst_path=mock.sentinel.dst_path)
+
+        self.assertTrue(self.xfer_mod.download.called)
+        self.client.call.assert_called_once_with(self.ctx, 2, 'data',
+                                                 'image-id')
+        open_mock.assert_called_with(mock.sentinel.dst_path, 'wb')
+
+    @mock.patch.object(six.moves.builtins, 'open')
+    def test_download_from_peers_signature_verification(self, open_mock):
+        self.flags(verify_glance_signatures=True, group='glance')
+
+        with mock.patch.object(self.service, '_get_verifier'):
+            self.service.download(self.ctx, 'image-id',
+                                  dst_path=mock.sentinel.dst_path)
+
+        self.assertFalse(self.xfer_mod.download.called)
+        self.client.call.assert_called_once_with(self.ctx, 2, 'data',
+                                                 'image-id')
+
+    def test_download_from_peers_data(self):
+        data = mock.MagicMock()
+
+        self.service.download(self.ctx, 'image-id', data=data,
+                              dst_path=mock.sentinel.dst_path)
+
+        self.assertFalse(self.xfer_mod.download.called)
+        data.write.assert_has_calls([mock.call(1), mock.call(2),
+                                     mock.call(3)])
+
+
 class TestDownloadSignatureVerification(test.NoDBTestCase):
 
     class MockVerifier(object):
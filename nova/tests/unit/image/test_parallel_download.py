@@ -0,0 +1,160 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import os
+
+import eventlet
+import fixtures
+import mock
+from oslo_serialization import jsonutils
+
+from nova import exception
+from nova.image import parallel_download
+from nova import test
+
+IMAGE_DATA = b''.join(bytes(bytearray([i % 256])) * 7 for i in range(100))
+CHECKSUM = hashlib.md5(IMAGE_DATA).hexdigest()
+CHUNK_SIZE = 64
+
+
+class FakeImageServer(object):
+    """Serves the byte ranges of an image held in memory."""
+
+    def __init__(self, data=IMAGE_DATA, ranges=True, failures=0):
+        self.data = data
+        self.ranges = ranges
+        self.failures = failures
+        self.requests = []
+
+    def fetch_range(self, start, end):
+        self.requests.append((start, end))
+        if not self.ranges:
+            raise parallel_download.RangesNotSupported()
+        # Let the other ranges start
+        eventlet.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise IOError('Connection reset')
+        data = self.data[start:end + 1]
+        return [data[i:i + 10] for i in range(0, len(data), 10)]
+
+
+class ParallelDownloadTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ParallelDownloadTestCase, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'image')
+        self.server = FakeImageServer()
+
+    def _download(self, checksum=CHECKSUM, verifier=None, retries=0):
+        return parallel_download.download(
+            'image-id', len(IMAGE_DATA), self.server.fetch_range, self.path,
+            CHUNK_SIZE, 4, checksum=checksum, verifier=verifier,
+            retries=retries)
+
+    def _read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_download(self):
+        verifier = mock.Mock()
+
+        self.assertTrue(self._download(verifier=verifier))
+
+        self.assertEqual(IMAGE_DATA, self._read())
+        self.assertEqual(11, len(self.server.requests))
+        self.assertIn((640, 699), self.server.requests)
+        self.assertEqual(IMAGE_DATA, b''.join(
+            call[0][0] for call in verifier.update.call_args_list))
+        verifier.verify.assert_called_once_with()
+        self.assertFalse(os.path.exists(
+            self.path + parallel_download.STATE_SUFFIX))
+
+    def test_download_resumes(self):
+        # A previous download wrote the first two chunks
+        with open(self.path, 'wb') as f:
+            f.write(IMAGE_DATA[:2 * CHUNK_SIZE])
+            f.truncate(len(IMAGE_DATA))
+        with open(self.path + parallel_download.STATE_SUFFIX, 'w') as f:
+            jsonutils.dump({'image': {'image_id': 'image-id',
+                                      'size': len(IMAGE_DATA),
+                                      'checksum': CHECKSUM,
+                                      'chunk_size': CHUNK_SIZE},
+                            'done': [0, 1]}, f)
+
+        self._download()
+
+        self.assertEqual(IMAGE_DATA, self._read())
+        self.assertEqual(9, len(self.server.requests))
+        self.assertNotIn((0, 63), self.server.requests)
+
+    def test_download_ignores_state_of_other_image(self):
+        with open(self.path, 'wb') as f:
+            f.truncate(len(IMAGE_DATA))
+        with open(self.path + parallel_download.STATE_SUFFIX, 'w') as f:
+            jsonutils.dump({'image': {'image_id': 'other-image',
+                                      'size': len(IMAGE_DATA),
+                                      'checksum': 'other',
+                                      'chunk_size': CHUNK_SIZE},
+                            'done': [0, 1]}, f)
+
+        self._download()
+
+        self.assertEqual(IMAGE_DATA, self._read())
+        self.assertEqual(11, len(self.server.requests))
+
+    def test_download_checksum_mismatch(self):
+        self.assertRaises(exception.ImageUnacceptable,
+                          self._download, checksum='bad')
+        self.assertFalse(os.path.exists(
+            self.path + parallel_download.STATE_SUFFIX))
+
+    def test_download_retries(self):
+        self.server.failures = 2
+
+        self._download(retries=2)
+
+        self.assertEqual(IMAGE_DATA, self._read())
+
+    def test_download_fails(self):
+        self.server.failures = 1
+
+        self.assertRaises(IOError, self._download)
+        self.assertFalse(os.path.exists(
+            self.path + parallel_download.STATE_SUFFIX))
+
+    def test_download_ranges_not_supported(self):
+        self.server.ranges = False
+
+        self.assertRaises(parallel_download.RangesNotSupported,
+                          self._download)
+
+    def test_download_coalesced(self):
+        downloads = [eventlet.spawn(self._download) for i in range(3)]
+
+        self.assertEqual([True, False, False],
+                         [download.wait() for download in downloads])
+        self.assertEqual(IMAGE_DATA, self._read())
+        self.assertEqual(11, len(self.server.requests))
+        self.assertEqual({}, parallel_download._IN_PROGRESS)
+
+    def test_download_coalesced_failure(self):
+        self.server.failures = 1
+        downloads = [eventlet.spawn(self._download) for i in range(2)]
+
+        for download in downloads:
+            self.assertRaises(IOError, download.wait)
@@ -13,12 +13,20 @@
 #    under the License.
 
 
+import hashlib
+import os
+import time
+
+import fixtures
 import mock
+import requests
 import six.moves.urllib.parse as urlparse
+import webob
 
 import nova.conf
 from nova import exception
 from nova.image.download import file as tm_file
+from nova.image.download import peer as tm_peer
 from nova import test
 
 CONF = nova.conf.CONF
@@ -108,3 +116,214 @@ class TestFileTransferModule(test.NoDBTestCase):
                           tm.download, mock.sentinel.ctx, url_parts,
                           dst_file, loc_meta)
         self.assertFalse(copy_mock.called)
+
+
+IMAGE_DATA = b'0123456789' * 20
+CHECKSUM = hashlib.md5(IMAGE_DATA).hexdigest()
+
+
+class TestPeerApplication(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestPeerApplication, self).setUp()
+        instances_path = self.useFixture(fixtures.TempDir()).path
+        self.flags(instances_path=instances_path)
+        self.flags(secret='secret', group='image_peer')
+        base_dir = os.path.join(instances_path,
+                                CONF.image_cache_subdirectory_name)
+        os.mkdir(base_dir)
+        with open(tm_peer._get_base_file('image-id'), 'wb') as f:
+            f.write(IMAGE_DATA)
+        self.app = tm_peer.PeerApplication()
+        # Compute the checksums synchronously
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.utils.spawn_n', lambda func, *args: func(*args)))
+        self.useFixture(fixtures.MonkeyPatch(
+            'eventlet.tpool.execute', lambda func, *args: func(*args)))
+
+    def _request(self, image_id='image-id', method='GET', signed=True,
+                 **headers):
+        if signed:
+            headers.update(tm_peer._signed_headers(image_id))
+        req = webob.Request.blank('/images/%s' % image_id, method=method,
+                                  headers=headers)
+        return req.get_response(self.app)
+
+    def test_get(self):
+        # The checksum is not known yet
+        self.assertEqual(503, self._request().status_int)
+
+        resp = self._request()
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(IMAGE_DATA, resp.body)
+        self.assertEqual(CHECKSUM, resp.etag)
+
+    def test_head(self):
+        self._request()
+
+        resp = self._request(method='HEAD')
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(str(len(IMAGE_DATA)), resp.headers['Content-Length'])
+        self.assertEqual(CHECKSUM, resp.etag)
+
+    def test_get_range(self):
+        self._request()
+
+        resp = self._request(Range='bytes=10-29')
+        self.assertEqual(206, resp.status_int)
+        self.assertEqual(IMAGE_DATA[10:30], resp.body)
+
+    def test_checksum_recomputed(self):
+        self._request()
+        with open(tm_peer._get_base_file('image-id'), 'ab') as f:
+            f.write(b'more')
+        os.utime(tm_peer._get_base_file('image-id'), (0, 0))
+
+        self.assertEqual(503, self._request().status_int)
+        resp = self._request()
+        self.assertEqual(hashlib.md5(IMAGE_DATA + b'more').hexdigest(),
+                         resp.etag)
+
+    def test_not_signed(self):
+        self.assertEqual(403, self._request(signed=False).status_int)
+
+    def test_bad_signature(self):
+        timestamp = str(int(time.time()))
+        resp = self._request(signed=False,
+                             **{tm_peer.TIMESTAMP_HEADER: timestamp,
+                                tm_peer.SIGNATURE_HEADER: 'bad'})
+        self.assertEqual(403, resp.status_int)
+
+    def test_signature_of_other_image(self):
+        headers = tm_peer._signed_headers('other-image')
+        self.assertEqual(403, self._request(signed=False,
+                                            **headers).status_int)
+
+    def test_stale_signature(self):
+        self._request()
+        timestamp = str(int(time.time()) - 61)
+        resp = self._request(
+            signed=False,
+            **{tm_peer.TIMESTAMP_HEADER: timestamp,
+               tm_peer.SIGNATURE_HEADER: tm_peer._sign('image-id',
+                                                       timestamp)})
+        self.assertEqual(403, resp.status_int)
+
+        # A signature made a while ago is accepted
+        timestamp = str(int(time.time()) - 50)
+        resp = self._request(
+            signed=False,
+            **{tm_peer.TIMESTAMP_HEADER: timestamp,
+               tm_peer.SIGNATURE_HEADER: tm_peer._sign('image-id',
+                                                       timestamp)})
+        self.assertEqual(200, resp.status_int)
+
+    def test_bad_timestamp(self):
+        resp = self._request(
+            signed=False,
+            **{tm_peer.TIMESTAMP_HEADER: 'bad',
+               tm_peer.SIGNATURE_HEADER: tm_peer._sign('image-id', 'bad')})
+        self.assertEqual(403, resp.status_int)
+
+    def test_not_found(self):
+        self.assertEqual(404, self._request('other-image').status_int)
+
+    def test_bad_path(self):
+        req = webob.Request.blank('/other/image-id')
+        self.assertEqual(404, req.get_response(self.app).status_int)
+
+    def test_method_not_allowed(self):
+        self.assertEqual(405, self._request(method='PUT').status_int)
+
+    @mock.patch('nova.wsgi.Server')
+    def test_start_server(self, mock_server):
+        self.flags(host='192.168.1.1', port=9999, group='image_peer')
+
+        server = tm_peer.start_server()
+
+        self.assertEqual(mock_server.return_value, server)
+        mock_server.assert_called_once_with(
+            'image_peer', mock.ANY, host='192.168.1.1', port=9999)
+        server.start.assert_called_once_with()
+
+    @mock.patch('nova.wsgi.Server')
+    def test_start_server_no_secret(self, mock_server):
+        self.flags(secret=None, group='image_peer')
+
+        self.assertIsNone(tm_peer.start_server())
+        self.assertFalse(mock_server.called)
+
+
+class TestPeerTransferModule(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestPeerTransferModule, self).setUp()
+        self.flags(secret='secret', chunk_size=1, group='image_peer')
+        self.flags(peers=['peer1:9393', 'peer2:9393', 'peer3:9393'],
+                   group='image_peer')
+        self.dst_path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'image')
+        self.url_parts = urlparse.urlparse('peer:///image-id')
+        self.metadata = {'checksum': CHECKSUM, 'size': len(IMAGE_DATA)}
+        self.session = mock.Mock()
+        self.useFixture(fixtures.MonkeyPatch(
+            'requests.Session', lambda: self.session))
+
+    def _response(self, status_code, checksum=CHECKSUM,
+                  size=len(IMAGE_DATA)):
+        resp = mock.Mock(status_code=status_code)
+        resp.headers = {'ETag': '"%s"' % checksum,
+                        'Content-Length': str(size)}
+        return resp
+
+    def _head(self, url, headers, timeout):
+        self.assertEqual(tm_peer._signed_headers('image-id'), headers)
+        if url.startswith('http://peer1:9393/'):
+            return self._response(200)
+        if url.startswith('http://peer2:9393/'):
+            return self._response(200, checksum='other')
+        raise requests.ConnectionError()
+
+    @mock.patch('time.time', return_value=1000.5)
+    @mock.patch('nova.image.parallel_download.download')
+    def test_download(self, mock_download, mock_time):
+        self.session.head.side_effect = self._head
+
+        tm_peer.PeerTransfer().download(mock.sentinel.ctx, self.url_parts,
+                                        self.dst_path, self.metadata)
+
+        self.assertEqual(3, self.session.head.call_count)
+        mock_download.assert_called_once_with(
+            'image-id', len(IMAGE_DATA), mock.ANY, self.dst_path, 1024 * 1024,
+            4, checksum=CHECKSUM, retries=1)
+
+        fetch_range = mock_download.call_args[0][2]
+        self.session.get.return_value = self._response(206)
+        self.session.get.return_value.iter_content.return_value = [b'data']
+        self.assertEqual([b'data'], fetch_range(10, 19))
+        self.session.get.assert_called_once_with(
+            'http://peer1:9393/images/image-id',
+            headers={tm_peer.TIMESTAMP_HEADER: '1000',
+                     tm_peer.SIGNATURE_HEADER: tm_peer._sign('image-id',
+                                                             '1000'),
+                     'Range': 'bytes=10-19'},
+            stream=True, timeout=30)
+
+        self.session.get.return_value = self._response(200)
+        self.assertRaises(IOError, fetch_range, 10, 19)
+
+    def test_download_no_peer(self):
+        self.session.head.return_value = self._response(404)
+
+        self.assertRaises(exception.ImageDownloadModuleError,
+                          tm_peer.PeerTransfer().download, mock.sentinel.ctx,
+                          self.url_parts, self.dst_path, self.metadata)
+
+    def test_download_no_checksum(self):
+        self.assertRaises(exception.ImageDownloadModuleMetaDataError,
+                          tm_peer.PeerTransfer().download, mock.sentinel.ctx,
+                          self.url_parts, self.dst_path, {'size': 10})
+        self.assertFalse(self.session.head.called)
+
+    def test_get_schemes(self):
+        self.assertEqual(['peer'], tm_peer.get_schemes())
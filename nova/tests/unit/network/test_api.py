@@ -547,6 +547,40 @@ class ApiTestCase(test.TestCase):
                                             update_cells=False)
         self.assertEqual(fake_result, result)
 
+    @mock.patch('oslo_concurrency.lockutils.lock')
+    @mock.patch.object(api.API, '_get_instance_nw_info')
+    @mock.patch('nova.network.base_api.update_instance_cache_with_nw_info')
+    def test_get_instances_nw_info(self, mock_update, mock_get, mock_lock):
+        unchanged = fake_instance.fake_instance_obj(
+            self.context, uuid=uuids.unchanged)
+        unchanged.info_cache = objects.InstanceInfoCache(
+            network_info=network_model.NetworkInfo(
+                [network_model.VIF(id='vif1', address='fa:16:3e:00:00:01')]))
+        changed = fake_instance.fake_instance_obj(self.context,
+                                                  uuid=uuids.changed)
+        changed.info_cache = objects.InstanceInfoCache(
+            network_info=network_model.NetworkInfo())
+        deleted = fake_instance.fake_instance_obj(self.context,
+                                                  uuid=uuids.deleted)
+        nw_info = network_model.NetworkInfo(
+            [network_model.VIF(id='vif1', address='fa:16:3e:00:00:01')])
+        mock_get.side_effect = [
+            nw_info, nw_info, exception.InstanceNotFound(instance_id='fake')]
+
+        result = self.network_api.get_instances_nw_info(
+            self.context, [unchanged, changed, deleted])
+
+        self.assertEqual({uuids.unchanged: nw_info, uuids.changed: nw_info},
+                         result)
+        # Only the info cache which changed is saved
+        mock_update.assert_called_once_with(self.network_api, self.context,
+                                            changed, nw_info=nw_info,
+                                            update_cells=False)
+        mock_lock.assert_has_calls([
+            mock.call('refresh_cache-%s' % uuids.unchanged),
+            mock.call('refresh_cache-%s' % uuids.changed),
+            mock.call('refresh_cache-%s' % uuids.deleted)], any_order=True)
+
 
 @mock.patch('nova.network.api.API')
 @mock.patch('nova.db.instance_info_cache_update', return_value=fake_info_cache)
@@ -18,6 +18,8 @@ import collections
 import copy
 import uuid
 
+import eventlet
+import fixtures
 from keystoneauth1.fixture import V2Token
 from keystoneauth1 import loading as ks_loading
 import mock
@@ -3650,6 +3652,87 @@ class TestNeutronv2WithMock(test.TestCase):
                                             mock.ANY,
                                             mock.ANY)
 
+    def _allocate_ports_concurrently(self, create_port, error=None):
+        nets = [{'id': 'net-%d' % i, 'subnets': ['subnet-%d' % i]}
+                for i in range(4)]
+        nw_req = objects.NetworkRequestList(
+            objects=[objects.NetworkRequest(network_id=net['id'])
+                     for net in nets])
+        instance = objects.Instance(project_id='proj-1',
+                                    availability_zone='nova',
+                                    uuid=uuids.instance)
+        self.flags(port_concurrency=2, group='neutron')
+        with test.nested(
+            mock.patch.object(neutronapi, 'get_client'),
+            mock.patch.object(self.api, '_has_port_binding_extension',
+                              return_value=False),
+            mock.patch.object(self.api, '_process_requested_networks',
+                              return_value=({}, [], nw_req.objects, None)),
+            mock.patch.object(self.api, '_get_available_networks',
+                              return_value=nets),
+            mock.patch.object(self.api, '_process_security_groups',
+                              return_value=[]),
+            mock.patch.object(self.api, '_populate_neutron_extension_values'),
+            mock.patch.object(self.api, '_create_port',
+                              side_effect=create_port),
+            mock.patch.object(self.api, '_update_port_dns_name'),
+            mock.patch.object(self.api, '_unbind_ports'),
+            mock.patch.object(self.api, '_delete_ports'),
+            mock.patch.object(self.api, 'get_instance_nw_info',
+                              return_value=model.NetworkInfo([]))
+        ) as (get_client, has_pbe, process_nets, get_nets, process_sgs,
+              populate, mock_create, dns_name, unbind, delete, nw_info):
+            if error:
+                self.assertRaises(error, self.api.allocate_for_instance,
+                                  self.context, instance,
+                                  requested_networks=nw_req)
+            else:
+                self.api.allocate_for_instance(self.context, instance,
+                                               requested_networks=nw_req)
+        return nw_info, unbind, delete
+
+    def test_allocate_for_instance_concurrent_ports(self):
+        in_progress = []
+        max_in_progress = []
+
+        def create_port(port_client, instance, network_id, *args):
+            in_progress.append(network_id)
+            max_in_progress.append(len(in_progress))
+            # Let the other ports be created meanwhile
+            eventlet.sleep(0.01 if network_id == 'net-0' else 0)
+            in_progress.remove(network_id)
+            return 'port-' + network_id
+
+        nw_info, unbind, delete = self._allocate_ports_concurrently(
+            create_port)
+
+        self.assertEqual(2, max(max_in_progress))
+        # The ports are in the requested order, whatever the order in which
+        # they were created
+        self.assertEqual(['port-net-%d' % i for i in range(4)],
+                         nw_info.call_args[1]['port_ids'])
+        self.assertFalse(unbind.called)
+        self.assertFalse(delete.called)
+
+    def test_allocate_for_instance_concurrent_ports_fail(self):
+        def create_port(port_client, instance, network_id, *args):
+            if network_id == 'net-0':
+                # The second port is created meanwhile
+                eventlet.sleep(0.01)
+                raise exception.PortLimitExceeded()
+            return 'port-' + network_id
+
+        nw_info, unbind, delete = self._allocate_ports_concurrently(
+            create_port, error=exception.PortLimitExceeded)
+
+        self.assertFalse(nw_info.called)
+        unbind.assert_called_once_with(self.context, [], mock.ANY, mock.ANY)
+        # The ports created while the first one failed are deleted
+        delete.assert_called_once_with(mock.ANY, mock.ANY, mock.ANY)
+        created_port_ids = delete.call_args[0][2]
+        self.assertIn('port-net-1', created_port_ids)
+        self.assertNotIn('port-net-0', created_port_ids)
+
     @mock.patch('nova.network.neutronv2.api.API._process_requested_networks')
     @mock.patch('nova.network.neutronv2.api.API._has_port_binding_extension')
     @mock.patch('nova.network.neutronv2.api.API._get_available_networks')
@@ -3924,6 +4007,198 @@ class TestNeutronv2WithMock(test.TestCase):
                          actual_obj.obj_to_primitive())
 
 
+class FakeNeutronClient(object):
+    """In-process neutron client listing the resources it was given."""
+
+    def __init__(self, **resources):
+        self.resources = resources
+        self.calls = []
+
+    def _list(self, name, **search_opts):
+        self.calls.append((name, search_opts))
+
+        def match(resource):
+            for key, value in search_opts.items():
+                values = value if isinstance(value, list) else [value]
+                if resource.get(key) not in values:
+                    return False
+            return True
+
+        return {name: [copy.deepcopy(resource)
+                       for resource in self.resources.get(name, [])
+                       if match(resource)]}
+
+    def list_ports(self, **search_opts):
+        return self._list('ports', **search_opts)
+
+    def list_networks(self, **search_opts):
+        return self._list('networks', **search_opts)
+
+    def list_subnets(self, **search_opts):
+        return self._list('subnets', **search_opts)
+
+    def list_floatingips(self, **search_opts):
+        return self._list('floatingips', **search_opts)
+
+
+class TestNeutronv2BulkNetworkInfo(test.NoDBTestCase):
+    """Test the network info of several instances built at once."""
+
+    def setUp(self):
+        super(TestNeutronv2BulkNetworkInfo, self).setUp()
+        self.api = neutronapi.API()
+        self.context = context.get_admin_context()
+        self.instances = []
+        ports = []
+        for i in range(3):
+            instance = fake_instance.fake_instance_obj(
+                self.context, uuid=getattr(uuids, 'instance%d' % i),
+                project_id='fake-project')
+            port = {'id': 'port%d' % i,
+                    'device_id': instance.uuid,
+                    'device_owner': 'compute:nova',
+                    'tenant_id': 'fake-project',
+                    'network_id': 'net1',
+                    'admin_state_up': True,
+                    'status': 'ACTIVE',
+                    'mac_address': 'fa:16:3e:00:00:0%d' % i,
+                    'fixed_ips': [{'ip_address': '10.0.0.%d' % (i + 10),
+                                   'subnet_id': 'subnet1'}],
+                    'binding:vif_type': model.VIF_TYPE_OVS}
+            instance.info_cache = objects.InstanceInfoCache(
+                network_info=model.NetworkInfo([model.VIF(
+                    id=port['id'], network=model.Network(id='net1'))]))
+            self.instances.append(instance)
+            ports.append(port)
+        ports.append({'id': 'dhcp',
+                      'device_id': 'dhcp-device',
+                      'device_owner': 'network:dhcp',
+                      'tenant_id': 'fake-project',
+                      'network_id': 'net1',
+                      'fixed_ips': [{'ip_address': '10.0.0.2',
+                                     'subnet_id': 'subnet1'}]})
+        self.client = FakeNeutronClient(
+            ports=ports,
+            networks=[{'id': 'net1', 'name': 'private',
+                       'tenant_id': 'fake-project'}],
+            subnets=[{'id': 'subnet1', 'network_id': 'net1',
+                      'cidr': '10.0.0.0/24', 'gateway_ip': '10.0.0.1',
+                      'dns_nameservers': ['8.8.8.8']}],
+            floatingips=[{'id': 'fip1', 'port_id': 'port1',
+                          'fixed_ip_address': '10.0.0.11',
+                          'floating_ip_address': '172.24.4.3'}])
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.network.neutronv2.api.get_client',
+            lambda context, admin=False: self.client))
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.compute.utils.refresh_info_cache_for_instance',
+            lambda context, instance: None))
+        patcher = mock.patch(
+            'nova.network.base_api.update_instance_cache_with_nw_info')
+        self.mock_update = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_instances_nw_info(self):
+        nw_infos = self.api.get_instances_nw_info(self.context,
+                                                  self.instances)
+
+        self.assertEqual(set(instance.uuid for instance in self.instances),
+                         set(nw_infos))
+        for i, instance in enumerate(self.instances):
+            vifs = nw_infos[instance.uuid]
+            self.assertEqual(['port%d' % i], [vif['id'] for vif in vifs])
+            self.assertEqual('private', vifs[0]['network']['label'])
+            subnet = vifs[0]['network']['subnets'][0]
+            self.assertEqual('10.0.0.0/24', subnet['cidr'])
+            self.assertEqual('10.0.0.2', subnet.get_meta('dhcp_server'))
+            self.assertEqual(['10.0.0.%d' % (i + 10)],
+                             [ip['address'] for ip in subnet['ips']])
+        floating_ips = nw_infos[uuids.instance1][0].floating_ips()
+        self.assertEqual(['172.24.4.3'],
+                         [ip['address'] for ip in floating_ips])
+        self.assertEqual(3, self.mock_update.call_count)
+        # A single call for each kind of resource
+        self.assertEqual(['ports', 'floatingips', 'networks', 'subnets',
+                          'ports'],
+                         [name for name, search_opts in self.client.calls])
+
+    def test_get_instances_nw_info_cached_resources(self):
+        self.api.get_instances_nw_info(self.context, self.instances[:1])
+        self.client.calls = []
+
+        self.api.get_instances_nw_info(self.context, self.instances[1:])
+
+        # The networks, subnets and DHCP ports come from the cache
+        self.assertEqual(['ports', 'floatingips'],
+                         [name for name, search_opts in self.client.calls])
+
+    def test_get_instances_nw_info_no_cache(self):
+        self.flags(resource_cache_ttl=0, group='neutron')
+        self.api.get_instances_nw_info(self.context, self.instances[:1])
+        self.client.calls = []
+
+        self.api.get_instances_nw_info(self.context, self.instances[1:])
+
+        self.assertEqual(5, len(self.client.calls))
+
+    @mock.patch('time.time')
+    def test_get_instances_nw_info_cache_purged(self, mock_time):
+        mock_time.return_value = 100
+        self.api.get_instances_nw_info(self.context, self.instances[:1])
+        cache = self.api._resource_cache
+        cache._networks['gone'] = (100, None)
+        self.assertIn('net1', cache._networks)
+
+        mock_time.return_value = 100 + CONF.neutron.resource_cache_ttl
+        self.assertEqual({}, cache.get_networks(self.client, []))
+
+        # All the expired entries are dropped, even the ones which were
+        # not requested or not found
+        self.assertEqual({}, cache._networks)
+
+    def test_get_instances_nw_info_port_attached_meanwhile(self):
+        instance = self.instances[0]
+        instance.info_cache.network_info.append(model.VIF(
+            id='port9', network=model.Network(id='net1')))
+        self.client.resources['ports'].append(
+            {'id': 'port9',
+             'device_id': 'other-device',
+             'device_owner': 'compute:nova',
+             'tenant_id': 'fake-project',
+             'network_id': 'net1',
+             'admin_state_up': True,
+             'status': 'ACTIVE',
+             'mac_address': 'fa:16:3e:00:00:09',
+             'fixed_ips': [],
+             'binding:vif_type': model.VIF_TYPE_OVS})
+
+        def attach(context, instance):
+            self.client.resources['ports'][-1]['device_id'] = instance.uuid
+
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.compute.utils.refresh_info_cache_for_instance', attach))
+
+        nw_infos = self.api.get_instances_nw_info(self.context, [instance])
+
+        # The ports of the instance were listed again
+        self.assertEqual(['port0', 'port9'],
+                         [vif['id'] for vif in nw_infos[instance.uuid]])
+        self.assertIn(('ports', {'tenant_id': 'fake-project',
+                                 'device_id': instance.uuid}),
+                      self.client.calls)
+
+    def test_get_instances_nw_info_instance_deleted(self):
+        with mock.patch.object(
+                self.api, '_build_network_info_model',
+                side_effect=[exception.InstanceNotFound(instance_id='fake'),
+                             model.NetworkInfo(), model.NetworkInfo()]):
+            nw_infos = self.api.get_instances_nw_info(self.context,
+                                                      self.instances)
+
+        self.assertEqual(set([uuids.instance1, uuids.instance2]),
+                         set(nw_infos))
+
+
 class TestNeutronv2ModuleMethods(test.NoDBTestCase):
 
     def test_gather_port_ids_and_networks_wrong_params(self):
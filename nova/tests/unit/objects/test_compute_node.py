@@ -382,6 +382,21 @@ class _TestComputeNodeObject(object):
                          subs=self.subs(),
                          comparators=self.comparators())
 
+    @mock.patch('nova.db.compute_node_get_all_updated_since')
+    def test_get_all_updated_since(self, cn_get_all_updated_since):
+        def fake_get_all_updated_since(context, since):
+            self.assertEqual('yes', context.read_deleted)
+            return [fake_compute_node]
+
+        cn_get_all_updated_since.side_effect = fake_get_all_updated_since
+        computes = compute_node.ComputeNodeList.get_all_updated_since(
+            self.context, NOW)
+        self.assertEqual(1, len(computes))
+        self.compare_obj(computes[0], fake_compute_node,
+                         subs=self.subs(),
+                         comparators=self.comparators())
+        self.assertEqual('no', self.context.read_deleted)
+
     @mock.patch('nova.db.compute_nodes_get_by_service_id')
     def test__get_by_service(self, cn_get_by_svc_id):
         cn_get_by_svc_id.return_value = [fake_compute_node]
@@ -1109,7 +1109,7 @@ object_data = {
     'BuildRequest': '1.0-c6cd434db5cbdb4d1ebb935424261377',
     'CellMapping': '1.0-7f1a7e85a22bbb7559fc730ab658b9bd',
     'ComputeNode': '1.16-2436e5b836fa0306a3c4e6d9e5ddacec',
-    'ComputeNodeList': '1.14-3b6f4f5ade621c40e70cb116db237844',
+    'ComputeNodeList': '1.15-16d40bd6cb17b8042512c6e22797e8c3',
     'DNSDomain': '1.0-7b0b2dab778454b6a7b6c66afe163a1a',
     'DNSDomainList': '1.0-4ee0d9efdfd681fed822da88376e04d2',
     'Destination': '1.0-4c59dd1288b2e7adbda6051a2de59183',
@@ -1204,6 +1204,7 @@ object_data = {
     'VirtualInterface': '1.1-422f46c1eaa24a1f63d3360c199cc7c0',
     'VirtualInterfaceList': '1.0-9750e2074437b3077e46359102779fc6',
     'VolumeUsage': '1.0-6c8190c46ce1469bb3286a1f21c2e475',
+    'VolumeUsageList': '1.0-6ef6f1ba9a2f716a6447a753a8d66824',
     'XenapiLiveMigrateData': '1.0-5f982bec68f066e194cd9ce53a24ac4c',
 }
 
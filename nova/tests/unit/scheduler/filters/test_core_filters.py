@@ -13,6 +13,7 @@
 import mock
 
 from nova import objects
+from nova.scheduler import columns
 from nova.scheduler.filters import core_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -50,6 +51,28 @@ class TestCoreFilter(test.NoDBTestCase):
                  'cpu_allocation_ratio': 2})
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
 
+    def test_core_filter_vectorized(self):
+        self.filt_cls = core_filter.CoreFilter()
+        spec_obj = objects.RequestSpec(flavor=objects.Flavor(vcpus=2))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 4, 'vcpus_used': 6,
+                 'cpu_allocation_ratio': 2}),
+            fakes.FakeHostState('host2', 'node2', {}),
+            fakes.FakeHostState('host3', 'node3',
+                {'vcpus_total': 4, 'vcpus_used': 7,
+                 'cpu_allocation_ratio': 2}),
+            fakes.FakeHostState('host4', 'node4',
+                {'vcpus_total': 1, 'vcpus_used': 0,
+                 'cpu_allocation_ratio': 2})]
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, True, False, False], passes.tolist())
+        self.assertEqual(4 * 2, hosts[0].limits['vcpu'])
+        self.assertEqual({}, hosts[1].limits)
+        self.assertEqual(4 * 2, hosts[2].limits['vcpu'])
+        self.assertEqual(1 * 2, hosts[3].limits['vcpu'])
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_core_filter_value_error(self, agg_mock):
         self.filt_cls = core_filter.AggregateCoreFilter()
@@ -92,3 +115,24 @@ class TestCoreFilter(test.NoDBTestCase):
         # use the minimum ratio from aggregates
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
         self.assertEqual(4 * 2, host.limits['vcpu'])
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_core_filter_vectorized(self, agg_mock):
+        self.filt_cls = core_filter.AggregateCoreFilter()
+        spec_obj = objects.RequestSpec(
+            context=mock.sentinel.ctx, flavor=objects.Flavor(vcpus=1))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 4, 'vcpus_used': 8,
+                 'cpu_allocation_ratio': 2}),
+            fakes.FakeHostState('host2', 'node2',
+                {'vcpus_total': 4, 'vcpus_used': 8,
+                 'cpu_allocation_ratio': 2,
+                 'aggregates': [mock.sentinel.aggregate]})]
+        agg_mock.return_value = set(['3'])
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([False, True], passes.tolist())
+        agg_mock.assert_called_once_with(hosts[1], 'cpu_allocation_ratio')
+        self.assertEqual(4 * 2, hosts[0].limits['vcpu'])
+        self.assertEqual(4 * 3, hosts[1].limits['vcpu'])
@@ -13,6 +13,7 @@
 import mock
 
 from nova import objects
+from nova.scheduler import columns
 from nova.scheduler.filters import disk_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -65,6 +66,24 @@ class TestDiskFilter(test.NoDBTestCase):
                  'disk_allocation_ratio': 10.0})
         self.assertFalse(filt_cls.host_passes(host, spec_obj))
 
+    def test_disk_filter_vectorized(self):
+        filt_cls = disk_filter.DiskFilter()
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(
+                root_gb=100, ephemeral_gb=18, swap=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 12,
+                 'disk_allocation_ratio': 10.0}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 13,
+                 'disk_allocation_ratio': 1.0})]
+        passes = filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False], passes.tolist())
+        self.assertEqual(12 * 10.0, hosts[0].limits['disk_gb'])
+        self.assertEqual({}, hosts[1].limits)
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_disk_filter_value_error(self, agg_mock):
         filt_cls = disk_filter.AggregateDiskFilter()
@@ -98,3 +117,27 @@ class TestDiskFilter(test.NoDBTestCase):
 
         agg_mock.return_value = set(['2'])
         self.assertTrue(filt_cls.host_passes(host, spec_obj))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_disk_filter_vectorized(self, agg_mock):
+        filt_cls = disk_filter.AggregateDiskFilter()
+        spec_obj = objects.RequestSpec(
+            context=mock.sentinel.ctx,
+            flavor=objects.Flavor(
+                root_gb=2, ephemeral_gb=1, swap=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                                {'free_disk_mb': 3 * 1024,
+                                 'total_usable_disk_gb': 1,
+                                 'disk_allocation_ratio': 1.0}),
+            fakes.FakeHostState('host2', 'node2',
+                                {'free_disk_mb': 3 * 1024,
+                                 'total_usable_disk_gb': 1,
+                                 'disk_allocation_ratio': 1.0,
+                                 'aggregates': [mock.sentinel.aggregate]})]
+        agg_mock.return_value = set(['2'])
+        passes = filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([False, True], passes.tolist())
+        agg_mock.assert_called_once_with(hosts[1], 'disk_allocation_ratio')
+        self.assertEqual(1 * 2.0, hosts[1].limits['disk_gb'])
@@ -14,6 +14,7 @@
 import mock
 
 from nova import objects
+from nova.scheduler import columns
 from nova.scheduler.filters import io_ops_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -37,6 +38,17 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         spec_obj = objects.RequestSpec()
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
 
+    def test_filter_num_iops_vectorized(self):
+        self.flags(max_io_ops_per_host=8)
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'num_io_ops': num_io_ops})
+                 for i, num_io_ops in enumerate([7, 8, 0])]
+        spec_obj = objects.RequestSpec()
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False, True], passes.tolist())
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_filter_num_iops_value(self, agg_mock):
         self.flags(max_io_ops_per_host=7)
@@ -60,3 +72,23 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_io_ops_per_host')
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_filter_num_iops_vectorized(self, agg_mock):
+        self.flags(max_io_ops_per_host=7)
+        self.filt_cls = io_ops_filter.AggregateIoOpsFilter()
+        hosts = [
+            fakes.FakeHostState('host1', 'node1', {'num_io_ops': 7}),
+            fakes.FakeHostState('host2', 'node2',
+                                {'num_io_ops': 7,
+                                 'aggregates': [mock.sentinel.aggregate]})]
+        agg_mock.return_value = set(['XXX'])
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([False, False], passes.tolist())
+        agg_mock.assert_called_once_with(hosts[1], 'max_io_ops_per_host')
+        agg_mock.return_value = set(['8'])
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([False, True], passes.tolist())
@@ -13,6 +13,7 @@
 import mock
 
 from nova import objects
+from nova.scheduler import columns
 from nova.scheduler.filters import num_instances_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -36,6 +37,17 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         spec_obj = objects.RequestSpec()
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
 
+    def test_filter_num_instances_vectorized(self):
+        self.flags(max_instances_per_host=5)
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'num_instances': num_instances})
+                 for i, num_instances in enumerate([4, 5, 0, 6])]
+        spec_obj = objects.RequestSpec()
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([True, False, True, False], passes.tolist())
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_filter_aggregate_num_instances_value(self, agg_mock):
         self.flags(max_instances_per_host=4)
@@ -60,3 +72,20 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         agg_mock.return_value = set(['XXX'])
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_instances_per_host')
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_filter_aggregate_num_instances_vectorized(self, agg_mock):
+        self.flags(max_instances_per_host=4)
+        self.filt_cls = num_instances_filter.AggregateNumInstancesFilter()
+        hosts = [
+            fakes.FakeHostState('host1', 'node1', {'num_instances': 5}),
+            fakes.FakeHostState('host2', 'node2',
+                                {'num_instances': 5,
+                                 'aggregates': [mock.sentinel.aggregate]}),
+            fakes.FakeHostState('host3', 'node3', {'num_instances': 3})]
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        agg_mock.return_value = set(['6'])
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([False, True, True], passes.tolist())
+        agg_mock.assert_called_once_with(hosts[1], 'max_instances_per_host')
@@ -13,6 +13,7 @@
 import mock
 
 from nova import objects
+from nova.scheduler import columns
 from nova.scheduler.filters import ram_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -57,6 +58,30 @@ class TestRamFilter(test.NoDBTestCase):
                  'ram_allocation_ratio': 2.0})
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
 
+    def test_ram_filter_vectorized(self):
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(memory_mb=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024,
+                 'ram_allocation_ratio': 1.0}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': 1024, 'total_usable_ram_mb': 1024,
+                 'ram_allocation_ratio': 1.0}),
+            fakes.FakeHostState('host3', 'node3',
+                {'free_ram_mb': -1024, 'total_usable_ram_mb': 2048,
+                 'ram_allocation_ratio': 2.0}),
+            fakes.FakeHostState('host4', 'node4',
+                {'free_ram_mb': 512, 'total_usable_ram_mb': 512,
+                 'ram_allocation_ratio': 2.0})]
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([False, True, True, False], passes.tolist())
+        self.assertEqual([host.host for host in hosts if host.limits],
+                         ['host2', 'host3'])
+        self.assertEqual(1024 * 1.0, hosts[1].limits['memory_mb'])
+        self.assertEqual(2048 * 2.0, hosts[2].limits['memory_mb'])
+
 
 @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
 class TestAggregateRamFilter(test.NoDBTestCase):
@@ -102,3 +127,23 @@ class TestAggregateRamFilter(test.NoDBTestCase):
         # use the minimum ratio from aggregates
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         self.assertEqual(1024 * 1.5, host.limits['memory_mb'])
+
+    def test_aggregate_ram_filter_vectorized(self, agg_mock):
+        spec_obj = objects.RequestSpec(
+            context=mock.sentinel.ctx,
+            flavor=objects.Flavor(memory_mb=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024,
+                 'ram_allocation_ratio': 1.0}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024,
+                 'ram_allocation_ratio': 1.0,
+                 'aggregates': [mock.sentinel.aggregate]})]
+        agg_mock.return_value = set(['1.5', '2.0'])
+        passes = self.filt_cls.filter_all_vectorized(
+            columns.HostStateColumns(hosts), spec_obj)
+        self.assertEqual([False, True], passes.tolist())
+        agg_mock.assert_called_once_with(hosts[1], 'ram_allocation_ratio')
+        self.assertEqual({}, hosts[0].limits)
+        self.assertEqual(1024 * 1.5, hosts[1].limits['memory_mb'])
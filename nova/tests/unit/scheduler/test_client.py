@@ -17,13 +17,16 @@ import mock
 import oslo_messaging as messaging
 
 from nova import context
+from nova import exception
 from nova import objects
 from nova.objects import pci_device_pool
 from nova.scheduler import client as scheduler_client
 from nova.scheduler.client import query as scheduler_query_client
 from nova.scheduler.client import report as scheduler_report_client
+from nova.scheduler import partitioning
 from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova import test
+from nova.tests import fixtures
 """Tests for Scheduler Client."""
 
 
@@ -115,6 +118,146 @@ class SchedulerQueryClientTestCase(test.NoDBTestCase):
             self.context, aggregate)
 
 
+class SchedulerQueryClientPartitionedTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(SchedulerQueryClientPartitionedTestCase, self).setUp()
+        self.flags(scheduler_partitioning=True)
+        self.useFixture(fixtures.SpawnIsSynchronousFixture())
+        self.context = context.get_admin_context()
+        self.client = scheduler_query_client.SchedulerQueryClient()
+        self.partitioner = mock.Mock(spec=partitioning.SchedulerPartitioner)
+        self.partitioner.members = ['sched1', 'sched2']
+        self.client.partitioner = self.partitioner
+        self.answers = {
+            'sched1': [{'host': 'host1', 'nodename': 'node1', 'limits': {},
+                        'weight': 1.0},
+                       {'host': 'host1', 'nodename': 'node1', 'limits': {},
+                        'weight': 0.2}],
+            'sched2': [{'host': 'host2', 'nodename': 'node2', 'limits': {},
+                        'weight': 0.8},
+                       {'host': 'host3', 'nodename': 'node3', 'limits': {},
+                        'weight': 0.7}],
+        }
+
+    def _select_destinations(self, ctxt, spec_obj, server=None,
+                             partial=False):
+        answer = self.answers[server]
+        if isinstance(answer, Exception):
+            raise answer
+        return [dict(dest) for dest in answer]
+
+    def _test_select_destinations(self, spec_obj):
+        with test.nested(
+            mock.patch.object(
+                scheduler_rpcapi.SchedulerAPI, 'select_destinations',
+                side_effect=self._select_destinations),
+            mock.patch.object(
+                scheduler_rpcapi.SchedulerAPI, 'release_destinations'),
+        ) as (mock_select, self.mock_release):
+            dests = self.client.select_destinations(self.context, spec_obj)
+        self.partitioner.refresh.assert_called_once_with(self.context)
+        mock_select.assert_has_calls([
+            mock.call(self.context, spec_obj, server='sched1', partial=True),
+            mock.call(self.context, spec_obj, server='sched2', partial=True)])
+        return dests
+
+    def test_constructor(self):
+        self.assertIsInstance(
+            scheduler_query_client.SchedulerQueryClient().partitioner,
+            partitioning.SchedulerPartitioner)
+
+    def test_select_destinations_single_scheduler(self):
+        self.partitioner.members = ['sched1']
+        fake_spec = objects.RequestSpec()
+        with mock.patch.object(scheduler_rpcapi.SchedulerAPI,
+                               'select_destinations') as mock_select:
+            self.client.select_destinations(self.context, fake_spec)
+        mock_select.assert_called_once_with(self.context, fake_spec)
+
+    def test_select_destinations_merges_best_weighed(self):
+        fake_spec = objects.RequestSpec(num_instances=3, instance_group=None)
+        dests = self._test_select_destinations(fake_spec)
+        self.assertEqual(
+            [{'host': 'host1', 'nodename': 'node1', 'limits': {}},
+             {'host': 'host2', 'nodename': 'node2', 'limits': {}},
+             {'host': 'host3', 'nodename': 'node3', 'limits': {}}],
+            dests)
+        # host1 is kept for one of the two instances of sched1
+        self.assertFalse(self.mock_release.called)
+
+    def test_select_destinations_releases_unused(self):
+        fake_spec = objects.RequestSpec(num_instances=1, instance_group=None)
+        dests = self._test_select_destinations(fake_spec)
+        self.assertEqual(['host1'], [dest['host'] for dest in dests])
+        self.mock_release.assert_called_once_with(
+            self.context,
+            [{'host': 'host2', 'nodename': 'node2'},
+             {'host': 'host3', 'nodename': 'node3'}],
+            server='sched2')
+
+    def test_select_destinations_across_partitions(self):
+        # Neither scheduler finds room for all of the instances
+        self.answers['sched1'] = self.answers['sched1'][:1]
+        self.answers['sched2'] = self.answers['sched2'][:1]
+        fake_spec = objects.RequestSpec(num_instances=2, instance_group=None)
+        dests = self._test_select_destinations(fake_spec)
+        self.assertEqual(['host1', 'host2'],
+                         [dest['host'] for dest in dests])
+        self.assertFalse(self.mock_release.called)
+
+    def test_select_destinations_server_group(self):
+        fake_spec = objects.RequestSpec(
+            num_instances=2, instance_group=objects.InstanceGroup())
+        dests = self._test_select_destinations(fake_spec)
+        # sched2 has the best total weight
+        self.assertEqual(['host2', 'host3'],
+                         [dest['host'] for dest in dests])
+        self.mock_release.assert_called_once_with(
+            self.context, [{'host': 'host1', 'nodename': 'node1'}],
+            server='sched1')
+
+    def test_select_destinations_server_group_partial(self):
+        # The best weighed answer doesn't hold all of the instances
+        self.answers['sched2'] = self.answers['sched2'][:1]
+        self.answers['sched2'][0]['weight'] = 2.0
+        fake_spec = objects.RequestSpec(
+            num_instances=2, instance_group=objects.InstanceGroup())
+        dests = self._test_select_destinations(fake_spec)
+        self.assertEqual(['host1', 'host1'],
+                         [dest['host'] for dest in dests])
+        self.mock_release.assert_called_once_with(
+            self.context, [{'host': 'host2', 'nodename': 'node2'}],
+            server='sched2')
+
+    def test_select_destinations_one_partition_without_host(self):
+        self.answers['sched2'] = exception.NoValidHost(reason='')
+        fake_spec = objects.RequestSpec(num_instances=2, instance_group=None)
+        dests = self._test_select_destinations(fake_spec)
+        self.assertEqual(['host1', 'host1'],
+                         [dest['host'] for dest in dests])
+
+    def test_select_destinations_no_valid_host(self):
+        self.answers['sched2'] = exception.NoValidHost(reason='')
+        fake_spec = objects.RequestSpec(num_instances=3, instance_group=None)
+        self.assertRaises(exception.NoValidHost,
+                          self._test_select_destinations, fake_spec)
+        self.mock_release.assert_called_once_with(
+            self.context, [{'host': 'host1', 'nodename': 'node1'}],
+            server='sched1')
+
+    def test_select_destinations_timeout(self):
+        self.answers['sched1'] = messaging.MessagingTimeout()
+        fake_spec = objects.RequestSpec(num_instances=1, instance_group=None)
+        dests = self._test_select_destinations(fake_spec)
+        self.assertEqual(['host2'], [dest['host'] for dest in dests])
+
+        self.partitioner.refresh.reset_mock()
+        self.answers['sched2'] = messaging.MessagingTimeout()
+        self.assertRaises(messaging.MessagingTimeout,
+                          self._test_select_destinations, fake_spec)
+
+
 class SchedulerClientTestCase(test.NoDBTestCase):
 
     def setUp(self):
@@ -0,0 +1,100 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the columnar view of host states.
+"""
+
+import mock
+
+from nova.objects import monitor_metric
+from nova.scheduler import columns
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+class HostStateColumnsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(HostStateColumnsTestCase, self).setUp()
+        self.hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                                {'free_ram_mb': 512, 'num_instances': 1}),
+            fakes.FakeHostState('host2', 'node2',
+                                {'free_ram_mb': 1024, 'num_instances': 2,
+                                 'aggregates': [mock.sentinel.aggregate]}),
+            fakes.FakeHostState('host3', 'node3',
+                                {'free_ram_mb': None, 'num_instances': 3})]
+        self.columns = columns.HostStateColumns(self.hosts)
+
+    def test_get(self):
+        self.assertEqual(3, len(self.columns))
+        self.assertEqual([1, 2, 3], self.columns.get('num_instances').tolist())
+        self.assertIs(self.columns.get('num_instances'),
+                      self.columns.get('num_instances'))
+
+    def test_get_none_values(self):
+        free_ram_mb = self.columns.get('free_ram_mb')
+        self.assertEqual([512, 1024], free_ram_mb[:2].tolist())
+        self.assertTrue(columns.numpy.isnan(free_ram_mb[2]))
+        self.assertEqual([512, 1024, 0],
+                         self.columns.get('free_ram_mb', default=0).tolist())
+
+    def test_get_metric(self):
+        self.hosts[0].metrics = monitor_metric.MonitorMetricList(objects=[
+            monitor_metric.MonitorMetric(name='cpu.idle.time', value=512)])
+        self.hosts[1].metrics = monitor_metric.MonitorMetricList(objects=[])
+        self.hosts[2].metrics = None
+        metric_values = self.columns.get_metric('cpu.idle.time')
+        self.assertEqual(512, metric_values[0])
+        self.assertTrue(columns.numpy.isnan(metric_values[1:]).all())
+
+    def test_select(self):
+        self.columns.get('num_instances')
+        selected = self.columns.select([True, False, True])
+        self.assertEqual([self.hosts[0], self.hosts[2]], selected.objs)
+        self.assertEqual([1, 3], selected.get('num_instances').tolist())
+
+    def test_set_limits(self):
+        self.columns.set_limits('memory_mb',
+                                columns.numpy.array([1.5, 2.5, 3.5]),
+                                [False, True, True])
+        self.assertEqual({}, self.hosts[0].limits)
+        self.assertEqual({'memory_mb': 2.5}, self.hosts[1].limits)
+        self.assertEqual({'memory_mb': 3.5}, self.hosts[2].limits)
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_get_aggregate_values(self, agg_mock):
+        agg_mock.return_value = set(['4', '6'])
+        values = self.columns.get_aggregate_values(
+            'max_instances_per_host', 5)
+        self.assertEqual([5, 4, 5], values.tolist())
+        agg_mock.assert_called_once_with(self.hosts[1],
+                                         'max_instances_per_host')
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_get_aggregate_values_default_array(self, agg_mock):
+        agg_mock.return_value = set()
+        values = self.columns.get_aggregate_values(
+            'num_instances', self.columns.get('num_instances'))
+        self.assertEqual([1, 2, 3], values.tolist())
+
+    @mock.patch.object(columns.LOG, 'warning')
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_get_aggregate_values_invalid(self, agg_mock, mock_warning):
+        agg_mock.return_value = set(['XXX'])
+        values = self.columns.get_aggregate_values(
+            'ram_allocation_ratio', 1.5, cast_to=float)
+        self.assertEqual([1.5, 1.5, 1.5], values.tolist())
+        self.assertTrue(mock_warning.called)
@@ -0,0 +1,96 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the adaptive ordering of the scheduler filters.
+"""
+
+from nova.scheduler import filter_ordering
+from nova.scheduler import filters
+from nova import test
+
+
+class CheapFilter(filters.BaseHostFilter):
+    pass
+
+
+class ExpensiveFilter(filters.BaseHostFilter):
+    pass
+
+
+class SelectiveFilter(filters.BaseHostFilter):
+    pass
+
+
+class OncePerRequestFilter(filters.BaseHostFilter):
+    run_filter_once_per_request = True
+
+
+class AdaptiveFilterOrderingTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(AdaptiveFilterOrderingTestCase, self).setUp()
+        self.ordering = filter_ordering.AdaptiveFilterOrdering(decay=0.5)
+
+    def test_record(self):
+        self.ordering.record('CheapFilter', 0.01, 10, 5)
+        stats = self.ordering._stats['CheapFilter']
+        self.assertAlmostEqual(0.001, stats.cost_per_host)
+        self.assertAlmostEqual(0.5, stats.rejection_rate)
+
+        self.ordering.record('CheapFilter', 0.03, 10, 10)
+        self.assertAlmostEqual(0.002, stats.cost_per_host)
+        self.assertAlmostEqual(0.25, stats.rejection_rate)
+        self.assertAlmostEqual(0.008, stats.rank)
+
+    def test_record_no_hosts(self):
+        self.ordering.record('CheapFilter', 0.01, 0, 0)
+        self.assertEqual({}, self.ordering._stats)
+
+    def test_rank_no_rejection(self):
+        self.ordering.record('CheapFilter', 0.01, 10, 10)
+        self.assertAlmostEqual(
+            0.001 / filter_ordering.MIN_REJECTION_RATE,
+            self.ordering._stats['CheapFilter'].rank)
+
+    def test_order_without_stats(self):
+        filters_ = [ExpensiveFilter(), CheapFilter(), SelectiveFilter()]
+        self.assertEqual(filters_, self.ordering.order(filters_))
+
+    def test_order(self):
+        expensive = ExpensiveFilter()
+        cheap = CheapFilter()
+        selective = SelectiveFilter()
+        self.ordering.record('ExpensiveFilter', 1.0, 10, 5)
+        self.ordering.record('CheapFilter', 0.01, 10, 10)
+        self.ordering.record('SelectiveFilter', 0.01, 10, 1)
+        self.assertEqual([selective, cheap, expensive],
+                         self.ordering.order([expensive, cheap, selective]))
+
+    def test_order_new_filter_first(self):
+        expensive = ExpensiveFilter()
+        cheap = CheapFilter()
+        self.ordering.record('ExpensiveFilter', 1.0, 10, 5)
+        self.assertEqual([cheap, expensive],
+                         self.ordering.order([expensive, cheap]))
+
+    def test_order_keeps_once_per_request_filters(self):
+        expensive = ExpensiveFilter()
+        once = OncePerRequestFilter()
+        cheap = CheapFilter()
+        self.ordering.record('ExpensiveFilter', 1.0, 10, 5)
+        self.ordering.record('OncePerRequestFilter', 5.0, 10, 10)
+        self.ordering.record('CheapFilter', 0.01, 10, 5)
+        self.assertEqual([cheap, once, expensive],
+                         self.ordering.order([expensive, once, cheap]))
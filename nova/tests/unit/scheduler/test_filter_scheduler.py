@@ -24,7 +24,7 @@ from nova.scheduler import filter_scheduler
 from nova.scheduler import host_manager
 from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
-from nova import test  # noqa
+from nova import test
 from nova.tests.unit.scheduler import fakes
 from nova.tests.unit.scheduler import test_scheduler
 from nova.tests import uuidsentinel as uuids
@@ -55,7 +55,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 1.0
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                limit=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             return [weights.WeighedHost(host_state, self.next_weight)]
@@ -85,6 +86,62 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         for weighed_host in weighed_hosts:
             self.assertIsNotNone(weighed_host.obj)
 
+    def _test_schedule_bulk_placement(self, instance_group=None):
+        self.flags(scheduler_bulk_placement=True)
+        host_states = [mock.Mock(spec=host_manager.HostState)
+                       for i in range(3)]
+
+        def fake_get_weighed_hosts(hosts, spec_obj, limit=None):
+            return [weights.WeighedHost(host_state, 1.0)
+                    for host_state in hosts]
+
+        spec_obj = objects.RequestSpec(
+            num_instances=3,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  vcpus=1),
+            project_id=1,
+            instance_uuid=uuids.instance,
+            instance_group=instance_group)
+
+        with test.nested(
+            mock.patch.object(self.driver, '_get_all_host_states',
+                              return_value=iter(host_states)),
+            mock.patch.object(self.driver.host_manager, 'get_filtered_hosts',
+                              side_effect=fake_get_filtered_hosts),
+            mock.patch.object(self.driver.host_manager, 'host_passes_filters',
+                              side_effect=[False, True]),
+            mock.patch.object(self.driver.host_manager, 'get_weighed_hosts',
+                              side_effect=fake_get_weighed_hosts),
+        ) as (mock_get_all, mock_get_hosts, mock_passes, mock_get_weighed):
+            selected_hosts = self.driver._schedule(self.context, spec_obj)
+
+        return host_states, selected_hosts, mock_get_hosts, mock_passes
+
+    def test_schedule_bulk_placement(self):
+        (host_states, selected_hosts,
+         mock_get_hosts, mock_passes) = self._test_schedule_bulk_placement()
+
+        # The first host doesn't pass the filters after consuming resources
+        # for the first instance, the second one still does.
+        self.assertEqual([host_states[0], host_states[1], host_states[1]],
+                         [host.obj for host in selected_hosts])
+        mock_get_hosts.assert_called_once_with(mock.ANY, mock.ANY, index=0)
+        mock_passes.assert_has_calls([
+            mock.call(host_states[0], mock.ANY, index=1),
+            mock.call(host_states[1], mock.ANY, index=2)])
+
+    def test_schedule_bulk_placement_instance_group(self):
+        instance_group = objects.InstanceGroup(hosts=[])
+        (host_states, selected_hosts,
+         mock_get_hosts, mock_passes) = self._test_schedule_bulk_placement(
+             instance_group=instance_group)
+
+        self.assertEqual(3, len(selected_hosts))
+        self.assertEqual(3, mock_get_hosts.call_count)
+        self.assertFalse(mock_passes.called)
+
     def test_add_retry_host(self):
         retry = dict(num_attempts=1, hosts=[])
         filter_properties = dict(retry=retry)
@@ -202,7 +259,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.flags(scheduler_host_subset_size=1)
         self.next_weight = 50
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                limit=None):
             this_weight = self.next_weight
             self.next_weight = 0
             host_state = hosts[0]
@@ -255,7 +313,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         selected_hosts = []
         selected_nodes = []
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                limit=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             selected_hosts.append(host_state.host)
@@ -308,6 +367,36 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                  dict(request_spec=expected))]
             self.assertEqual(expected, mock_info.call_args_list)
 
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule')
+    def test_select_destinations_partitioned(self, mock_schedule):
+        self.flags(scheduler_partitioning=True)
+        host_state = mock.Mock(host='host1', nodename='node1', limits={})
+        mock_schedule.return_value = [weights.WeighedHost(host_state, 0.5)]
+        dests = self.driver.select_destinations(
+            self.context, objects.RequestSpec(num_instances=1))
+        self.assertEqual([dict(host='host1', nodename='node1', limits={},
+                               weight=0.5)], dests)
+
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule')
+    def test_select_destinations_partial(self, mock_schedule):
+        host_state = mock.Mock(host='host1', nodename='node1', limits={})
+        mock_schedule.return_value = [weights.WeighedHost(host_state, 0.5)]
+        with mock.patch.object(self.driver.host_manager,
+                               'release_host_states') as mock_release:
+            dests = self.driver.select_destinations(
+                self.context, objects.RequestSpec(num_instances=3),
+                partial=True)
+        self.assertEqual([dict(host='host1', nodename='node1', limits={})],
+                         dests)
+        self.assertFalse(mock_release.called)
+
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule')
+    def test_select_destinations_partial_no_valid_host(self, mock_schedule):
+        mock_schedule.return_value = []
+        self.assertRaises(exception.NoValidHost,
+                self.driver.select_destinations, self.context,
+                objects.RequestSpec(num_instances=1), partial=True)
+
     @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule')
     def test_select_destinations_no_valid_host(self, mock_schedule):
         mock_schedule.return_value = []
@@ -319,8 +408,12 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         # Tests that we have fewer hosts available than number of instances
         # requested to build.
         consumed_hosts = [mock.MagicMock(), mock.MagicMock()]
-        with mock.patch.object(self.driver, '_schedule',
-                               return_value=consumed_hosts):
+        with test.nested(
+            mock.patch.object(self.driver, '_schedule',
+                              return_value=consumed_hosts),
+            mock.patch.object(self.driver.host_manager,
+                              'release_host_states'),
+        ) as (mock_schedule, mock_release):
             try:
                 self.driver.select_destinations(
                     self.context, objects.RequestSpec(num_instances=3))
@@ -332,3 +425,6 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                 # Make sure that the consumed hosts have chance to be reverted.
                 for host in consumed_hosts:
                     self.assertIsNone(host.obj.updated)
+                mock_release.assert_called_once_with(
+                    [(host.obj.host, host.obj.nodename)
+                     for host in consumed_hosts])
@@ -265,3 +265,111 @@ class FiltersTestCase(test.NoDBTestCase):
             cargs = mock_log.call_args[0][0]
             self.assertIn("with instance ID '%s'" % fake_uuid, cargs)
             self.assertIn(exp_output, cargs)
+
+    def test_get_filtered_objects_vectorized(self):
+        built = []
+
+        class FakeColumns(object):
+            def __init__(self, objs):
+                self.objs = list(objs)
+                built.append(self.objs)
+
+            def select(self, mask):
+                return FakeColumns(obj for obj, passes in zip(self.objs, mask)
+                                   if passes)
+
+        class VectorizedFilter(filters.BaseFilter):
+            vectorized = True
+
+            def filter_all_vectorized(self, columns, spec_obj):
+                # drop the first object
+                return [False] + [True] * (len(columns.objs) - 1)
+
+        class RegularFilter(filters.BaseFilter):
+            def filter_all(self, list_objs, spec_obj):
+                return list_objs[1:]
+
+        spec_obj = objects.RequestSpec()
+        self.filter_handler.columns_cls = FakeColumns
+        result = self.filter_handler.get_filtered_objects(
+            [VectorizedFilter(), VectorizedFilter(), RegularFilter(),
+             VectorizedFilter()],
+            ['obj1', 'obj2', 'obj3', 'obj4', 'obj5'], spec_obj)
+        self.assertEqual(['obj5'], result)
+        # The columns are built once for the first two filters, then built
+        # again after the regular filter changed the list of objects.
+        self.assertEqual([['obj1', 'obj2', 'obj3', 'obj4', 'obj5'],
+                          ['obj2', 'obj3', 'obj4', 'obj5'],
+                          ['obj3', 'obj4', 'obj5'],
+                          ['obj4', 'obj5'],
+                          ['obj5']], built)
+
+    def test_get_filtered_objects_vectorized_disabled(self):
+        class VectorizedFilter(filters.BaseFilter):
+            vectorized = True
+
+            def filter_all(self, list_objs, spec_obj):
+                return list_objs[1:]
+
+        spec_obj = objects.RequestSpec()
+        with mock.patch.object(VectorizedFilter,
+                               'filter_all_vectorized') as mock_vectorized:
+            result = self.filter_handler.get_filtered_objects(
+                [VectorizedFilter()], ['obj1', 'obj2'], spec_obj)
+        self.assertEqual(['obj2'], result)
+        self.assertFalse(mock_vectorized.called)
+
+    def test_get_filtered_objects_instrumentation(self):
+        class FilterA(filters.BaseFilter):
+            def _filter_one(self, obj, spec_obj):
+                return obj != 'obj2'
+
+        class FilterB(filters.BaseFilter):
+            def filter_all(self, list_objs, spec_obj):
+                return list_objs[1:]
+
+        instrumentation = mock.Mock()
+        instrumentation.sample.return_value = True
+        self.filter_handler.instrumentation = instrumentation
+        spec_obj = objects.RequestSpec()
+        result = self.filter_handler.get_filtered_objects(
+            [FilterA(), FilterB()], ['obj1', 'obj2', 'obj3'], spec_obj)
+        self.assertEqual(['obj3'], result)
+        self.assertEqual(1, instrumentation.sample.call_count)
+        self.assertEqual(
+            [mock.call('filter', 'FilterA', mock.ANY, 3, 2, mock.ANY,
+                       mock.ANY),
+             mock.call('filter', 'FilterB', mock.ANY, 2, 1, None, None)],
+            instrumentation.record.call_args_list)
+        # The slowest object is only known when filtering one at a time
+        self.assertIn(instrumentation.record.call_args_list[0][0][5],
+                      ['obj1', 'obj2', 'obj3'])
+
+    def test_get_filtered_objects_instrumentation_not_sampled(self):
+        instrumentation = mock.Mock()
+        instrumentation.sample.return_value = False
+        self.filter_handler.instrumentation = instrumentation
+        spec_obj = objects.RequestSpec()
+        with mock.patch.object(filters.BaseFilterHandler,
+                               '_filter_all_timed') as mock_timed:
+            result = self.filter_handler.get_filtered_objects(
+                [filters.BaseFilter()], ['obj1', 'obj2'], spec_obj)
+        self.assertEqual(['obj1', 'obj2'], result)
+        self.assertFalse(mock_timed.called)
+        self.assertFalse(instrumentation.record.called)
+
+    def test_get_filtered_objects_statistics(self):
+        class FilterA(filters.BaseFilter):
+            def _filter_one(self, obj, spec_obj):
+                return obj != 'obj2'
+
+        statistics = mock.Mock()
+        self.filter_handler.statistics = statistics
+        spec_obj = objects.RequestSpec()
+        result = self.filter_handler.get_filtered_objects(
+            [FilterA(), Filter1()], ['obj1', 'obj2', 'obj3'], spec_obj)
+        self.assertEqual(['obj1', 'obj3'], result)
+        self.assertEqual(
+            [mock.call('FilterA', mock.ANY, 3, 2),
+             mock.call('Filter1', mock.ANY, 2, 2)],
+            statistics.record.call_args_list)
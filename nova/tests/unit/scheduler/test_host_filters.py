@@ -14,6 +14,9 @@
 """
 Tests For Scheduler Host Filters.
 """
+import mock
+
+from nova.scheduler import columns
 from nova.scheduler import filters
 from nova.scheduler.filters import all_hosts_filter
 from nova.scheduler.filters import compute_filter
@@ -35,3 +38,22 @@ class HostFiltersTestCase(test.NoDBTestCase):
         filt_cls = all_hosts_filter.AllHostsFilter()
         host = fakes.FakeHostState('host1', 'node1', {})
         self.assertTrue(filt_cls.host_passes(host, {}))
+
+    def test_filter_handler_vectorized(self):
+        self.flags(scheduler_use_vectorized_filters=True)
+        with mock.patch.object(columns, 'numpy', mock.sentinel.numpy):
+            filter_handler = filters.HostFilterHandler()
+        self.assertEqual(columns.HostStateColumns,
+                         filter_handler.columns_cls)
+
+    @mock.patch.object(filters.LOG, 'warning')
+    def test_filter_handler_vectorized_no_numpy(self, mock_warning):
+        self.flags(scheduler_use_vectorized_filters=True)
+        with mock.patch.object(columns, 'numpy', None):
+            filter_handler = filters.HostFilterHandler()
+        self.assertIsNone(filter_handler.columns_cls)
+        self.assertTrue(mock_warning.called)
+
+    def test_filter_handler_not_vectorized(self):
+        filter_handler = filters.HostFilterHandler()
+        self.assertIsNone(filter_handler.columns_cls)
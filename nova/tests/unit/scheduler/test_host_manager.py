@@ -21,6 +21,7 @@ import datetime
 
 import mock
 from oslo_serialization import jsonutils
+from oslo_utils import fixture as utils_fixture
 from oslo_utils import versionutils
 import six
 
@@ -32,8 +33,10 @@ from nova import exception
 from nova import objects
 from nova.objects import base as obj_base
 from nova.pci import stats as pci_stats
+from nova.scheduler import filter_ordering
 from nova.scheduler import filters
 from nova.scheduler import host_manager
+from nova.scheduler import partitioning
 from nova import test
 from nova.tests import fixtures
 from nova.tests.unit import fake_instance
@@ -222,6 +225,85 @@ class HostManagerTestCase(test.NoDBTestCase):
                 fake_properties)
         self._verify_result(info, result)
 
+    def test_adaptive_filter_ordering_disabled(self):
+        self.assertIsNone(self.host_manager.filter_ordering)
+        self.assertIsNone(self.host_manager.filter_handler.statistics)
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def test_get_filtered_hosts_adaptive_filter_ordering(self, mock_init_agg,
+                                                         mock_init_inst):
+        self.flags(scheduler_adaptive_filter_ordering=True)
+        self.flags(scheduler_default_filters=['FakeFilterClass1',
+                                              'FakeFilterClass2'])
+        hm = host_manager.HostManager()
+        self.assertIsInstance(hm.filter_ordering,
+                              filter_ordering.AdaptiveFilterOrdering)
+        self.assertIs(hm.filter_ordering, hm.filter_handler.statistics)
+        fake_properties = objects.RequestSpec(ignore_hosts=[],
+                                              instance_uuid=uuids.instance,
+                                              force_hosts=[],
+                                              force_nodes=[])
+        reordered = list(reversed(hm.default_filters))
+
+        with test.nested(
+            mock.patch.object(hm.filter_ordering, 'order',
+                              return_value=reordered),
+            mock.patch.object(hm.filter_handler, 'get_filtered_objects',
+                              return_value=self.fake_hosts),
+        ) as (mock_order, mock_get_filtered):
+            result = hm.get_filtered_hosts(self.fake_hosts, fake_properties)
+        self.assertEqual(self.fake_hosts, result)
+        mock_order.assert_called_once_with(hm.default_filters)
+        mock_get_filtered.assert_called_once_with(
+            reordered, self.fake_hosts, fake_properties, 0)
+
+    def test_host_passes_filters(self):
+        fake_properties = objects.RequestSpec(ignore_hosts=[],
+                                              instance_uuid=uuids.instance,
+                                              force_hosts=[],
+                                              force_nodes=[])
+        host_state = self.fake_hosts[0]
+
+        with mock.patch.object(FakeFilterClass1, '_filter_one',
+                               return_value=True) as mock_filter_one:
+            self.assertTrue(self.host_manager.host_passes_filters(
+                host_state, fake_properties, index=1))
+        mock_filter_one.assert_called_once_with(host_state, fake_properties)
+
+        with mock.patch.object(FakeFilterClass1, '_filter_one',
+                               return_value=False):
+            self.assertFalse(self.host_manager.host_passes_filters(
+                host_state, fake_properties, index=1))
+
+    def test_host_passes_filters_once_per_request(self):
+        fake_properties = objects.RequestSpec(ignore_hosts=[],
+                                              instance_uuid=uuids.instance,
+                                              force_hosts=[],
+                                              force_nodes=[])
+
+        with test.nested(
+            mock.patch.object(FakeFilterClass1, 'run_filter_once_per_request',
+                              True),
+            mock.patch.object(FakeFilterClass1, '_filter_one',
+                              return_value=False),
+        ) as (_, mock_filter_one):
+            self.assertTrue(self.host_manager.host_passes_filters(
+                self.fake_hosts[0], fake_properties, index=1))
+        self.assertFalse(mock_filter_one.called)
+
+    def test_host_passes_filters_forced_host(self):
+        fake_properties = objects.RequestSpec(ignore_hosts=[],
+                                              instance_uuid=uuids.instance,
+                                              force_hosts=['fake_host1'],
+                                              force_nodes=[])
+
+        with mock.patch.object(FakeFilterClass1, '_filter_one',
+                               return_value=False) as mock_filter_one:
+            self.assertTrue(self.host_manager.host_passes_filters(
+                self.fake_hosts[0], fake_properties, index=1))
+        self.assertFalse(mock_filter_one.called)
+
     def test_get_filtered_hosts_with_requested_destination(self):
         dest = objects.Destination(host='fake_host1', node='fake-node')
         fake_properties = objects.RequestSpec(requested_destination=dest,
@@ -872,6 +954,228 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(len(host_states_map), 0)
 
 
+class HostManagerIncrementalTestCase(test.NoDBTestCase):
+    """Test case for HostManager with incremental host states."""
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def setUp(self, mock_init_agg, mock_init_inst):
+        super(HostManagerIncrementalTestCase, self).setUp()
+        self.flags(scheduler_incremental_host_states=True)
+        self.host_manager = host_manager.HostManager()
+        self.context = 'fake_context'
+        self.updated_at = datetime.datetime(2016, 6, 1, 12, 0, 0)
+        self.compute_nodes = [self._compute_node(compute, self.updated_at)
+                              for compute in fakes.COMPUTE_NODES[:4]]
+
+        patcher = mock.patch('nova.objects.ComputeNodeList.get_all',
+                             return_value=self.compute_nodes)
+        self.mock_get_all = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            'nova.objects.ComputeNodeList.get_all_updated_since',
+            return_value=[])
+        self.mock_get_updated = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('nova.objects.ServiceList.get_by_binary',
+                             return_value=fakes.SERVICES)
+        self.mock_get_by_binary = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('nova.objects.InstanceList.get_by_host',
+                             return_value=objects.InstanceList())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _compute_node(compute, updated_at, **updates):
+        compute = compute.obj_clone()
+        compute.created_at = datetime.datetime(2016, 1, 1)
+        compute.updated_at = updated_at
+        compute.deleted_at = None
+        compute.deleted = False
+        for key, value in updates.items():
+            setattr(compute, key, value)
+        return compute
+
+    def test_get_all_host_states_initial_load(self):
+        self.host_manager.get_all_host_states(self.context)
+
+        self.mock_get_all.assert_called_once_with(self.context)
+        self.assertFalse(self.mock_get_updated.called)
+        self.assertEqual(4, len(self.host_manager.host_state_map))
+        self.assertEqual(self.updated_at,
+                         self.host_manager._compute_nodes_high_water_mark)
+
+    def test_get_all_host_states_only_loads_changes(self):
+        self.host_manager.get_all_host_states(self.context)
+        later = self.updated_at + datetime.timedelta(seconds=30)
+        self.mock_get_updated.return_value = [
+            self._compute_node(fakes.COMPUTE_NODES[0], later,
+                               free_ram_mb=256)]
+
+        self.host_manager.get_all_host_states(self.context)
+
+        self.mock_get_all.assert_called_once_with(self.context)
+        self.mock_get_updated.assert_called_once_with(self.context,
+                                                      self.updated_at)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(4, len(host_states_map))
+        self.assertEqual(256, host_states_map[('host1', 'node1')].free_ram_mb)
+        self.assertEqual(1024,
+                         host_states_map[('host2', 'node2')].free_ram_mb)
+        self.assertEqual(later,
+                         self.host_manager._compute_nodes_high_water_mark)
+
+    def test_get_all_host_states_refreshes_unchanged_services(self):
+        self.host_manager.get_all_host_states(self.context)
+        services = [objects.Service(host=service.host, disabled=True)
+                    for service in fakes.SERVICES]
+        self.mock_get_by_binary.return_value = services
+
+        self.host_manager.get_all_host_states(self.context)
+
+        for host_state in self.host_manager.host_state_map.values():
+            self.assertTrue(host_state.service['disabled'])
+
+    def test_get_all_host_states_removes_deleted_node(self):
+        self.host_manager.get_all_host_states(self.context)
+        later = self.updated_at + datetime.timedelta(seconds=30)
+        self.mock_get_updated.return_value = [
+            self._compute_node(fakes.COMPUTE_NODES[3], self.updated_at,
+                               deleted=True, deleted_at=later)]
+
+        self.host_manager.get_all_host_states(self.context)
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(3, len(host_states_map))
+        self.assertNotIn(('host4', 'node4'), host_states_map)
+        self.assertEqual(later,
+                         self.host_manager._compute_nodes_high_water_mark)
+
+    def test_get_all_host_states_removes_node_without_service(self):
+        self.host_manager.get_all_host_states(self.context)
+        self.mock_get_by_binary.return_value = fakes.SERVICES[:3]
+
+        self.host_manager.get_all_host_states(self.context)
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(3, len(host_states_map))
+        self.assertNotIn(('host4', 'node4'), host_states_map)
+
+    def test_get_all_host_states_full_resync_after_interval(self):
+        time_fixture = self.useFixture(utils_fixture.TimeFixture())
+        self.host_manager.get_all_host_states(self.context)
+        time_fixture.advance_time_seconds(
+            CONF.scheduler_host_state_full_sync_interval - 1)
+        self.host_manager.get_all_host_states(self.context)
+        self.assertEqual(1, self.mock_get_all.call_count)
+
+        time_fixture.advance_time_seconds(2)
+        self.host_manager.get_all_host_states(self.context)
+        self.assertEqual(2, self.mock_get_all.call_count)
+        self.assertEqual(1, self.mock_get_updated.call_count)
+
+    def test_force_full_resync(self):
+        self.host_manager.get_all_host_states(self.context)
+        self.host_manager.force_full_resync()
+        self.mock_get_all.return_value = self.compute_nodes[:2]
+
+        self.host_manager.get_all_host_states(self.context)
+
+        self.assertEqual(2, self.mock_get_all.call_count)
+        self.assertFalse(self.mock_get_updated.called)
+        self.assertEqual(2, len(self.host_manager.host_state_map))
+
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    def test_release_host_states(self, mock_get_node):
+        self.host_manager.get_all_host_states(self.context)
+        host_state = self.host_manager.host_state_map[('host1', 'node1')]
+        host_state.free_ram_mb = 0
+        host_state.updated = self.updated_at + datetime.timedelta(seconds=1)
+        mock_get_node.return_value = self.compute_nodes[0]
+
+        self.host_manager.release_host_states([('host1', 'node1'),
+                                               ('host9', 'node9')])
+        self.assertIsNone(host_state.updated)
+        self.host_manager.get_all_host_states(self.context)
+
+        mock_get_node.assert_called_once_with(self.context, 'host1', 'node1')
+        self.assertEqual(self.compute_nodes[0].free_ram_mb,
+                         host_state.free_ram_mb)
+        self.assertEqual(set(), self.host_manager._released_host_states)
+
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    def test_release_host_states_changed_node(self, mock_get_node):
+        self.host_manager.get_all_host_states(self.context)
+        later = self.updated_at + datetime.timedelta(seconds=30)
+        self.mock_get_updated.return_value = [
+            self._compute_node(fakes.COMPUTE_NODES[0], later)]
+
+        self.host_manager.release_host_states([('host1', 'node1')])
+        self.host_manager.get_all_host_states(self.context)
+
+        self.assertFalse(mock_get_node.called)
+
+    def test_get_all_host_states_incremental_disabled(self):
+        self.host_manager.incremental_host_states = False
+        self.host_manager.get_all_host_states(self.context)
+        self.host_manager.get_all_host_states(self.context)
+
+        self.assertEqual(2, self.mock_get_all.call_count)
+        self.assertFalse(self.mock_get_updated.called)
+        self.assertIsNone(self.host_manager._compute_nodes_high_water_mark)
+
+    def test_get_all_host_states_partitioned(self):
+        partitioner = mock.Mock(spec=partitioning.SchedulerPartitioner)
+        partitioner.refresh.return_value = False
+        owned_hosts = ['host1', 'host2']
+        partitioner.owns.side_effect = (
+            lambda host, node, aggregate_ids: host in owned_hosts)
+        self.host_manager.partitioner = partitioner
+
+        self.host_manager.get_all_host_states(self.context)
+
+        partitioner.refresh.assert_called_once_with(self.context)
+        self.assertEqual(set([('host1', 'node1'), ('host2', 'node2')]),
+                         set(self.host_manager.host_state_map))
+
+        # Another scheduler took host2 and gave host3 over
+        partitioner.refresh.return_value = True
+        owned_hosts[:] = ['host1', 'host3']
+        self.host_manager.get_all_host_states(self.context)
+
+        self.assertEqual(2, self.mock_get_all.call_count)
+        self.assertFalse(self.mock_get_updated.called)
+        self.assertEqual(set([('host1', 'node1'), ('host3', 'node3')]),
+                         set(self.host_manager.host_state_map))
+
+    def test_update_aggregates_partitioned_by_aggregate(self):
+        self.flags(scheduler_partition_key='aggregate')
+        self.host_manager.partitioner = mock.Mock(
+            spec=partitioning.SchedulerPartitioner)
+        self.host_manager.partitioner.refresh.return_value = False
+        self.host_manager.partitioner.owns.return_value = True
+        self.host_manager.get_all_host_states(self.context)
+        self.assertFalse(self.host_manager._full_sync_needed())
+
+        self.host_manager.update_aggregates(
+            [objects.Aggregate(id=1, hosts=['host1'])])
+
+        self.assertTrue(self.host_manager._full_sync_needed())
+
+    def test_update_aggregates_partitioned_by_node(self):
+        self.host_manager.partitioner = mock.Mock(
+            spec=partitioning.SchedulerPartitioner)
+        self.host_manager.partitioner.refresh.return_value = False
+        self.host_manager.partitioner.owns.return_value = True
+        self.host_manager.get_all_host_states(self.context)
+
+        self.host_manager.update_aggregates(
+            [objects.Aggregate(id=1, hosts=['host1'])])
+
+        self.assertFalse(self.host_manager._full_sync_needed())
+
+
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
 
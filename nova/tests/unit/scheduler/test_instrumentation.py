@@ -0,0 +1,134 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the scheduler filters and weighers instrumentation.
+"""
+
+import socket
+
+import mock
+from oslo_utils import fixture as utils_fixture
+
+from nova.scheduler import instrumentation
+from nova import test
+
+
+def _measure(name='RamFilter', seconds=0.003, hosts_in=10, hosts_out=4,
+             slowest_host='host1', slowest_seconds=0.001):
+    return instrumentation.StageMeasure('filter', name, seconds, hosts_in,
+                                        hosts_out, slowest_host,
+                                        slowest_seconds)
+
+
+class InstrumentationTestCase(test.NoDBTestCase):
+
+    def test_from_config_disabled(self):
+        self.assertIsNone(instrumentation.from_config())
+
+    def test_from_config(self):
+        self.flags(scheduler_instrumentation_sample_rate=0.5,
+                   scheduler_instrumentation_sink='histogram')
+        instr = instrumentation.from_config()
+        self.assertEqual(0.5, instr.sample_rate)
+        self.assertIsInstance(instr.sink, instrumentation.HistogramSink)
+
+    @mock.patch('random.random')
+    def test_sample(self, mock_random):
+        instr = instrumentation.Instrumentation(mock.sentinel.sink, 0.1)
+        mock_random.return_value = 0.05
+        self.assertTrue(instr.sample())
+        mock_random.return_value = 0.5
+        self.assertFalse(instr.sample())
+
+    def test_record(self):
+        sink = mock.Mock(spec=instrumentation.BaseSink)
+        instr = instrumentation.Instrumentation(sink, 0.1)
+        instr.record('filter', 'RamFilter', 0.003, 10, 4, 'host1', 0.001)
+        sink.emit.assert_called_once_with(_measure(), 0.1)
+
+
+class LogSinkTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(LogSinkTestCase, self).setUp()
+        self.time_fixture = self.useFixture(utils_fixture.TimeFixture())
+        self.flags(scheduler_instrumentation_interval=60)
+
+    @mock.patch.object(instrumentation.LOG, 'info')
+    def test_emit(self, mock_info):
+        sink = instrumentation.LogSink()
+        sink.emit(_measure(), 1.0)
+        self.assertFalse(mock_info.called)
+
+        self.time_fixture.advance_time_seconds(61)
+        sink.emit(_measure(seconds=0.005, hosts_in=4, hosts_out=4,
+                           slowest_host='host2', slowest_seconds=0.002), 1.0)
+        self.assertEqual(1, mock_info.call_count)
+        values = mock_info.call_args[0][1]
+        self.assertEqual(2, values['passes'])
+        self.assertAlmostEqual(4.0, values['mean_ms'])
+        self.assertAlmostEqual(5.0, values['max_ms'])
+        self.assertEqual(14, values['hosts_in'])
+        self.assertEqual(6, values['eliminated'])
+        self.assertEqual('host2', values['slowest_host'])
+
+        # The stages are reset after each report
+        self.assertEqual({}, dict(sink._stages))
+
+
+class HistogramSinkTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(HistogramSinkTestCase, self).setUp()
+        self.time_fixture = self.useFixture(utils_fixture.TimeFixture())
+
+    @mock.patch.object(instrumentation.LOG, 'info')
+    def test_emit(self, mock_info):
+        sink = instrumentation.HistogramSink()
+        for seconds in (0.0005, 0.0015, 0.0019, 0.005):
+            sink.emit(_measure(seconds=seconds), 1.0)
+        self.assertFalse(mock_info.called)
+
+        self.time_fixture.advance_time_seconds(
+            sink.interval + 1)
+        sink.emit(_measure(seconds=0.0001), 1.0)
+        values = mock_info.call_args[0][1]
+        self.assertEqual('<1 ms: 2, <2 ms: 2, <8 ms: 1', values['buckets'])
+
+
+class StatsdSinkTestCase(test.NoDBTestCase):
+
+    @mock.patch('socket.socket')
+    def test_emit(self, mock_socket):
+        self.flags(scheduler_instrumentation_statsd_host='statsd.example.org',
+                   scheduler_instrumentation_statsd_port=8126)
+        sink = instrumentation.StatsdSink()
+        sink.emit(_measure(), 0.1)
+        mock_socket.assert_called_once_with(socket.AF_INET, socket.SOCK_DGRAM)
+        mock_socket.return_value.sendto.assert_called_once_with(
+            b'nova.scheduler.filter.RamFilter.time:3.000|ms|@0.1\n'
+            b'nova.scheduler.filter.RamFilter.hosts_in:10|c|@0.1\n'
+            b'nova.scheduler.filter.RamFilter.hosts_eliminated:6|c|@0.1\n'
+            b'nova.scheduler.filter.RamFilter.slowest_host_time:1.000|ms|@0.1',
+            ('statsd.example.org', 8126))
+
+    @mock.patch('socket.socket')
+    def test_emit_error(self, mock_socket):
+        mock_socket.return_value.sendto.side_effect = socket.error
+        sink = instrumentation.StatsdSink()
+        sink.emit(_measure(slowest_host=None, slowest_seconds=None), 1.0)
+        data = mock_socket.return_value.sendto.call_args[0][0]
+        self.assertNotIn(b'|@', data)
+        self.assertNotIn(b'slowest_host_time', data)
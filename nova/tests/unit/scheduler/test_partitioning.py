@@ -0,0 +1,124 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the partitioning of the compute nodes between the schedulers.
+"""
+
+import mock
+from oslo_utils import fixture as utils_fixture
+
+import nova.conf
+from nova import objects
+from nova.scheduler import partitioning
+from nova import test
+
+CONF = nova.conf.CONF
+
+
+class HashRingTestCase(test.NoDBTestCase):
+
+    def test_empty_ring(self):
+        self.assertIsNone(partitioning.HashRing([]).get_member('host1-node1'))
+
+    def test_get_member(self):
+        ring = partitioning.HashRing(['sched1', 'sched2', 'sched3'])
+        keys = ['host%d-node%d' % (i, i) for i in range(300)]
+        members = [ring.get_member(key) for key in keys]
+        # Every scheduler owns some of the keys
+        self.assertEqual(set(['sched1', 'sched2', 'sched3']), set(members))
+        # The same ring always maps a key to the same member
+        other_ring = partitioning.HashRing(['sched3', 'sched1', 'sched2'])
+        self.assertEqual(members, [other_ring.get_member(key)
+                                   for key in keys])
+
+    def test_add_member_only_moves_keys_to_it(self):
+        ring = partitioning.HashRing(['sched1', 'sched2'])
+        bigger_ring = partitioning.HashRing(['sched1', 'sched2', 'sched3'])
+        for i in range(300):
+            key = 'host%d-node%d' % (i, i)
+            member = bigger_ring.get_member(key)
+            if member != 'sched3':
+                self.assertEqual(ring.get_member(key), member)
+
+
+class SchedulerPartitionerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(SchedulerPartitionerTestCase, self).setUp()
+        self.context = 'fake_context'
+        self.partitioner = partitioning.SchedulerPartitioner('sched1')
+        self.services = [objects.Service(host='sched2'),
+                         objects.Service(host='sched3'),
+                         objects.Service(host='sched4')]
+        patcher = mock.patch('nova.objects.ServiceList.get_by_binary',
+                             return_value=self.services)
+        self.mock_get_by_binary = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            self.partitioner.servicegroup_api, 'services_are_up',
+            side_effect=lambda services: [service.host != 'sched4'
+                                          for service in services])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_scheduler_hosts(self):
+        self.assertEqual(['sched2', 'sched3'],
+                         partitioning.get_scheduler_hosts(
+                             self.context, self.partitioner.servicegroup_api))
+        self.mock_get_by_binary.assert_called_once_with(self.context,
+                                                        'nova-scheduler')
+
+    def test_initial_ring(self):
+        self.assertEqual(['sched1'], self.partitioner.members)
+        self.assertTrue(self.partitioner.owns('host1', 'node1'))
+
+    def test_refresh(self):
+        self.assertTrue(self.partitioner.refresh(self.context))
+        self.assertEqual(['sched1', 'sched2', 'sched3'],
+                         self.partitioner.members)
+
+    def test_refresh_interval(self):
+        time_fixture = self.useFixture(utils_fixture.TimeFixture())
+        self.partitioner.refresh(self.context)
+        time_fixture.advance_time_seconds(
+            CONF.scheduler_partition_refresh_interval - 1)
+        self.assertFalse(self.partitioner.refresh(self.context))
+        self.assertEqual(1, self.mock_get_by_binary.call_count)
+
+        # Same schedulers as before
+        time_fixture.advance_time_seconds(2)
+        self.assertFalse(self.partitioner.refresh(self.context))
+        self.assertEqual(2, self.mock_get_by_binary.call_count)
+
+    def test_get_key(self):
+        self.assertEqual('host1-node1',
+                         self.partitioner.get_key('host1', 'node1', set([2])))
+        self.flags(scheduler_partition_key='aggregate')
+        self.assertEqual('aggregate-2',
+                         self.partitioner.get_key('host1', 'node1',
+                                                  set([3, 2])))
+        self.assertEqual('host1-node1',
+                         self.partitioner.get_key('host1', 'node1', set()))
+
+    def test_owns(self):
+        self.partitioner.refresh(self.context)
+        owners = set()
+        for i in range(100):
+            host = 'host%d' % i
+            owner = self.partitioner.ring.get_member('%s-node' % host)
+            owners.add(owner)
+            self.assertEqual(owner == 'sched1',
+                             self.partitioner.owns(host, 'node'))
+        self.assertEqual(set(['sched1', 'sched2', 'sched3']), owners)
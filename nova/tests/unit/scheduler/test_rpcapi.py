@@ -76,6 +76,66 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 spec_obj=fake_spec,
                 version='4.3')
 
+    def test_select_destinations_on_server(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        fake_spec = objects.RequestSpec()
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        with test.nested(
+            mock.patch.object(rpcapi.client, 'can_send_version',
+                              return_value=True),
+            mock.patch.object(rpcapi.client, 'prepare',
+                              return_value=rpcapi.client),
+            mock.patch.object(rpcapi.client, 'call', return_value='foo'),
+        ) as (mock_csv, mock_prepare, mock_call):
+            self.assertEqual('foo', rpcapi.select_destinations(
+                ctxt, fake_spec, server='sched1'))
+        mock_prepare.assert_called_once_with(version='4.3', server='sched1')
+        mock_call.assert_called_once_with(ctxt, 'select_destinations',
+                                          spec_obj=fake_spec)
+
+    def test_select_destinations_partial(self):
+        fake_spec = objects.RequestSpec()
+        self._test_scheduler_api('select_destinations', rpc_method='call',
+                expected_args={'spec_obj': fake_spec, 'partial': True},
+                spec_obj=fake_spec, partial=True,
+                version='4.4')
+
+    def test_select_destinations_partial_old_manager(self):
+        self.flags(scheduler='4.3', group='upgrade_levels')
+        fake_spec = objects.RequestSpec()
+        self._test_scheduler_api('select_destinations', rpc_method='call',
+                expected_args={'spec_obj': fake_spec},
+                spec_obj=fake_spec, partial=True,
+                version='4.3')
+
+    def test_release_destinations(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        dests = [{'host': 'host1', 'nodename': 'node1'}]
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        with test.nested(
+            mock.patch.object(rpcapi.client, 'can_send_version',
+                              return_value=True),
+            mock.patch.object(rpcapi.client, 'prepare',
+                              return_value=rpcapi.client),
+            mock.patch.object(rpcapi.client, 'cast'),
+        ) as (mock_csv, mock_prepare, mock_cast):
+            rpcapi.release_destinations(ctxt, dests, server='sched1')
+        mock_prepare.assert_called_once_with(version='4.4', server='sched1')
+        mock_cast.assert_called_once_with(ctxt, 'release_destinations',
+                                          destinations=dests)
+
+    def test_release_destinations_old_manager(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        with test.nested(
+            mock.patch.object(rpcapi.client, 'can_send_version',
+                              return_value=False),
+            mock.patch.object(rpcapi.client, 'cast'),
+        ) as (mock_csv, mock_cast):
+            rpcapi.release_destinations(ctxt, [], server='sched1')
+        mock_csv.assert_called_once_with('4.4')
+        self.assertFalse(mock_cast.called)
+
     @mock.patch.object(objects.RequestSpec, 'to_legacy_filter_properties_dict')
     @mock.patch.object(objects.RequestSpec, 'to_legacy_request_spec_dict')
     def test_select_destinations_with_old_manager(self, to_spec, to_props):
@@ -121,6 +121,22 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
             self.manager.select_destinations(None, spec_obj=fake_spec)
             select_destinations.assert_called_once_with(None, fake_spec)
 
+    def test_select_destination_partial(self):
+        fake_spec = objects.RequestSpec()
+        with mock.patch.object(self.manager.driver, 'select_destinations'
+                ) as select_destinations:
+            self.manager.select_destinations(None, spec_obj=fake_spec,
+                                             partial=True)
+            select_destinations.assert_called_once_with(None, fake_spec,
+                                                        partial=True)
+
+    def test_release_destinations(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'release_host_states') as mock_release:
+            self.manager.release_destinations(
+                None, destinations=[{'host': 'host1', 'nodename': 'node1'}])
+            mock_release.assert_called_once_with([('host1', 'node1')])
+
     # TODO(sbauza): Remove that test once the API v4 is removed
     @mock.patch.object(objects.RequestSpec, 'from_primitives')
     def test_select_destination_with_old_client(self, from_primitives):
@@ -224,18 +240,17 @@ class SchedulerTestCase(test.NoDBTestCase):
         self.servicegroup_api = servicegroup.API()
 
     @mock.patch('nova.objects.ServiceList.get_by_topic')
-    @mock.patch('nova.servicegroup.API.service_is_up')
-    def test_hosts_up(self, mock_service_is_up, mock_get_by_topic):
+    @mock.patch('nova.servicegroup.API.services_are_up')
+    def test_hosts_up(self, mock_services_are_up, mock_get_by_topic):
         service1 = objects.Service(host='host1')
         service2 = objects.Service(host='host2')
         services = objects.ServiceList(objects=[service1, service2])
 
         mock_get_by_topic.return_value = services
-        mock_service_is_up.side_effect = [False, True]
+        mock_services_are_up.return_value = [False, True]
 
         result = self.driver.hosts_up(self.context, self.topic)
         self.assertEqual(result, ['host2'])
 
         mock_get_by_topic.assert_called_once_with(self.context, self.topic)
-        calls = [mock.call(service1), mock.call(service2)]
-        self.assertEqual(calls, mock_service_is_up.call_args_list)
+        mock_services_are_up.assert_called_once_with(services)
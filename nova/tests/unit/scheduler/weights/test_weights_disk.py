@@ -16,6 +16,7 @@
 Tests For Scheduler disk weights.
 """
 
+from nova.scheduler import columns
 from nova.scheduler import weights
 from nova.scheduler.weights import disk
 from nova import test
@@ -109,3 +110,11 @@ class DiskWeigherTestCase(test.NoDBTestCase):
         weighed_host = weights[-1]
         self.assertEqual(0, weighed_host.weight)
         self.assertEqual('negative', weighed_host.obj.host)
+
+
+class DiskWeigherVectorizedTestCase(DiskWeigherTestCase):
+    """Runs the disk weigher tests with the hosts weighed all at once."""
+
+    def setUp(self):
+        super(DiskWeigherVectorizedTestCase, self).setUp()
+        self.weight_handler.columns_cls = columns.HostStateColumns
@@ -13,6 +13,7 @@
 Tests For Scheduler IoOpsWeigher weights
 """
 
+from nova.scheduler import columns
 from nova.scheduler import weights
 from nova.scheduler.weights import io_ops
 from nova import test
@@ -66,3 +67,11 @@ class IoOpsWeigherTestCase(test.NoDBTestCase):
         self._do_test(io_ops_weight_multiplier=2.0,
                       expected_weight=2.0,
                       expected_host='host4')
+
+
+class IoOpsWeigherVectorizedTestCase(IoOpsWeigherTestCase):
+    """Runs the io ops weigher tests with the hosts weighed all at once."""
+
+    def setUp(self):
+        super(IoOpsWeigherVectorizedTestCase, self).setUp()
+        self.weight_handler.columns_cls = columns.HostStateColumns
@@ -16,6 +16,7 @@ Tests For Scheduler metrics weights.
 from nova import exception
 from nova.objects import fields
 from nova.objects import monitor_metric
+from nova.scheduler import columns
 from nova.scheduler import weights
 from nova.scheduler.weights import metrics
 from nova import test
@@ -181,3 +182,11 @@ class MetricsWeigherTestCase(test.NoDBTestCase):
         self.flags(required=False, group='metrics')
         setting = [idle + '=0.0001', user + '=-1']
         self._do_test(setting, 1.0, 'host5')
+
+
+class MetricsWeigherVectorizedTestCase(MetricsWeigherTestCase):
+    """Runs the metrics weigher tests with the hosts weighed all at once."""
+
+    def setUp(self):
+        super(MetricsWeigherVectorizedTestCase, self).setUp()
+        self.weight_handler.columns_cls = columns.HostStateColumns
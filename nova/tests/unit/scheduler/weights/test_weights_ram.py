@@ -16,6 +16,7 @@
 Tests For Scheduler RAM weights.
 """
 
+from nova.scheduler import columns
 from nova.scheduler import weights
 from nova.scheduler.weights import ram
 from nova import test
@@ -109,3 +110,11 @@ class RamWeigherTestCase(test.NoDBTestCase):
         weighed_host = weights[-1]
         self.assertEqual(0, weighed_host.weight)
         self.assertEqual('negative', weighed_host.obj.host)
+
+
+class RamWeigherVectorizedTestCase(RamWeigherTestCase):
+    """Runs the RAM weigher tests with the hosts weighed all at once."""
+
+    def setUp(self):
+        super(RamWeigherVectorizedTestCase, self).setUp()
+        self.weight_handler.columns_cls = columns.HostStateColumns
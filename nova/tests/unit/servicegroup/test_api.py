@@ -60,3 +60,16 @@ class ServiceGroupApiTestCase(test.NoDBTestCase):
         result = self.servicegroup_api.service_is_up(member)
         self.assertIs(result, False)
         driver.is_up.assert_not_called()
+
+    def test_services_are_up(self):
+        members = [{"host": "fake-host1", "forced_down": False},
+                   {"host": "fake-host2", "forced_down": True},
+                   {"host": "fake-host3", "forced_down": False}]
+        driver = self.servicegroup_api._driver
+        driver.is_up = mock.MagicMock(side_effect=[True, True, False])
+
+        result = self.servicegroup_api.services_are_up(members)
+
+        self.assertEqual([True, False, False], result)
+        self.assertEqual([mock.call(member) for member in members],
+                         driver.is_up.call_args_list)
@@ -0,0 +1,176 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import mock
+from oslo_utils import fixture as utils_fixture
+from oslo_utils import timeutils
+
+from nova import db
+from nova import objects
+from nova import servicegroup
+from nova.servicegroup.drivers import batched
+from nova import test
+
+
+class HeartbeatBufferTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(HeartbeatBufferTestCase, self).setUp()
+        self.now = timeutils.utcnow()
+        self.time_fixture = self.useFixture(
+            utils_fixture.TimeFixture(self.now))
+        self.buffer = batched.HeartbeatBuffer()
+        patcher = mock.patch('oslo_service.loopingcall.'
+                             'FixedIntervalLoopingCall')
+        self.mock_timer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_add(self):
+        self.buffer.add(1)
+        self.time_fixture.advance_time_seconds(1)
+        self.buffer.add(1)
+        self.buffer.add(2)
+
+        self.assertEqual(self.now + datetime.timedelta(seconds=1),
+                         self.buffer.get(1))
+        self.assertIsNone(self.buffer.get(3))
+        # The timer is only started once
+        self.mock_timer.assert_called_once_with(self.buffer.flush)
+        self.mock_timer.return_value.start.assert_called_once_with(
+            interval=5, initial_delay=5)
+
+    @mock.patch.object(db, 'service_heartbeats_update')
+    def test_flush(self, mock_update):
+        self.buffer.add(1)
+        self.buffer.add(1)
+        self.buffer.add(2)
+        self.buffer.flush()
+
+        mock_update.assert_called_once_with(mock.ANY, {1: (self.now, 2),
+                                                       2: (self.now, 1)})
+        self.assertIsNone(self.buffer.get(1))
+
+        # Nothing to write
+        self.buffer.flush()
+        self.assertEqual(1, mock_update.call_count)
+
+    @mock.patch.object(db, 'service_heartbeats_update',
+                       side_effect=[Exception, None])
+    def test_flush_error(self, mock_update):
+        self.buffer.add(1)
+        self.buffer.flush()
+        later = self.now + datetime.timedelta(seconds=1)
+        self.time_fixture.advance_time_seconds(1)
+        self.buffer.add(1)
+        self.buffer.flush()
+
+        self.assertEqual(mock.call(mock.ANY, {1: (later, 2)}),
+                         mock_update.call_args)
+
+
+class BatchedServiceGroupTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(BatchedServiceGroupTestCase, self).setUp()
+        self.down_time = 15
+        self.flags(service_down_time=self.down_time,
+                   servicegroup_driver='batched')
+        self.servicegroup_api = servicegroup.API()
+        self.driver = self.servicegroup_api._driver
+        self.now = timeutils.utcnow()
+        self.time_fixture = self.useFixture(
+            utils_fixture.TimeFixture(self.now))
+        self.buffer = batched.HeartbeatBuffer()
+        self.stub_out('nova.servicegroup.drivers.batched.HEARTBEATS',
+                      self.buffer)
+        patcher = mock.patch('oslo_service.loopingcall.'
+                             'FixedIntervalLoopingCall')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _service(self, service_id, seconds_ago):
+        last_seen_up = self.now - datetime.timedelta(seconds=seconds_ago)
+        return objects.Service(id=service_id, host='host%d' % service_id,
+                               topic='compute', binary='nova-compute',
+                               created_at=last_seen_up,
+                               updated_at=last_seen_up,
+                               last_seen_up=last_seen_up,
+                               forced_down=False)
+
+    def test_services_are_up(self):
+        services = [self._service(1, 10), self._service(2, 20),
+                    self._service(3, 20)]
+        # The heartbeat of the third service isn't written yet
+        self.buffer.add(3)
+
+        self.assertEqual([True, False, True],
+                         self.servicegroup_api.services_are_up(services))
+        self.assertFalse(self.servicegroup_api.service_is_up(services[1]))
+        self.assertTrue(self.servicegroup_api.service_is_up(services[2]))
+
+    def test_report_state_local(self):
+        self.stub_out('nova.objects.base.NovaObject.indirection_api', None)
+        service = mock.MagicMock(service_ref=self._service(1, 10))
+
+        self.driver._report_state(service)
+
+        self.assertEqual(self.now, self.buffer.get(1))
+
+    @mock.patch('nova.conductor.rpcapi.ConductorAPI')
+    def test_report_state_conductor(self, mock_conductor):
+        self.stub_out('nova.objects.base.NovaObject.indirection_api',
+                      mock.sentinel.indirection_api)
+        service = mock.MagicMock(service_ref=self._service(1, 10),
+                                 model_disconnected=False)
+        mock_conductor.return_value.can_report_heartbeat.return_value = True
+
+        self.driver._report_state(service)
+
+        mock_conductor.return_value.report_heartbeat.assert_called_once_with(
+            mock.ANY, 1)
+        self.assertIsNone(self.buffer.get(1))
+        self.assertFalse(service.model_disconnected)
+
+    @mock.patch.object(objects.Service, 'save')
+    @mock.patch('nova.conductor.rpcapi.ConductorAPI')
+    def test_report_state_old_conductor(self, mock_conductor, mock_save):
+        self.stub_out('nova.objects.base.NovaObject.indirection_api',
+                      mock.sentinel.indirection_api)
+        service_ref = self._service(1, 10)
+        service_ref.report_count = 10
+        service = mock.MagicMock(service_ref=service_ref,
+                                 model_disconnected=False)
+        mock_conductor.return_value.can_report_heartbeat.return_value = False
+
+        self.driver._report_state(service)
+
+        self.assertFalse(mock_conductor.return_value.report_heartbeat.called)
+        mock_save.assert_called_once_with()
+        self.assertEqual(11, service_ref.report_count)
+
+    @mock.patch('nova.conductor.rpcapi.ConductorAPI')
+    def test_report_state_conductor_error(self, mock_conductor):
+        self.stub_out('nova.objects.base.NovaObject.indirection_api',
+                      mock.sentinel.indirection_api)
+        service = mock.MagicMock(service_ref=self._service(1, 10),
+                                 model_disconnected=False)
+        mock_conductor.return_value.can_report_heartbeat.return_value = True
+        mock_conductor.return_value.report_heartbeat.side_effect = Exception
+
+        self.driver._report_state(service)
+
+        self.assertTrue(service.model_disconnected)
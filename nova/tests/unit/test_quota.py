@@ -2786,6 +2786,146 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         self.compare_reservation(result, reservations_list)
 
 
+class CountedQuotaDriverTestCase(test.TestCase):
+    def setUp(self):
+        super(CountedQuotaDriverTestCase, self).setUp()
+        self.flags(quota_instances=3,
+                   quota_cores=10,
+                   quota_ram=4096,
+                   quota_usage_cache_ttl=60)
+        self.driver = quota.CountedQuotaDriver()
+        self.context = context.RequestContext('fake-user', 'fake-project')
+        self.resources = quota.QUOTAS._resources
+        for i in range(2):
+            self._create_instance()
+
+    def _create_instance(self, user_id='fake-user'):
+        db.instance_create(self.context.elevated(),
+                           {'project_id': 'fake-project', 'user_id': user_id,
+                            'vcpus': 2, 'memory_mb': 512})
+
+    def _reserve(self, **deltas):
+        return self.driver.reserve(self.context, self.resources, deltas)
+
+    def _count_rows(self, model):
+        ctxt = self.context.elevated()
+        with sqa_api.main_context_manager.reader.using(ctxt):
+            return sqa_api.model_query(ctxt, model,
+                                       read_deleted='yes').count()
+
+    def test_get_project_quotas_counts_usage(self):
+        self._create_instance(user_id='other-user')
+        result = self.driver.get_project_quotas(
+            self.context, self.resources, 'fake-project')
+        self.assertEqual(dict(limit=3, in_use=3, reserved=0),
+                         result['instances'])
+        self.assertEqual(dict(limit=10, in_use=6, reserved=0),
+                         result['cores'])
+
+    def test_get_user_quotas_counts_usage(self):
+        self._create_instance(user_id='other-user')
+        result = self.driver.get_user_quotas(
+            self.context, self.resources, 'fake-project', 'fake-user')
+        self.assertEqual(dict(limit=3, in_use=2, reserved=0),
+                         result['instances'])
+        self.assertEqual(dict(limit=4096, in_use=1024, reserved=0),
+                         result['ram'])
+
+    def test_reserve(self):
+        reservations = self._reserve(instances=1, cores=2, ram=512)
+
+        # Nothing is written in the quota tables
+        self.assertEqual([], reservations)
+        self.assertEqual(0, self._count_rows(sqa_models.Reservation))
+        self.assertEqual(0, self._count_rows(sqa_models.QuotaUsage))
+
+    def test_reserve_counts_usage(self):
+        self._create_instance()
+        exc = self.assertRaises(exception.OverQuota, self._reserve,
+                                instances=1, cores=2, ram=512)
+        self.assertEqual(['instances'], exc.kwargs['overs'])
+        self.assertEqual(dict(in_use=3, reserved=0),
+                         exc.kwargs['usages']['instances'])
+
+    def test_reserve_counts_other_users(self):
+        self._create_instance(user_id='other-user')
+        exc = self.assertRaises(exception.OverQuota, self._reserve,
+                                instances=1, cores=2, ram=512)
+        self.assertEqual(['instances'], exc.kwargs['overs'])
+
+    def test_reserve_over_quota(self):
+        self.assertRaises(exception.OverQuota, self._reserve,
+                          instances=2, cores=4, ram=1024)
+
+    def test_reserve_ignores_cached_usage(self):
+        self.driver.get_project_quotas(self.context, self.resources,
+                                       'fake-project')
+        self._create_instance()
+        self.assertRaises(exception.OverQuota, self._reserve,
+                          instances=1, cores=2, ram=512)
+
+    def test_reserve_negative_delta(self):
+        self._create_instance()
+        self._create_instance()
+        self.assertEqual([], self._reserve(instances=-1, cores=-2,
+                                           ram=-512))
+
+    def test_recheck(self):
+        self._create_instance()
+        self.driver.recheck(self.context, self.resources,
+                            ['instances', 'cores', 'ram'])
+
+    def test_recheck_over_quota(self):
+        # Two requests passed the check at the same time
+        self._reserve(instances=1, cores=2, ram=512)
+        self._reserve(instances=1, cores=2, ram=512)
+        self._create_instance()
+        self._create_instance()
+
+        exc = self.assertRaises(exception.OverQuota, self.driver.recheck,
+                                self.context, self.resources,
+                                ['instances', 'cores', 'ram'])
+        self.assertEqual(['instances'], exc.kwargs['overs'])
+
+    def test_recheck_counts_project(self):
+        self._create_instance()
+        self._create_instance(user_id='other-user')
+        self.assertRaises(exception.OverQuota, self.driver.recheck,
+                          self.context, self.resources, ['instances'],
+                          user_id='other-user')
+
+    def test_no_reservations(self):
+        self.driver.commit(self.context, [])
+        self.driver.rollback(self.context, [])
+        self.driver.usage_reset(self.context, ['instances'])
+        self.driver.expire(self.context)
+        self.assertEqual(0, self._count_rows(sqa_models.Reservation))
+        self.assertEqual(0, self._count_rows(sqa_models.QuotaUsage))
+
+    def test_usage_is_cached(self):
+        self.driver.get_project_quotas(self.context, self.resources,
+                                       'fake-project')
+        self._create_instance()
+        result = self.driver.get_project_quotas(
+            self.context, self.resources, 'fake-project')
+        self.assertEqual(2, result['instances']['in_use'])
+
+        # Checking the quota counts the usage again
+        self._reserve(instances=0)
+        result = self.driver.get_project_quotas(
+            self.context, self.resources, 'fake-project')
+        self.assertEqual(3, result['instances']['in_use'])
+
+    def test_usage_is_not_cached(self):
+        self.flags(quota_usage_cache_ttl=0)
+        self.driver.get_project_quotas(self.context, self.resources,
+                                       'fake-project')
+        self._create_instance()
+        result = self.driver.get_project_quotas(
+            self.context, self.resources, 'fake-project')
+        self.assertEqual(3, result['instances']['in_use'])
+
+
 class NoopQuotaDriverTestCase(test.TestCase):
     def setUp(self):
         super(NoopQuotaDriverTestCase, self).setUp()
@@ -18,6 +18,7 @@ Tests For weights.
 
 import mock
 
+from nova.scheduler import columns
 from nova.scheduler import weights as scheduler_weights
 from nova.scheduler.weights import ram
 from nova import test
@@ -57,6 +58,23 @@ class TestWeigher(test.NoDBTestCase):
             ret = weights.normalize(seq, minval=minval, maxval=maxval)
             self.assertEqual(tuple(ret), result)
 
+    def test_normalize_array(self):
+        # weight_list, expected_result, minval, maxval
+        map_ = (
+            ((), (), None, None),
+            ((0.0, 0.0), (0.0, 0.0), None, None),
+            ((1.0, 1.0), (0.0, 0.0), None, None),
+
+            ((20.0, 50.0), (0.0, 1.0), None, None),
+            ((20.0, 50.0), (0.0, 0.375), None, 100.0),
+            ((20.0, 50.0), (0.4, 1.0), 0.0, None),
+            ((20.0, 50.0), (0.2, 0.5), 0.0, 100.0),
+        )
+        for seq, result, minval, maxval in map_:
+            ret = weights.normalize_array(weights.numpy.array(seq),
+                                          minval=minval, maxval=maxval)
+            self.assertEqual(tuple(ret.tolist()), result)
+
     @mock.patch('nova.weights.BaseWeigher.weigh_objects')
     def test_only_one_host(self, mock_weigh):
         host_values = [
@@ -72,3 +90,106 @@ class TestWeigher(test.NoDBTestCase):
         self.assertEqual(1, len(weighed_host))
         self.assertEqual('host1', weighed_host[0].obj.host)
         self.assertFalse(mock_weigh.called)
+
+    def _get_hosts(self):
+        host_values = [
+            ('host1', 'node1', {'free_ram_mb': 512}),
+            ('host2', 'node2', {'free_ram_mb': 8192}),
+            ('host3', 'node3', {'free_ram_mb': 1024}),
+            ('host4', 'node4', {'free_ram_mb': 8192}),
+            ('host5', 'node5', {'free_ram_mb': 3072}),
+        ]
+        return [fakes.FakeHostState(host, node, values)
+                for host, node, values in host_values]
+
+    def test_limit(self):
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighers = [ram.RAMWeigher()]
+        weighed_hosts = weight_handler.get_weighed_objects(
+            weighers, self._get_hosts(), {}, limit=3)
+        self.assertEqual(['host2', 'host4', 'host5'],
+                         [weighed.obj.host for weighed in weighed_hosts])
+
+    def test_vectorized(self):
+        class FakeWeigher(scheduler_weights.BaseHostWeigher):
+            def _weigh_object(self, host_state, weight_properties):
+                return int(host_state.host[-1])
+
+        hosts = self._get_hosts()
+        weight_handler = scheduler_weights.HostWeightHandler()
+        expected = weight_handler.get_weighed_objects(
+            [ram.RAMWeigher(), FakeWeigher()], hosts, {})
+
+        weight_handler.columns_cls = columns.HostStateColumns
+        with mock.patch.object(ram.RAMWeigher,
+                               '_weigh_object') as mock_weigh:
+            weighed_hosts = weight_handler.get_weighed_objects(
+                [ram.RAMWeigher(), FakeWeigher()], hosts, {})
+        self.assertFalse(mock_weigh.called)
+        self.assertEqual([(weighed.obj.host, weighed.weight)
+                          for weighed in expected],
+                         [(weighed.obj.host, weighed.weight)
+                          for weighed in weighed_hosts])
+
+    def test_vectorized_limit(self):
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weight_handler.columns_cls = columns.HostStateColumns
+        weighers = [ram.RAMWeigher()]
+        weighed_hosts = weight_handler.get_weighed_objects(
+            weighers, self._get_hosts(), {}, limit=3)
+        self.assertEqual([('host2', 1.0), ('host4', 1.0), ('host5', 0.375)],
+                         [(weighed.obj.host, weighed.weight)
+                          for weighed in weighed_hosts])
+
+    def test_vectorized_limit_ties(self):
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'free_ram_mb': 1024})
+                 for i in range(20)]
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighers = [ram.RAMWeigher()]
+        expected = weight_handler.get_weighed_objects(
+            weighers, hosts, {}, limit=3)
+
+        weight_handler.columns_cls = columns.HostStateColumns
+        weighed_hosts = weight_handler.get_weighed_objects(
+            weighers, hosts, {}, limit=3)
+        self.assertEqual(['host0', 'host1', 'host2'],
+                         [weighed.obj.host for weighed in expected])
+        self.assertEqual(['host0', 'host1', 'host2'],
+                         [weighed.obj.host for weighed in weighed_hosts])
+
+    def test_weight_handler_vectorized(self):
+        self.flags(scheduler_use_vectorized_weighers=True)
+        with mock.patch.object(columns, 'numpy', mock.sentinel.numpy):
+            weight_handler = scheduler_weights.HostWeightHandler()
+        self.assertEqual(columns.HostStateColumns,
+                         weight_handler.columns_cls)
+
+    @mock.patch.object(scheduler_weights.LOG, 'warning')
+    def test_weight_handler_vectorized_no_numpy(self, mock_warning):
+        self.flags(scheduler_use_vectorized_weighers=True)
+        with mock.patch.object(columns, 'numpy', None):
+            weight_handler = scheduler_weights.HostWeightHandler()
+        self.assertIsNone(weight_handler.columns_cls)
+        self.assertTrue(mock_warning.called)
+
+    def test_instrumentation(self):
+        weight_handler = scheduler_weights.HostWeightHandler()
+        instrumentation = mock.Mock()
+        instrumentation.sample.return_value = True
+        weight_handler.instrumentation = instrumentation
+        weight_handler.get_weighed_objects([ram.RAMWeigher()],
+                                           self._get_hosts(), {})
+        instrumentation.record.assert_called_once_with(
+            'weigher', 'RAMWeigher', mock.ANY, 5, 5)
+
+    def test_instrumentation_vectorized(self):
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weight_handler.columns_cls = columns.HostStateColumns
+        instrumentation = mock.Mock()
+        instrumentation.sample.return_value = True
+        weight_handler.instrumentation = instrumentation
+        weight_handler.get_weighed_objects([ram.RAMWeigher()],
+                                           self._get_hosts(), {})
+        instrumentation.record.assert_called_once_with(
+            'weigher', 'RAMWeigher', mock.ANY, 5, 5)
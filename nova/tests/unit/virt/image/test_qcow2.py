@@ -0,0 +1,204 @@
+#
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+
+import os
+import struct
+import zlib
+
+import fixtures
+import mock
+
+from nova import test
+from nova.virt.image import qcow2
+
+CLUSTER_BITS = 9
+CLUSTER_SIZE = 1 << CLUSTER_BITS
+COPIED = 1 << 63
+
+
+def _cluster(i):
+    return bytes(bytearray([i % 251])) * CLUSTER_SIZE
+
+
+def make_qcow2(disk, version=3, data_first=False, compressed=(),
+               zero=(), backing_file=False):
+    """Return a qcow2 image with the content of disk.
+
+    The indexes of the clusters of disk in compressed are compressed, the
+    ones in zero are zero clusters, the other clusters of zeros are
+    unallocated. With data_first, the data clusters are placed before the
+    L1 and L2 tables.
+    """
+    clusters = len(disk) // CLUSTER_SIZE
+    entries_per_l2 = CLUSTER_SIZE // 8
+    l1_size = (clusters + entries_per_l2 - 1) // entries_per_l2
+    data = [i for i in range(clusters)
+            if i not in compressed and i not in zero and
+            disk[i * CLUSTER_SIZE:(i + 1) * CLUSTER_SIZE] !=
+            b'\0' * CLUSTER_SIZE]
+
+    if data_first:
+        data_start = 1
+        l1_offset = (1 + len(data)) * CLUSTER_SIZE
+    else:
+        l1_offset = CLUSTER_SIZE
+        data_start = 2 + l1_size
+    l2_start = l1_offset // CLUSTER_SIZE + 1
+    # The compressed clusters follow the header, the tables and the data
+    image = bytearray((2 + l1_size + len(data)) * CLUSTER_SIZE)
+    header = qcow2.HEADER_V2.pack(
+        qcow2.QCOW2_MAGIC, version, 1024 if backing_file else 0,
+        4 if backing_file else 0, CLUSTER_BITS, len(disk), 0, l1_size,
+        l1_offset, 0, 0, 0, 0)
+    header += qcow2.HEADER_V3.pack(0, 0, 0, 4, 104)
+    image[:len(header)] = header
+
+    l1 = [COPIED | (l2_start + i) * CLUSTER_SIZE for i in range(l1_size)]
+    image[l1_offset:l1_offset + l1_size * 8] = struct.pack(
+        '>%dQ' % l1_size, *l1)
+
+    l2 = [0] * (l1_size * entries_per_l2)
+    for n, i in enumerate(data):
+        offset = (data_start + n) * CLUSTER_SIZE
+        l2[i] = COPIED | offset
+        image[offset:offset + CLUSTER_SIZE] = (
+            disk[i * CLUSTER_SIZE:(i + 1) * CLUSTER_SIZE])
+    for i in zero:
+        l2[i] = qcow2.ZERO
+    offset_bits = 62 - (CLUSTER_BITS - 8)
+    for i in compressed:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -12)
+        data = compressor.compress(
+            disk[i * CLUSTER_SIZE:(i + 1) * CLUSTER_SIZE])
+        data += compressor.flush()
+        offset = len(image)
+        sectors = ((offset & 511) + len(data) + 511) // 512
+        l2[i] = qcow2.COMPRESSED | ((sectors - 1) << offset_bits) | offset
+        image += data
+    for i in range(l1_size):
+        offset = (l2_start + i) * CLUSTER_SIZE
+        image[offset:offset + CLUSTER_SIZE] = struct.pack(
+            '>%dQ' % entries_per_l2,
+            *l2[i * entries_per_l2:(i + 1) * entries_per_l2])
+    return bytes(image)
+
+
+class StreamingConverterTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(StreamingConverterTestCase, self).setUp()
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.dst_path = os.path.join(tmpdir, 'image.converted')
+        self.spill_path = os.path.join(tmpdir, 'image.part')
+        self.disk = b''.join(_cluster(i) if i % 7 else b'\0' * CLUSTER_SIZE
+                             for i in range(100))
+
+    def _convert(self, image, write_size=1000, check_size=None):
+        converter = qcow2.StreamingConverter(self.dst_path, self.spill_path,
+                                             check_size=check_size)
+        for i in range(0, len(image), write_size):
+            converter.write(image[i:i + write_size])
+        return converter, converter.finish()
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_convert(self):
+        converter, converted = self._convert(make_qcow2(self.disk))
+
+        self.assertTrue(converted)
+        self.assertEqual(len(self.disk), converter.virtual_size)
+        self.assertEqual(self.disk, self._read(self.dst_path))
+        # Only the header was received before the L1 and L2 tables
+        self.assertEqual(set(), converter._spilled)
+
+    def test_convert_data_first(self):
+        converter, converted = self._convert(
+            make_qcow2(self.disk, data_first=True))
+
+        self.assertTrue(converted)
+        self.assertEqual(self.disk, self._read(self.dst_path))
+        self.assertNotEqual(set(), converter._spilled)
+
+    def test_convert_compressed_and_zero_clusters(self):
+        converter, converted = self._convert(
+            make_qcow2(self.disk, compressed=(1, 2, 99), zero=(3,)),
+            write_size=CLUSTER_SIZE * 3)
+
+        self.assertTrue(converted)
+        disk = (self.disk[:3 * CLUSTER_SIZE] + b'\0' * CLUSTER_SIZE +
+                self.disk[4 * CLUSTER_SIZE:])
+        self.assertEqual(disk, self._read(self.dst_path))
+
+    def test_convert_version_2(self):
+        converter, converted = self._convert(make_qcow2(self.disk,
+                                                        version=2))
+
+        self.assertTrue(converted)
+        self.assertEqual(self.disk, self._read(self.dst_path))
+
+    def test_convert_partial_last_cluster(self):
+        disk = self.disk + b'\1' * 100
+        image = make_qcow2(disk + b'\0' * (CLUSTER_SIZE - 100))
+        # The virtual size isn't a multiple of the cluster size
+        image = (image[:24] + struct.pack('>Q', len(disk)) + image[32:])
+
+        converter, converted = self._convert(image)
+
+        self.assertTrue(converted)
+        self.assertEqual(disk, self._read(self.dst_path))
+
+    def test_not_qcow2(self):
+        converter, converted = self._convert(self.disk)
+
+        self.assertFalse(converted)
+        self.assertEqual(self.disk, self._read(self.spill_path))
+        self.assertFalse(os.path.exists(self.dst_path))
+
+    def test_small_image(self):
+        converter, converted = self._convert(b'small')
+
+        self.assertFalse(converted)
+        self.assertEqual(b'small', self._read(self.spill_path))
+
+    def test_backing_file(self):
+        image = make_qcow2(self.disk, backing_file=True)
+
+        converter, converted = self._convert(image)
+
+        self.assertFalse(converted)
+        self.assertEqual(image, self._read(self.spill_path))
+        self.assertFalse(os.path.exists(self.dst_path))
+
+    def test_truncated(self):
+        image = make_qcow2(self.disk)
+
+        self.assertRaises(qcow2.ConversionError, self._convert,
+                          image[:len(image) // 2])
+
+    def test_invalid_compressed_cluster(self):
+        image = make_qcow2(self.disk, compressed=(1,))
+        image = image[:-10] + b'\xff' * 10
+
+        self.assertRaises(qcow2.ConversionError, self._convert, image)
+
+    def test_check_size(self):
+        check_size = mock.Mock(side_effect=ValueError)
+
+        self.assertRaises(ValueError, self._convert, make_qcow2(self.disk),
+                          check_size=check_size)
+        check_size.assert_called_once_with(len(self.disk))
@@ -139,7 +139,7 @@ def get_fs_info(path):
             'free': 84 * (1024 ** 3)}
 
 
-def fetch_image(context, target, image_id, max_size=0):
+def fetch_image(context, target, image_id, max_size=0, max_bandwidth=0):
     pass
 
 
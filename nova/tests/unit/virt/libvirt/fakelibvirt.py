@@ -144,6 +144,16 @@ VIR_DOMAIN_BLOCK_REBASE_RELATIVE = 8
 VIR_CONNECT_LIST_DOMAINS_ACTIVE = 1
 VIR_CONNECT_LIST_DOMAINS_INACTIVE = 2
 
+VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE = 1
+
+# getAllDomainStats stats
+VIR_DOMAIN_STATS_STATE = 1
+VIR_DOMAIN_STATS_CPU_TOTAL = 2
+VIR_DOMAIN_STATS_BALLOON = 4
+VIR_DOMAIN_STATS_VCPU = 8
+VIR_DOMAIN_STATS_INTERFACE = 16
+VIR_DOMAIN_STATS_BLOCK = 32
+
 # secret type
 VIR_SECRET_USAGE_TYPE_NONE = 0
 VIR_SECRET_USAGE_TYPE_VOLUME = 1
@@ -561,6 +571,32 @@ class Domain(object):
     def blockStats(self, device):
         return [2, 10000242400, 234, 2343424234, 34]
 
+    def _get_all_stats(self):
+        stats = {'cpu.time': 123456789,
+                 'balloon.current': int(self._def['memory']),
+                 'balloon.maximum': int(self._def['memory']),
+                 'vcpu.current': self._def['vcpu']}
+        for i in range(self._def['vcpu']):
+            stats['vcpu.%d.time' % i] = 120405
+        disks = self._def['devices'].get('disks', [])
+        stats['block.count'] = len(disks)
+        for i, disk in enumerate(disks):
+            stats['block.%d.name' % i] = disk.get('target_dev')
+            for key, value in zip(('rd.reqs', 'rd.bytes', 'wr.reqs',
+                                   'wr.bytes', 'errors'),
+                                  self.blockStats(disk.get('target_dev'))):
+                stats['block.%d.%s' % (i, key)] = value
+        nics = self._def['devices'].get('nics', [])
+        stats['net.count'] = len(nics)
+        for i, nic in enumerate(nics):
+            stats['net.%d.name' % i] = 'vnet%d' % i
+            for key, value in zip(('rx.bytes', 'rx.pkts', 'rx.errs',
+                                   'rx.drop', 'tx.bytes', 'tx.pkts',
+                                   'tx.errs', 'tx.drop'),
+                                  self.interfaceStats('vnet%d' % i)):
+                stats['net.%d.%s' % (i, key)] = value
+        return stats
+
     def suspend(self):
         self._state = VIR_DOMAIN_PAUSED
 
@@ -915,6 +951,10 @@ class Connection(object):
                     vms.append(vm)
         return vms
 
+    def getAllDomainStats(self, stats=0, flags=0):
+        return [(vm, vm._get_all_stats()) for vm in self._vms.values()
+                if vm._state != VIR_DOMAIN_SHUTOFF]
+
     def _emit_lifecycle(self, dom, event, detail):
         if VIR_DOMAIN_EVENT_ID_LIFECYCLE not in self._event_callbacks:
             return
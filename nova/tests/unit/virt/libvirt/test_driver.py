@@ -25,6 +25,7 @@ import random
 import re
 import shutil
 import signal
+import stat
 import threading
 import time
 import uuid
@@ -80,12 +81,14 @@ from nova.tests.unit.objects import test_pci_device
 from nova.tests.unit.objects import test_vcpu_model
 from nova.tests.unit.virt.libvirt import fake_libvirt_utils
 from nova.tests.unit.virt.libvirt import fakelibvirt
+from nova.tests import uuidsentinel as uuids
 from nova import utils
 from nova import version
 from nova.virt import block_device as driver_block_device
 from nova.virt import configdrive
 from nova.virt.disk import api as disk
 from nova.virt import driver
+from nova.virt import event as virtevent
 from nova.virt import fake
 from nova.virt import firewall as base_firewall
 from nova.virt import hardware
@@ -5439,6 +5442,26 @@ class LibvirtConnTestCase(test.NoDBTestCase):
         self.assertEqual(uuids[3], vm4.UUIDString())
         mock_list.assert_called_with(only_guests=True, only_running=False)
 
+    @mock.patch.object(libvirt_guest.Guest, 'get_power_state')
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_get_power_states(self, mock_list, mock_power_state):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        vm3 = FakeVirtDomain(name="instance00000003")
+        mock_list.return_value = [vm1, vm2, vm3]
+        mock_power_state.side_effect = [
+            power_state.RUNNING, power_state.SHUTDOWN,
+            exception.InstanceNotFound(instance_id=vm3.UUIDString())]
+
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        power_states = drvr.get_power_states()
+
+        self.assertEqual({vm1.UUIDString(): power_state.RUNNING,
+                          vm2.UUIDString(): power_state.SHUTDOWN},
+                         power_states)
+        mock_list.assert_called_once_with(only_guests=True,
+                                          only_running=False)
+
     @mock.patch('nova.virt.libvirt.host.Host.get_online_cpus')
     def test_get_host_vcpus(self, get_online_cpus):
         drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
@@ -11081,7 +11104,7 @@ class LibvirtConnTestCase(test.NoDBTestCase):
                         'disk_size': '10737418240',
                         'over_committed_disk_size': '21474836480'}]}
 
-        def side_effect(name, dom, block_device_info):
+        def side_effect(name, dom, block_device_info, disk_info_cache):
             if name == 'instance0000001':
                 self.assertEqual('/dev/vda',
                                  block_device_info['root_device_name'])
@@ -11127,6 +11150,100 @@ class LibvirtConnTestCase(test.NoDBTestCase):
         drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
         self.assertEqual(0, drvr._get_disk_over_committed_size_total())
 
+    @mock.patch.object(libvirt_driver.libvirt_utils, 'get_disk_backing_file',
+                       return_value='base')
+    @mock.patch.object(libvirt_driver.disk, 'get_disk_size',
+                       return_value=20 * units.Gi)
+    @mock.patch.object(os.path, 'getsize', return_value=units.Gi)
+    @mock.patch.object(os, 'stat')
+    def test_get_instance_disk_info_cached(self, mock_stat, mock_getsize,
+                                           mock_disk_size, mock_backing):
+        xml = ("<domain type='kvm'><name>instance-0000000a</name>"
+               "<devices>"
+               "<disk type='file'><driver name='qemu' type='qcow2'/>"
+               "<source file='/test/disk'/>"
+               "<target dev='vda' bus='virtio'/></disk>"
+               "</devices></domain>")
+        mock_stat.return_value = mock.Mock(st_mode=stat.S_IFREG,
+                                           st_mtime=1.0, st_size=units.Gi)
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        cache = {'/test/gone': ((1.0, units.Gi), (units.Gi, 'base'))}
+
+        for i in range(2):
+            info = drvr._get_instance_disk_info('instance-0000000a', xml,
+                                                disk_info_cache=cache)
+            self.assertEqual(20 * units.Gi, info[0]['virt_disk_size'])
+            self.assertEqual('base', info[0]['backing_file'])
+            self.assertEqual(19 * units.Gi,
+                             info[0]['over_committed_disk_size'])
+        mock_disk_size.assert_called_once_with('/test/disk')
+        mock_backing.assert_called_once_with('/test/disk')
+        self.assertEqual(['/test/disk'], list(cache))
+
+        # The disk is probed again once it changed
+        mock_stat.return_value.st_mtime = 2.0
+        drvr._get_instance_disk_info('instance-0000000a', xml,
+                                     disk_info_cache=cache)
+        self.assertEqual(2, mock_disk_size.call_count)
+        self.assertEqual(2, mock_backing.call_count)
+
+    @mock.patch.object(libvirt_driver.libvirt_utils, 'get_disk_backing_file',
+                       return_value='base')
+    @mock.patch.object(libvirt_driver.disk, 'get_disk_size',
+                       return_value=20 * units.Gi)
+    @mock.patch.object(os.path, 'getsize', return_value=units.Gi)
+    @mock.patch.object(os, 'stat')
+    def test_get_instance_disk_info_not_cached(self, mock_stat, mock_getsize,
+                                               mock_disk_size, mock_backing):
+        xml = ("<domain type='kvm'><name>instance-0000000a</name>"
+               "<devices>"
+               "<disk type='file'><driver name='qemu' type='qcow2'/>"
+               "<source file='/test/disk'/>"
+               "<target dev='vda' bus='virtio'/></disk>"
+               "</devices></domain>")
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        for i in range(2):
+            drvr._get_instance_disk_info('instance-0000000a', xml)
+        self.assertEqual(2, mock_disk_size.call_count)
+        self.assertFalse(mock_stat.called)
+
+    @mock.patch.object(host.Host, "list_instance_domains")
+    @mock.patch.object(objects.BlockDeviceMappingList, "bdms_by_instance_uuid")
+    @mock.patch.object(objects.InstanceList, "get_by_filters",
+                       return_value=[])
+    @mock.patch.object(libvirt_driver.LibvirtDriver, "_get_instance_disk_info",
+                       return_value=[])
+    def test_disk_over_committed_size_total_disk_info_cache(
+            self, mock_get_disk_info, mock_get, mock_bdms, mock_list):
+        dom = mock.Mock()
+        dom.UUIDString.return_value = uuids.instance
+        dom.XMLDesc.return_value = "<domain/>"
+        mock_list.return_value = [dom]
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        drvr._disk_info_cache = {uuids.instance: {'/test/disk': None},
+                                 uuids.gone: {'/test/gone': None}}
+
+        drvr._get_disk_over_committed_size_total()
+
+        # The disks of the domains which are gone are forgotten
+        self.assertEqual({uuids.instance: {'/test/disk': None}},
+                         drvr._disk_info_cache)
+        mock_get_disk_info.assert_called_once_with(
+            dom.name.return_value, "<domain/>", block_device_info=None,
+            disk_info_cache=drvr._disk_info_cache[uuids.instance])
+
+    def test_emit_event_invalidates_disk_info_cache(self):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        drvr._disk_info_cache = {uuids.instance: {'/test/disk': None},
+                                 uuids.other: {'/test/other': None}}
+
+        drvr.emit_event(virtevent.LifecycleEvent(
+            uuids.instance, virtevent.EVENT_LIFECYCLE_STOPPED))
+
+        self.assertEqual({uuids.other: {'/test/other': None}},
+                         drvr._disk_info_cache)
+
     def test_cpu_info(self):
         drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
 
@@ -15936,6 +16053,122 @@ class LibvirtVolumeUsageTestCase(test.NoDBTestCase):
               [dict(instance=self.ins_ref, instance_bdms=self.bdms)])
         self.assertEqual(vol_usage, [])
 
+    @mock.patch.object(host.Host, 'get_all_domain_stats')
+    def test_get_all_volume_usage_bulk_stats(self, mock_stats):
+        mock_stats.return_value = {self.ins_ref.uuid: host.DomainStats(
+            cpu_time=0, vcpu_times=[], memory=0, max_memory=0,
+            block={'vde': (1, 2, 3, 4, -1)}, net={})}
+
+        with mock.patch.object(self.drvr, 'block_stats',
+                               return_value=(5, 6, 7, 8, -1)) as mock_block:
+            vol_usage = self.drvr.get_all_volume_usage(self.c,
+                  [dict(instance=self.ins_ref, instance_bdms=self.bdms)])
+
+        expected_usage = [{'volume': 1,
+                           'instance': self.ins_ref,
+                           'rd_req': 1, 'rd_bytes': 2,
+                           'wr_req': 3, 'wr_bytes': 4},
+                          {'volume': 2,
+                           'instance': self.ins_ref,
+                           'rd_req': 5, 'rd_bytes': 6,
+                           'wr_req': 7, 'wr_bytes': 8}]
+        self.assertEqual(expected_usage, vol_usage)
+        mock_stats.assert_called_once_with()
+        # Only the disk missing from the bulk statistics is queried
+        mock_block.assert_called_once_with(self.ins_ref, 'vda')
+
+
+class LibvirtDomainStatsTestCase(test.NoDBTestCase):
+    """Test for the use of the sampled statistics of the guests."""
+
+    def setUp(self):
+        super(LibvirtDomainStatsTestCase, self).setUp()
+        self.useFixture(fakelibvirt.FakeLibvirtFixture())
+        self.flags(domain_stats_interval=10, group='libvirt')
+        self.drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.instance = objects.Instance(
+            uuid='875a8070-d0b9-4949-8b31-104d125c9a64')
+        self.stats = host.DomainStats(
+            cpu_time=3000, vcpu_times=[1000, 2000], memory=512,
+            max_memory=1024, block={'vda': (1, 2, 3, 4, -1)},
+            net={'tap1': (10, 11, 12, 13, 20, 21, 22, 23),
+                 'tap2': (30, 31, 32, 33, 40, 41, 42, 43)})
+
+    @mock.patch('oslo_service.loopingcall.FixedIntervalLoopingCall')
+    def test_init_and_cleanup_host(self, mock_loop):
+        self.drvr.init_host('fake-host')
+        mock_loop.return_value.start.assert_called_once_with(interval=10)
+
+        self.drvr.cleanup_host('fake-host')
+        mock_loop.return_value.stop.assert_called_once_with()
+
+    @mock.patch.object(host.Host, 'get_all_domain_stats')
+    def test_get_all_bw_counters(self, mock_stats):
+        mock_stats.return_value = {self.instance.uuid: self.stats}
+        network_info = [{'devname': 'tap1', 'address': 'fa:16:3e:00:00:01'},
+                        {'devname': 'tap2', 'address': 'fa:16:3e:00:00:02'},
+                        {'devname': 'tap3', 'address': 'fa:16:3e:00:00:03'}]
+        other = objects.Instance(uuid='0c8a6a41-5bd9-4c6d-a3dd-6f1a2bb7d7b5')
+
+        with mock.patch.object(objects.Instance, 'get_network_info',
+                               return_value=network_info):
+            counters = self.drvr.get_all_bw_counters([self.instance, other])
+
+        self.assertEqual([{'uuid': self.instance.uuid,
+                           'mac_address': 'fa:16:3e:00:00:01',
+                           'bw_in': 10, 'bw_out': 20},
+                          {'uuid': self.instance.uuid,
+                           'mac_address': 'fa:16:3e:00:00:02',
+                           'bw_in': 30, 'bw_out': 40}], counters)
+
+    def test_get_all_bw_counters_not_sampled(self):
+        self.flags(domain_stats_interval=0, group='libvirt')
+
+        self.assertRaises(NotImplementedError,
+                          self.drvr.get_all_bw_counters, [self.instance])
+
+    @mock.patch.object(host.Host, 'get_all_domain_stats', return_value=None)
+    def test_get_all_bw_counters_not_supported(self, mock_stats):
+        self.assertRaises(NotImplementedError,
+                          self.drvr.get_all_bw_counters, [self.instance])
+
+    @mock.patch.object(host.Host, 'get_all_domain_stats')
+    @mock.patch.object(host.Host, 'get_guest')
+    def test_get_diagnostics_sampled(self, mock_get_guest, mock_stats):
+        mock_stats.return_value = {self.instance.uuid: self.stats}
+        self.drvr._domain_stats.sample()
+        xml = """
+                <domain type='kvm'>
+                    <devices>
+                        <disk type='file'>
+                            <source file='filename'/>
+                            <target dev='vda' bus='virtio'/>
+                        </disk>
+                        <interface type='bridge'>
+                            <mac address='fa:16:3e:00:00:01'/>
+                            <target dev='tap1'/>
+                        </interface>
+                    </devices>
+                </domain>
+            """
+        guest = mock.Mock(spec=libvirt_guest.Guest)
+        guest._domain = mock.Mock()
+        guest.get_xml_desc.return_value = xml
+        guest._domain.memoryStats.return_value = {'actual': 512}
+        guest._domain.maxMemory.return_value = 1024
+        mock_get_guest.return_value = guest
+
+        actual = self.drvr.get_diagnostics(self.instance)
+
+        self.assertEqual(1000, actual['cpu0_time'])
+        self.assertEqual(2000, actual['cpu1_time'])
+        self.assertEqual(2, actual['vda_read'])
+        self.assertEqual(10, actual['tap1_rx'])
+        self.assertEqual(20, actual['tap1_tx'])
+        self.assertFalse(guest.get_vcpus_info.called)
+        self.assertFalse(guest._domain.blockStats.called)
+        self.assertFalse(guest._domain.interfaceStats.called)
+
 
 class LibvirtNonblockingTestCase(test.NoDBTestCase):
     """Test libvirtd calls are nonblocking."""
@@ -917,6 +917,67 @@ cg /cgroup/memory cg opt1,opt2 0 0
     def test_is_cpu_control_policy_capable_ioerror(self, mock_open):
         self.assertFalse(self.host.is_cpu_control_policy_capable())
 
+    @mock.patch.object(fakelibvirt.virConnect, "getAllDomainStats")
+    def test_get_all_domain_stats(self, mock_stats):
+        vm = FakeVirtDomain(id=3, name="instance00000001")
+        mock_stats.return_value = [(vm, {
+            'cpu.time': 1000,
+            'balloon.current': 512,
+            'balloon.maximum': 1024,
+            'vcpu.current': 2,
+            'vcpu.0.time': 400,
+            'vcpu.1.time': 600,
+            'block.count': 1,
+            'block.0.name': 'vda',
+            'block.0.rd.reqs': 1,
+            'block.0.rd.bytes': 2,
+            'block.0.wr.reqs': 3,
+            'block.0.wr.bytes': 4,
+            'block.0.errors': 5,
+            'net.count': 1,
+            'net.0.name': 'vnet0',
+            'net.0.rx.bytes': 10,
+            'net.0.rx.pkts': 11,
+            'net.0.tx.bytes': 20,
+            'net.0.tx.pkts': 21})]
+
+        stats = self.host.get_all_domain_stats()
+
+        self.assertEqual({vm.UUIDString(): host.DomainStats(
+            cpu_time=1000, vcpu_times=[400, 600], memory=512,
+            max_memory=1024, block={'vda': (1, 2, 3, 4, 5)},
+            net={'vnet0': (10, 11, -1, -1, 20, 21, -1, -1)})}, stats)
+        mock_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_CPU_TOTAL |
+            fakelibvirt.VIR_DOMAIN_STATS_BALLOON |
+            fakelibvirt.VIR_DOMAIN_STATS_VCPU |
+            fakelibvirt.VIR_DOMAIN_STATS_INTERFACE |
+            fakelibvirt.VIR_DOMAIN_STATS_BLOCK,
+            fakelibvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE)
+
+    @mock.patch.object(fakelibvirt.virConnect, "getAllDomainStats")
+    def test_get_all_domain_stats_not_supported(self, mock_stats):
+        mock_stats.side_effect = fakelibvirt.make_libvirtError(
+            fakelibvirt.libvirtError,
+            "API is not supported",
+            error_code=fakelibvirt.VIR_ERR_NO_SUPPORT)
+
+        self.assertIsNone(self.host.get_all_domain_stats())
+        self.assertIsNone(self.host.get_all_domain_stats())
+        # The API isn't called again once it is known to be unsupported
+        mock_stats.assert_called_once_with(mock.ANY, mock.ANY)
+
+    @mock.patch.object(fakelibvirt.virConnect, "getAllDomainStats")
+    def test_get_all_domain_stats_error(self, mock_stats):
+        mock_stats.side_effect = fakelibvirt.make_libvirtError(
+            fakelibvirt.libvirtError,
+            "internal error",
+            error_code=fakelibvirt.VIR_ERR_INTERNAL_ERROR)
+
+        self.assertRaises(fakelibvirt.libvirtError,
+                          self.host.get_all_domain_stats)
+        self.assertFalse(self.host._skip_domain_stats)
+
 
 class DomainJobInfoTestCase(test.NoDBTestCase):
 
@@ -1110,3 +1171,48 @@ class DomainJobInfoTestCase(test.NoDBTestCase):
 
         mock_stats.assert_called_once_with()
         mock_info.assert_called_once_with()
+
+
+class DomainStatsCollectorTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(DomainStatsCollectorTestCase, self).setUp()
+        self.host = mock.Mock(spec=host.Host)
+        self.collector = host.DomainStatsCollector(self.host)
+
+    @mock.patch('time.time')
+    def test_sample(self, mock_time):
+        mock_time.return_value = 100
+        stats = {'uuid1': mock.sentinel.stats1}
+        self.host.get_all_domain_stats.return_value = stats
+
+        self.assertEqual(stats, self.collector.sample())
+        self.assertEqual(stats, self.collector.get_latest(max_age=10))
+        mock_time.return_value = 111
+        self.assertIsNone(self.collector.get_latest(max_age=10))
+
+    def test_sample_error(self):
+        self.host.get_all_domain_stats.side_effect = (
+            fakelibvirt.make_libvirtError(
+                fakelibvirt.libvirtError, "internal error",
+                error_code=fakelibvirt.VIR_ERR_INTERNAL_ERROR))
+
+        self.assertIsNone(self.collector.sample())
+        self.assertIsNone(self.collector.get_latest(max_age=10))
+
+    @mock.patch('oslo_service.loopingcall.FixedIntervalLoopingCall')
+    def test_start_stop(self, mock_loop):
+        self.collector.start(10)
+
+        mock_loop.assert_called_once_with(self.collector.sample)
+        mock_loop.return_value.start.assert_called_once_with(interval=10)
+        self.collector.stop()
+        mock_loop.return_value.stop.assert_called_once_with()
+
+    @mock.patch('oslo_service.loopingcall.FixedIntervalLoopingCall')
+    def test_sample_not_supported(self, mock_loop):
+        self.host.get_all_domain_stats.return_value = None
+        self.collector.start(10)
+
+        self.assertIsNone(self.collector.sample())
+        mock_loop.return_value.stop.assert_called_once_with()
@@ -773,3 +773,79 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
                                                     remove_lock=False)
         mock_synchronized.assert_called_once_with(lock_file, external=True,
                                                   lock_path=lock_path)
+
+    @mock.patch.object(libvirt_utils, 'update_mtime')
+    def test_handle_base_image_pinned(self, mock_mtime):
+        img = '123'
+
+        with self._make_base_file() as fname:
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.unexplained_images = [fname]
+            image_cache_manager.pinned_images = set(['123'])
+            image_cache_manager._handle_base_image(img, fname)
+
+            mock_mtime.assert_called_once_with(fname)
+            self.assertEqual(image_cache_manager.unexplained_images, [])
+            self.assertEqual(image_cache_manager.active_base_files, [fname])
+            self.assertEqual(image_cache_manager.removable_base_files, [])
+
+    @mock.patch.object(utils, 'spawn_n',
+                       side_effect=lambda f, *args: f(*args))
+    @mock.patch.object(utils, 'synchronized',
+                       return_value=lambda function: function)
+    @mock.patch.object(libvirt_utils, 'fetch_image')
+    def test_prefetch(self, mock_fetch, mock_synchronized, mock_spawn):
+        def fake_fetch(context, target, image_id, max_bandwidth=0):
+            with open(target, 'w') as f:
+                f.write(image_id)
+
+        mock_fetch.side_effect = fake_fetch
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir,
+                       image_prefetch_max_concurrency=2,
+                       image_prefetch_max_bandwidth=10)
+            base_dir = os.path.join(tmpdir, CONF.image_cache_subdirectory_name)
+            cached = os.path.join(base_dir, imagecache.get_cache_fname('b'))
+            os.mkdir(base_dir)
+            open(cached, 'w').close()
+            prefetched = os.path.join(base_dir,
+                                      imagecache.get_cache_fname('a'))
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.prefetch(mock.sentinel.ctx, ['a', 'b'])
+
+            mock_fetch.assert_called_once_with(
+                mock.sentinel.ctx, prefetched + '.prefetch', 'a',
+                max_bandwidth=5 * 1024 * 1024)
+            mock_synchronized.assert_called_once_with(
+                imagecache.get_cache_fname('a'), external=True,
+                lock_path=os.path.join(tmpdir, 'locks'))
+            with open(prefetched) as f:
+                self.assertEqual('a', f.read())
+            self.assertFalse(os.path.exists(prefetched + '.prefetch'))
+            self.assertFalse(image_cache_manager._prefetching)
+
+    @mock.patch.object(utils, 'spawn_n',
+                       side_effect=lambda f, *args: f(*args))
+    @mock.patch.object(libvirt_utils, 'fetch_image',
+                       side_effect=test.TestingException)
+    def test_prefetch_failure(self, mock_fetch, mock_spawn):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.prefetch(mock.sentinel.ctx, ['a'])
+
+            self.assertTrue(mock_fetch.called)
+            self.assertEqual([], os.listdir(
+                os.path.join(tmpdir, CONF.image_cache_subdirectory_name)))
+            self.assertFalse(image_cache_manager._prefetching)
+
+    @mock.patch.object(utils, 'spawn_n')
+    def test_prefetch_in_progress(self, mock_spawn):
+        image_cache_manager = imagecache.ImageCacheManager()
+        image_cache_manager._prefetching = True
+
+        image_cache_manager.prefetch(mock.sentinel.ctx, ['a'])
+
+        self.assertFalse(mock_spawn.called)
@@ -542,7 +542,7 @@ disk size: 4.4M
         image_id = '4'
         libvirt_utils.fetch_image(context, target, image_id)
         mock_images.assert_called_once_with(
-            context, image_id, target, max_size=0)
+            context, image_id, target, max_size=0, max_bandwidth=0)
 
     @mock.patch('nova.virt.images.fetch')
     def test_fetch_initrd_image(self, mock_images):
@@ -602,6 +602,7 @@ disk size: 4.4M
         self.stub_out('os.unlink', fake_unlink)
         self.stubs.Set(images, 'fetch', lambda *_, **__: None)
         self.stubs.Set(images, 'qemu_img_info', fake_qemu_img_info)
+        self.stub_out('nova.virt.images._CONVERSIONS', {})
         self.stubs.Set(fileutils, 'delete_if_exists', fake_rm_on_error)
 
         # Since the remove param of fileutils.remove_path_on_error()
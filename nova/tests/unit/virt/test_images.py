@@ -12,13 +12,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import os
 
+import fixtures
 import mock
 from oslo_concurrency import processutils
 
 from nova import exception
 from nova import test
+from nova.tests.unit.virt.image import test_qcow2
 from nova import utils
 from nova.virt import images
 
@@ -66,3 +69,119 @@ class QemuTestCase(test.NoDBTestCase):
                                'Image href123 is unacceptable.*',
                                images.fetch_to_raw,
                                None, 'href123', '/no/path')
+
+    @mock.patch.object(images.IMAGE_API, 'download')
+    def test_fetch_max_bandwidth(self, mock_download):
+        images.fetch(None, 'href123', '/no/path', max_bandwidth=1024)
+
+        mock_download.assert_called_once_with(None, 'href123',
+                                              dest_path='/no/path',
+                                              max_bandwidth=1024)
+
+
+class FetchToRawTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(FetchToRawTestCase, self).setUp()
+        self.flags(stream_raw_conversion=True)
+        self.stub_out('nova.virt.images._CONVERSIONS',
+                      collections.OrderedDict())
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'image')
+        self.disk = b'\1' * 4096
+        self.info = mock.Mock(file_format='raw', backing_file=None,
+                              virtual_size=len(self.disk))
+        patcher = mock.patch.object(images, 'qemu_img_info',
+                                    return_value=self.info)
+        self.mock_info = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _download(self, image):
+        def download(context, image_href, data, max_bandwidth=0):
+            data.write(image[:1000])
+            data.write(image[1000:])
+        return mock.patch.object(images.IMAGE_API, 'download',
+                                 side_effect=download)
+
+    def _read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_fetch_to_raw_streaming(self):
+        with self._download(test_qcow2.make_qcow2(self.disk)):
+            images.fetch_to_raw(None, 'href123', self.path, max_size=4096)
+
+        self.assertEqual(self.disk, self._read())
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.assertFalse(os.path.exists(self.path + '.converted'))
+        self.mock_info.assert_called_once_with(self.path + '.converted')
+        self.assertEqual({'format': 'qcow2', 'virtual_size': 4096,
+                          'converted_to': 'raw'},
+                         images._CONVERSIONS['href123'])
+
+    def test_fetch_to_raw_streaming_not_converted(self):
+        with self._download(self.disk):
+            images.fetch_to_raw(None, 'href123', self.path)
+
+        self.assertEqual(self.disk, self._read())
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.mock_info.assert_called_once_with(self.path + '.part')
+        self.assertEqual({'format': 'raw', 'virtual_size': 4096,
+                          'converted_to': None},
+                         images._CONVERSIONS['href123'])
+
+    def test_fetch_to_raw_streaming_too_large(self):
+        with self._download(test_qcow2.make_qcow2(self.disk)):
+            self.assertRaises(exception.FlavorDiskSmallerThanImage,
+                              images.fetch_to_raw, None, 'href123',
+                              self.path, max_size=1024)
+
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.assertFalse(os.path.exists(self.path + '.converted'))
+        self.assertNotIn('href123', images._CONVERSIONS)
+
+    def test_fetch_to_raw_streaming_truncated(self):
+        image = test_qcow2.make_qcow2(self.disk)
+        with self._download(image[:len(image) // 2]):
+            self.assertRaises(exception.ImageUnacceptable,
+                              images.fetch_to_raw, None, 'href123',
+                              self.path)
+
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.assertFalse(os.path.exists(self.path + '.converted'))
+
+    def test_conversions_bounded(self):
+        self.stub_out('nova.virt.images._MAX_CONVERSIONS', 2)
+        images._set_conversion('href1', {'format': 'raw'})
+        images._set_conversion('href2', {'format': 'raw'})
+        self.assertEqual({'format': 'raw'}, images._get_conversion('href1'))
+
+        images._set_conversion('href3', {'format': 'qcow2'})
+
+        self.assertEqual(['href1', 'href3'], list(images._CONVERSIONS))
+        self.assertIsNone(images._get_conversion('href2'))
+
+    @mock.patch.object(images, 'fetch')
+    def test_fetch_to_raw_cached_too_large(self, mock_fetch):
+        images._CONVERSIONS['href123'] = {'format': 'qcow2',
+                                          'virtual_size': 4096,
+                                          'converted_to': 'raw'}
+
+        self.assertRaises(exception.FlavorDiskSmallerThanImage,
+                          images.fetch_to_raw, None, 'href123', self.path,
+                          max_size=1024)
+        self.assertFalse(mock_fetch.called)
+
+    @mock.patch('os.rename')
+    @mock.patch.object(images, 'fetch')
+    def test_fetch_to_raw_cached_raw(self, mock_fetch, mock_rename):
+        images._CONVERSIONS['href123'] = {'format': 'raw',
+                                          'virtual_size': 4096,
+                                          'converted_to': None}
+
+        images.fetch_to_raw(None, 'href123', self.path)
+
+        mock_fetch.assert_called_once_with(None, 'href123',
+                                           self.path + '.part', max_size=0,
+                                           max_bandwidth=0)
+        mock_rename.assert_called_once_with(self.path + '.part', self.path)
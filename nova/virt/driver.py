@@ -166,6 +166,15 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self):
+        """Return the power states of all of the instances known to the
+        hypervisor, as a dict keyed by instance uuid.
+
+        This lets the compute manager check the power state of all of its
+        instances with a single call to the hypervisor.
+        """
+        raise NotImplementedError()
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
@@ -1318,6 +1327,18 @@ class ComputeDriver(object):
         """
         pass
 
+    def prefetch_images(self, context, image_ids):
+        """Download images into the driver's local image cache ahead of
+        demand.
+
+        The drivers caching images for instances on disk should start
+        downloading the images which are missing from the cache and return
+        without waiting for them.
+
+        :param image_ids: list of the ids of the images to prefetch
+        """
+        pass
+
     def add_to_aggregate(self, context, aggregate, host, **kwargs):
         """Add a compute host to an aggregate.
 
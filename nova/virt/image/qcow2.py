@@ -0,0 +1,296 @@
+#
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+
+"""
+Conversion of the qcow2 images to raw while they are received.
+
+The data clusters of the image are written at their offset in the raw image
+as soon as they are received, if the L2 table mapping them was received
+before, which is the case of the images written by qemu-img. The other
+clusters, mostly the metadata and the compressed clusters, are kept at their
+offset in a sparse spill file until the end of the image, when the data
+they hold is written to the raw image.
+
+The images which are not in the qcow2 format, or which use a backing file,
+encryption, internal snapshots or an incompatible feature of the version 3
+of the format, are not converted but written unchanged to the spill file.
+"""
+
+import struct
+import zlib
+
+from oslo_log import log as logging
+from six.moves import range
+
+from nova.i18n import _
+
+LOG = logging.getLogger(__name__)
+
+QCOW2_MAGIC = b'QFI\xfb'
+
+# magic, version, backing_file_offset, backing_file_size, cluster_bits,
+# size, crypt_method, l1_size, l1_table_offset, refcount_table_offset,
+# refcount_table_clusters, nb_snapshots, snapshots_offset
+HEADER_V2 = struct.Struct('>4sIQIIQIIQQIIQ')
+# incompatible_features, compatible_features, autoclear_features,
+# refcount_order, header_length
+HEADER_V3 = struct.Struct('>QQQII')
+
+OFFSET_MASK = 0x00fffffffffffe00
+COMPRESSED = 1 << 62
+ZERO = 1
+
+MIN_CLUSTER_BITS = 9
+MAX_CLUSTER_BITS = 21
+# Same limit of the size of the L1 table as qemu
+MAX_L1_SIZE = 32 * 1024 * 1024
+
+
+class ConversionError(Exception):
+    """The qcow2 image is corrupted or truncated."""
+
+
+class StreamingConverter(object):
+    """File-like object converting the qcow2 image written to it to raw.
+
+    The image is converted to dst_path, or written unchanged to spill_path
+    if it can't be converted. check_size, if set, is called with the
+    virtual size of the image as soon as it is known, it raises to abort the
+    download.
+    """
+
+    def __init__(self, dst_path, spill_path, check_size=None):
+        self.dst_path = dst_path
+        self.spill_path = spill_path
+        self.check_size = check_size
+        # None until the header of the image is received
+        self.converted = None
+        self.virtual_size = None
+        self._spill = open(spill_path, 'w+b')
+        self._dst = None
+        self._pending = []
+        self._pending_size = 0
+        # Offset in the image of the first pending byte
+        self._offset = 0
+        self._cluster_size = None
+        self._cluster_bits = None
+        self._zero_cluster = None
+        self._l1_size = None
+        # Clusters of the L1 table, keyed by offset, None until received
+        self._l1_clusters = {}
+        # Index in the L1 table of the L2 tables not received yet, keyed by
+        # offset
+        self._l2_tables = {}
+        # Offsets in the virtual disk of the data clusters not received yet,
+        # keyed by offset in the image
+        self._data = {}
+        # (offset in the virtual disk, L2 entry) of the compressed clusters
+        self._compressed = []
+        # Offsets of the clusters written to the spill file
+        self._spilled = set()
+
+    def write(self, data):
+        if self.converted is False:
+            self._spill.write(data)
+            return
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self.converted is None:
+            if self._pending_size < HEADER_V2.size + HEADER_V3.size:
+                return
+            self._start()
+            if not self.converted:
+                return
+        if self._pending_size >= self._cluster_size:
+            self._process(final=False)
+
+    def truncate(self, size=0):
+        """Discard the data written so far."""
+        self._spill.truncate(size)
+        if self._dst is not None:
+            self._dst.truncate(size)
+
+    def finish(self):
+        """Complete the image after all its data was written.
+
+        Returns True if the image was converted to dst_path, False if it
+        was written unchanged to spill_path.
+        """
+        if self.converted is None:
+            self._start()
+        if self.converted:
+            self._process(final=True)
+            if any(data is None for data in self._l1_clusters.values()):
+                raise ConversionError(_('The L1 table is missing'))
+            if self._l2_tables or self._data:
+                raise ConversionError(
+                    _('%d clusters referenced by the image are missing') %
+                    (len(self._l2_tables) + len(self._data)))
+            for guest_offset, entry in self._compressed:
+                self._write_compressed(guest_offset, entry)
+        self.close()
+        return self.converted
+
+    def close(self):
+        self._spill.close()
+        if self._dst is not None:
+            self._dst.close()
+
+    def _start(self):
+        """Parse the header of the image to decide whether to convert it."""
+        header = b''.join(self._pending)
+        self.converted = False
+        if (len(header) < HEADER_V2.size + HEADER_V3.size or
+                header[:len(QCOW2_MAGIC)] != QCOW2_MAGIC):
+            self._spill_pending()
+            return
+
+        (magic, version, backing_file_offset, backing_file_size,
+         cluster_bits, size, crypt_method, l1_size, l1_table_offset,
+         refcount_table_offset, refcount_table_clusters, nb_snapshots,
+         snapshots_offset) = HEADER_V2.unpack_from(header)
+        incompatible_features = 0
+        if version >= 3:
+            incompatible_features = HEADER_V3.unpack_from(
+                header, HEADER_V2.size)[0]
+        self.virtual_size = size
+        if self.check_size is not None:
+            self.check_size(size)
+
+        if (version not in (2, 3) or backing_file_offset or crypt_method or
+                nb_snapshots or incompatible_features or
+                not MIN_CLUSTER_BITS <= cluster_bits <= MAX_CLUSTER_BITS or
+                l1_size * 8 > MAX_L1_SIZE or
+                l1_table_offset % (1 << cluster_bits)):
+            LOG.debug('Not converting the qcow2 image written to %s while '
+                      'it is received', self.spill_path)
+            self._spill_pending()
+            return
+
+        self.converted = True
+        self._cluster_bits = cluster_bits
+        self._cluster_size = 1 << cluster_bits
+        self._zero_cluster = b'\0' * self._cluster_size
+        self._l1_size = l1_size
+        l1_clusters = ((l1_size * 8 + self._cluster_size - 1) //
+                       self._cluster_size)
+        for i in range(l1_clusters):
+            self._l1_clusters[l1_table_offset + i * self._cluster_size] = None
+        # Truncating an empty file creates a sparse file
+        self._dst = open(self.dst_path, 'wb')
+        self._dst.truncate(size)
+
+    def _spill_pending(self):
+        for data in self._pending:
+            self._spill.write(data)
+        self._pending = []
+        self._pending_size = 0
+
+    def _process(self, final):
+        buf = b''.join(self._pending)
+        end = len(buf) - len(buf) % self._cluster_size
+        if final and end < len(buf):
+            buf += b'\0' * (self._cluster_size - len(buf) + end)
+            end = len(buf)
+        for start in range(0, end, self._cluster_size):
+            self._handle_cluster(self._offset + start,
+                                 buf[start:start + self._cluster_size])
+        self._offset += end
+        self._pending = [buf[end:]] if end < len(buf) else []
+        self._pending_size = len(buf) - end
+
+    def _handle_cluster(self, offset, data):
+        if offset == 0:
+            # The header was parsed already
+            return
+        if offset in self._l1_clusters:
+            self._l1_clusters[offset] = data
+            if all(cluster is not None
+                   for cluster in self._l1_clusters.values()):
+                self._parse_l1()
+        elif offset in self._l2_tables:
+            self._parse_l2(self._l2_tables.pop(offset), data)
+        elif offset in self._data:
+            self._write_data(self._data.pop(offset), data)
+        else:
+            self._spill.seek(offset)
+            self._spill.write(data)
+            self._spilled.add(offset)
+
+    def _read_spilled(self, offset, length):
+        self._spill.seek(offset)
+        return self._spill.read(length).ljust(length, b'\0')
+
+    def _parse_l1(self):
+        table = b''.join(self._l1_clusters[offset]
+                         for offset in sorted(self._l1_clusters))
+        entries = struct.unpack_from('>%dQ' % self._l1_size, table)
+        for index, entry in enumerate(entries):
+            l2_offset = entry & OFFSET_MASK
+            if not l2_offset:
+                continue
+            if l2_offset in self._spilled:
+                self._parse_l2(index, self._read_spilled(l2_offset,
+                                                         self._cluster_size))
+            else:
+                self._l2_tables[l2_offset] = index
+
+    def _parse_l2(self, index, data):
+        entries_per_table = self._cluster_size // 8
+        entries = struct.unpack('>%dQ' % entries_per_table, data)
+        guest_base = index * entries_per_table * self._cluster_size
+        for i, entry in enumerate(entries):
+            guest_offset = guest_base + i * self._cluster_size
+            if guest_offset >= self.virtual_size:
+                break
+            if entry & COMPRESSED:
+                self._compressed.append((guest_offset, entry))
+                continue
+            host_offset = entry & OFFSET_MASK
+            if not host_offset or entry & ZERO:
+                # Unallocated or zero cluster, left as a hole
+                continue
+            if host_offset in self._spilled:
+                self._write_data([guest_offset], self._read_spilled(
+                    host_offset, self._cluster_size))
+            else:
+                self._data.setdefault(host_offset, []).append(guest_offset)
+
+    def _write_data(self, guest_offsets, data):
+        if data == self._zero_cluster:
+            return
+        for guest_offset in guest_offsets:
+            self._dst.seek(guest_offset)
+            self._dst.write(data[:self.virtual_size - guest_offset])
+
+    def _write_compressed(self, guest_offset, entry):
+        offset_bits = 62 - (self._cluster_bits - 8)
+        host_offset = entry & ((1 << offset_bits) - 1)
+        sectors = ((entry >> offset_bits) &
+                   ((1 << (62 - offset_bits)) - 1)) + 1
+        length = sectors * 512 - (host_offset & 511)
+        compressed = self._read_spilled(host_offset, length)
+        try:
+            data = zlib.decompressobj(-15).decompress(compressed,
+                                                      self._cluster_size)
+        except zlib.error as e:
+            raise ConversionError(
+                _('Invalid compressed cluster at %(offset)d: %(error)s') %
+                {'offset': host_offset, 'error': e})
+        if len(data) != self._cluster_size:
+            raise ConversionError(
+                _('Invalid compressed cluster at %d') % host_offset)
+        self._write_data([guest_offset], data)
@@ -19,6 +19,7 @@
 Handling of VM disk images.
 """
 
+import collections
 import os
 
 from oslo_concurrency import processutils
@@ -31,12 +32,37 @@ from nova import exception
 from nova.i18n import _, _LE
 from nova import image
 from nova import utils
+from nova.virt.image import qcow2
 
 LOG = logging.getLogger(__name__)
 
 CONF = nova.conf.CONF
 IMAGE_API = image.API()
 
+# Format and virtual size of the images fetched by fetch_to_raw, and format
+# they were converted to if they were converted, keyed by image, least
+# recently used first
+_CONVERSIONS = collections.OrderedDict()
+# Number of images kept in _CONVERSIONS
+_MAX_CONVERSIONS = 1000
+
+
+def _get_conversion(image_href):
+    conversion = _CONVERSIONS.pop(image_href, None)
+    if conversion is not None:
+        _CONVERSIONS[image_href] = conversion
+    return conversion
+
+
+def _set_conversion(image_href, conversion):
+    _CONVERSIONS.pop(image_href, None)
+    _CONVERSIONS[image_href] = conversion
+    # NOTE: The entries are never invalidated, the images of glance can't
+    # change, but they are dropped once too many images were fetched so
+    # that the deleted images don't stay forever.
+    while len(_CONVERSIONS) > _MAX_CONVERSIONS:
+        del _CONVERSIONS[next(iter(_CONVERSIONS))]
+
 
 def qemu_img_info(path, format=None):
     """Return an object containing the parsed output from qemu-img info."""
@@ -96,18 +122,99 @@ def _convert_image(source, dest, in_format, out_format, run_as_root):
         raise exception.ImageUnacceptable(image_id=source, reason=msg)
 
 
-def fetch(context, image_href, path, max_size=0):
+def fetch(context, image_href, path, max_size=0, max_bandwidth=0):
+    """Download an image to path.
+
+    :param max_bandwidth: if not 0, the maximum rate in bytes per second of
+                          the download
+    """
     with fileutils.remove_path_on_error(path):
-        IMAGE_API.download(context, image_href, dest_path=path)
+        IMAGE_API.download(context, image_href, dest_path=path,
+                           max_bandwidth=max_bandwidth)
 
 
 def get_info(context, image_href):
     return IMAGE_API.get(context, image_href)
 
 
-def fetch_to_raw(context, image_href, path, max_size=0):
+def _check_disk_size(path, disk_size, max_size):
+    # We can't generally shrink incoming images, so disallow
+    # images > size of the flavor we're booting.  Checking here avoids
+    # an immediate DoS where we convert large qcow images to raw
+    # (which may compress well but not be sparse).
+    # TODO(p-draigbrady): loop through all flavor sizes, so that
+    # we might continue here and not discard the download.
+    # If we did that we'd have to do the higher level size checks
+    # irrespective of whether the base image was prepared or not.
+    if max_size and max_size < disk_size:
+        LOG.error(_LE('%(base)s virtual size %(disk_size)s '
+                      'larger than flavor root disk size %(size)s'),
+                  {'base': path,
+                   'disk_size': disk_size,
+                   'size': max_size})
+        raise exception.FlavorDiskSmallerThanImage(
+            flavor_size=max_size, image_size=disk_size)
+
+
+def _fetch_and_convert_to_raw(context, image_href, path, path_tmp, max_size,
+                              max_bandwidth):
+    """Download an image and convert it to raw while it is received.
+
+    Returns False if the image couldn't be converted this way, it was then
+    downloaded unchanged to path_tmp.
+    """
+    staged = "%s.converted" % path
+    with fileutils.remove_path_on_error(path_tmp), \
+            fileutils.remove_path_on_error(staged):
+        converter = qcow2.StreamingConverter(
+            staged, path_tmp,
+            check_size=lambda size: _check_disk_size(path, size, max_size))
+        try:
+            IMAGE_API.download(context, image_href, data=converter,
+                               max_bandwidth=max_bandwidth)
+            converted = converter.finish()
+        except qcow2.ConversionError as exp:
+            raise exception.ImageUnacceptable(image_id=image_href,
+                reason=_("Unable to convert image to raw: %(exp)s")
+                % {'exp': exp})
+        finally:
+            converter.close()
+        if not converted:
+            return False
+
+        LOG.debug("%s was qcow2, converted to raw while downloading",
+                  image_href)
+        os.unlink(path_tmp)
+        data = qemu_img_info(staged)
+        if data.file_format != "raw":
+            raise exception.ImageUnacceptable(image_id=image_href,
+                reason=_("Converted to raw, but format is now %s") %
+                data.file_format)
+        os.rename(staged, path)
+
+    _set_conversion(image_href, {'format': 'qcow2',
+                                 'virtual_size': converter.virtual_size,
+                                 'converted_to': 'raw'})
+    return True
+
+
+def fetch_to_raw(context, image_href, path, max_size=0, max_bandwidth=0):
     path_tmp = "%s.part" % path
-    fetch(context, image_href, path_tmp, max_size=max_size)
+    conversion = _get_conversion(image_href)
+    if conversion is not None:
+        # Don't download the images already known to be too large
+        _check_disk_size(path, conversion['virtual_size'], max_size)
+
+    # The images known not to need a conversion are downloaded with fetch(),
+    # which can use the transfer modules and the parallel downloads
+    if (CONF.force_raw_images and CONF.stream_raw_conversion and
+            (conversion is None or conversion['converted_to'] == 'raw')):
+        if _fetch_and_convert_to_raw(context, image_href, path, path_tmp,
+                                     max_size, max_bandwidth):
+            return
+    else:
+        fetch(context, image_href, path_tmp, max_size=max_size,
+              max_bandwidth=max_bandwidth)
 
     with fileutils.remove_path_on_error(path_tmp):
         data = qemu_img_info(path_tmp)
@@ -124,25 +231,12 @@ def fetch_to_raw(context, image_href, path, max_size=0):
                 reason=(_("fmt=%(fmt)s backed by: %(backing_file)s") %
                         {'fmt': fmt, 'backing_file': backing_file}))
 
-        # We can't generally shrink incoming images, so disallow
-        # images > size of the flavor we're booting.  Checking here avoids
-        # an immediate DoS where we convert large qcow images to raw
-        # (which may compress well but not be sparse).
-        # TODO(p-draigbrady): loop through all flavor sizes, so that
-        # we might continue here and not discard the download.
-        # If we did that we'd have to do the higher level size checks
-        # irrespective of whether the base image was prepared or not.
         disk_size = data.virtual_size
-        if max_size and max_size < disk_size:
-            LOG.error(_LE('%(base)s virtual size %(disk_size)s '
-                          'larger than flavor root disk size %(size)s'),
-                      {'base': path,
-                       'disk_size': disk_size,
-                       'size': max_size})
-            raise exception.FlavorDiskSmallerThanImage(
-                flavor_size=max_size, image_size=disk_size)
+        _check_disk_size(path, disk_size, max_size)
 
+        converted_to = None
         if fmt != "raw" and CONF.force_raw_images:
+            converted_to = 'raw'
             staged = "%s.converted" % path
             LOG.debug("%s was %s, converting to raw", image_href, fmt)
             with fileutils.remove_path_on_error(staged):
@@ -165,3 +259,6 @@ def fetch_to_raw(context, image_href, path, max_size=0):
                 os.rename(staged, path)
         else:
             os.rename(path_tmp, path)
+
+    _set_conversion(image_href, {'format': fmt, 'virtual_size': disk_size,
+                                 'converted_to': converted_to})
@@ -36,6 +36,7 @@ import mmap
 import operator
 import os
 import shutil
+import stat
 import tempfile
 import time
 import uuid
@@ -90,6 +91,7 @@ from nova.virt import diagnostics
 from nova.virt.disk import api as disk
 from nova.virt.disk.vfs import guestfs
 from nova.virt import driver
+from nova.virt import event as virtevent
 from nova.virt import firewall
 from nova.virt import hardware
 from nova.virt.image import model as imgmodel
@@ -332,6 +334,10 @@ class LibvirtDriver(driver.ComputeDriver):
         self._disk_cachemode = None
         self.image_cache_manager = imagecache.ImageCacheManager()
         self.image_backend = imagebackend.Backend(CONF.use_cow_images)
+        # Virtual size and backing file of the qcow2 disks of each domain,
+        # keyed by domain uuid then by disk path. See _get_qcow2_disk_info.
+        self._disk_info_cache = {}
+        self._domain_stats = host.DomainStatsCollector(self._host)
 
         self.disk_cachemodes = {}
 
@@ -427,6 +433,12 @@ class LibvirtDriver(driver.ComputeDriver):
                          'developer/nova/support-matrix.html'),
                         {'type': CONF.libvirt.virt_type, 'arch': hostarch})
 
+    def emit_event(self, event):
+        # The disks of a domain may have changed whenever its lifecycle did
+        if isinstance(event, virtevent.InstanceEvent):
+            self._invalidate_disk_info_cache(event.uuid)
+        super(LibvirtDriver, self).emit_event(event)
+
     def _handle_conn_event(self, enabled, reason):
         LOG.info(_LI("Connection event '%(enabled)d' reason '%(reason)s'"),
                  {'enabled': enabled, 'reason': reason})
@@ -508,6 +520,12 @@ class LibvirtDriver(driver.ComputeDriver):
                      'qemu_ver': self._version_to_string(
                         MIN_QEMU_OTHER_ARCH.get(kvm_arch))})
 
+        if CONF.libvirt.domain_stats_interval:
+            self._domain_stats.start(CONF.libvirt.domain_stats_interval)
+
+    def cleanup_host(self, host):
+        self._domain_stats.stop()
+
     def _check_required_migration_flags(self, migration_flags, config_name):
         if CONF.libvirt.virt_type == 'xen':
             if (migration_flags & libvirt.VIR_MIGRATE_PEER2PEER) != 0:
@@ -684,6 +702,16 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return uuids
 
+    def get_power_states(self):
+        power_states = {}
+        for guest in self._host.list_guests(only_running=False):
+            try:
+                power_states[guest.uuid] = guest.get_power_state(self._host)
+            except exception.InstanceNotFound:
+                # The domain went away since it was listed
+                continue
+        return power_states
+
     def plug_vifs(self, instance, network_info):
         """Plug VIFs into networks."""
         for vif in network_info:
@@ -865,6 +893,7 @@ class LibvirtDriver(driver.ComputeDriver):
 
     def cleanup(self, context, instance, network_info, block_device_info=None,
                 destroy_disks=True, migrate_data=None, destroy_vifs=True):
+        self._invalidate_disk_info_cache(instance.uuid)
         if destroy_vifs:
             self._unplug_vifs(instance, network_info, True)
 
@@ -1238,6 +1267,7 @@ class LibvirtDriver(driver.ComputeDriver):
         driver_bdm.save()
 
         self._swap_volume(guest, disk_dev, conf.source_path, resize_to)
+        self._invalidate_disk_info_cache(instance.uuid)
         self._disconnect_volume(old_connection_info, disk_dev)
 
     def _get_existing_domain_xml(self, instance, network_info,
@@ -1895,6 +1925,7 @@ class LibvirtDriver(driver.ComputeDriver):
                               instance=instance)
                 self._volume_snapshot_update_status(
                     context, snapshot_id, 'error')
+        self._invalidate_disk_info_cache(instance.uuid)
 
         self._volume_snapshot_update_status(
             context, snapshot_id, 'creating')
@@ -2181,6 +2212,7 @@ class LibvirtDriver(driver.ComputeDriver):
                               instance=instance)
                 self._volume_snapshot_update_status(
                     context, snapshot_id, 'error_deleting')
+        self._invalidate_disk_info_cache(instance.uuid)
 
         self._volume_snapshot_update_status(context, snapshot_id, 'deleting')
         self._volume_refresh_connection_info(context, instance, volume_id)
@@ -5092,9 +5124,13 @@ class LibvirtDriver(driver.ComputeDriver):
            a given host.
         """
         vol_usage = []
+        all_stats = self._get_all_domain_stats()
 
         for instance_bdms in compute_host_bdms:
             instance = instance_bdms['instance']
+            domain_stats = None
+            if all_stats is not None:
+                domain_stats = all_stats.get(instance.uuid)
 
             for bdm in instance_bdms['instance_bdms']:
                 mountpoint = bdm['device_name']
@@ -5104,7 +5140,11 @@ class LibvirtDriver(driver.ComputeDriver):
 
                 LOG.debug("Trying to get stats for the volume %s",
                           volume_id, instance=instance)
-                vol_stats = self.block_stats(instance, mountpoint)
+                if (domain_stats is not None and
+                        mountpoint in domain_stats.block):
+                    vol_stats = domain_stats.block[mountpoint]
+                else:
+                    vol_stats = self.block_stats(instance, mountpoint)
 
                 if vol_stats:
                     stats = dict(volume=volume_id,
@@ -5122,6 +5162,98 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return vol_usage
 
+    def get_all_bw_counters(self, instances):
+        """Return bandwidth usage counters for each interface on each
+           running VM.
+        """
+        # NOTE: The counters are only reported when the statistics of the
+        # guests are sampled, so that enabling the sampling is what enables
+        # the bandwidth usage accounting of the instances of this host.
+        if not CONF.libvirt.domain_stats_interval:
+            raise NotImplementedError()
+        all_stats = self._get_all_domain_stats()
+        if all_stats is None:
+            raise NotImplementedError()
+
+        bw_counters = []
+        for instance in instances:
+            domain_stats = all_stats.get(instance.uuid)
+            if domain_stats is None:
+                continue
+            for vif in instance.get_network_info():
+                stats = domain_stats.net.get(vif['devname'])
+                if stats is None:
+                    continue
+                bw_counters.append({'uuid': instance.uuid,
+                                    'mac_address': vif['address'],
+                                    'bw_in': stats[0],
+                                    'bw_out': stats[4]})
+        return bw_counters
+
+    def _get_all_domain_stats(self):
+        """Return the statistics of all the running guests, keyed by uuid
+
+        The latest sample of the statistics is used if it is recent enough,
+        or else a new sample is collected with a single libvirt call.
+        Returns None if the statistics of all the guests can't be collected
+        at once.
+        """
+        interval = CONF.libvirt.domain_stats_interval
+        if interval:
+            # Allow for the time the sampling itself takes
+            all_stats = self._domain_stats.get_latest(max_age=2 * interval)
+            if all_stats is not None:
+                return all_stats
+        return self._domain_stats.sample()
+
+    def _get_sampled_domain_stats(self, instance):
+        """Return the statistics of a guest from the latest sample if it is
+        recent enough, or None.
+        """
+        interval = CONF.libvirt.domain_stats_interval
+        if not interval:
+            return None
+        all_stats = self._domain_stats.get_latest(max_age=2 * interval)
+        if all_stats is None:
+            return None
+        return all_stats.get(instance.uuid)
+
+    @staticmethod
+    def _get_vcpu_times(guest, domain_stats):
+        if domain_stats is not None and domain_stats.vcpu_times:
+            return domain_stats.vcpu_times
+        # get cpu time, might launch an exception if the method
+        # is not supported by the underlying hypervisor being
+        # used by libvirt
+        try:
+            return [vcpu.time for vcpu in guest.get_vcpus_info()]
+        except libvirt.libvirtError:
+            return []
+
+    @staticmethod
+    def _get_disk_stats(domain, domain_stats, guest_disk):
+        if domain_stats is not None and guest_disk in domain_stats.block:
+            return domain_stats.block[guest_disk]
+        try:
+            # blockStats might launch an exception if the method
+            # is not supported by the underlying hypervisor being
+            # used by libvirt
+            return domain.blockStats(guest_disk)
+        except libvirt.libvirtError:
+            return None
+
+    @staticmethod
+    def _get_interface_stats(domain, domain_stats, interface):
+        if domain_stats is not None and interface in domain_stats.net:
+            return domain_stats.net[interface]
+        try:
+            # interfaceStats might launch an exception if the method
+            # is not supported by the underlying hypervisor being
+            # used by libvirt
+            return domain.interfaceStats(interface)
+        except libvirt.libvirtError:
+            return None
+
     def block_stats(self, instance, disk_id):
         """Note that this function takes an instance name."""
         try:
@@ -6641,12 +6773,14 @@ class LibvirtDriver(driver.ComputeDriver):
         self._host.write_instance_config(xml)
 
     def _get_instance_disk_info(self, instance_name, xml,
-                                block_device_info=None):
+                                block_device_info=None, disk_info_cache=None):
         """Get the non-volume disk information from the domain xml
 
         :param str instance_name: the name of the instance (domain)
         :param str xml: the libvirt domain xml for the instance
         :param dict block_device_info: block device info for BDMs
+        :param dict disk_info_cache: cached information about the qcow2 disks
+                                     of the domain, which is updated
         :returns disk_info: list of dicts with keys:
 
           * 'type': the disk type (str)
@@ -6665,6 +6799,7 @@ class LibvirtDriver(driver.ComputeDriver):
             volume_devices.add(disk_dev)
 
         disk_info = []
+        cached_disks = {}
         doc = etree.fromstring(xml)
         disk_nodes = doc.findall('.//devices/disk')
         path_nodes = doc.findall('.//devices/disk/source')
@@ -6704,8 +6839,12 @@ class LibvirtDriver(driver.ComputeDriver):
 
             disk_type = driver_nodes[cnt].get('type')
             if disk_type == "qcow2":
-                backing_file = libvirt_utils.get_disk_backing_file(path)
-                virt_size = disk.get_disk_size(path)
+                if disk_info_cache is not None:
+                    virt_size, backing_file = self._get_qcow2_disk_info(
+                        path, disk_info_cache, cached_disks)
+                else:
+                    backing_file = libvirt_utils.get_disk_backing_file(path)
+                    virt_size = disk.get_disk_size(path)
                 over_commit_size = int(virt_size) - dk_size
             else:
                 backing_file = ""
@@ -6718,8 +6857,46 @@ class LibvirtDriver(driver.ComputeDriver):
                               'backing_file': backing_file,
                               'disk_size': dk_size,
                               'over_committed_disk_size': over_commit_size})
+        if disk_info_cache is not None:
+            # Forget the disks which are gone from the domain
+            disk_info_cache.clear()
+            disk_info_cache.update(cached_disks)
         return disk_info
 
+    @staticmethod
+    def _get_qcow2_disk_info(path, disk_info_cache, cached_disks):
+        """Return the virtual size and the backing file of a qcow2 disk.
+
+        qemu-img is only run again if the modification time or the size of
+        the disk file changed since it was cached in disk_info_cache. The
+        entry of the disk is also added to cached_disks.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        key = None
+        if st is not None and stat.S_ISREG(st.st_mode):
+            key = (st.st_mtime, st.st_size)
+            cached = disk_info_cache.get(path)
+            if cached is not None and cached[0] == key:
+                cached_disks[path] = cached
+                return cached[1]
+
+        info = (disk.get_disk_size(path),
+                libvirt_utils.get_disk_backing_file(path))
+        if key is not None:
+            cached_disks[path] = (key, info)
+        return info
+
+    def _invalidate_disk_info_cache(self, instance_uuid):
+        """Forget the cached disk information of a domain.
+
+        This must be called after nova changed the disks of a domain in a way
+        which may keep their modification time and size, or swapped them.
+        """
+        self._disk_info_cache.pop(instance_uuid, None)
+
     def get_instance_disk_info(self, instance,
                                block_device_info=None):
         try:
@@ -6745,11 +6922,15 @@ class LibvirtDriver(driver.ComputeDriver):
         # Disk size that all instance uses : virtual_size - disk_size
         disk_over_committed_size = 0
         instance_domains = self._host.list_instance_domains()
-        if not instance_domains:
-            return disk_over_committed_size
 
         # Get all instance uuids
         instance_uuids = [dom.UUIDString() for dom in instance_domains]
+        # Forget the disks of the domains which are gone
+        for instance_uuid in set(self._disk_info_cache) - set(instance_uuids):
+            del self._disk_info_cache[instance_uuid]
+        if not instance_domains:
+            return disk_over_committed_size
+
         ctx = nova_context.get_admin_context()
         # Get instance object list by uuid filter
         filters = {'uuid': instance_uuids}
@@ -6781,8 +6962,11 @@ class LibvirtDriver(driver.ComputeDriver):
                     block_device_info = driver.get_block_device_info(
                         local_instances[guest.uuid], bdms[guest.uuid])
 
+                disk_info_cache = self._disk_info_cache.setdefault(
+                    guest.uuid, {})
                 disk_infos = self._get_instance_disk_info(guest.name, xml,
-                                 block_device_info=block_device_info)
+                                 block_device_info=block_device_info,
+                                 disk_info_cache=disk_info_cache)
 
                 for info in disk_infos:
                     disk_over_committed_size += int(
@@ -6844,6 +7028,13 @@ class LibvirtDriver(driver.ComputeDriver):
         """Manage the local cache of images."""
         self.image_cache_manager.update(context, all_instances)
 
+    def prefetch_images(self, context, image_ids):
+        """Download images into the local cache of images."""
+        if CONF.libvirt.images_type == 'rbd':
+            # The disks are cloned from the images in the ceph cluster
+            return
+        self.image_cache_manager.prefetch(context, image_ids)
+
     def _cleanup_remote_migration(self, dest, inst_base, inst_base_resize,
                                   shared_storage=False):
         """Used only for cleanup in case migrate_disk_and_power_off fails."""
@@ -7145,6 +7336,7 @@ class LibvirtDriver(driver.ComputeDriver):
             if (disk_name != 'disk.config' and
                         info['type'] == 'raw' and CONF.use_cow_images):
                 self._disk_raw_to_qcow2(info['path'])
+        self._invalidate_disk_info_cache(instance.uuid)
 
         xml = self._get_guest_xml(context, instance, network_info,
                                   block_disk_info, image_meta,
@@ -7213,6 +7405,7 @@ class LibvirtDriver(driver.ComputeDriver):
             finally:
                 root_disk.remove_snap(libvirt_utils.RESIZE_SNAPSHOT_NAME,
                                       ignore_errors=True)
+        self._invalidate_disk_info_cache(instance.uuid)
 
         disk_info = blockinfo.get_disk_info(CONF.libvirt.virt_type,
                                             instance,
@@ -7265,37 +7458,26 @@ class LibvirtDriver(driver.ComputeDriver):
         # virDomain object to use nova.virt.libvirt.Guest.
         # We should be able to remove domain at the end.
         domain = guest._domain
+        domain_stats = self._get_sampled_domain_stats(instance)
         output = {}
-        # get cpu time, might launch an exception if the method
-        # is not supported by the underlying hypervisor being
-        # used by libvirt
-        try:
-            for vcpu in guest.get_vcpus_info():
-                output["cpu" + str(vcpu.id) + "_time"] = vcpu.time
-        except libvirt.libvirtError:
-            pass
+        for vcpu_id, vcpu_time in enumerate(
+                self._get_vcpu_times(guest, domain_stats)):
+            output["cpu" + str(vcpu_id) + "_time"] = vcpu_time
         # get io status
         xml = guest.get_xml_desc()
         dom_io = LibvirtDriver._get_io_devices(xml)
         for guest_disk in dom_io["volumes"]:
-            try:
-                # blockStats might launch an exception if the method
-                # is not supported by the underlying hypervisor being
-                # used by libvirt
-                stats = domain.blockStats(guest_disk)
+            stats = self._get_disk_stats(domain, domain_stats, guest_disk)
+            if stats is not None:
                 output[guest_disk + "_read_req"] = stats[0]
                 output[guest_disk + "_read"] = stats[1]
                 output[guest_disk + "_write_req"] = stats[2]
                 output[guest_disk + "_write"] = stats[3]
                 output[guest_disk + "_errors"] = stats[4]
-            except libvirt.libvirtError:
-                pass
         for interface in dom_io["ifaces"]:
-            try:
-                # interfaceStats might launch an exception if the method
-                # is not supported by the underlying hypervisor being
-                # used by libvirt
-                stats = domain.interfaceStats(interface)
+            stats = self._get_interface_stats(domain, domain_stats,
+                                              interface)
+            if stats is not None:
                 output[interface + "_rx"] = stats[0]
                 output[interface + "_rx_packets"] = stats[1]
                 output[interface + "_rx_errors"] = stats[2]
@@ -7304,8 +7486,6 @@ class LibvirtDriver(driver.ComputeDriver):
                 output[interface + "_tx_packets"] = stats[5]
                 output[interface + "_tx_errors"] = stats[6]
                 output[interface + "_tx_drop"] = stats[7]
-            except libvirt.libvirtError:
-                pass
         output["memory"] = domain.maxMemory()
         # memoryStats might launch an exception if the method
         # is not supported by the underlying hypervisor being
@@ -7346,34 +7526,22 @@ class LibvirtDriver(driver.ComputeDriver):
         diags.memory_details.maximum = max_mem / units.Mi
         diags.memory_details.used = mem / units.Mi
 
-        # get cpu time, might launch an exception if the method
-        # is not supported by the underlying hypervisor being
-        # used by libvirt
-        try:
-            for vcpu in guest.get_vcpus_info():
-                diags.add_cpu(time=vcpu.time)
-        except libvirt.libvirtError:
-            pass
+        domain_stats = self._get_sampled_domain_stats(instance)
+        for vcpu_time in self._get_vcpu_times(guest, domain_stats):
+            diags.add_cpu(time=vcpu_time)
         # get io status
         dom_io = LibvirtDriver._get_io_devices(xml)
         for guest_disk in dom_io["volumes"]:
-            try:
-                # blockStats might launch an exception if the method
-                # is not supported by the underlying hypervisor being
-                # used by libvirt
-                stats = domain.blockStats(guest_disk)
+            stats = self._get_disk_stats(domain, domain_stats, guest_disk)
+            if stats is not None:
                 diags.add_disk(read_bytes=stats[1],
                                read_requests=stats[0],
                                write_bytes=stats[3],
                                write_requests=stats[2])
-            except libvirt.libvirtError:
-                pass
         for interface in dom_io["ifaces"]:
-            try:
-                # interfaceStats might launch an exception if the method
-                # is not supported by the underlying hypervisor being
-                # used by libvirt
-                stats = domain.interfaceStats(interface)
+            stats = self._get_interface_stats(domain, domain_stats,
+                                              interface)
+            if stats is not None:
                 diags.add_nic(rx_octets=stats[0],
                               rx_errors=stats[2],
                               rx_drop=stats[3],
@@ -7382,8 +7550,6 @@ class LibvirtDriver(driver.ComputeDriver):
                               tx_errors=stats[6],
                               tx_drop=stats[7],
                               tx_packets=stats[5])
-            except libvirt.libvirtError:
-                pass
 
         # Update mac addresses of interface if stats have been reported
         if diags.nic_details:
@@ -27,17 +27,20 @@ the raw libvirt API. These APIs are then used by all
 the other libvirt related classes
 """
 
+import collections
 import operator
 import os
 import socket
 import sys
 import threading
+import time
 
 from eventlet import greenio
 from eventlet import greenthread
 from eventlet import patcher
 from eventlet import tpool
 from oslo_log import log as logging
+from oslo_service import loopingcall
 from oslo_utils import excutils
 from oslo_utils import importutils
 from oslo_utils import units
@@ -74,6 +77,45 @@ HV_DRIVER_QEMU = "QEMU"
 HV_DRIVER_XEN = "Xen"
 
 
+# Statistics of a guest. block maps the disk names to the same tuples as
+# virDomainBlockStats, net maps the interface names to the same tuples as
+# virDomainInterfaceStats
+DomainStats = collections.namedtuple(
+    'DomainStats', ['cpu_time', 'vcpu_times', 'memory', 'max_memory', 'block',
+                    'net'])
+
+_BLOCK_STATS_KEYS = ('rd.reqs', 'rd.bytes', 'wr.reqs', 'wr.bytes',
+                     'errors')
+_NET_STATS_KEYS = ('rx.bytes', 'rx.pkts', 'rx.errs', 'rx.drop', 'tx.bytes',
+                   'tx.pkts', 'tx.errs', 'tx.drop')
+
+
+def _parse_domain_stats(record):
+    """Convert a record returned by virConnectGetAllDomainStats to a
+    DomainStats.
+    """
+    def devices(prefix, keys):
+        result = {}
+        for i in range(record.get('%s.count' % prefix, 0)):
+            name = record.get('%s.%d.name' % (prefix, i))
+            if name is None:
+                continue
+            # The statistics which aren't supported are reported as -1,
+            # like the per-domain calls do
+            result[name] = tuple(record.get('%s.%d.%s' % (prefix, i, key), -1)
+                                 for key in keys)
+        return result
+
+    vcpu_times = [record.get('vcpu.%d.time' % i, 0)
+                  for i in range(record.get('vcpu.current', 0))]
+    return DomainStats(cpu_time=record.get('cpu.time', 0),
+                       vcpu_times=vcpu_times,
+                       memory=record.get('balloon.current', 0),
+                       max_memory=record.get('balloon.maximum', 0),
+                       block=devices('block', _BLOCK_STATS_KEYS),
+                       net=devices('net', _NET_STATS_KEYS))
+
+
 class DomainJobInfo(object):
     """Information about libvirt background jobs
 
@@ -204,6 +246,7 @@ class Host(object):
         self._conn_event_handler = conn_event_handler
         self._lifecycle_event_handler = lifecycle_event_handler
         self._skip_list_all_domains = False
+        self._skip_domain_stats = False
         self._caps = None
         self._hostname = None
 
@@ -743,6 +786,38 @@ class Host(object):
 
         return doms
 
+    def get_all_domain_stats(self):
+        """Get the statistics of all the running guests
+
+        The CPU, memory, disk and interface statistics of all the running
+        guests are collected with a single libvirt call.
+
+        :returns: dict of DomainStats keyed by guest uuid, or None if the
+                  bulk statistics API is not available
+        """
+        if self._skip_domain_stats:
+            return None
+        stats = (libvirt.VIR_DOMAIN_STATS_CPU_TOTAL |
+                 libvirt.VIR_DOMAIN_STATS_BALLOON |
+                 libvirt.VIR_DOMAIN_STATS_VCPU |
+                 libvirt.VIR_DOMAIN_STATS_INTERFACE |
+                 libvirt.VIR_DOMAIN_STATS_BLOCK)
+        try:
+            records = self.get_connection().getAllDomainStats(
+                stats, libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE)
+        except (libvirt.libvirtError, AttributeError) as ex:
+            if (isinstance(ex, libvirt.libvirtError) and
+                    ex.get_error_code() != libvirt.VIR_ERR_NO_SUPPORT):
+                raise
+            LOG.info(_LI("Unable to use bulk domain statistics APIs, "
+                         "falling back to slow code path: %(ex)s"),
+                     {'ex': ex})
+            self._skip_domain_stats = True
+            return None
+
+        return {dom.UUIDString(): _parse_domain_stats(record)
+                for dom, record in records}
+
     def get_online_cpus(self):
         """Get the set of CPUs that are online on the host
 
@@ -1020,3 +1095,59 @@ class Host(object):
         """
         return getattr(libvirt, 'VIR_DOMAIN_XML_MIGRATABLE',
                        None) is not None
+
+
+class DomainStatsCollector(object):
+    """Periodic sampler of the statistics of all the running guests
+
+    Every sample is collected with a single libvirt call, and the latest
+    one is kept, so that the statistics of any guest can be read without
+    calling libvirt.
+    """
+
+    def __init__(self, host):
+        self._host = host
+        # (time, dict of DomainStats keyed by guest uuid) tuple
+        self._latest = None
+        self._timer = None
+
+    def start(self, interval):
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.sample)
+        self._timer.start(interval=interval)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+
+    def sample(self):
+        """Collect a new sample of the statistics of all the guests
+
+        :returns: dict of DomainStats keyed by guest uuid, or None if the
+                  statistics could not be collected
+        """
+        try:
+            stats = self._host.get_all_domain_stats()
+        except Exception:
+            # NOTE: This must not stop the timer, the next sample is taken
+            # at the next interval.
+            LOG.exception(_LE("Unable to collect the statistics of the "
+                              "guests"))
+            return None
+        if stats is None:
+            # The bulk statistics API is not available
+            self.stop()
+            return None
+        self._latest = (time.time(), stats)
+        return stats
+
+    def get_latest(self, max_age):
+        """Return the latest sample if it is at most max_age seconds old,
+        or None.
+        """
+        if self._latest is None:
+            return None
+        sampled_at, stats = self._latest
+        if time.time() - sampled_at > max_age:
+            return None
+        return stats
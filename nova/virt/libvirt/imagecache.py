@@ -25,9 +25,12 @@ import os
 import re
 import time
 
+import eventlet
 from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_log import log as logging
+from oslo_utils import fileutils
+from oslo_utils import units
 
 import nova.conf
 from nova.i18n import _LE
@@ -84,12 +87,14 @@ class ImageCacheManager(imagecache.ImageCacheManager):
     def __init__(self):
         super(ImageCacheManager, self).__init__()
         self.lock_path = os.path.join(CONF.instances_path, 'locks')
+        self._prefetching = False
         self._reset_state()
 
     def _reset_state(self):
         """Reset state variables used for each pass."""
 
         self.used_images = {}
+        self.pinned_images = set()
         self.instance_names = set()
 
         self.back_swap_images = set()
@@ -323,7 +328,15 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         if base_file in self.unexplained_images:
             self.unexplained_images.remove(base_file)
 
-        if img_id in self.used_images:
+        if img_id in self.pinned_images:
+            image_in_use = True
+            LOG.info(_LI('image %(id)s at (%(base_file)s): pinned by the '
+                         'prefetch_images option'),
+                     {'id': img_id,
+                      'base_file': base_file})
+            self.active_base_files.append(base_file)
+
+        elif img_id in self.used_images:
             local, remote, instances = self.used_images[img_id]
 
             if local > 0 or remote > 0:
@@ -380,8 +393,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
 
     def _age_and_verify_cached_images(self, context, all_instances, base_dir):
         LOG.debug('Verify base images')
-        # Determine what images are on disk because they're in use
-        for img in self.used_images:
+        # Determine what images are on disk because they're in use or pinned
+        for img in set(self.used_images) | self.pinned_images:
             fingerprint = hashlib.sha1(img).hexdigest()
             LOG.debug('Image id %(id)s yields fingerprint %(fingerprint)s',
                       {'id': img,
@@ -453,6 +466,71 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self.used_images = running['used_images']
         self.instance_names = running['instance_names']
         self.used_swap_images = running['used_swap_images']
+        self.pinned_images = set(CONF.prefetch_images)
         # perform the aging and image verification
         self._age_and_verify_cached_images(context, all_instances, base_dir)
         self._age_and_verify_swap_images(context, base_dir)
+
+    def prefetch(self, context, image_ids):
+        """Download the images which are missing from the cache in the
+        background, unless the previous prefetch is still running.
+        """
+        if self._prefetching:
+            LOG.debug('Skipping image prefetch, the previous one is still '
+                      'running')
+            return
+
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        missing = [image_id for image_id in image_ids
+                   if not os.path.exists(
+                       os.path.join(base_dir, get_cache_fname(image_id)))]
+        if not missing:
+            return
+
+        fileutils.ensure_tree(base_dir)
+        self._prefetching = True
+        utils.spawn_n(self._prefetch, context, base_dir, missing)
+
+    def _prefetch(self, context, base_dir, image_ids):
+        try:
+            pool = eventlet.GreenPool(CONF.image_prefetch_max_concurrency)
+            for image_id in image_ids:
+                pool.spawn_n(self._prefetch_image, context, base_dir,
+                             image_id)
+            pool.waitall()
+        finally:
+            self._prefetching = False
+
+    def _prefetch_image(self, context, base_dir, image_id):
+        """Download an image into the cache.
+
+        The image is downloaded next to its cache file and only renamed
+        under the lock of the cache file, so that booting an instance never
+        waits for a throttled prefetch.
+        """
+        filename = get_cache_fname(image_id)
+        base_file = os.path.join(base_dir, filename)
+        tmp_file = base_file + '.prefetch'
+        max_bandwidth = (CONF.image_prefetch_max_bandwidth * units.Mi //
+                         CONF.image_prefetch_max_concurrency)
+
+        @utils.synchronized(filename, external=True, lock_path=self.lock_path)
+        def _install():
+            # An instance may have needed the image meanwhile
+            if os.path.exists(base_file):
+                fileutils.delete_if_exists(tmp_file)
+            else:
+                os.rename(tmp_file, base_file)
+
+        LOG.info(_LI('Prefetching image %(id)s to %(base_file)s'),
+                 {'id': image_id, 'base_file': base_file})
+        try:
+            # Remove a download interrupted by a restart
+            fileutils.delete_if_exists(tmp_file)
+            libvirt_utils.fetch_image(context, tmp_file, image_id,
+                                      max_bandwidth=max_bandwidth)
+            _install()
+        except Exception:
+            LOG.exception(_LE('Failed to prefetch image %s'), image_id)
+            fileutils.delete_if_exists(tmp_file)
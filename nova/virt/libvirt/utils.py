@@ -414,9 +414,10 @@ def get_fs_info(path):
             'used': used}
 
 
-def fetch_image(context, target, image_id, max_size=0):
+def fetch_image(context, target, image_id, max_size=0, max_bandwidth=0):
     """Grab image."""
-    images.fetch_to_raw(context, image_id, target, max_size=max_size)
+    images.fetch_to_raw(context, image_id, target, max_size=max_size,
+                        max_bandwidth=max_bandwidth)
 
 
 def fetch_raw_image(context, target, image_id, max_size=0):
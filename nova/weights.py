@@ -18,11 +18,16 @@ Pluggable Weighing support
 """
 
 import abc
+import heapq
+import time
 
+from oslo_utils import importutils
 import six
 
 from nova import loadables
 
+numpy = importutils.try_import('numpy')
+
 
 def normalize(weight_list, minval=None, maxval=None):
     """Normalize the values in a list between 0 and 1.0.
@@ -53,6 +58,31 @@ def normalize(weight_list, minval=None, maxval=None):
     return ((i - minval) / range_ for i in weight_list)
 
 
+def normalize_array(weights, minval=None, maxval=None):
+    """Normalize the values of a NumPy array between 0 and 1.0.
+
+    This is the equivalent of normalize() for the vectorized weighers.
+    """
+
+    if not len(weights):
+        return weights
+
+    if maxval is None:
+        maxval = weights.max()
+
+    if minval is None:
+        minval = weights.min()
+
+    maxval = float(maxval)
+    minval = float(minval)
+
+    if minval == maxval:
+        return numpy.zeros(len(weights))
+
+    range_ = maxval - minval
+    return (weights - minval) / range_
+
+
 class WeighedObject(object):
     """Object with weight information."""
     def __init__(self, obj, weight):
@@ -76,6 +106,9 @@ class BaseWeigher(object):
     minval = None
     maxval = None
 
+    # Set to true in a subclass implementing _weigh_columns()
+    vectorized = False
+
     def weight_multiplier(self):
         """How weighted this weigher should be.
 
@@ -117,19 +150,85 @@ class BaseWeigher(object):
 
         return weights
 
+    def _weigh_columns(self, columns, weight_properties):
+        """Weigh all the objects of a columnar view at once.
+
+        Override in a subclass setting vectorized to True. Return a NumPy
+        array holding the weight of each object of columns.objs.
+        """
+        raise NotImplementedError()
+
+    def weigh_objects_vectorized(self, columns, weight_properties):
+        """Weigh multiple objects given as a columnar view.
+
+        Only called instead of weigh_objects() when the weight handler
+        provides a columnar view of the objects, see
+        BaseWeightHandler.columns_cls.
+        """
+        weights = self._weigh_columns(columns, weight_properties)
+        if len(weights):
+            minval = float(weights.min())
+            maxval = float(weights.max())
+            # Same as weigh_objects(): only extend the values the weigher
+            # may have set.
+            if self.minval is None or minval < self.minval:
+                self.minval = minval
+            if self.maxval is None or maxval > self.maxval:
+                self.maxval = maxval
+        return weights
+
 
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
-    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
-        """Return a sorted (descending), normalized list of WeighedObjects."""
+    # Class building a columnar view of the objects being weighed, which is
+    # handed to the weigh_objects_vectorized() method of vectorized weighers.
+    # It is instantiated with the list of objects. Vectorized weighing is
+    # disabled when this is None.
+    columns_cls = None
+
+    # Object measuring the weighers, see nova.scheduler.instrumentation. The
+    # weighers aren't measured when this is None.
+    instrumentation = None
+
+    def _weigh(self, weigher, weighed_objs, weighing_properties, columns,
+               measured):
+        start_time = time.time()
+        if columns is not None and weigher.vectorized:
+            weights = weigher.weigh_objects_vectorized(columns,
+                                                       weighing_properties)
+        else:
+            weights = weigher.weigh_objects(weighed_objs, weighing_properties)
+        if measured:
+            self.instrumentation.record(
+                'weigher', weigher.__class__.__name__,
+                time.time() - start_time, len(weighed_objs),
+                len(weighed_objs))
+        return weights
+
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            limit=None):
+        """Return a sorted (descending), normalized list of WeighedObjects.
+
+        If limit is set, only the limit objects with the highest weights are
+        returned.
+        """
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
 
         if len(weighed_objs) <= 1:
             return weighed_objs
 
+        measured = (self.instrumentation is not None and
+                    self.instrumentation.sample())
+
+        if (self.columns_cls is not None and
+                any(weigher.vectorized for weigher in weighers)):
+            return self._get_weighed_objects_vectorized(
+                weighers, weighed_objs, weighing_properties, limit, measured)
+
         for weigher in weighers:
-            weights = weigher.weigh_objects(weighed_objs, weighing_properties)
+            weights = self._weigh(weigher, weighed_objs, weighing_properties,
+                                  None, measured)
 
             # Normalize the weights
             weights = normalize(weights,
@@ -140,4 +239,41 @@ class BaseWeightHandler(loadables.BaseLoader):
                 obj = weighed_objs[i]
                 obj.weight += weigher.weight_multiplier() * weight
 
+        if limit is not None and limit < len(weighed_objs):
+            return heapq.nlargest(limit, weighed_objs, key=lambda x: x.weight)
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
+    def _get_weighed_objects_vectorized(self, weighers, weighed_objs,
+                                        weighing_properties, limit, measured):
+        columns = self.columns_cls([obj.obj for obj in weighed_objs])
+        total_weights = numpy.zeros(len(weighed_objs))
+
+        for weigher in weighers:
+            weights = numpy.asarray(
+                self._weigh(weigher, weighed_objs, weighing_properties,
+                            columns, measured),
+                dtype=float)
+
+            weights = normalize_array(weights,
+                                      minval=weigher.minval,
+                                      maxval=weigher.maxval)
+            total_weights += weigher.weight_multiplier() * weights
+
+        # Keep the objects with equal weights in their original order, as
+        # sorted() does. argpartition() picks any of the objects weighing as
+        # much as the last one kept, the first ones of them are kept instead.
+        if limit is not None and limit < len(weighed_objs):
+            cut = -numpy.partition(-total_weights, limit - 1)[limit - 1]
+            above = numpy.flatnonzero(total_weights > cut)
+            ties = numpy.flatnonzero(total_weights == cut)
+            best = numpy.concatenate((above, ties[:limit - len(above)]))
+            order = best[numpy.lexsort((best, -total_weights[best]))]
+        else:
+            order = numpy.argsort(-total_weights, kind='mergesort')
+
+        result = []
+        for i in order:
+            obj = weighed_objs[i]
+            obj.weight = float(total_weights[i])
+            result.append(obj)
+        return result
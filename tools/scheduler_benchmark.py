@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the scheduling decisions made by the filter schedulers.
+
+This tool builds a synthetic fleet of compute hosts, with aggregates, NUMA
+topologies and PCI device pools, and sends it a series of scheduling requests
+through FilterScheduler.select_destinations() or the CachingScheduler. It then
+reports the time spent in each filter and weigher, the number of hosts each
+filter eliminated, and the overall scheduling throughput.
+
+No database or message queue is needed: the host states are built in memory
+and are kept from one request to the next, so the resources consumed by a
+request are seen by the following ones. The time spent loading the host
+states from the database is therefore not part of the results.
+
+Run like:
+
+    ./tools/scheduler_benchmark.py --hosts 1000 --requests 200 \\
+        --filters RetryFilter,RamFilter,ComputeFilter,NUMATopologyFilter \\
+        --numa-cells 2 --numa-nodes 1
+
+Any argument not known to this tool, such as --config-file, is handed to the
+Nova configuration parser, so that the scheduler options of a real deployment
+can be benchmarked.
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import sys
+import time
+
+from oslo_utils import timeutils
+from oslo_utils import uuidutils
+from six.moves import range
+
+from nova import config
+from nova import context as context_module
+from nova import exception
+from nova import objects
+from nova.scheduler import caching_scheduler
+from nova.scheduler import filter_scheduler
+from nova.scheduler import host_manager
+from nova.scheduler import scheduler_options
+from nova.virt import hardware
+
+CONF = config.CONF
+
+PCI_VENDOR_ID = '8086'
+PCI_PRODUCT_ID = '1520'
+
+
+class StageStats(object):
+    """Timing and host counts of one filter or weigher."""
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.calls = 0
+        self.seconds = 0.0
+        self.hosts_in = 0
+        self.hosts_out = 0
+
+    def record(self, seconds, hosts_in, hosts_out):
+        self.calls += 1
+        self.seconds += seconds
+        self.hosts_in += hosts_in
+        self.hosts_out += hosts_out
+
+
+class TimedFilter(object):
+    """Wraps a filter to record the time it takes and the hosts it drops."""
+
+    def __init__(self, filter_, stats):
+        self._filter = filter_
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._filter, name)
+
+    def filter_all(self, filter_obj_list, spec_obj):
+        start = time.time()
+        objs = self._filter.filter_all(filter_obj_list, spec_obj)
+        # The filters return generators, which have to be consumed for the
+        # filter to actually run.
+        if objs is not None:
+            objs = list(objs)
+        self._stats.record(time.time() - start, len(filter_obj_list),
+                           len(objs or []))
+        return objs
+
+    def filter_all_vectorized(self, columns, spec_obj):
+        start = time.time()
+        passes = self._filter.filter_all_vectorized(columns, spec_obj)
+        self._stats.record(time.time() - start, len(columns),
+                           int(passes.sum()))
+        return passes
+
+
+class TimedWeigher(object):
+    """Wraps a weigher to record the time it takes."""
+
+    def __init__(self, weigher, stats):
+        self._weigher = weigher
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._weigher, name)
+
+    def weigh_objects(self, weighed_obj_list, weight_properties):
+        start = time.time()
+        weights = self._weigher.weigh_objects(weighed_obj_list,
+                                              weight_properties)
+        self._stats.record(time.time() - start, len(weighed_obj_list),
+                           len(weighed_obj_list))
+        return weights
+
+    def weigh_objects_vectorized(self, columns, weight_properties):
+        start = time.time()
+        weights = self._weigher.weigh_objects_vectorized(columns,
+                                                         weight_properties)
+        self._stats.record(time.time() - start, len(columns), len(columns))
+        return weights
+
+
+class BenchmarkHostManager(host_manager.HostManager):
+    """Host manager serving a synthetic fleet instead of the database."""
+
+    def __init__(self, host_states, aggregates):
+        self._fleet = host_states
+        self._aggregates = aggregates
+        super(BenchmarkHostManager, self).__init__()
+
+    def _init_aggregates(self):
+        for agg in self._aggregates:
+            self.aggs_by_id[agg.id] = agg
+            for host in agg.hosts:
+                self.host_aggregates_map[host].add(agg.id)
+
+    def _init_instance_info(self):
+        self._instance_info = {}
+
+    def get_all_host_states(self, context):
+        return iter(self._fleet)
+
+
+class _BenchmarkSchedulerMixin(object):
+    def __init__(self, host_manager):
+        # The parent constructors are skipped as they load the host manager
+        # through stevedore and need the messaging layer for notifications.
+        self.host_manager = host_manager
+        self.options = scheduler_options.SchedulerOptions()
+        self.notifier = _NullNotifier()
+        # Only used by the CachingScheduler
+        self.all_host_states = None
+
+
+class BenchmarkFilterScheduler(_BenchmarkSchedulerMixin,
+                               filter_scheduler.FilterScheduler):
+    pass
+
+
+class BenchmarkCachingScheduler(_BenchmarkSchedulerMixin,
+                                caching_scheduler.CachingScheduler):
+    pass
+
+
+class _NullNotifier(object):
+    def info(self, context, event_type, payload):
+        pass
+
+
+def _parse_key_values(value):
+    items = {}
+    for item in value.split(','):
+        if item:
+            key, _sep, val = item.partition('=')
+            items[key.strip()] = val.strip()
+    return items
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the scheduler decisions on a synthetic fleet.')
+    parser.add_argument('--scheduler', choices=['filter', 'caching'],
+                        default='filter',
+                        help='Scheduler driver to benchmark.')
+    parser.add_argument('--filters',
+                        help='Comma separated list of the filters to use, '
+                             'scheduler_default_filters by default.')
+    parser.add_argument('--weighers',
+                        help='Comma separated list of the weigher classes to '
+                             'use, scheduler_weight_classes by default.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the random fleet and requests.')
+    fleet = parser.add_argument_group('fleet')
+    fleet.add_argument('--hosts', type=int, default=1000,
+                       help='Number of compute hosts.')
+    fleet.add_argument('--host-vcpus', type=int, default=32)
+    fleet.add_argument('--host-ram-mb', type=int, default=131072)
+    fleet.add_argument('--host-disk-gb', type=int, default=2048)
+    fleet.add_argument('--host-usage', type=float, default=0.5,
+                       help='Maximum fraction of the host resources already '
+                            'used, each host gets a random usage below it.')
+    fleet.add_argument('--aggregates', type=int, default=10,
+                       help='Number of host aggregates.')
+    fleet.add_argument('--aggregates-per-host', type=int, default=1)
+    fleet.add_argument('--aggregate-metadata', default='',
+                       help='Comma separated key=value pairs set on every '
+                            'other aggregate, for instance ssd=true.')
+    fleet.add_argument('--numa-cells', type=int, default=0,
+                       help='Number of NUMA cells of the hosts, 0 to not '
+                            'report any NUMA topology.')
+    fleet.add_argument('--pci-devices', type=int, default=0,
+                       help='Number of PCI devices in the pool of each host.')
+    requests = parser.add_argument_group('requests')
+    requests.add_argument('--requests', type=int, default=100,
+                          help='Number of scheduling requests.')
+    requests.add_argument('--instances', type=int, default=1,
+                          help='Number of instances per request.')
+    requests.add_argument('--vcpus', type=int, default=2)
+    requests.add_argument('--ram-mb', type=int, default=4096)
+    requests.add_argument('--disk-gb', type=int, default=20)
+    requests.add_argument('--extra-specs', default='',
+                          help='Comma separated key=value pairs of flavor '
+                               'extra specs, for instance '
+                               'aggregate_instance_extra_specs:ssd=true.')
+    requests.add_argument('--numa-nodes', type=int, default=0,
+                          help='Number of NUMA nodes requested by the '
+                               'instances, 0 for none.')
+    requests.add_argument('--pci-requests', type=int, default=0,
+                          help='Number of PCI devices requested by the '
+                               'instances.')
+    requests.add_argument('--server-group',
+                          choices=['affinity', 'anti-affinity'],
+                          help='Policy of a server group created for each '
+                               'request.')
+    return parser.parse_known_args(argv[1:])
+
+
+def build_aggregates(args):
+    metadata = _parse_key_values(args.aggregate_metadata)
+    aggregates = []
+    for i in range(args.aggregates):
+        agg_metadata = {'availability_zone': 'az%d' % (i % 3)}
+        if i % 2 == 0:
+            agg_metadata.update(metadata)
+        aggregates.append(objects.Aggregate(
+            id=i + 1, uuid=uuidutils.generate_uuid(), name='agg%d' % i,
+            hosts=[], metadata=agg_metadata))
+    return aggregates
+
+
+def _build_numa_topology(args, vcpus_used, ram_used):
+    cell_vcpus = args.host_vcpus // args.numa_cells
+    cell_ram = args.host_ram_mb // args.numa_cells
+    cells = []
+    for i in range(args.numa_cells):
+        cells.append(objects.NUMACell(
+            id=i,
+            cpuset=set(range(i * cell_vcpus, (i + 1) * cell_vcpus)),
+            memory=cell_ram,
+            cpu_usage=vcpus_used // args.numa_cells,
+            memory_usage=ram_used // args.numa_cells,
+            mempages=[], siblings=[], pinned_cpus=set()))
+    return objects.NUMATopology(cells=cells)
+
+
+def build_fleet(args, aggregates, rng):
+    host_states = []
+    now = timeutils.utcnow()
+    for i in range(args.hosts):
+        host = 'host%d' % i
+        usage = rng.uniform(0, args.host_usage)
+        vcpus_used = int(args.host_vcpus * usage)
+        ram_used = int(args.host_ram_mb * usage)
+        disk_used = int(args.host_disk_gb * usage)
+        num_instances = vcpus_used // max(1, args.vcpus)
+
+        numa_topology = None
+        if args.numa_cells:
+            numa_topology = _build_numa_topology(
+                args, vcpus_used, ram_used)._to_json()
+        pci_device_pools = None
+        if args.pci_devices:
+            pci_device_pools = objects.PciDevicePoolList(objects=[
+                objects.PciDevicePool(
+                    vendor_id=PCI_VENDOR_ID, product_id=PCI_PRODUCT_ID,
+                    numa_node=0, tags={'dev_type': 'type-VF'},
+                    count=args.pci_devices)])
+
+        compute = objects.ComputeNode(
+            id=i + 1, host=host, hypervisor_hostname=host,
+            vcpus=args.host_vcpus, vcpus_used=vcpus_used,
+            memory_mb=args.host_ram_mb,
+            free_ram_mb=args.host_ram_mb - ram_used,
+            local_gb=args.host_disk_gb, local_gb_used=disk_used,
+            free_disk_gb=args.host_disk_gb - disk_used,
+            disk_available_least=None, updated_at=now,
+            host_ip='10.0.%d.%d' % (i // 256, i % 256),
+            hypervisor_type='QEMU', hypervisor_version=2005000,
+            supported_hv_specs=[
+                objects.HVSpec(arch='x86_64', hv_type='qemu', vm_mode='hvm')],
+            numa_topology=numa_topology, pci_device_pools=pci_device_pools,
+            cpu_info='{}', metrics='[]',
+            stats={'num_instances': str(num_instances),
+                   'io_workload': str(rng.randint(0, 4))},
+            cpu_allocation_ratio=CONF.cpu_allocation_ratio or 16.0,
+            ram_allocation_ratio=CONF.ram_allocation_ratio or 1.5,
+            disk_allocation_ratio=CONF.disk_allocation_ratio or 1.0)
+        service = {'host': host, 'binary': 'nova-compute',
+                   'topic': 'compute', 'disabled': False,
+                   'forced_down': False, 'created_at': now,
+                   'updated_at': now, 'last_seen_up': now}
+
+        host_aggregates = []
+        if aggregates:
+            host_aggregates = rng.sample(
+                aggregates, min(len(aggregates), args.aggregates_per_host))
+            for agg in host_aggregates:
+                agg.hosts.append(host)
+
+        host_state = host_manager.HostState(host, host)
+        host_state.update(compute=compute, service=service,
+                          aggregates=host_aggregates, inst_dict={})
+        host_states.append(host_state)
+    return host_states
+
+
+def build_request_spec(args, ctxt):
+    extra_specs = _parse_key_values(args.extra_specs)
+    if args.numa_nodes:
+        extra_specs['hw:numa_nodes'] = str(args.numa_nodes)
+    flavor = objects.Flavor(
+        id=1, flavorid='bench', name='bench', vcpus=args.vcpus,
+        memory_mb=args.ram_mb, root_gb=args.disk_gb, ephemeral_gb=0,
+        swap=0, extra_specs=extra_specs)
+    image_meta = objects.ImageMeta.from_dict({})
+
+    pci_requests = None
+    if args.pci_requests:
+        pci_requests = objects.InstancePCIRequests(requests=[
+            objects.InstancePCIRequest(
+                count=args.pci_requests,
+                spec=[{'vendor_id': PCI_VENDOR_ID,
+                       'product_id': PCI_PRODUCT_ID}])])
+
+    instance_group = None
+    if args.server_group:
+        instance_group = objects.InstanceGroup(
+            uuid=uuidutils.generate_uuid(), policies=[args.server_group],
+            hosts=[], members=[])
+
+    spec_obj = objects.RequestSpec.from_components(
+        ctxt, uuidutils.generate_uuid(), {}, flavor,
+        hardware.numa_get_constraints(flavor, image_meta), pci_requests,
+        {}, instance_group, None)
+    spec_obj.num_instances = args.instances
+    return spec_obj
+
+
+def build_scheduler(args, host_states, aggregates):
+    manager = BenchmarkHostManager(host_states, aggregates)
+    stats = []
+    timed_filters = []
+    for filter_ in manager.default_filters:
+        stage = StageStats(filter_.__class__.__name__, 'filter')
+        stats.append(stage)
+        timed_filters.append(TimedFilter(filter_, stage))
+    manager.default_filters = timed_filters
+    timed_weighers = []
+    for weigher in manager.weighers:
+        stage = StageStats(weigher.__class__.__name__, 'weigher')
+        stats.append(stage)
+        timed_weighers.append(TimedWeigher(weigher, stage))
+    manager.weighers = timed_weighers
+
+    if args.scheduler == 'caching':
+        driver = BenchmarkCachingScheduler(manager)
+    else:
+        driver = BenchmarkFilterScheduler(manager)
+    return driver, stats
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def print_report(args, stats, latencies, placed, failures, elapsed):
+    print('Scheduler: %s, hosts: %d, requests: %d, instances per request: %d'
+          % (args.scheduler, args.hosts, args.requests, args.instances))
+    print()
+    print('%-36s %8s %10s %10s %10s %10s' % (
+        'Stage', 'Calls', 'Total ms', 'Mean ms', 'Hosts in', 'Eliminated'))
+    for stage in stats:
+        mean_ms = stage.seconds * 1000 / stage.calls if stage.calls else 0.0
+        print('%-36s %8d %10.1f %10.3f %10d %10d' % (
+            '%s %s' % (stage.kind, stage.name), stage.calls,
+            stage.seconds * 1000, mean_ms, stage.hosts_in,
+            stage.hosts_in - stage.hosts_out))
+    print()
+
+    latencies = sorted(latencies)
+    print('Requests: %d succeeded, %d failed' % (
+        len(latencies) - failures, failures))
+    print('Instances placed: %d' % placed)
+    print('Request latency ms: mean %.2f, p50 %.2f, p95 %.2f, max %.2f' % (
+        sum(latencies) * 1000 / len(latencies) if latencies else 0.0,
+        _percentile(latencies, 50) * 1000, _percentile(latencies, 95) * 1000,
+        (latencies[-1] if latencies else 0.0) * 1000))
+    if elapsed:
+        print('Throughput: %.1f requests/s, %.1f instances/s' % (
+            len(latencies) / elapsed, placed / elapsed))
+
+
+def main(argv=sys.argv):
+    args, remaining = _parse_args(argv)
+    config.parse_args([argv[0]] + remaining, configure_db=False,
+                      init_rpc=False)
+    objects.register_all()
+    # The synthetic services never send heartbeats.
+    CONF.set_override('service_down_time', 3600 * 24 * 365)
+    if args.filters:
+        CONF.set_override('scheduler_default_filters',
+                          args.filters.split(','))
+    if args.weighers:
+        CONF.set_override('scheduler_weight_classes',
+                          args.weighers.split(','))
+
+    rng = random.Random(args.seed)
+    ctxt = context_module.get_admin_context()
+    aggregates = build_aggregates(args)
+    host_states = build_fleet(args, aggregates, rng)
+    driver, stats = build_scheduler(args, host_states, aggregates)
+    if args.scheduler == 'caching':
+        driver.run_periodic_tasks(ctxt)
+
+    latencies = []
+    placed = 0
+    failures = 0
+    for i in range(args.requests):
+        spec_obj = build_request_spec(args, ctxt)
+        request_start = time.time()
+        try:
+            placed += len(driver.select_destinations(ctxt, spec_obj))
+        except exception.NoValidHost:
+            failures += 1
+        latencies.append(time.time() - request_start)
+
+    print_report(args, stats, latencies, placed, failures, sum(latencies))
+
+
+if __name__ == '__main__':
+    sys.exit(main())